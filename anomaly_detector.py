@@ -0,0 +1,97 @@
+"""Q-Storm Platform - Vectorized anomaly detection over daily series
+
+日×系列の行列（行=日、列=メトリック×店舗）の全セルを一括判定する。
+NaN のセル（行のない日）は未観測として統計量から除き、異常とは判定しない。
+"""
+import warnings
+from typing import Dict, Sequence
+
+import numpy as np
+
+ANOMALY_METHODS = ('robust_z', 'iqr', 'seasonal')
+
+# MAD を標準偏差相当に換算する係数（正規分布で 1/Φ^-1(0.75)）
+_MAD_SCALE = 1.4826
+
+# IQR 法の係数
+IQR_MULTIPLIER = 1.5
+
+
+def _nanmedian(matrix: np.ndarray) -> np.ndarray:
+    """NaN を除いた列ごとの中央値（観測のない列は NaN）"""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmedian(matrix, axis=0)
+
+
+def _robust_z(matrix: np.ndarray) -> np.ndarray:
+    """列ごとの中央値・MAD による頑健 z スコア（MAD=0 の列は 0）"""
+    median = _nanmedian(matrix)
+    mad = _nanmedian(np.abs(matrix - median)) * _MAD_SCALE
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = (matrix - median) / mad
+    return np.where(mad > 0, z, 0.0)
+
+
+def _weekday_profile(matrix: np.ndarray, weekdays: np.ndarray) -> np.ndarray:
+    """曜日ごとの列中央値を各行に展開した期待値行列"""
+    expected = np.empty_like(matrix)
+    for day in np.unique(weekdays):
+        rows = weekdays == day
+        expected[rows] = _nanmedian(matrix[rows])
+    return expected
+
+
+def detect_anomalies(matrix: np.ndarray, weekdays: np.ndarray, methods: Sequence[str] = ANOMALY_METHODS,
+                     threshold: float = 3.5) -> Dict[str, np.ndarray]:
+    """
+    頑健 z スコア・IQR・曜日季節残差による異常判定
+
+    Args:
+        matrix: 日×系列の2次元配列（NaN は未観測のセル）
+        weekdays: 各行の曜日（0=月曜）
+        methods: 使用する判定法（ANOMALY_METHODS の部分集合）
+        threshold: 頑健 z スコア（季節残差を含む）の閾値
+
+    Returns:
+        dict: flags（手法→bool行列、未観測のセルは False）, score（季節残差または頑健 z スコア）, expected（期待値）
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    observed = np.isfinite(matrix)
+    flags: Dict[str, np.ndarray] = {}
+    z = _robust_z(matrix)
+    if 'robust_z' in methods:
+        flags['robust_z'] = np.abs(z) > threshold
+    if 'iqr' in methods:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            q1, q3 = np.nanpercentile(matrix, [25, 75], axis=0)
+        spread = (q3 - q1) * IQR_MULTIPLIER
+        flags['iqr'] = ((matrix < q1 - spread) | (matrix > q3 + spread)) & (spread > 0)
+
+    if 'seasonal' in methods:
+        expected = _weekday_profile(matrix, weekdays)
+        score = _robust_z(matrix - expected)
+        flags['seasonal'] = np.abs(score) > threshold
+    else:
+        expected = np.broadcast_to(_nanmedian(matrix), matrix.shape)
+        score = z
+    flags = {name: flag & observed for name, flag in flags.items()}
+    return {'flags': flags, 'score': score, 'expected': expected}
+
+
+def flagged_cells(result: Dict[str, np.ndarray]):
+    """
+    いずれかの手法で異常と判定されたセルを |score| の降順で返す
+
+    Returns:
+        tuple: (rows, columns, method_mask) - method_mask は手法ごとの判定（行=セル）
+    """
+    names = list(result['flags'])
+    if not names:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty((0, 0), dtype=bool)
+    stacked = np.stack([result['flags'][name] for name in names], axis=-1)
+    rows, columns = np.nonzero(stacked.any(axis=-1))
+    order = np.argsort(-np.abs(result['score'][rows, columns]), kind='stable')
+    rows, columns = rows[order], columns[order]
+    return rows, columns, stacked[rows, columns]
@@ -5,10 +5,13 @@ import json
 import logging
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 import time
+import uuid
 from scipy import stats
 
 import numpy as np
@@ -21,9 +24,38 @@ from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
 
 import config
+from cache_manager import AnalysisCache
 from db_manager import DatabaseManager
+from density_binning import hex_bins, rect_bins
+import column_store
+import duckdb_backend
+import parquet_stream
+import partitioned_store
+import progressive
+import session_union
+from distribution_fitter import DISTRIBUTION_LABELS, fit_candidates, frozen_distribution, subsample
+from eda_profiler import profile_dataframe
 from export_manager import MarkdownExporter
+from forecast_engine import fit_panel, forecast, parameters_for
+from rolling_stats import rolling_statistics
+from pareto_engine import DEFAULT_PAGE_SIZE as PARETO_DEFAULT_PAGE_SIZE
+from pareto_engine import MAX_PAGE_SIZE as PARETO_MAX_PAGE_SIZE
+from pareto_engine import (
+    MIGRATION_STATES,
+    ParetoEngine,
+    classify_rows,
+    numeric_matrix,
+    rank_rows,
+    sum_rows_by_code,
+    sum_by_code_pair,
+    transition_counts,
+)
+from anomaly_detector import detect_anomalies, flagged_cells
+from query_engine import aggregate, combine_codes, quantile_name
+from monte_carlo import percentile_bands, simulate_bootstrap, simulate_parametric
+from store_clustering import kmeans, standardize
 from auth import require_api_key
+from lang_agent.chain import CATEGORY_LABELS
 from lang_agent.chain import DEFAULT_CATEGORY_COLUMNS as LANGCHAIN_DEFAULT_CATEGORIES
 from lang_agent.chain import generate_store_comparison
 
@@ -62,6 +94,26 @@ limiter = Limiter(
 # データストレージ（メモリベース）
 data_storage = {}
 
+# 分析結果キャッシュ（セッション単位のLRU、アップロード時に破棄）
+analysis_cache = AnalysisCache(maxsize=config.ANALYSIS_CACHE_SIZE)
+
+# 行フィルタの列配列・条件マスクのキャッシュ（セッション単位のLRU、アップロード時に破棄）
+filter_cache = AnalysisCache(maxsize=config.FILTER_CACHE_SIZE)
+
+# セッションごとのデータセットバージョン（アップロード時に更新）
+dataset_versions: Dict[str, str] = {}
+
+# mmap で開いたセッションの列ストア（アップロード時に破棄）
+column_stores: Dict[str, column_store.ColumnStore] = {}
+
+# 段階的応答の近似値に使う店舗別の層別標本 {(session_id,): (dataset_version, 標本)}
+# （アップロード時に作成してディスクにも保存、メモリ上はセッション単位のLRU）
+stratified_samples = AnalysisCache(maxsize=config.PROGRESSIVE_SAMPLE_CACHE_SIZE)
+
+# 段階的応答の厳密な結果 {(result_id,): (分析種別, Future)}（result_id で参照するためセッション単位の破棄は行わない）
+progressive_results = AnalysisCache(maxsize=config.PROGRESSIVE_RESULT_LIMIT)
+progressive_executor = ThreadPoolExecutor(max_workers=config.PROGRESSIVE_WORKERS, thread_name_prefix='progressive')
+
 # アップロード設定
 ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls'}
 MAX_FILE_SIZE = 200 * 1024 * 1024  # 200MB
@@ -102,6 +154,15 @@ def validate_session_id(session_id: Optional[str]) -> str:
     return session_id
 
 
+def validate_session_ids(session_ids: Optional[Any]) -> List[str]:
+    """Validate the session id list of multi-session (union) requests."""
+    if not isinstance(session_ids, list) or not session_ids:
+        raise ValueError('session_ids must be a non-empty list')
+    if len(session_ids) > config.MAX_UNION_SESSIONS:
+        raise ValueError(f'session_ids must contain at most {config.MAX_UNION_SESSIONS} sessions')
+    return list(dict.fromkeys(validate_session_id(session_id) for session_id in session_ids))
+
+
 def validate_metric(metric: Optional[str]) -> str:
     """Validate requested metric against the allowed schema."""
     metric = metric or '売上金額'
@@ -133,10 +194,334 @@ def validate_bins(bins: Optional[Any]) -> int:
     return bins_int
 
 
+def validate_normality_method(method: Optional[str]) -> str:
+    """Validate normality test method for histogram statistics."""
+    method = method or 'shapiro'
+    if method not in config.VALID_NORMALITY_METHODS:
+        allowed = ', '.join(config.VALID_NORMALITY_METHODS)
+        raise ValueError(f"Invalid normality_method. Must be one of: {allowed}")
+    return method
+
+
+def validate_distribution_type(distribution_type: Optional[str]) -> str:
+    """Validate requested probability distribution ('auto' fits every candidate)."""
+    distribution_type = distribution_type or 'auto'
+    if distribution_type != 'auto' and distribution_type not in config.VALID_DISTRIBUTIONS:
+        allowed = ', '.join(['auto', *config.VALID_DISTRIBUTIONS])
+        raise ValueError(f"Invalid distribution_type. Must be one of: {allowed}")
+    return distribution_type
+
+
+def validate_page_size(page_size: Optional[Any]) -> int:
+    """Validate page size for paginated member lists."""
+    if page_size is None:
+        return PARETO_DEFAULT_PAGE_SIZE
+    try:
+        page_size_int = int(page_size)
+    except (TypeError, ValueError) as exc:
+        raise ValueError('page_size must be an integer value') from exc
+    if not 1 <= page_size_int <= PARETO_MAX_PAGE_SIZE:
+        raise ValueError(f'page_size must be between 1 and {PARETO_MAX_PAGE_SIZE}')
+    return page_size_int
+
+
+def validate_offset(offset: Optional[Any]) -> int:
+    """Validate pagination offset."""
+    if offset is None:
+        return 0
+    try:
+        offset_int = int(offset)
+    except (TypeError, ValueError) as exc:
+        raise ValueError('offset must be an integer value') from exc
+    if offset_int < 0:
+        raise ValueError('offset must be zero or greater')
+    return offset_int
+
+
+def validate_window(value: Optional[Any], name: str, default: int) -> int:
+    """Validate a window length (number of periods) for rolling statistics."""
+    if value is None:
+        return default
+    try:
+        value_int = int(value)
+    except (TypeError, ValueError) as exc:
+        raise ValueError(f'{name} must be an integer value') from exc
+    if not 1 <= value_int <= config.TIMESERIES_MAX_WINDOW:
+        raise ValueError(f'{name} must be between 1 and {config.TIMESERIES_MAX_WINDOW}')
+    return value_int
+
+
+def validate_anomaly_methods(methods: Optional[Any]) -> List[str]:
+    """Validate anomaly detection methods (ANOMALY_DEFAULT_METHODS when omitted)."""
+    if methods is None:
+        return list(config.ANOMALY_DEFAULT_METHODS)
+    if not isinstance(methods, list) or not methods:
+        raise ValueError('methods must be a non-empty list')
+    invalid = [method for method in methods if method not in config.VALID_ANOMALY_METHODS]
+    if invalid:
+        allowed = ', '.join(config.VALID_ANOMALY_METHODS)
+        raise ValueError(f"Invalid anomaly method. Must be one of: {allowed}")
+    return [method for method in config.VALID_ANOMALY_METHODS if method in methods]
+
+
+def validate_threshold(threshold: Optional[Any]) -> float:
+    """Validate robust z-score threshold for anomaly detection."""
+    if threshold is None:
+        return config.ANOMALY_Z_THRESHOLD
+    try:
+        threshold_float = float(threshold)
+    except (TypeError, ValueError) as exc:
+        raise ValueError('threshold must be a number') from exc
+    if not 1.0 <= threshold_float <= 20.0:
+        raise ValueError('threshold must be between 1 and 20')
+    return threshold_float
+
+
+def validate_comparison_mode(mode: Optional[str]) -> str:
+    """Validate period comparison mode."""
+    mode = mode or 'yoy'
+    if mode not in config.VALID_COMPARISON_MODES:
+        allowed = ', '.join(config.VALID_COMPARISON_MODES)
+        raise ValueError(f"Invalid mode. Must be one of: {allowed}")
+    return mode
+
+
+def validate_heatmap_axis(axis: Optional[str]) -> str:
+    """Validate heatmap period axis."""
+    axis = axis or 'month'
+    if axis not in config.VALID_HEATMAP_AXES:
+        allowed = ', '.join(config.VALID_HEATMAP_AXES)
+        raise ValueError(f"Invalid axis. Must be one of: {allowed}")
+    return axis
+
+
+def validate_aggregation(aggregation: Optional[str]) -> str:
+    """Validate cell aggregation function."""
+    aggregation = aggregation or 'sum'
+    if aggregation not in config.VALID_AGGREGATIONS:
+        allowed = ', '.join(config.VALID_AGGREGATIONS)
+        raise ValueError(f"Invalid aggregation. Must be one of: {allowed}")
+    return aggregation
+
+
+def validate_scatter_mode(mode: Optional[str]) -> str:
+    """Validate scatter rendering mode ('auto' bins only above SCATTER_MAX_POINTS)."""
+    mode = mode or 'auto'
+    if mode not in config.VALID_SCATTER_MODES:
+        allowed = ', '.join(config.VALID_SCATTER_MODES)
+        raise ValueError(f"Invalid mode. Must be one of: {allowed}")
+    return mode
+
+
+def validate_cluster_count(k: Optional[Any]) -> int:
+    """Validate the number of clusters."""
+    if k is None:
+        return 4
+    try:
+        k_int = int(k)
+    except (TypeError, ValueError) as exc:
+        raise ValueError('k must be an integer value') from exc
+    if not 2 <= k_int <= config.CLUSTER_MAX_K:
+        raise ValueError(f'k must be between 2 and {config.CLUSTER_MAX_K}')
+    return k_int
+
+
+def validate_simulation_options(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate Monte Carlo simulation options (method, days, trials, percentiles)."""
+    method = payload.get('method') or 'bootstrap'
+    if method not in config.VALID_SIMULATION_METHODS:
+        allowed = ', '.join(config.VALID_SIMULATION_METHODS)
+        raise ValueError(f"Invalid method. Must be one of: {allowed}")
+    try:
+        days = int(payload.get('days', 30))
+        trials = int(payload.get('trials', config.SIMULATION_DEFAULT_TRIALS))
+    except (TypeError, ValueError) as exc:
+        raise ValueError('days and trials must be integer values') from exc
+    if not 1 <= days <= config.SIMULATION_MAX_DAYS:
+        raise ValueError(f'days must be between 1 and {config.SIMULATION_MAX_DAYS}')
+    if not 100 <= trials <= config.SIMULATION_MAX_TRIALS:
+        raise ValueError(f'trials must be between 100 and {config.SIMULATION_MAX_TRIALS}')
+    percentiles = payload.get('percentiles', config.SIMULATION_PERCENTILES)
+    if not isinstance(percentiles, list) or not percentiles or \
+            not all(isinstance(p, (int, float)) and not isinstance(p, bool) and 0 <= p <= 100
+                    for p in percentiles):
+        raise ValueError('percentiles must be a list of numbers between 0 and 100')
+    return {
+        'method': method,
+        'distribution_type': validate_distribution_type(payload.get('distribution_type')),
+        'days': days,
+        'trials': trials,
+        'percentiles': sorted(set(float(p) for p in percentiles)),
+    }
+
+
+def validate_query(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate a declarative group-by query and return it in normalized form."""
+    group_by = payload.get('group_by') or []
+    if not isinstance(group_by, list) or not all(isinstance(item, str) for item in group_by):
+        raise ValueError('group_by must be a list of dimension names')
+    time_units = [item for item in group_by if item not in config.VALID_QUERY_DIMENSIONS]
+    if len(time_units) > 1:
+        raise ValueError('group_by accepts at most one time unit')
+    time_unit = validate_time_unit(time_units[0]) if time_units else None
+
+    metrics = payload.get('metrics')
+    if not isinstance(metrics, list) or not metrics:
+        raise ValueError('metrics must be a non-empty list')
+    if len(metrics) > config.QUERY_MAX_METRICS:
+        raise ValueError(f'metrics accepts at most {config.QUERY_MAX_METRICS} entries')
+    metrics = list(dict.fromkeys(validate_metric(metric) for metric in metrics))
+
+    aggregations = payload.get('aggregations') or ['sum']
+    if not isinstance(aggregations, list) or \
+            any(aggregation not in config.VALID_QUERY_AGGREGATIONS for aggregation in aggregations):
+        allowed = ', '.join(config.VALID_QUERY_AGGREGATIONS)
+        raise ValueError(f"Invalid aggregations. Each must be one of: {allowed}")
+    quantiles = payload.get('quantiles') or []
+    if not isinstance(quantiles, list) or \
+            not all(isinstance(q, (int, float)) and not isinstance(q, bool) and 0 <= q <= 1
+                    for q in quantiles):
+        raise ValueError('quantiles must be a list of numbers between 0 and 1')
+
+    categories = payload.get('categories')
+    if categories is not None and (not isinstance(categories, list) or
+                                   not all(isinstance(c, str) and len(c) <= 100 for c in categories)):
+        raise ValueError('categories must be a list of category names')
+
+    dates = {}
+    for name in ('start_date', 'end_date'):
+        value = payload.get(name)
+        if value:
+            try:
+                dates[name] = pd.Timestamp(value).strftime('%Y-%m-%d')
+            except (TypeError, ValueError) as exc:
+                raise ValueError(f'{name} must be a valid date') from exc
+
+    # 正規化: 次元・集計は定義順、店舗・カテゴリ・分位点はソート済み（同じ問い合わせは同じキャッシュキー）
+    return {
+        'dimensions': [dimension for dimension in config.VALID_QUERY_DIMENSIONS if dimension in group_by],
+        'time_unit': time_unit,
+        'metrics': metrics,
+        'aggregations': [a for a in config.VALID_QUERY_AGGREGATIONS if a in aggregations],
+        'quantiles': sorted(set(float(q) for q in quantiles)),
+        'stores': sorted(validate_store_list(payload.get('stores')) or []),
+        'categories': sorted(set(categories or [])),
+        'start_date': dates.get('start_date'),
+        'end_date': dates.get('end_date'),
+        'filters': validate_filters(payload.get('filters')),
+    }
+
+
+def validate_filters(filters: Optional[Any]) -> Tuple[tuple, ...]:
+    """Validate the optional multi-condition `filters` object into a normalized filter spec."""
+    if filters is None:
+        return ()
+    if not isinstance(filters, dict):
+        raise ValueError('filters must be an object')
+    unknown = sorted(set(filters) - {'stores', 'start_date', 'end_date', 'ranges', 'categories'})
+    if unknown:
+        raise ValueError(f"Unknown filter '{unknown[0]}'")
+
+    predicates = []
+    for name, kind in (('start_date', 'date_from'), ('end_date', 'date_to')):
+        if filters.get(name):
+            predicates.append((kind, normalize_filter_date(filters[name], strict=True)))
+    ranges = filters.get('ranges') or {}
+    categories = filters.get('categories') or {}
+    if not isinstance(ranges, dict) or not isinstance(categories, dict):
+        raise ValueError('filters.ranges and filters.categories must be objects keyed by column')
+    for column, bounds in ranges.items():
+        if not isinstance(bounds, dict) or not bounds or set(bounds) - {'min', 'max'} or \
+                not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in bounds.values()):
+            raise ValueError(f"Range filter for '{column}' must be an object with numeric min and/or max")
+        low, high = bounds.get('min'), bounds.get('max')
+        if low is not None and high is not None and low > high:
+            raise ValueError(f"Range filter for '{column}' has min greater than max")
+        predicates.append(('range', validate_filter_column(column),
+                           None if low is None else float(low), None if high is None else float(high)))
+    for column, values in categories.items():
+        if not isinstance(values, list) or not values or not all(isinstance(v, str) for v in values):
+            raise ValueError(f"Category filter for '{column}' must be a non-empty list of values")
+        predicates.append(('in', validate_filter_column(column), tuple(sorted(set(values)))))
+    return build_filter_spec(stores=validate_store_list(filters.get('stores')), extra=tuple(predicates))
+
+
+def split_filter_options(filters: Optional[Any], options: Tuple[str, ...]) -> Tuple[Dict[str, Any], Tuple[tuple, ...]]:
+    """
+    Split a `filters` object into endpoint options (e.g. shop / remove_outliers) and
+    the filter spec of the remaining multi-condition keys (see validate_filters).
+    """
+    if not filters:
+        return {}, ()
+    if not isinstance(filters, dict):
+        raise ValueError('filters must be an object')
+    return ({name: filters[name] for name in options if name in filters},
+            validate_filters({name: value for name, value in filters.items() if name not in options}))
+
+
+def validate_filter_column(column: Any) -> str:
+    """Validate a column name used in a filter condition."""
+    if not isinstance(column, str) or not column.strip() or len(column) > 100:
+        raise ValueError('filter column names must be non-empty strings up to 100 characters')
+    return column
+
+
+def validate_cursor(cursor: Optional[Any]) -> int:
+    """Validate a paging cursor returned as next_cursor by a previous page."""
+    if cursor is None or cursor == '':
+        return 0
+    if not isinstance(cursor, str) or not cursor.isdigit():
+        raise ValueError('cursor is invalid')
+    return int(cursor)
+
+
+def validate_horizon(horizon: Optional[Any]) -> int:
+    """Validate forecast horizon (number of periods ahead)."""
+    if horizon is None:
+        return config.FORECAST_DEFAULT_HORIZON
+    try:
+        horizon_int = int(horizon)
+    except (TypeError, ValueError) as exc:
+        raise ValueError('horizon must be an integer value') from exc
+    if not 1 <= horizon_int <= config.FORECAST_MAX_HORIZON:
+        raise ValueError(f'horizon must be between 1 and {config.FORECAST_MAX_HORIZON}')
+    return horizon_int
+
+
+def validate_rolling_options(options: Optional[Any]) -> Optional[Dict[str, int]]:
+    """Validate rolling statistics options (true for defaults, or an object)."""
+    if options is None or options is False:
+        return None
+    if options is True:
+        options = {}
+    if not isinstance(options, dict):
+        raise ValueError('rolling must be a boolean or an object')
+    window = validate_window(options.get('window'), 'window', config.TIMESERIES_ROLLING_WINDOW)
+    return {
+        'window': window,
+        'span': validate_window(options.get('ewma_span'), 'ewma_span', window),
+        'growth_lag': validate_window(options.get('growth_lag'), 'growth_lag', 1),
+    }
+
+
+def validate_store_list(stores: Optional[Any]) -> Optional[List[str]]:
+    """Validate an optional list of store names (None when omitted or empty)."""
+    if stores is None:
+        return None
+    if not isinstance(stores, list):
+        raise ValueError('stores must be a list')
+    if not all(isinstance(store, str) for store in stores):
+        raise ValueError('stores must contain only strings')
+    validated = [store for store in (validate_store(s) for s in stores) if store]
+    return validated or None
+
+
 def validate_store(store: Optional[str]) -> Optional[str]:
     """Validate store name string when provided."""
     if store is None:
         return None
+    if not isinstance(store, str):
+        raise ValueError('store must be a string')
     store = store.strip()
     if not store:
         return None
@@ -149,35 +534,7 @@ def validate_store(store: Optional[str]) -> Optional[str]:
 
 def filter_dataframe_by_date(df: pd.DataFrame, start_date_str: Optional[str], end_date_str: Optional[str]) -> pd.DataFrame:
     """Apply date range filters to the DataFrame if dates are provided."""
-    if not start_date_str and not end_date_str:
-        return df
-
-    try:
-        date_series = prepare_datetime_index(df)
-    except ValueError:
-        logger.warning("Date filter requested but no valid date column found.")
-        return df
-
-    df_filtered = df.copy()
-    df_filtered['__temp_date__'] = date_series
-
-    if start_date_str:
-        try:
-            start_ts = pd.to_datetime(start_date_str)
-            start_ts = start_ts.normalize()
-            df_filtered = df_filtered[df_filtered['__temp_date__'] >= start_ts]
-        except Exception:
-            pass
-
-    if end_date_str:
-        try:
-            end_ts = pd.to_datetime(end_date_str)
-            end_ts = end_ts.normalize() + pd.Timedelta(days=1, microseconds=-1)
-            df_filtered = df_filtered[df_filtered['__temp_date__'] <= end_ts]
-        except Exception:
-            pass
-
-    return df_filtered.drop(columns=['__temp_date__'])
+    return DatasetFilter(df).apply(build_filter_spec(start_date_str, end_date_str))
 
 
 # Session utilities -----------------------------------------------------------
@@ -194,7 +551,14 @@ def get_session_output_dir(session_id: str) -> Path:
 
 
 def locate_session_data_file(session_dir: Path) -> Path:
-    """Locate the first supported dataset file inside the session directory."""
+    """
+    Locate the first supported dataset file inside the session directory.
+
+    A store / month partitioned dataset is represented by its manifest file.
+    """
+    manifest = session_dir / partitioned_store.DATASET_DIR / partitioned_store.MANIFEST_NAME
+    if manifest.exists():
+        return manifest
     preferred_names = [
         'cleaned_data.parquet',
         'analysis_ready.parquet',
@@ -219,15 +583,26 @@ def locate_session_data_file(session_dir: Path) -> Path:
     raise FileNotFoundError('Analysis dataset not found for session')
 
 
-def load_session_dataframe(session_id: str) -> pd.DataFrame:
-    """Load the session's dataset into a DataFrame."""
+def load_session_dataframe(session_id: str, stores: Optional[List[str]] = None,
+                           start_date: Optional[str] = None, end_date: Optional[str] = None) -> pd.DataFrame:
+    """
+    Load the session's dataset into a DataFrame.
+
+    For a partitioned dataset the store / date predicates are pushed down so only matching
+    partition files and row groups are read. Single-file datasets are loaded whole
+    (callers apply their row filters either way).
+    """
     session_dir = get_session_upload_dir(session_id)
     if not session_dir.exists() or not session_dir.is_dir():
         raise FileNotFoundError('Session directory not found')
     data_file = locate_session_data_file(session_dir)
+    pushdown = bool(stores or start_date or end_date)
 
     try:
-        if data_file.suffix.lower() == '.parquet':
+        if data_file.name == partitioned_store.MANIFEST_NAME:
+            df = partitioned_store.read_partitioned(data_file.parent, stores, normalize_filter_date(start_date),
+                                                    normalize_filter_date(end_date))
+        elif data_file.suffix.lower() == '.parquet':
             df = pd.read_parquet(data_file)
         elif data_file.suffix.lower() in {'.csv'}:
             df = pd.read_csv(data_file)
@@ -240,54 +615,417 @@ def load_session_dataframe(session_id: str) -> pd.DataFrame:
     except Exception as exc:
         raise ValueError('Failed to load session dataset') from exc
 
-    if df.empty:
+    if df.empty and not pushdown:
         raise ValueError('Session dataset is empty')
+    if df.empty and stores:
+        raise ValueError('No records found for specified store')
     return df
 
 
-def get_dataframe_for_analysis(session_id: str) -> pd.DataFrame:
-    """Fetch dataframe from in-memory storage or fall back to disk."""
+def persist_session_dataset(session_id: str, df: pd.DataFrame) -> None:
+    """Write the session dataset to disk partitioned by store and month."""
+    store_column = next((col for col in STORE_COLUMNS if col in df.columns), None)
+    try:
+        date_column, dates = resolve_datetime(df)
+    except ValueError:
+        date_column, dates = None, None
+    partitioned_store.write_partitioned(
+        df, get_session_upload_dir(session_id) / partitioned_store.DATASET_DIR,
+        store_column, dates, date_column, row_group_size=config.PARTITION_ROW_GROUP_SIZE)
+
+
+def persist_session_columns(session_id: str, df: pd.DataFrame) -> None:
+    """Write the session dataset as memory-mappable .npy columns (numeric values, codes, dates)."""
+    try:
+        dates = prepare_datetime_index(df)
+    except ValueError:
+        dates = None
+    column_stores.pop(session_id, None)
+    column_store.write_column_store(df, get_session_upload_dir(session_id) / column_store.COLUMNS_DIR, dates)
+
+
+def open_column_store(session_id: str) -> Optional[column_store.ColumnStore]:
+    """Return the session's mmap column store (opened once per session, shared across requests)."""
+    store = column_stores.get(session_id)
+    if store is None:
+        directory = get_session_upload_dir(session_id) / column_store.COLUMNS_DIR
+        if not column_store.exists(directory):
+            return None
+        store = column_stores.setdefault(session_id, column_store.ColumnStore(directory))
+    return store
+
+
+def build_session_sample(df: pd.DataFrame) -> progressive.StratifiedSample:
+    """Per-store stratified sample of the session dataset (approximate answers in progressive mode)."""
+    store_column = next((col for col in STORE_COLUMNS if col in df.columns), None)
+    try:
+        dates = prepare_datetime_index(df)
+    except ValueError:
+        dates = None
+    return progressive.build_stratified_sample(df, store_column, config.PROGRESSIVE_SAMPLE_PER_STORE,
+                                               dates, seed=config.ANALYSIS_RANDOM_SEED)
+
+
+def persist_session_sample(session_id: str, sample: progressive.StratifiedSample) -> None:
+    """Write the session's stratified sample next to its dataset, tagged with the data file version."""
+    progressive.write_stratified_sample(sample, get_session_upload_dir(session_id) / progressive.SAMPLE_DIR,
+                                        get_dataset_file_version(session_id))
+
+
+def load_session_sample(session_id: str) -> Optional[progressive.StratifiedSample]:
+    """Open the sample written at upload (None if missing or built from a different data file)."""
+    directory = get_session_upload_dir(session_id) / progressive.SAMPLE_DIR
+    if not progressive.exists(directory):
+        return None
+    try:
+        data_version, sample = progressive.read_stratified_sample(directory)
+        if data_version != get_dataset_file_version(session_id):
+            return None
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.warning('Stratified sample read warning: %s', exc)
+        return None
+    return sample
+
+
+def get_stratified_sample(session_id: str) -> progressive.StratifiedSample:
+    """
+    Return the session's stratified sample.
+
+    Kept at upload (memory and disk); sessions loaded from disk open the saved sample without reading
+    the dataset. Only sessions without a saved sample build it here, once, and save it.
+    """
+    version = get_dataset_version(session_id)
+    cached = stratified_samples.get((session_id,))
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    sample = load_session_sample(session_id)
+    if sample is None:
+        sample = build_session_sample(get_dataframe_for_analysis(session_id))
+        if session_id not in data_storage:
+            try:
+                persist_session_sample(session_id, sample)
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.warning('Stratified sample write warning: %s', exc)
+    stratified_samples.set((session_id,), (version, sample))
+    return sample
+
+
+def get_dataframe_for_analysis(session_id: str, stores: Optional[List[str]] = None,
+                               start_date: Optional[str] = None, end_date: Optional[str] = None) -> pd.DataFrame:
+    """
+    Fetch dataframe from in-memory storage or fall back to disk.
+
+    stores / start_date / end_date are pushdown hints for partitioned datasets on disk;
+    in-memory sessions are returned whole.
+    """
     df = data_storage.get(session_id)
     if df is not None:
         return df.copy()
-    return load_session_dataframe(session_id)
+    return load_session_dataframe(session_id, stores, start_date, end_date)
+
+
+def get_dataset_version(session_id: str) -> str:
+    """Return an identifier that changes whenever the session's dataset changes."""
+    version = dataset_versions.get(session_id)
+    if version is not None:
+        return version
+    if session_id in data_storage:
+        return 'memory'
+    return get_dataset_file_version(session_id)
+
+
+def get_dataset_file_version(session_id: str) -> str:
+    """Return an identifier of the session's dataset file on disk (name, mtime, size)."""
+    data_file = locate_session_data_file(get_session_upload_dir(session_id))
+    stat = data_file.stat()
+    return f'{data_file.name}:{stat.st_mtime_ns}:{stat.st_size}'
+
+
+# DataFrame を経由せずに集計するバックエンド（ANALYSIS_BACKEND で選択）
+AnalysisBackend = Union[duckdb_backend.DuckDBBackend, parquet_stream.ParquetStreamBackend,
+                        column_store.ColumnStoreBackend]
+
+
+def get_analysis_backend(session_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                         stores: Optional[List[str]] = None) -> Optional[AnalysisBackend]:
+    """
+    Return an aggregation backend over the session's Parquet file(s) or column store.
+
+    ANALYSIS_BACKEND='duckdb' uses DuckDB SQL, 'stream' iterates Parquet row groups,
+    'columns' reads the session's memory-mapped .npy columns (in-memory sessions included).
+    For a partitioned dataset only the partition files matching stores / dates are scanned.
+    None (= pandas path) for in-memory sessions, non-Parquet files, sessions without a column store
+    or when duckdb is not installed.
+    """
+    if config.ANALYSIS_BACKEND == 'columns':
+        store = open_column_store(session_id)
+        if store is None:
+            return None
+        return column_store.ColumnStoreBackend(store, start_date=normalize_filter_date(start_date),
+                                               end_date=normalize_filter_date(end_date))
+    if config.ANALYSIS_BACKEND not in ('duckdb', 'stream') or session_id in data_storage:
+        return None
+    if config.ANALYSIS_BACKEND == 'duckdb' and not duckdb_backend.available():
+        logger.warning('ANALYSIS_BACKEND=duckdb but duckdb is not installed. Falling back to pandas.')
+        return None
+    data_file = locate_session_data_file(get_session_upload_dir(session_id))
+    start_date, end_date = normalize_filter_date(start_date), normalize_filter_date(end_date)
+    if data_file.name == partitioned_store.MANIFEST_NAME:
+        # 一致するパーティションがない場合も全ファイルで開き、空の集計結果・店舗エラーはバックエンド側で扱う
+        paths = partitioned_store.select_files(data_file.parent, stores, start_date, end_date) or \
+            partitioned_store.all_files(data_file.parent)
+    elif data_file.suffix.lower() == '.parquet':
+        paths = [data_file]
+    else:
+        return None
+    if config.ANALYSIS_BACKEND == 'stream':
+        return parquet_stream.ParquetStreamBackend(paths, start_date=start_date, end_date=end_date)
+    return duckdb_backend.DuckDBBackend(
+        paths,
+        threads=config.DUCKDB_THREADS,
+        memory_limit=config.DUCKDB_MEMORY_LIMIT or None,
+        start_date=start_date,
+        end_date=end_date,
+    )
+
+
+@contextmanager
+def get_analysis_source(session_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                        stores: Optional[List[str]] = None, filters: Tuple[tuple, ...] = ()):
+    """
+    Yield (DataFrame, backend) for an analysis request; the backend is closed on exit.
+
+    With a DuckDB / streaming backend the DataFrame is the zero-row schema only (column detection),
+    and start_date / end_date are already applied inside the backend.
+    stores / dates are pushed down to partitioned datasets; callers still apply their row filters.
+    Additional filters (validate_filters) are evaluated by the row filter only, so they force the DataFrame path.
+    """
+    backend = None if filters else get_analysis_backend(session_id, start_date, end_date, stores)
+    if backend is None:
+        yield get_dataframe_for_analysis(session_id, stores, start_date, end_date), None
+        return
+    try:
+        yield backend.schema, backend
+    finally:
+        backend.close()
+
+
+def analysis_scope_key(session_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                       stores: Optional[List[str]] = None) -> tuple:
+    """
+    Return the cache key prefix (session_id, dataset_version, row_scope) for analyzers.
+
+    row_scope is the store / date pushdown passed to get_analysis_source, so results computed from
+    a partition subset are never shared with those computed from a different subset.
+    """
+    row_scope = (tuple(sorted(str(store) for store in stores or ())), start_date, end_date)
+    return session_id, get_dataset_version(session_id), row_scope
 
 
 # Analysis helpers ------------------------------------------------------------
 
 
+STORE_COLUMNS = ['店舗名', 'shop']
+
+# 縦持ちデータのカテゴリ列（優先順）
+CATEGORY_COLUMNS = ['カテゴリ', 'category', 'product_category', 'カテゴリ名']
+
+# 日付の構成要素（数値列だが分析対象メトリックではない）
+DATE_PART_COLUMNS = ['年', '月', '日', '曜日', 'year', 'month', 'day', 'weekday']
+
+
+def get_store_column(df: pd.DataFrame) -> str:
+    """Return the first available store column name."""
+    available = [col for col in STORE_COLUMNS if col in df.columns]
+    if not available:
+        raise ValueError('Store column not present in dataset')
+    return available[0]
+
+
 def filter_store(df: pd.DataFrame, store: Optional[str]) -> pd.DataFrame:
     if store is None:
         return df
-    store_columns = ['店舗名', 'shop']
-    available = [col for col in store_columns if col in df.columns]
-    if not available:
-        raise ValueError('Store column not present in dataset')
-    filtered = df[df[available[0]] == store]
+    filtered = DatasetFilter(df).apply(build_filter_spec(stores=[store]))
     if filtered.empty:
         raise ValueError('No records found for specified store')
     return filtered
 
 
 def prepare_datetime_index(df: pd.DataFrame) -> pd.Series:
+    return resolve_datetime(df)[1]
+
+
+def resolve_datetime(df: pd.DataFrame) -> Tuple[Optional[str], pd.Series]:
+    """行ごとの日時と、その元になった日付列（年/月/日 から組み立てた場合は None）"""
     date_columns = ['営業日付', 'Date', 'date']
     for column in date_columns:
         if column in df.columns:
             series = pd.to_datetime(df[column], errors='coerce')
             if series.notna().any():
-                return series
+                return column, series
     if {'年', '月', '日'}.issubset(df.columns):
         try:
             constructed = pd.to_datetime(
                 df[['年', '月', '日']].astype(int)
                 .rename(columns={'年': 'year', '月': 'month', '日': 'day'})
             )
-            return constructed
+            return None, constructed
         except Exception as exc:
             raise ValueError('Failed to construct datetime from year/month/day columns') from exc
     raise ValueError('Datetime column not found in dataset')
 
 
+# Row filters -----------------------------------------------------------------
+
+
+def normalize_filter_date(value: Any, strict: bool = False) -> Optional[str]:
+    """日付条件を 'YYYY-MM-DD' に正規化（strict=False では解釈できない値を無視）"""
+    if not value:
+        return None
+    try:
+        timestamp = pd.Timestamp(value)
+    except (TypeError, ValueError) as exc:
+        if strict:
+            raise ValueError(f'Invalid date: {value}') from exc
+        return None
+    if pd.isna(timestamp):
+        return None
+    if timestamp.tzinfo is not None:
+        # タイムゾーン情報を削除して tz-naive な日付として比較
+        timestamp = timestamp.tz_localize(None)
+    return timestamp.strftime('%Y-%m-%d')
+
+
+def build_filter_spec(start_date: Optional[str] = None, end_date: Optional[str] = None,
+                      stores: Optional[List[str]] = None, extra: Tuple[tuple, ...] = ()) -> Tuple[tuple, ...]:
+    """
+    期間・店舗・追加条件を正規化した条件タプル（順序に依存せず、そのままキャッシュキーに使える）
+
+    条件の形式:
+        ('date_from', 'YYYY-MM-DD'), ('date_to', 'YYYY-MM-DD'), ('stores', (店舗, ...)),
+        ('range', 列名, 下限 or None, 上限 or None), ('in', 列名, (値, ...))
+    """
+    predicates = list(extra)
+    start = normalize_filter_date(start_date)
+    if start:
+        predicates.append(('date_from', start))
+    end = normalize_filter_date(end_date)
+    if end:
+        predicates.append(('date_to', end))
+    if stores:
+        predicates.append(('stores', tuple(sorted(set(stores)))))
+    return tuple(sorted(set(predicates), key=repr))
+
+
+class DatasetFilter:
+    """
+    行フィルタの条件タプルを列配列上のブールマスクにコンパイルして適用
+
+    列配列（店舗等のコード・日時・数値列）と条件ごとのマスクは cache_key 単位で filter_cache に保持し、
+    複数条件の組み合わせはキャッシュ済みマスクの論理積だけで求める。
+    cache_key はセッションのデータセット全体を渡すときだけ指定する（部分集合では行位置が異なるため）。
+    """
+
+    def __init__(self, df: pd.DataFrame, cache_key: Optional[tuple] = None):
+        self.df = df
+        # (session_id, dataset_version) - Noneの場合はインスタンス内でのみ再利用
+        self.cache_key = cache_key
+        self._local: Dict[tuple, Any] = {}
+
+    def apply(self, spec: Tuple[tuple, ...]) -> pd.DataFrame:
+        if not spec:
+            return self.df
+        mask = self.mask(spec)
+        return self.df if mask.all() else self.df[mask]
+
+    def mask(self, spec: Tuple[tuple, ...]) -> np.ndarray:
+        mask = np.ones(len(self.df), dtype=bool)
+        for predicate in spec:
+            mask = mask & self._memo(('mask', predicate), lambda p=predicate: self._compile(p))
+        return mask
+
+    def _memo(self, key: tuple, compute: Any) -> Any:
+        if self.cache_key is None:
+            if key not in self._local:
+                self._local[key] = compute()
+            return self._local[key]
+        return filter_cache.get_or_compute((*self.cache_key, *key), compute)
+
+    def _compile(self, predicate: tuple) -> np.ndarray:
+        kind = predicate[0]
+        if kind in ('date_from', 'date_to'):
+            try:
+                dates = self._memo(('dates',), self._dates)
+            except ValueError:
+                logger.warning("Date filter requested but no valid date column found.")
+                return np.ones(len(self.df), dtype=bool)
+            day = np.datetime64(predicate[1], 'ns')
+            if kind == 'date_from':
+                return dates >= day
+            return dates < day + np.timedelta64(1, 'D')
+        if kind == 'stores':
+            return self._isin(get_store_column(self.df), predicate[1])
+        if kind == 'in':
+            return self._isin(self._require_column(predicate[1]), predicate[2])
+        if kind == 'range':
+            column, low, high = predicate[1:]
+            values = self._memo(('numeric', self._require_column(column)),
+                                lambda: pd.to_numeric(self.df[column], errors='coerce').to_numpy(dtype=float))
+            mask = np.isfinite(values)
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+            return mask
+        raise ValueError(f'Unknown filter condition: {kind}')
+
+    def _dates(self) -> np.ndarray:
+        dates = pd.DatetimeIndex(prepare_datetime_index(self.df))
+        if dates.tz is not None:
+            dates = dates.tz_localize(None)
+        return dates.to_numpy(dtype='datetime64[ns]')
+
+    def _isin(self, column: str, values: Tuple[str, ...]) -> np.ndarray:
+        # 列は1回だけコード化し、条件は整数コードの所属判定にする
+        codes, labels = self._memo(('codes', column), lambda: pd.factorize(self.df[column].astype(str)))
+        wanted = labels.get_indexer(list(values))
+        return np.isin(codes, wanted[wanted >= 0])
+
+    def _require_column(self, column: str) -> str:
+        if column not in self.df.columns:
+            raise ValueError(f"Filter column '{column}' not found in dataset")
+        return column
+
+
+def apply_row_filters(df: pd.DataFrame, cache_key: Optional[tuple], spec: Tuple[tuple, ...]) -> pd.DataFrame:
+    """
+    セッションのデータセット全体に条件タプルを適用
+
+    cache_key は分析クラスのキャッシュキー（先頭が session_id）で、マスクは session_id と
+    データセットバージョン単位で分析クラス間・リクエスト間で共有される。
+    パーティションから条件付きで読んだ DataFrame は attrs['row_scope'] ごとに別のマスクを持つ。
+    店舗条件に一致する行がない場合は filter_store と同じく ValueError。
+    """
+    filter_key = None
+    if cache_key is not None:
+        filter_key = (cache_key[0], get_dataset_version(cache_key[0]), *df.attrs.get('row_scope', ()))
+    filtered = DatasetFilter(df, filter_key).apply(spec)
+    if filtered.empty and any(predicate[0] == 'stores' for predicate in spec):
+        raise ValueError('No records found for specified store')
+    return filtered
+
+
+def backend_store_filter(schema: pd.DataFrame, backend: AnalysisBackend,
+                         store: Optional[str]) -> Optional[str]:
+    """集計バックエンド用の店舗列（filter_store と同じく該当行がなければ ValueError）"""
+    if store is None:
+        return None
+    store_column = get_store_column(schema)
+    if not backend.row_count(store_column, store):
+        raise ValueError('No records found for specified store')
+    return store_column
+
+
 class TimeSeriesAnalyzer:
     """Execute time series aggregations for the requested metric."""
 
@@ -298,12 +1036,37 @@ class TimeSeriesAnalyzer:
         '年': 'Y',
     }
 
-    def __init__(self, df: pd.DataFrame):
-        self.df = df
+    # 予測モデルの季節長（期間数）
+    _TIME_UNIT_TO_SEASON = {
+        '日': 7,
+        '週': 52,
+        '月': 12,
+        '年': 1,
+    }
 
-    def analyze(self, metric: str = '売上金額', time_unit: str = '月', store: Optional[str] = None) -> Dict[str, Any]:
+    def __init__(self, df: pd.DataFrame, cache_key: Optional[tuple] = None,
+                 backend: Optional[AnalysisBackend] = None):
+        self.df = df
+        # (session_id, dataset_version, start_date, end_date) - Noneの場合はキャッシュしない
+        self.cache_key = cache_key
+        # 集計バックエンド（有効時は df はスキーマのみ、期間集計をバックエンドで実行）
+        self.backend = backend
+
+    def analyze(self, metric: str = '売上金額', time_unit: str = '月', store: Optional[str] = None,
+                rolling: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        return self.summarize(self.resample(metric, time_unit, store), rolling)
+
+    def resample(self, metric: str = '売上金額', time_unit: str = '月', store: Optional[str] = None) -> pd.Series:
+        """期間別合計（期間末日のラベル、データのある最初と最後の期間の間は 0 で埋まる）"""
+        if self.backend is not None:
+            store_column = backend_store_filter(self.df, self.backend, store)
+            return self.backend.resample_sum(metric, time_unit, store_column, store)
         metric_series = self._prepare_metric_series(metric, store)
-        resampled = metric_series.resample(self._TIME_UNIT_TO_FREQ[time_unit]).sum().dropna()
+        return metric_series.resample(self._TIME_UNIT_TO_FREQ[time_unit]).sum().dropna()
+
+    @classmethod
+    def summarize(cls, resampled: pd.Series, rolling: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        """期間別合計からトレンド・統計量・移動統計量を算出"""
         if resampled.empty:
             raise ValueError('No data points available after resampling')
 
@@ -316,14 +1079,345 @@ class TimeSeriesAnalyzer:
         slope, intercept, r_value, p_value, std_err = stats.linregress(x_numeric, values)
         trend_values = [float(slope * x + intercept) for x in x_numeric]
 
-        statistics = self._build_statistics(resampled, slope, intercept, r_value ** 2)
+        statistics = cls._build_statistics(resampled, slope, intercept, r_value ** 2)
 
-        return {
+        result = {
             'dates': dates,
             'values': values,
             'trend_values': trend_values,
             'statistics': statistics
         }
+        if rolling:
+            computed = rolling_statistics(resampled.to_numpy(dtype=float), **rolling)
+            result['rolling'] = {
+                **rolling,
+                **{name: cls._nullable(matrix[:, 0]) for name, matrix in computed.items()},
+            }
+        return result
+
+    def analyze_panel(self, metrics: List[str], time_unit: str = '月', stores: Optional[List[str]] = None,
+                      rolling: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        """
+        複数メトリック×複数店舗の時系列と移動統計量を一括算出
+
+        全系列を共通の期間軸に揃えた行列にまとめ、移動統計量は行列全体に
+        1回のベクトル演算で適用する（系列ごとの再計算なし）。
+
+        Args:
+            metrics: 対象メトリック列
+            time_unit: 集計単位
+            stores: 対象店舗（省略時は全店舗）
+            rolling: validate_rolling_options の結果
+
+        Returns:
+            dict: dates, rolling（設定値）, series（metric/store ごとの値と移動統計量、store=None は合計）
+        """
+        # 行のない期間は単一系列の resample と同じく 0
+        panel = self._build_panel(metrics, self._TIME_UNIT_TO_FREQ[time_unit], stores).fillna(0.0)
+        rolling = rolling or {'window': config.TIMESERIES_ROLLING_WINDOW,
+                              'span': config.TIMESERIES_ROLLING_WINDOW, 'growth_lag': 1}
+        matrix = panel.to_numpy(dtype=float)
+        computed = rolling_statistics(matrix, **rolling)
+
+        series = []
+        for index, (metric, store) in enumerate(panel.columns):
+            entry = {'metric': metric, 'store': store or None, 'values': self._nullable(matrix[:, index])}
+            entry.update({name: self._nullable(values[:, index]) for name, values in computed.items()})
+            series.append(entry)
+        return {
+            'dates': [ts.to_pydatetime().isoformat() for ts in panel.index],
+            'rolling': rolling,
+            'series': series,
+        }
+
+    def forecast_panel(self, metrics: List[str], time_unit: str = '月', stores: Optional[List[str]] = None,
+                       horizon: int = 12) -> Dict[str, Any]:
+        """
+        複数メトリック×複数店舗の時系列を一括予測（加法型 Holt-Winters）
+
+        行のない期間（開店前など）は未観測として当てはめに含めない。
+        当てはめ結果（平滑化係数・最終状態）はキャッシュし、予測期間の変更では再計算しない。
+
+        Returns:
+            dict: forecast_dates, season_length, series（metric/store ごとの予測値・区間・パラメータ）
+        """
+        freq = self._TIME_UNIT_TO_FREQ[time_unit]
+
+        def build() -> Dict[str, Any]:
+            panel = self._build_panel(metrics, freq, stores)
+            fit = fit_panel(panel.to_numpy(dtype=float), self._TIME_UNIT_TO_SEASON[time_unit],
+                            max_workers=config.ANALYSIS_MAX_WORKERS)
+            return {'columns': list(panel.columns), 'last_date': panel.index[-1], 'fit': fit}
+
+        if self.cache_key is None:
+            fitted = build()
+        else:
+            key = (*self.cache_key, 'forecast_fit', tuple(metrics), tuple(stores or ()), time_unit)
+            fitted = analysis_cache.get_or_compute(key, build)
+
+        fit = fitted['fit']
+        predicted = forecast(fit, horizon)
+        forecast_dates = pd.date_range(fitted['last_date'], periods=horizon + 1, freq=freq)[1:]
+        series = []
+        for index, (metric, store) in enumerate(fitted['columns']):
+            series.append({
+                'metric': metric,
+                'store': store or None,
+                'forecast': self._nullable(predicted['forecast'][:, index]),
+                'lower': self._nullable(predicted['lower'][:, index]),
+                'upper': self._nullable(predicted['upper'][:, index]),
+                'parameters': parameters_for(fit, index),
+            })
+        return {
+            'model': 'holt_winters_additive',
+            'season_length': int(fit['season_length']),
+            'horizon': horizon,
+            'forecast_dates': [ts.to_pydatetime().isoformat() for ts in forecast_dates],
+            'series': series,
+        }
+
+    def scan_anomalies(self, metrics: List[str], stores: Optional[List[str]] = None,
+                       methods: Optional[List[str]] = None, threshold: float = 3.5,
+                       cursor: int = 0, limit: int = 100) -> Dict[str, Any]:
+        """
+        日次の店舗×メトリック系列から異常日を一括検出（頑健 z / IQR / 曜日季節残差）
+
+        行のない日（開店前・休業日など）は未観測として判定しない。
+        判定結果はキャッシュし、カーソルによるページングでは再計算しない。
+
+        Returns:
+            dict: total_cells（判定した観測セル数）, flagged_count, anomalies（|score| 降順）, next_cursor
+        """
+        methods = methods or list(config.ANOMALY_DEFAULT_METHODS)
+
+        def build() -> Dict[str, Any]:
+            panel = self._build_panel(metrics, 'D', stores)
+            matrix = self._comparable_totals(panel)
+            detected = detect_anomalies(matrix, panel.index.dayofweek.to_numpy(), methods, threshold)
+            rows, columns, method_mask = flagged_cells(detected)
+            return {
+                'dates': panel.index[rows].strftime('%Y-%m-%d').tolist(),
+                'columns': [panel.columns[index] for index in columns],
+                'values': matrix[rows, columns],
+                'expected': detected['expected'][rows, columns],
+                'score': detected['score'][rows, columns],
+                'methods': list(detected['flags']),
+                'method_mask': method_mask,
+                'total_cells': int(np.isfinite(matrix).sum()),
+            }
+
+        if self.cache_key is None:
+            scanned = build()
+        else:
+            key = (*self.cache_key, 'anomaly', tuple(metrics), tuple(stores or ()), tuple(methods), threshold)
+            scanned = analysis_cache.get_or_compute(key, build)
+
+        flagged_count = len(scanned['dates'])
+        end = min(cursor + limit, flagged_count)
+        anomalies = []
+        for index in range(cursor, end):
+            metric, store = scanned['columns'][index]
+            anomalies.append({
+                'date': scanned['dates'][index],
+                'metric': metric,
+                'store': store or None,
+                'value': float(scanned['values'][index]),
+                'expected': float(scanned['expected'][index]),
+                'score': float(scanned['score'][index]),
+                'methods': [name for name, hit in zip(scanned['methods'], scanned['method_mask'][index]) if hit],
+            })
+        return {
+            'methods': scanned['methods'],
+            'threshold': threshold,
+            'total_cells': scanned['total_cells'],
+            'flagged_count': flagged_count,
+            'anomalies': anomalies,
+            'next_cursor': str(end) if end < flagged_count else None,
+        }
+
+    def compare_periods(self, metrics: List[str], mode: str = 'yoy', time_unit: str = '月',
+                        stores: Optional[List[str]] = None, base_store: Optional[str] = None,
+                        start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict[str, Any]:
+        """
+        期間比較（前年同期・前月・前年同曜日・店舗間）の差分と増減率を一括算出
+
+        比較元の期間が対象期間の外にあっても参照できるよう、期間フィルタ前の
+        パネル（キャッシュ済み）から対象期間の行と比較元の行をそれぞれ位置参照する。
+
+        Args:
+            metrics: 対象メトリック列
+            mode: yoy / mom / same_weekday_yoy / store
+            time_unit: 集計単位（mom は月、same_weekday_yoy は日に固定）
+            stores: 対象店舗（省略時は全店舗）
+            base_store: mode='store' の比較元店舗
+            start_date: 対象期間の開始日（任意）
+            end_date: 対象期間の終了日（任意）
+
+        Returns:
+            dict: periods, base_periods, series（current, base, delta, growth_rate, total）
+        """
+        if mode == 'mom':
+            time_unit = '月'
+        elif mode == 'same_weekday_yoy':
+            time_unit = '日'
+        if mode == 'store':
+            if base_store is None:
+                raise ValueError('base_store is required for store comparison')
+            if stores and base_store not in stores:
+                stores = [*stores, base_store]
+        freq = self._TIME_UNIT_TO_FREQ[time_unit]
+        panel = self._cached_panel(metrics, freq, stores)
+        # 行のない期間は単一系列の resample と同じく 0
+        matrix = np.nan_to_num(panel.to_numpy(dtype=float), nan=0.0)
+
+        window = self._period_window(panel.index, start_date, end_date)
+        rows = np.flatnonzero(window)
+        if rows.size == 0:
+            raise ValueError('No periods available in the requested range')
+
+        columns = np.arange(matrix.shape[1])
+        if mode == 'store':
+            position = {column: index for index, column in enumerate(panel.columns)}
+            keep = [index for index, (metric, store) in enumerate(panel.columns) if store and store != base_store]
+            if any((metric, base_store) not in position for metric in metrics):
+                raise ValueError('No records found for specified base_store')
+            columns = np.array(keep, dtype=int)
+            base_columns = np.array([position[(panel.columns[index][0], base_store)] for index in keep], dtype=int)
+            base_rows = rows
+            current = matrix[np.ix_(rows, columns)]
+            base = matrix[np.ix_(rows, base_columns)]
+        else:
+            base_rows = self._base_rows(panel.index, rows, mode, time_unit)
+            current = matrix[rows]
+            base = np.full_like(current, np.nan)
+            found = base_rows >= 0
+            base[found] = matrix[base_rows[found]]
+
+        delta = current - base
+        with np.errstate(divide='ignore', invalid='ignore'):
+            growth = np.where(base != 0, delta / np.abs(base) * 100, np.nan)
+        # 合計は比較元が揃っている期間のみで算出
+        comparable = np.isfinite(base)
+        current_total = np.where(comparable, current, 0.0).sum(axis=0)
+        base_total = np.where(comparable, base, 0.0).sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            total_growth = np.where(base_total != 0, (current_total - base_total) / np.abs(base_total) * 100, np.nan)
+
+        series = []
+        for offset, index in enumerate(columns):
+            metric, store = panel.columns[index]
+            series.append({
+                'metric': metric,
+                'store': store or None,
+                'current': self._nullable(current[:, offset]),
+                'base': self._nullable(base[:, offset]),
+                'delta': self._nullable(delta[:, offset]),
+                'growth_rate': self._nullable(growth[:, offset]),
+                'total': {
+                    'current': float(current_total[offset]),
+                    'base': float(base_total[offset]),
+                    'delta': float(current_total[offset] - base_total[offset]),
+                    'growth_rate': self._nullable(total_growth[offset:offset + 1])[0],
+                    'comparable_periods': int(comparable[:, offset].sum()),
+                },
+            })
+
+        base_labels = [panel.index[row].to_pydatetime().isoformat() if row >= 0 else None for row in base_rows]
+        return {
+            'mode': mode,
+            'time_unit': time_unit,
+            'base_store': base_store if mode == 'store' else None,
+            'periods': [panel.index[row].to_pydatetime().isoformat() for row in rows],
+            'base_periods': base_labels,
+            'series': series,
+        }
+
+    @staticmethod
+    def _period_window(index: pd.DatetimeIndex, start_date: Optional[str], end_date: Optional[str]) -> np.ndarray:
+        window = np.ones(len(index), dtype=bool)
+        if start_date:
+            window &= index >= pd.to_datetime(start_date)
+        if end_date:
+            window &= index <= pd.to_datetime(end_date) + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+        return window
+
+    @staticmethod
+    def _base_rows(index: pd.DatetimeIndex, rows: np.ndarray, mode: str, time_unit: str) -> np.ndarray:
+        """比較元期間の行位置（存在しない場合は -1）"""
+        if mode == 'same_weekday_yoy':
+            return index.get_indexer(index[rows] - pd.Timedelta(days=364))
+        if mode == 'yoy' and time_unit == '日':
+            return index.get_indexer(index[rows] - pd.DateOffset(years=1))
+        # パネルは連続した期間軸のため、月・週・年は期間数のずれで比較元を特定
+        lag = {'月': 12, '週': 52, '年': 1}[time_unit] if mode == 'yoy' else 1
+        base_rows = rows - lag
+        return np.where(base_rows >= 0, base_rows, -1)
+
+    @staticmethod
+    def _comparable_totals(panel: pd.DataFrame) -> np.ndarray:
+        """
+        パネルの行列（合計系列は、いずれかの店舗の開店前・閉店後の期間を NaN にする）
+
+        店舗の営業期間（最初と最後の観測の間）の外では合計の母集団が異なり、
+        水準の差がそのまま異常と判定されるため、合計系列の判定対象から除く。
+        """
+        matrix = panel.to_numpy(dtype=float, copy=True)
+        observed = np.isfinite(matrix)
+        periods = np.arange(len(panel.index))[:, None]
+        first = np.where(observed, periods, len(panel.index)).min(axis=0)
+        last = np.where(observed, periods, -1).max(axis=0)
+        outside = (periods < first) | (periods > last)
+        for index, (metric, store) in enumerate(panel.columns):
+            if store:
+                continue
+            members = [i for i, (name, key) in enumerate(panel.columns) if name == metric and key]
+            if members:
+                matrix[outside[:, members].any(axis=1), index] = np.nan
+        return matrix
+
+    def _cached_panel(self, metrics: List[str], freq: str, stores: Optional[List[str]]) -> pd.DataFrame:
+        if self.cache_key is None:
+            return self._build_panel(metrics, freq, stores)
+        key = (*self.cache_key, 'panel', tuple(metrics), tuple(stores or ()), freq)
+        return analysis_cache.get_or_compute(key, lambda: self._build_panel(metrics, freq, stores))
+
+    def _build_panel(self, metrics: List[str], freq: str, stores: Optional[List[str]]) -> pd.DataFrame:
+        missing = [metric for metric in metrics if metric not in self.df.columns]
+        if missing:
+            raise ValueError(f"Metric column '{missing[0]}' not found in dataset")
+
+        frame = self.df[metrics].apply(pd.to_numeric, errors='coerce')
+        frame.index = pd.DatetimeIndex(prepare_datetime_index(self.df))
+        store_values = None
+        if any(col in self.df.columns for col in STORE_COLUMNS):
+            store_values = self.df[get_store_column(self.df)].astype(str).to_numpy()
+        elif stores:
+            raise ValueError('Store column not present in dataset')
+
+        valid = frame.index.notna()
+        if stores:
+            valid &= np.isin(store_values, stores)
+        frame = frame[valid]
+        if frame.empty:
+            raise ValueError('No data points available after resampling')
+
+        # 合計系列（店舗キーは空文字、レスポンスでは store=None）は単一系列の resample と同じ期間軸
+        # 行のない期間（開店前・休業日など）は 0 ではなく NaN（未観測）
+        totals = frame.resample(freq).sum(min_count=1)
+        totals.columns = pd.MultiIndex.from_tuples([(metric, '') for metric in metrics])
+        if store_values is None:
+            return totals
+
+        per_store = frame.groupby([pd.Grouper(freq=freq), store_values[valid]]).sum(min_count=1)
+        per_store = per_store.unstack(level=1).reindex(totals.index)
+        panel = pd.concat([totals, per_store], axis=1)
+        order = [(metric, store) for metric in metrics
+                 for store in ['', *sorted(per_store.columns.get_level_values(1).unique())]]
+        return panel[order]
+
+    @staticmethod
+    def _nullable(values: np.ndarray) -> List[Optional[float]]:
+        return [float(v) if np.isfinite(v) else None for v in values]
 
     def _prepare_metric_series(self, metric: str, store: Optional[str]) -> pd.Series:
         df = filter_store(self.df, store)
@@ -374,45 +1468,236 @@ class TimeSeriesAnalyzer:
         }
 
 
+class SortedValuesIndex:
+    """
+    指標の有限値をソート済みで保持するインデックス
+
+    任意のビン境界の度数を searchsorted で O(bins · log n)、
+    分位点を位置参照で O(1) で求められるため、ビン数の変更時に
+    全データを再走査する必要がない。
+    """
+
+    def __init__(self, values: np.ndarray, presorted: bool = False):
+        values = np.asarray(values, dtype=float)
+        self.values = values if presorted else np.sort(values)
+        self.size = int(self.values.size)
+
+    @property
+    def min(self) -> float:
+        return float(self.values[0])
+
+    @property
+    def max(self) -> float:
+        return float(self.values[-1])
+
+    def quantile(self, q: float) -> float:
+        """線形補間による分位点（np.quantile の既定と同一）"""
+        position = q * (self.size - 1)
+        lower = int(np.floor(position))
+        upper = min(lower + 1, self.size - 1)
+        weight = position - lower
+        return float(self.values[lower] * (1 - weight) + self.values[upper] * weight)
+
+    def bin_edges(self, bins: int) -> np.ndarray:
+        """np.histogram と同一の等幅ビン境界"""
+        first, last = self.min, self.max
+        if first == last:
+            first, last = first - 0.5, last + 0.5
+        return np.linspace(first, last, bins + 1)
+
+    def count(self, bin_edges: np.ndarray) -> np.ndarray:
+        """
+        任意のビン境界に対する度数
+
+        np.histogram と同じく各ビンは半開区間 [a, b)、最終ビンのみ閉区間 [a, b]。
+        """
+        bin_edges = np.asarray(bin_edges, dtype=float)
+        positions = np.searchsorted(self.values, bin_edges, side='left')
+        positions[-1] = np.searchsorted(self.values, bin_edges[-1], side='right')
+        return np.diff(positions)
+
+    def histogram(self, bins: int):
+        bin_edges = self.bin_edges(bins)
+        return self.count(bin_edges), bin_edges
+
+
 class HistogramAnalyzer:
     """Execute histogram analysis for the requested metric."""
 
-    def __init__(self, df: pd.DataFrame):
-        self.df = df
+    _PERCENTILES = (5, 25, 75, 95)
 
-    def analyze(self, metric: str = '売上金額', bins: int = 20, store: Optional[str] = None) -> Dict[str, Any]:
-        df = filter_store(self.df, store)
-        if metric not in df.columns:
-            raise ValueError(f"Metric column '{metric}' not found in dataset")
+    def __init__(self, df: Optional[pd.DataFrame], cache_key: Optional[tuple] = None,
+                 backend: Optional[AnalysisBackend] = None,
+                 loader: Optional[Callable[[], pd.DataFrame]] = None):
+        self._df = df
+        # (session_id, dataset_version, start_date, end_date, filters) - Noneの場合はキャッシュしない
+        self.cache_key = cache_key
+        # 集計バックエンド（有効時は df はスキーマのみ、度数・統計量をバックエンドで集計）
+        self.backend = backend
+        # df=None の場合の読み込み関数（ソート済みインデックスがキャッシュ済みならフレームを読まない）
+        self._loader = loader
 
-        # pd.to_numeric は validate_upload で実行済みだが、安全のため再度実行
-        # np.isfinite を使い、NaN と inf の両方を除外する
-        series = pd.to_numeric(df[metric], errors='coerce')
-        values = series[np.isfinite(series)].to_numpy()
+    @property
+    def df(self) -> pd.DataFrame:
+        if self._df is None and self._loader is not None:
+            self._df = self._loader()
+        return self._df
 
-        if values.size == 0:
-            raise ValueError('Metric column contains no valid numeric data')
+    def analyze(self, metric: str = '売上金額', bins: int = 20, store: Optional[str] = None,
+                normality_method: str = 'shapiro') -> Dict[str, Any]:
+        if self.backend is not None:
+            return self._analyze_backend(metric, bins, store, normality_method)
 
-        # ヒストグラム計算（エッジケース対応）
-        try:
-            counts, bin_edges = np.histogram(values, bins=bins)
-        except Exception as e:
-            # データが1件しかない場合や、すべて同じ値の場合のビニング失敗をキャッチ
-            logger.warning(f"np.histogram failed: {e}. Using single bin.")
-            min_val = np.min(values)
-            max_val = np.max(values)
-            counts = np.array([values.size])
-            bin_edges = np.array([min_val, max_val]) if max_val > min_val else np.array([min_val, min_val + 1])
+        index = self._cached(('sorted_values', metric, store),
+                             lambda: self._build_sorted_index(metric, store))
+
+        # ヒストグラム計算: ソート済みインデックスからビン数に関わらず再走査なしで算出
+        counts, bin_edges = index.histogram(bins)
 
         # Frontend expects: bin_edges, frequencies, statistics
-        statistics = self._build_statistics(values)
+        statistics = dict(self._cached(('statistics', metric, store),
+                                       lambda: self._build_statistics(index)))
+        statistics.update(self._cached_normality(index.values, metric, store, normality_method))
+
+        return {
+            'bin_edges': [float(edge) for edge in bin_edges],
+            'frequencies': [int(c) for c in counts],
+            'statistics': statistics
+        }
+
+    def analyze_grouped(self, metric: str = '売上金額', bins: int = 20,
+                        stores: Optional[list] = None) -> Dict[str, Any]:
+        """
+        店舗別ヒストグラム（共通ビン境界で重ね合わせ表示用）
+
+        全店舗共通のビン境界を一度だけ決め、ビン番号と店舗コードを
+        組み合わせた np.bincount で全店舗の度数を1回の走査で集計する。
+        店舗別統計量も (店舗コード, 値) の1回のソートから位置参照で求める。
+
+        Args:
+            metric: 分析対象の指標
+            bins: ビン数
+            stores: 対象店舗（Noneの場合は全店舗）
+
+        Returns:
+            dict: bin_edges, stores, frequencies (店舗×ビンの行列), statistics (店舗順)
+        """
+        store_column = get_store_column(self.df)
+        if metric not in self.df.columns:
+            raise ValueError(f"Metric column '{metric}' not found in dataset")
 
+        values = pd.to_numeric(self.df[metric], errors='coerce').to_numpy(dtype=float)
+        if stores:
+            store_codes = pd.Categorical(self.df[store_column], categories=stores).codes
+            store_labels = list(stores)
+        else:
+            store_codes, uniques = pd.factorize(self.df[store_column], sort=True)
+            store_labels = [str(label) for label in uniques]
+
+        valid = np.isfinite(values) & (store_codes >= 0)
+        values = values[valid]
+        store_codes = store_codes[valid].astype(np.int64)
+        if values.size == 0:
+            raise ValueError('Metric column contains no valid numeric data')
+
+        n_stores = len(store_labels)
+        bin_edges = SortedValuesIndex(np.array([values.min(), values.max()])).bin_edges(bins)
+        # 半開区間 [a, b)、最終ビンのみ閉区間 (np.histogram と同一)
+        bin_index = np.clip(np.searchsorted(bin_edges, values, side='right') - 1, 0, bins - 1)
+        counts = np.bincount(store_codes * bins + bin_index, minlength=n_stores * bins)
+        counts = counts.reshape(n_stores, bins)
+
+        # 店舗ごとの統計量: 店舗コード→値の順にソートし、各店舗の区間を位置参照
+        order = np.lexsort((values, store_codes))
+        sorted_values = values[order]
+        sizes = np.bincount(store_codes, minlength=n_stores)
+        sums = np.bincount(store_codes, weights=values, minlength=n_stores)
+        offsets = np.concatenate(([0], np.cumsum(sizes)))
+        means = np.divide(sums, sizes, out=np.zeros(n_stores), where=sizes > 0)
+        squared_dev = np.bincount(store_codes, weights=(values - means[store_codes]) ** 2,
+                                  minlength=n_stores)
+
+        statistics = []
+        for code in range(n_stores):
+            size = int(sizes[code])
+            if size == 0:
+                statistics.append({'count': 0})
+                continue
+            segment = SortedValuesIndex(sorted_values[offsets[code]:offsets[code + 1]], presorted=True)
+            statistics.append({
+                'count': size,
+                'mean': float(means[code]),
+                'median': segment.quantile(0.5),
+                'std': float(np.sqrt(squared_dev[code] / (size - 1))) if size > 1 else 0.0,
+                'min': segment.min,
+                'max': segment.max,
+                'percentiles': {str(p): segment.quantile(p / 100) for p in self._PERCENTILES},
+            })
+
+        return {
+            'mode': 'grouped',
+            'bin_edges': [float(edge) for edge in bin_edges],
+            'stores': store_labels,
+            'frequencies': counts.tolist(),
+            'statistics': statistics,
+        }
+
+    def _analyze_backend(self, metric: str, bins: int, store: Optional[str], normality_method: str) -> Dict[str, Any]:
+        """analyze と同じ結果をバックエンドの集計（件数・モーメント・分位点・ビン度数）から組み立てる"""
+        store_column = backend_store_filter(self.df, self.backend, store)
+        quantiles = {p: p / 100 for p in (*self._PERCENTILES, 50)}
+        summary = self._cached(('backend_summary', metric, store),
+                               lambda: self.backend.value_summary(metric, store_column, store,
+                                                                  tuple(sorted(quantiles.values()))))
+        bin_edges = SortedValuesIndex(np.array([summary['min'], summary['max']])).bin_edges(bins)
+        counts = self.backend.histogram_counts(metric, bin_edges, store_column, store)
+
+        statistics = {
+            'mean': summary['mean'],
+            'median': summary['quantiles'][0.5],
+            'std': summary['std'],
+            'min': summary['min'],
+            'max': summary['max'],
+            'skewness': summary['skewness'],
+            'kurtosis': summary['kurtosis'],
+            'percentiles': {str(p): summary['quantiles'][quantiles[p]] for p in self._PERCENTILES},
+        }
+
+        def test() -> Dict[str, Any]:
+            sample, total = self.backend.sample_values(metric, config.NORMALITY_MAX_SAMPLES,
+                                                       config.NORMALITY_RANDOM_SEED, store_column, store)
+            normality = self._test_normality(sample, normality_method)
+            normality.update({'n': total, 'subsampled': total > sample.size})
+            return normality
+
+        normality = self._cached(('backend_normality', metric, store, normality_method, config.NORMALITY_MAX_SAMPLES),
+                                 test)
+        statistics.update(self._normality_fields(normality, normality_method))
         return {
             'bin_edges': [float(edge) for edge in bin_edges],
             'frequencies': [int(c) for c in counts],
             'statistics': statistics
         }
 
+    def _cached(self, parts: tuple, compute):
+        if self.cache_key is None:
+            return compute()
+        return analysis_cache.get_or_compute((*self.cache_key, *parts), compute)
+
+    def _build_sorted_index(self, metric: str, store: Optional[str]) -> SortedValuesIndex:
+        df = filter_store(self.df, store)
+        if metric not in df.columns:
+            raise ValueError(f"Metric column '{metric}' not found in dataset")
+
+        # pd.to_numeric は validate_upload で実行済みだが、安全のため再度実行
+        # np.isfinite を使い、NaN と inf の両方を除外する
+        series = pd.to_numeric(df[metric], errors='coerce')
+        values = series[np.isfinite(series)].to_numpy()
+
+        if values.size == 0:
+            raise ValueError('Metric column contains no valid numeric data')
+        return SortedValuesIndex(values)
+
     @staticmethod
     def _build_chart(metric: str, counts: np.ndarray, bin_edges: np.ndarray, bin_centers: np.ndarray) -> Dict[str, Any]:
         chart = {
@@ -434,17 +1719,19 @@ class HistogramAnalyzer:
         }
         return chart
 
-    @staticmethod
-    def _build_statistics(values: np.ndarray) -> Dict[str, Any]:
-        # Calculate basic statistics
+    @classmethod
+    def _build_statistics(cls, index: SortedValuesIndex) -> Dict[str, Any]:
+        values = index.values
+        # Calculate basic statistics (順序統計量はソート済み配列から位置参照)
         mean_val = float(np.mean(values))
-        median_val = float(np.median(values))
+        median_val = index.quantile(0.5)
         std_val = float(np.std(values, ddof=1)) if values.size > 1 else 0.0
-        min_val = float(np.min(values))
-        max_val = float(np.max(values))
+        min_val = index.min
+        max_val = index.max
+        percentiles = {str(p): index.quantile(p / 100) for p in cls._PERCENTILES}
 
         # Calculate skewness and kurtosis using scipy.stats
-        from scipy.stats import skew, kurtosis, shapiro
+        from scipy.stats import skew, kurtosis
 
         # エッジケース対応: すべて同じ値、または極端な値の場合に例外が発生する
         try:
@@ -459,19 +1746,6 @@ class HistogramAnalyzer:
             logger.warning(f"Kurtosis calculation failed: {e}. Setting to 0.0")
             kurt = 0.0
 
-        # Shapiro-Wilk test for normality
-        if values.size >= 3:
-            try:
-                shapiro_stat, shapiro_p = shapiro(values)
-                is_normal = shapiro_p > 0.05
-            except Exception as e:
-                logger.warning(f"Shapiro-Wilk test failed: {e}. Setting defaults.")
-                shapiro_stat, shapiro_p = 0.0, 1.0
-                is_normal = False
-        else:
-            shapiro_stat, shapiro_p = 0.0, 1.0
-            is_normal = False
-
         return {
             'mean': mean_val,
             'median': median_val,
@@ -480,20 +1754,109 @@ class HistogramAnalyzer:
             'max': max_val,
             'skewness': skewness,
             'kurtosis': kurt,
-            'shapiro_statistic': float(shapiro_stat),
-            'shapiro_pvalue': float(shapiro_p),
-            'is_normal': bool(is_normal),  # JSON serialization のため明示的に bool 変換
+            'percentiles': percentiles,
+        }
+
+    def _cached_normality(self, values: np.ndarray, metric: str, store: Optional[str],
+                          method: str) -> Dict[str, Any]:
+        """正規性検定結果をセッション/指標/フィルタ単位でキャッシュ"""
+        normality = self._cached(('normality', metric, store, method, config.NORMALITY_MAX_SAMPLES),
+                                 lambda: self._test_normality(values, method))
+        return self._normality_fields(normality, method)
+
+    @staticmethod
+    def _normality_fields(normality: Dict[str, Any], method: str) -> Dict[str, Any]:
+        fields = {
+            'is_normal': normality['is_normal'],  # JSON serialization のため明示的に bool 変換済み
+            'normality': normality,
+        }
+        # 既存フロントエンド互換: Shapiro-Wilk の場合のみ従来キーを返す
+        if method == 'shapiro':
+            fields['shapiro_statistic'] = normality['statistic']
+            fields['shapiro_pvalue'] = normality['p_value'] if normality['p_value'] is not None else 1.0
+        return fields
+
+    @staticmethod
+    def _test_normality(values: np.ndarray, method: str = 'shapiro',
+                        max_samples: Optional[int] = None,
+                        seed: Optional[int] = None) -> Dict[str, Any]:
+        """
+        正規性検定（Shapiro-Wilk / Anderson-Darling / D'Agostino K²）
+
+        max_samples を超える場合はシード固定の非復元抽出で標本を縮小する。
+        Shapiro-Wilk は n > 5000 で p値の精度が保証されないため。
+        """
+        from scipy.stats import anderson, normaltest, shapiro
+
+        max_samples = config.NORMALITY_MAX_SAMPLES if max_samples is None else max_samples
+        seed = config.NORMALITY_RANDOM_SEED if seed is None else seed
+
+        sample = values
+        subsampled = False
+        if values.size > max_samples:
+            rng = np.random.default_rng(seed)
+            sample = rng.choice(values, size=max_samples, replace=False)
+            subsampled = True
+
+        result = {
+            'method': method,
+            'statistic': 0.0,
+            'p_value': None,
+            'is_normal': False,
+            'n': int(values.size),
+            'sample_size': int(sample.size),
+            'subsampled': subsampled,
         }
+        # scipy の最小標本数: shapiro=3, normaltest=8, anderson=2(実用上3)
+        min_size = 8 if method == 'dagostino' else 3
+        if sample.size < min_size or np.ptp(sample) == 0:
+            if method != 'anderson':
+                result['p_value'] = 1.0
+            return result
+
+        try:
+            if method == 'anderson':
+                ad = anderson(sample, dist='norm')
+                levels = list(ad.significance_level)
+                critical_5 = float(ad.critical_values[levels.index(5.0)])
+                result['statistic'] = float(ad.statistic)
+                result['critical_value'] = critical_5
+                result['significance_level'] = 0.05
+                result['is_normal'] = bool(ad.statistic < critical_5)
+            else:
+                test = normaltest if method == 'dagostino' else shapiro
+                stat, p_value = test(sample)
+                result['statistic'] = float(stat)
+                result['p_value'] = float(p_value)
+                result['is_normal'] = bool(p_value > 0.05)
+        except Exception as e:
+            logger.warning(f"Normality test ({method}) failed: {e}. Setting defaults.")
+            if method != 'anderson':
+                result['p_value'] = 1.0
+        return result
+
+
+# 商品カテゴリ列（Mens_*, WOMEN'S_* 等）を横断集計する特殊キー
+PRODUCT_CATEGORY_KEY = '商品カテゴリ（集計）'
+# V2: 既定の商品カテゴリ列を日本語ラベルで集計する特殊キー（合計が正のカテゴリのみ）
+LABELED_CATEGORY_KEY = '商品カテゴリ（ラベル）'
 
 
 class ParetoAnalyzer:
     """Execute Pareto analysis (80/20 rule) for the requested metric."""
 
-    def __init__(self, df: pd.DataFrame):
+    def __init__(self, df: pd.DataFrame, cache_key: Optional[tuple] = None,
+                 backend: Optional[AnalysisBackend] = None):
         self.df = df
+        # (session_id, dataset_version, row_scope) - Noneの場合はキャッシュしない（analysis_scope_key）
+        # V1/V2 で同一キー形式を用いるため、同条件の集計はエンドポイント間で共有される
+        self.cache_key = cache_key
+        # 集計バックエンド（有効時は df はスキーマのみ、カテゴリ合計をバックエンドで集計。期間はバックエンド側で適用済み）
+        self.backend = backend
 
     def analyze(self, metric: str = '売上金額', category_column: Optional[str] = None,
-                store: Optional[str] = None, top_n: int = 20) -> Dict[str, Any]:
+                store: Optional[str] = None, top_n: int = 20,
+                page_size: int = PARETO_DEFAULT_PAGE_SIZE, filters: Tuple[tuple, ...] = ()) -> Dict[str, Any]:
         """
         Pareto分析を実行（ABC分類、80/20ルール）
 
@@ -502,48 +1865,325 @@ class ParetoAnalyzer:
             category_column: カテゴリ列名（Noneの場合は商品カテゴリを自動検出）
             store: 店舗名フィルタ
             top_n: 上位N件を表示（デフォルト: 20）
+            page_size: ABC分類ごとに返すメンバー数（残りは members() でページ参照）
+            filters: 追加条件（validate_filters の条件タプル）
 
         Returns:
             dict: Plotlyグラフデータと統計情報（ABC分類含む）
         """
-        df = filter_store(self.df, store)
+        return self.summarize(self.engine(metric, category_column, store, filters=filters), metric, top_n, page_size)
+
+    @classmethod
+    def summarize(cls, engine: ParetoEngine, metric: str, top_n: int = 20,
+                  page_size: int = PARETO_DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+        """カテゴリ別集計済みエンジンからグラフ・統計情報・ABC分類を組み立てる"""
+        top = engine.top(top_n)
+        categories = top['categories']
+        values = top['values']
+        ratio_values = [round(r, 2) for r in top['ratios']]  # パーセント
+        cumulative_values = [round(c, 2) for c in top['cumulative']]
+
+        abc_classification = engine.classification(page_size)
+
+        chart = cls._build_chart(categories, values, ratio_values, cumulative_values, metric)
+
+        stats = cls._build_statistics(engine.total, engine.size, engine.class_counts())
+
+        return {'chart': chart, 'statistics': stats, 'abc_classification': abc_classification}
+
+    def members(self, metric: str = '売上金額', category_column: Optional[str] = None,
+                store: Optional[str] = None, abc_class: str = 'A', offset: int = 0,
+                limit: int = PARETO_DEFAULT_PAGE_SIZE, filters: Tuple[tuple, ...] = ()) -> Dict[str, Any]:
+        """ABC分類メンバーのページ参照（キャッシュ済み集計を再利用）"""
+        return self.engine(metric, category_column, store, filters=filters).members(abc_class, offset, limit)
+
+    def analyze_v2(self, metric: str = 'Total_Sales', category_type: str = 'product_category',
+                   store: Optional[str] = None, start_date: Optional[str] = None,
+                   end_date: Optional[str] = None, filters: Tuple[tuple, ...] = ()) -> Dict[str, Any]:
+        """
+        パレート分析 V2 形式（全カテゴリのランキングと分類を返却）
+
+        Args:
+            metric: 分析対象の指標（category_type='shop' の場合に使用）
+            category_type: 'product_category'（商品カテゴリ列）または 'shop'（店舗別）
+            store: 店舗名フィルタ
+            start_date: 開始日（任意）
+            end_date: 終了日（任意）
+            filters: 追加条件（validate_filters の条件タプル）
+        """
+        category_column = self._v2_category_column(category_type)
+        if category_column == 'shop' and 'shop' not in self.df.columns:
+            raise ValueError('shop列が見つかりません')
+        engine = self.engine(metric, category_column, store, start_date, end_date, filters)
+        # エッジケース対応: フィルタリング後に合計が0になる場合のゼロ除算を防ぐ
+        if engine.total == 0:
+            raise ValueError('フィルタ条件に一致するデータの合計が0です。フィルタ条件を変更してください。')
+
+        ranking = engine.ranking()
+        counts = engine.class_counts()
+        return {
+            'categories': ranking['categories'],
+            'values': ranking['values'],
+            'cumulative_percentage': ranking['cumulative_percentage'],
+            'abc_classification': dict(zip(ranking['categories'], ranking['classes'])),
+            'statistics': {
+                'total': float(engine.total),
+                'a_items': counts['A'],
+                'b_items': counts['B'],
+                'c_items': counts['C']
+            }
+        }
+
+    def analyze_migration(self, metric: str = 'Total_Sales', category_type: str = 'product_category',
+                          time_unit: str = '月', store: Optional[str] = None,
+                          start_date: Optional[str] = None,
+                          end_date: Optional[str] = None) -> Dict[str, Any]:
+        """
+        期間別 ABC 分類とクラス遷移（例: 月次で A→B に落ちたカテゴリ数）
+
+        全期間×全カテゴリの合計を1回のグループ集計で求め、
+        期間ごとの分類も行列演算で一括算出する。
+
+        Returns:
+            dict: periods, categories, classes (カテゴリ×期間), class_counts,
+                  transition_matrix (全期間合計), period_transitions
+        """
+        category_column = self._v2_category_column(category_type)
+        if category_column == 'shop' and 'shop' not in self.df.columns:
+            raise ValueError('shop列が見つかりません')
+
+        def build() -> Dict[str, Any]:
+            return self._build_migration(metric, category_column, time_unit, store, start_date, end_date)
+
+        if self.cache_key is None:
+            return build()
+        key = (*self.cache_key, start_date, end_date, 'pareto_migration',
+               metric, category_column, store, time_unit)
+        return analysis_cache.get_or_compute(key, build)
+
+    def _build_migration(self, metric: str, category_column: str, time_unit: str,
+                         store: Optional[str], start_date: Optional[str],
+                         end_date: Optional[str]) -> Dict[str, Any]:
+        spec = build_filter_spec(start_date, end_date, [store] if store else None)
+        df = apply_row_filters(self.df, self.cache_key, spec)
+        if df.empty:
+            raise ValueError('フィルタ条件に一致するデータがありません')
+
+        dates = prepare_datetime_index(df)
+        valid_dates = dates.notna().to_numpy()
+        df = df[valid_dates]
+        freq = TimeSeriesAnalyzer._TIME_UNIT_TO_FREQ[time_unit]
+        period_codes, periods = pd.factorize(dates[valid_dates].dt.to_period(freq), sort=True)
+        n_periods = len(periods)
+        if n_periods == 0:
+            raise ValueError('No data points available after resampling')
+
+        if category_column == LABELED_CATEGORY_KEY:
+            columns = [col for col in LANGCHAIN_DEFAULT_CATEGORIES if col in df.columns]
+            if not columns:
+                raise ValueError('商品カテゴリデータが見つかりません')
+            totals = sum_rows_by_code(period_codes, n_periods, numeric_matrix(df, columns))
+            categories = [CATEGORY_LABELS.get(col, col) for col in columns]
+        else:
+            if metric not in df.columns:
+                raise ValueError(f"Metric column '{metric}' not found in dataset")
+            category_codes, uniques = pd.factorize(df[category_column], sort=True)
+            keep = category_codes >= 0
+            values = pd.to_numeric(df[metric], errors='coerce').to_numpy(dtype=float)
+            totals = sum_by_code_pair(period_codes[keep], n_periods, category_codes[keep],
+                                      len(uniques), values[keep])
+            categories = uniques.tolist()
+
+        classes = classify_rows(totals)
+        transitions = transition_counts(classes)
+        states = np.array(MIGRATION_STATES, dtype=object)
+        period_labels = [str(period) for period in periods]
+        n_states = len(MIGRATION_STATES)
+        state_counts = np.stack([(classes == state).sum(axis=1) for state in range(n_states)])
+
+        return {
+            'time_unit': time_unit,
+            'periods': period_labels,
+            'categories': categories,
+            'states': list(MIGRATION_STATES),
+            'classes': states[classes.T].tolist(),
+            'values': totals.T.tolist(),
+            'class_counts': {state: state_counts[i].tolist() for i, state in enumerate(MIGRATION_STATES)},
+            'transition_matrix': transitions.sum(axis=0).tolist(),
+            'period_transitions': [
+                {'from': period_labels[t], 'to': period_labels[t + 1], 'matrix': transitions[t].tolist()}
+                for t in range(transitions.shape[0])
+            ],
+        }
+
+    def analyze_drilldown(self, category: Optional[str] = None, start_date: Optional[str] = None,
+                          end_date: Optional[str] = None) -> Dict[str, Any]:
+        """
+        2階層パレート分析（商品カテゴリ → 店舗）
+
+        店舗×商品カテゴリの合計行列を1回のグループ集計で求め、
+        カテゴリ別の合計（上位階層）と各カテゴリ内の店舗別内訳（下位階層）を
+        同じ行列から算出する。結果はキャッシュされ、UI のドリルダウンは
+        category 指定でキャッシュから返す。
+
+        Args:
+            category: 内訳を取得するカテゴリ（表示ラベル）。Noneの場合は全体を返す
+            start_date: 開始日（任意）
+            end_date: 終了日（任意）
+        """
+        def build() -> Dict[str, Any]:
+            return self._build_drilldown(start_date, end_date)
+
+        if self.cache_key is None:
+            hierarchy = build()
+        else:
+            key = (*self.cache_key, start_date, end_date, 'pareto_drilldown')
+            hierarchy = analysis_cache.get_or_compute(key, build)
+
+        if category is None:
+            return hierarchy
+        if category not in hierarchy['drilldown']:
+            raise ValueError(f"Category '{category}' not found in Pareto result")
+        return {'category': category, **hierarchy['drilldown'][category]}
+
+    def _build_drilldown(self, start_date: Optional[str], end_date: Optional[str]) -> Dict[str, Any]:
+        df = apply_row_filters(self.df, self.cache_key, build_filter_spec(start_date, end_date))
+        if df.empty:
+            raise ValueError('フィルタ条件に一致するデータがありません')
+        if 'shop' not in df.columns:
+            raise ValueError('shop列が見つかりません')
+        columns = [col for col in LANGCHAIN_DEFAULT_CATEGORIES if col in df.columns]
+        if not columns:
+            raise ValueError('商品カテゴリデータが見つかりません')
+
+        store_codes, stores = pd.factorize(df['shop'], sort=True)
+        keep = store_codes >= 0
+        # 店舗×カテゴリの合計行列（1回の縮約）
+        matrix = sum_rows_by_code(store_codes[keep], len(stores), numeric_matrix(df[keep], columns))
+
+        # V2 と同様、合計が正のカテゴリのみ対象
+        positive = matrix.sum(axis=0) > 0
+        matrix = matrix[:, positive]
+        labels = [CATEGORY_LABELS.get(col, col) for col, flag in zip(columns, positive) if flag]
+        top = ParetoEngine(labels, matrix.sum(axis=0))
+        if top.total <= 0:
+            raise ValueError('フィルタ条件に一致するデータの合計が0です。フィルタ条件を変更してください。')
+        ranking = top.ranking()
+
+        # 各カテゴリ内の店舗別内訳を一括で順位付け・分類
+        by_category = matrix.T
+        order, sorted_totals, cumulative = rank_rows(by_category)
+        classes = np.take_along_axis(classify_rows(by_category), order, axis=1)
+        store_labels = np.array(stores.tolist(), dtype=object)
+        states = np.array(MIGRATION_STATES, dtype=object)
+        drilldown = {}
+        for index, label in enumerate(labels):
+            drilldown[label] = {
+                'stores': store_labels[order[index]].tolist(),
+                'values': sorted_totals[index].tolist(),
+                'cumulative_percentage': cumulative[index].tolist(),
+                'abc_classification': dict(zip(store_labels[order[index]].tolist(),
+                                               states[classes[index]].tolist())),
+                'total': float(sorted_totals[index].sum()),
+            }
+
+        return {
+            'categories': ranking['categories'],
+            'values': ranking['values'],
+            'cumulative_percentage': ranking['cumulative_percentage'],
+            'abc_classification': dict(zip(ranking['categories'], ranking['classes'])),
+            'stores': store_labels.tolist(),
+            'drilldown': {label: drilldown[label] for label in ranking['categories']},
+            'statistics': {
+                'total': float(top.total),
+                'category_count': top.size,
+                'store_count': len(stores),
+            },
+        }
+
+    @staticmethod
+    def _v2_category_column(category_type: str) -> str:
+        if category_type == 'product_category':
+            return LABELED_CATEGORY_KEY
+        if category_type == 'shop':
+            return 'shop'
+        raise ValueError(f'未対応のcategory_type: {category_type}')
+
+    def engine(self, metric: str, category_column: Optional[str], store: Optional[str],
+               start_date: Optional[str] = None, end_date: Optional[str] = None,
+               filters: Tuple[tuple, ...] = ()) -> ParetoEngine:
+        """カテゴリ別集計済みエンジン（セッション/期間/指標/カテゴリ/店舗/追加条件単位でキャッシュ）"""
+        def build() -> ParetoEngine:
+            return self._build_engine(metric, category_column, store, start_date, end_date, filters)
+
+        if self.cache_key is None:
+            return build()
+        key = (*self.cache_key, start_date, end_date, 'pareto', metric, category_column, store, filters)
+        return analysis_cache.get_or_compute(key, build)
+
+    def _build_engine(self, metric: str, category_column: Optional[str], store: Optional[str],
+                      start_date: Optional[str] = None, end_date: Optional[str] = None,
+                      filters: Tuple[tuple, ...] = ()) -> ParetoEngine:
+        if self.backend is not None:
+            # 追加条件は行フィルタでのみ評価できるため、呼び出し側は filters 指定時にバックエンドを渡さない
+            return self._build_engine_backend(metric, category_column, store)
+        spec = build_filter_spec(start_date, end_date, [store] if store else None, filters)
+        df = apply_row_filters(self.df, self.cache_key, spec)
+        if df.empty:
+            raise ValueError('フィルタ条件に一致するデータがありません')
 
         if category_column is None:
             category_column = self._detect_category_column(df)
 
-        if category_column not in df.columns:
+        if category_column not in df.columns and \
+                category_column not in (PRODUCT_CATEGORY_KEY, LABELED_CATEGORY_KEY):
             raise ValueError(f"Category column '{category_column}' not found in dataset")
 
-        if metric not in df.columns:
+        if metric not in df.columns and category_column != LABELED_CATEGORY_KEY:
             raise ValueError(f"Metric column '{metric}' not found in dataset")
 
-        category_totals = self._aggregate_by_category(df, category_column, metric)
+        engine = self._aggregate_by_category(df, category_column, metric)
 
-        if category_totals.empty:
+        if engine.size == 0:
             raise ValueError('No valid data for Pareto analysis')
+        return engine
 
-        category_totals = category_totals.sort_values(ascending=False)
-        total = category_totals.sum()
-        ratios = (category_totals / total * 100).round(2)  # パーセント
-        cumulative_ratios = ratios.cumsum().round(2)
-
-        categories = category_totals.head(top_n).index.tolist()
-        values = category_totals.head(top_n).values.tolist()
-        ratio_values = ratios.head(top_n).values.tolist()
-        cumulative_values = cumulative_ratios.head(top_n).values.tolist()
+    def _build_engine_backend(self, metric: str, category_column: Optional[str], store: Optional[str]) -> ParetoEngine:
+        """_build_engine と同じ集計をバックエンドのカテゴリ合計で行う"""
+        schema = self.df
+        store_column = backend_store_filter(schema, self.backend, store)
+        if not self.backend.row_count(store_column, store):
+            raise ValueError('フィルタ条件に一致するデータがありません')
 
-        abc_classification = self._classify_abc(cumulative_ratios)
+        if category_column is None:
+            category_column = self._detect_category_column(schema)
+        if category_column not in schema.columns and \
+                category_column not in (PRODUCT_CATEGORY_KEY, LABELED_CATEGORY_KEY):
+            raise ValueError(f"Category column '{category_column}' not found in dataset")
+        if metric not in schema.columns and category_column != LABELED_CATEGORY_KEY:
+            raise ValueError(f"Metric column '{metric}' not found in dataset")
 
-        chart = self._build_chart(categories, values, ratio_values, cumulative_values, metric)
+        if category_column in (PRODUCT_CATEGORY_KEY, LABELED_CATEGORY_KEY):
+            labeled = category_column == LABELED_CATEGORY_KEY
+            columns = [col for col in (LANGCHAIN_DEFAULT_CATEGORIES if labeled else self._product_columns(schema))
+                       if col in schema.columns]
+            if not columns and not labeled:
+                raise ValueError('No product category columns found')
+            totals = self.backend.column_totals(columns, store_column, store)
+            engine = ParetoEngine.from_totals(columns, totals, labels=CATEGORY_LABELS if labeled else None,
+                                              positive_only=labeled)
+            if labeled and engine.size == 0:
+                raise ValueError('商品カテゴリデータが見つかりません')
+        else:
+            engine = ParetoEngine(*self.backend.group_totals(category_column, metric, store_column, store))
 
-        stats = self._build_statistics(
-            total,
-            len(category_totals),
-            abc_classification,
-            cumulative_ratios
-        )
+        if engine.size == 0:
+            raise ValueError('No valid data for Pareto analysis')
+        return engine
 
-        return {'chart': chart, 'statistics': stats, 'abc_classification': abc_classification}
+    @staticmethod
+    def _product_columns(df: pd.DataFrame) -> List[str]:
+        return [col for col in df.columns if col.startswith(('Mens_', 'Womens_', "WOMEN'S_", 'LADIES_'))]
 
     def _detect_category_column(self, df: pd.DataFrame) -> str:
         """
@@ -553,19 +2193,17 @@ class ParetoAnalyzer:
         1. 'カテゴリ', 'category', 'product_category'
         2. Mens_*, Womens_*, WOMEN'S_* 等の商品列
         """
-        priority_columns = ['カテゴリ', 'category', 'product_category', 'カテゴリ名']
-        for col in priority_columns:
+        for col in CATEGORY_COLUMNS:
             if col in df.columns:
                 return col
 
-        product_columns = [col for col in df.columns
-                           if col.startswith(('Mens_', 'Womens_', "WOMEN'S_", 'LADIES_'))]
+        product_columns = self._product_columns(df)
 
         if product_columns:
             # 最初の商品列を使用（または全商品列を集計）
             # ここでは簡易的に最初の列を返す
             # 実際には全商品列を集計する方が適切
-            return '商品カテゴリ（集計）'  # 特殊キー
+            return PRODUCT_CATEGORY_KEY  # 特殊キー
 
         for col in df.columns:
             if col not in ['店舗名', 'shop', 'year', 'month', 'day', '年', '月', '日']:
@@ -575,40 +2213,24 @@ class ParetoAnalyzer:
         raise ValueError('No suitable category column found in dataset')
 
     def _aggregate_by_category(self, df: pd.DataFrame, category_column: str,
-                               metric: str) -> pd.Series:
+                               metric: str) -> ParetoEngine:
         """カテゴリ別に集計"""
-        if category_column == '商品カテゴリ（集計）':
-            product_columns = [col for col in df.columns
-                               if col.startswith(('Mens_', 'Womens_', "WOMEN'S_", 'LADIES_'))]
+        if category_column == PRODUCT_CATEGORY_KEY:
+            product_columns = self._product_columns(df)
 
             if not product_columns:
                 raise ValueError('No product category columns found')
 
-            category_totals = df[product_columns].sum()
-            category_totals = pd.to_numeric(category_totals, errors='coerce').dropna()
-            return category_totals
-        else:
-            grouped = df.groupby(category_column)[metric].sum()
-            return pd.to_numeric(grouped, errors='coerce').dropna()
-
-    @staticmethod
-    def _classify_abc(cumulative_ratios: pd.Series) -> Dict[str, list]:
-        """
-        ABC分類
-
-        A: 累積80%まで
-        B: 累積80%-95%
-        C: 累積95%-100%
-        """
-        a_items = cumulative_ratios[cumulative_ratios <= 80].index.tolist()
-        b_items = cumulative_ratios[(cumulative_ratios > 80) & (cumulative_ratios <= 95)].index.tolist()
-        c_items = cumulative_ratios[cumulative_ratios > 95].index.tolist()
-
-        return {
-            'A': a_items,
-            'B': b_items,
-            'C': c_items
-        }
+            # 商品カテゴリ列を行列として1回の縮約で合計
+            return ParetoEngine.from_columns(df, product_columns)
+        if category_column == LABELED_CATEGORY_KEY:
+            engine = ParetoEngine.from_columns(
+                df, LANGCHAIN_DEFAULT_CATEGORIES, labels=CATEGORY_LABELS, positive_only=True)
+            if engine.size == 0:
+                raise ValueError('商品カテゴリデータが見つかりません')
+            return engine
+        # カテゴリをコード化し bincount で集計（groupby より軽量、高カーディナリティ対応）
+        return ParetoEngine.from_codes(df[category_column], df[metric])
 
     @staticmethod
     def _build_chart(categories: list, values: list, ratios: list,
@@ -660,10 +2282,9 @@ class ParetoAnalyzer:
 
     @staticmethod
     def _build_statistics(total: float, category_count: int,
-                          abc_classification: Dict[str, list],
-                          cumulative_ratios: pd.Series) -> Dict[str, Any]:
+                          abc_counts: Dict[str, int]) -> Dict[str, Any]:
         """統計情報を生成"""
-        vital_few_count = len(abc_classification['A'])
+        vital_few_count = abc_counts['A']
         vital_few_ratio = (vital_few_count / category_count * 100) if category_count > 0 else 0
 
         return {
@@ -671,128 +2292,1197 @@ class ParetoAnalyzer:
             'category_count': int(category_count),
             'vital_few_count': vital_few_count,
             'vital_few_ratio': round(vital_few_ratio, 2),
-            'abc_counts': {
-                'A': len(abc_classification['A']),
-                'B': len(abc_classification['B']),
-                'C': len(abc_classification['C'])
-            },
+            'abc_counts': dict(abc_counts),
             'pareto_rule_achieved': vital_few_ratio <= 30  # 20%ルールの妥当性判定
         }
 
-# Response helpers ------------------------------------------------------------
 
-def build_success_response(data: Dict[str, Any]) -> Any:
-    return jsonify({'success': True, 'data': data})
+class HeatmapAnalyzer:
+    """Store x period heatmap built from integer codes with a single bincount."""
 
+    WEEKDAY_LABELS = ['月', '火', '水', '木', '金', '土', '日']
 
-def build_error_response(message: str, status_code: int = 400, code: Optional[str] = None) -> Any:
-    response_body = {
-        'success': False,
-        'error': sanitize_error_message(message),
-        'timestamp': datetime.utcnow().isoformat() + 'Z',
-    }
-    if code:
-        response_body['code'] = code
-    return jsonify(response_body), status_code
+    def __init__(self, df: pd.DataFrame, cache_key: Optional[tuple] = None):
+        self.df = df
+        # (session_id, dataset_version) - Noneの場合はキャッシュしない
+        self.cache_key = cache_key
 
+    def analyze(self, metric: str, axis: str = 'month', aggregation: str = 'sum',
+                stores: Optional[List[str]] = None, start_date: Optional[str] = None,
+                end_date: Optional[str] = None, filters: Tuple[tuple, ...] = ()) -> Dict[str, Any]:
+        """
+        店舗×月（または店舗×曜日）のヒートマップ
 
-# API endpoints ---------------------------------------------------------------
+        Returns:
+            dict: stores（行ラベル）, periods（列ラベル）, values（密な行列、欠損セルは null）, statistics
+        """
+        spec = build_filter_spec(start_date, end_date, stores, filters)
 
+        def build() -> Dict[str, Any]:
+            return self._build(metric, axis, aggregation, spec)
 
-@app.route('/api/v2/upload/validate', methods=['POST'])
-def validate_upload():
-    """ファイルアップロードの検証"""
-    try:
-        if 'file' not in request.files:
-            return jsonify({'error': 'ファイルがありません'}), 400
+        if self.cache_key is None:
+            return build()
+        key = (*self.cache_key, 'heatmap', metric, axis, aggregation, spec)
+        return analysis_cache.get_or_compute(key, build)
 
-        file = request.files['file']
+    def _build(self, metric: str, axis: str, aggregation: str, spec: Tuple[tuple, ...]) -> Dict[str, Any]:
+        df = apply_row_filters(self.df, self.cache_key, spec)
+        if metric not in df.columns:
+            raise ValueError(f"Metric column '{metric}' not found in dataset")
+        store_values = df[get_store_column(df)].astype(str).to_numpy()
+        dates = pd.DatetimeIndex(prepare_datetime_index(df))
+        values = pd.to_numeric(df[metric], errors='coerce').to_numpy(dtype=float)
+
+        valid = dates.notna() & np.isfinite(values)
+        if not valid.any():
+            raise ValueError('No data available for heatmap')
+        store_values, dates, values = store_values[valid], dates[valid], values[valid]
+
+        store_codes, store_labels = pd.factorize(store_values, sort=True)
+        if axis == 'month':
+            month_index = (dates.year * 12 + dates.month - 1).to_numpy()
+            first = int(month_index.min())
+            period_codes = month_index - first
+            n_periods = int(period_codes.max()) + 1
+            period_labels = [f'{(first + i) // 12}-{(first + i) % 12 + 1:02d}' for i in range(n_periods)]
+        else:
+            period_codes = dates.dayofweek.to_numpy()
+            n_periods = 7
+            period_labels = list(self.WEEKDAY_LABELS)
+
+        # 店舗×期間のセルを1次元コードにまとめ、bincount 1回で集計
+        n_cells = len(store_labels) * n_periods
+        cell_codes = store_codes * n_periods + period_codes
+        counts = np.bincount(cell_codes, minlength=n_cells).reshape(len(store_labels), n_periods)
+        sums = np.bincount(cell_codes, weights=values, minlength=n_cells).reshape(len(store_labels), n_periods)
+        if aggregation == 'count':
+            matrix = counts.astype(float)
+        else:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                matrix = sums / counts if aggregation == 'mean' else sums
+            matrix = np.where(counts > 0, matrix, np.nan)
 
-        if not file or file.filename == '':
-            return jsonify({'error': 'ファイルが選択されていません'}), 400
+        filled = matrix[np.isfinite(matrix)]
+        return {
+            'metric': metric,
+            'axis': axis,
+            'aggregation': aggregation,
+            'stores': [str(label) for label in store_labels],
+            'periods': period_labels,
+            'values': np.where(np.isfinite(matrix), matrix, None).tolist(),
+            'statistics': {
+                'min': float(filled.min()) if filled.size else None,
+                'max': float(filled.max()) if filled.size else None,
+                'empty_cells': int(matrix.size - filled.size),
+            },
+        }
 
-        # ファイル名のサニタイズ
-        filename = secure_filename(file.filename)
 
-        # 拡張子チェック
-        if not allowed_file(filename):
-            return jsonify({'error': f'許可されていないファイル形式です。許可: {", ".join(ALLOWED_EXTENSIONS)}'}), 400
+class ScatterAnalyzer:
+    """Metric pair scatter with server-side density binning for large datasets."""
 
-        # ファイルサイズチェック
-        file.seek(0, os.SEEK_END)
-        file_size = file.tell()
-        file.seek(0)
+    def __init__(self, df: pd.DataFrame, cache_key: Optional[tuple] = None):
+        self.df = df
+        # (session_id, dataset_version) - Noneの場合はキャッシュしない
+        self.cache_key = cache_key
 
-        if file_size > MAX_FILE_SIZE:
-            return jsonify({
-                'error': f'ファイルサイズが大きすぎます (最大: {MAX_FILE_SIZE/1024/1024:.0f}MB)',
-                'file_size': f'{file_size/1024/1024:.1f}MB'
-            }), 400
+    def analyze(self, x_metric: str, y_metric: str, mode: str = 'auto', bins: int = 40,
+                store: Optional[str] = None, start_date: Optional[str] = None,
+                end_date: Optional[str] = None, filters: Tuple[tuple, ...] = ()) -> Dict[str, Any]:
+        """
+        2メトリックの散布図（点数に依存しない大きさのレスポンス）
 
-        # ファイル内容の検証
-        try:
-            if filename.endswith('.csv'):
-                df = pd.read_csv(file, encoding='utf-8-sig')
-            else:
-                df = pd.read_excel(file)
+        mode='auto' は SCATTER_MAX_POINTS 以下なら生の点、超えると六角形ビンで返す。
 
-            # 必須カラムチェック
-            required_columns = ['shop', 'Date']
-            missing = [col for col in required_columns if col not in df.columns]
+        Returns:
+            dict: mode, n, points | rect | hex, statistics（相関・回帰）
+        """
+        spec = build_filter_spec(start_date, end_date, [store] if store else None, filters)
+
+        def build() -> Dict[str, Any]:
+            return self._build(x_metric, y_metric, mode, bins, spec)
+
+        if self.cache_key is None:
+            return build()
+        key = (*self.cache_key, 'scatter', x_metric, y_metric, mode, bins, spec, config.SCATTER_MAX_POINTS)
+        return analysis_cache.get_or_compute(key, build)
+
+    def _build(self, x_metric: str, y_metric: str, mode: str, bins: int, spec: Tuple[tuple, ...]) -> Dict[str, Any]:
+        df = apply_row_filters(self.df, self.cache_key, spec)
+        for metric in (x_metric, y_metric):
+            if metric not in df.columns:
+                raise ValueError(f"Metric column '{metric}' not found in dataset")
+        x = pd.to_numeric(df[x_metric], errors='coerce').to_numpy(dtype=float)
+        y = pd.to_numeric(df[y_metric], errors='coerce').to_numpy(dtype=float)
+        valid = np.isfinite(x) & np.isfinite(y)
+        x, y = x[valid], y[valid]
+        if x.size < 3:
+            raise ValueError('At least 3 valid data points are required for scatter analysis')
+
+        if mode == 'auto':
+            mode = 'points' if x.size <= config.SCATTER_MAX_POINTS else 'hex'
+        result: Dict[str, Any] = {
+            'x_metric': x_metric,
+            'y_metric': y_metric,
+            'mode': mode,
+            'n': int(x.size),
+            'statistics': self._build_statistics(x, y),
+        }
+        if mode == 'points':
+            if x.size > config.SCATTER_MAX_POINTS:
+                raise ValueError(f'Too many points for raw scatter (max {config.SCATTER_MAX_POINTS}); '
+                                 'use rect or hex mode')
+            result['points'] = {'x': x.tolist(), 'y': y.tolist()}
+        elif mode == 'rect':
+            result['rect'] = rect_bins(x, y, bins, bins)
+        else:
+            result['hex'] = hex_bins(x, y, bins)
+        return result
 
-            if missing:
-                return jsonify({'error': f'必須カラムが不足: {missing}'}), 400
+    @staticmethod
+    def _build_statistics(x: np.ndarray, y: np.ndarray) -> Dict[str, Any]:
+        if np.ptp(x) == 0 or np.ptp(y) == 0:
+            return {'pearson_r': None, 'spearman_rho': None, 'regression': None}
+        regression = stats.linregress(x, y)
+        spearman = stats.spearmanr(x, y)
+        return {
+            'pearson_r': float(regression.rvalue),
+            'spearman_rho': float(spearman.correlation),
+            'regression': {
+                'slope': float(regression.slope),
+                'intercept': float(regression.intercept),
+                'r_squared': float(regression.rvalue ** 2),
+                'p_value': float(regression.pvalue),
+                'std_err': float(regression.stderr),
+            },
+        }
 
-            # データ検証結果
-            validation_result = {
-                'valid': True,
-                'rows': len(df),
-                'columns': list(df.columns),
-                'numeric_columns': list(df.select_dtypes(include=[np.number]).columns),
-                'date_columns': [],
-                'shops': [],
-                'date_range': {}
-            }
 
-            # 店舗情報の抽出
-            if 'shop' in df.columns:
-                validation_result['shops'] = df['shop'].unique().tolist()
+class StoreClusterAnalyzer:
+    """Group stores by category mix and KPI profile with k-means."""
 
-            # 日付情報の抽出
-            if 'Date' in df.columns:
-                try:
-                    df['Date'] = pd.to_datetime(df['Date'])
-                    validation_result['date_columns'].append('Date')
-                    validation_result['date_range'] = {
-                        'min': df['Date'].min().strftime('%Y-%m-%d'),
-                        'max': df['Date'].max().strftime('%Y-%m-%d')
-                    }
-                except Exception:  # pylint: disable=broad-except
-                    pass
+    # KPI の元となる列（英語スキーマ / 日本語スキーマ）
+    KPI_SOURCE_COLUMNS = {
+        'sales': ['Total_Sales', '売上金額'],
+        'profit': ['gross_profit', '粗利額'],
+        'guests': ['Number_of_guests', '客数'],
+    }
 
-            # 主要なメトリックカラムをあらかじめ数値型に変換
-            # これにより、V2 APIでの 'sum()' TypeError を防ぐ
-            metrics_to_convert = [
-                'Total_Sales', 'gross_profit', 'Operating_profit',
-                'Number_of_guests', 'Price_per_customer',
-                'Mens_JACKETS&OUTER2', 'Mens_KNIT', 'Mens_PANTS',
-                "WOMEN'S_JACKETS2", "WOMEN'S_TOPS", "WOMEN'S_ONEPIECE",
-                "WOMEN'S_bottoms", "WOMEN'S_SCARF & STOLES"
-            ]
-            for col in metrics_to_convert:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
+    def __init__(self, df: pd.DataFrame, cache_key: Optional[tuple] = None):
+        self.df = df
+        # (session_id, dataset_version) - Noneの場合はキャッシュしない
+        self.cache_key = cache_key
 
-            # セッションにデータを保存
-            session_id = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            data_storage[session_id] = df
+    def analyze(self, k: int = 4, features: Optional[List[str]] = None,
+                start_date: Optional[str] = None, end_date: Optional[str] = None,
+                filters: Tuple[tuple, ...] = ()) -> Dict[str, Any]:
+        """
+        店舗クラスタリング（商品カテゴリ構成比・客単価・粗利率・日販の標準化特徴量）
 
-            # フロントエンド(api.ts UploadResponse)が要求する形式でレスポンスを構築
-            response_payload = {
-                'session_id': session_id,
-                'filename': filename,
-                'columns': validation_result['columns'],
-                'row_count': validation_result['rows'],
+        Returns:
+            dict: features, stores, assignments, clusters（中心は元の単位）, inertia
+        """
+        spec = build_filter_spec(start_date, end_date, extra=filters)
+
+        def build() -> Dict[str, Any]:
+            return self._cluster(k, features, spec)
+
+        if self.cache_key is None:
+            return build()
+        key = (*self.cache_key, 'clustering', k, tuple(features or ()), spec)
+        return analysis_cache.get_or_compute(key, build)
+
+    def _cluster(self, k: int, features: Optional[List[str]], spec: Tuple[tuple, ...]) -> Dict[str, Any]:
+        df = apply_row_filters(self.df, self.cache_key, spec)
+        names, stores, matrix = self._feature_matrix(df)
+        if features:
+            unknown = [name for name in features if name not in names]
+            if unknown:
+                raise ValueError(f"Unknown feature '{unknown[0]}'. Available: {', '.join(names)}")
+            selected = [names.index(name) for name in features]
+            names, matrix = list(features), matrix[:, selected]
+        if not names:
+            raise ValueError('No clustering features available in dataset')
+        if k > len(stores):
+            raise ValueError(f'k must not exceed the number of stores ({len(stores)})')
+
+        scaled, mean, std = standardize(matrix)
+        result = kmeans(scaled, k, n_init=config.CLUSTER_N_INIT, seed=config.ANALYSIS_RANDOM_SEED)
+        labels = result['labels']
+        centroids = result['centers'] * std + mean
+        sizes = np.bincount(labels, minlength=k)
+
+        clusters = []
+        for cluster in range(k):
+            members = np.flatnonzero(labels == cluster)
+            clusters.append({
+                'cluster': cluster,
+                'size': int(sizes[cluster]),
+                'stores': [stores[i] for i in members],
+                'centroid': {name: float(value) for name, value in zip(names, centroids[cluster])},
+            })
+        return {
+            'k': k,
+            'features': names,
+            'stores': stores,
+            'assignments': labels.tolist(),
+            'clusters': clusters,
+            'inertia': result['inertia'],
+            'iterations': result['iterations'],
+        }
+
+    def _feature_matrix(self, df: pd.DataFrame):
+        """店舗×特徴量行列（店舗別合計は1回の縮約で算出）"""
+        store_codes, store_labels = pd.factorize(df[get_store_column(df)].astype(str), sort=True)
+        valid = store_codes >= 0
+        df, store_codes = df[valid], store_codes[valid]
+        n_stores = len(store_labels)
+        if n_stores == 0:
+            raise ValueError('No stores available for clustering')
+
+        names: List[str] = []
+        columns: List[np.ndarray] = []
+        categories = [col for col in LANGCHAIN_DEFAULT_CATEGORIES if col in df.columns]
+        if categories:
+            category_totals = sum_rows_by_code(store_codes, n_stores, numeric_matrix(df, categories))
+            row_totals = category_totals.sum(axis=1, keepdims=True)
+            shares = np.divide(category_totals, row_totals, out=np.zeros_like(category_totals),
+                               where=row_totals > 0) * 100
+            names.extend(f'{CATEGORY_LABELS.get(col, col)} 構成比' for col in categories)
+            columns.extend(shares.T)
+
+        sources = {key: next((col for col in candidates if col in df.columns), None)
+                   for key, candidates in self.KPI_SOURCE_COLUMNS.items()}
+        present = [col for col in sources.values() if col]
+        totals = dict(zip(present, sum_rows_by_code(store_codes, n_stores, numeric_matrix(df, present)).T)) \
+            if present else {}
+        sales, profit, guests = (totals.get(sources[key]) for key in ('sales', 'profit', 'guests'))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if sales is not None and guests is not None:
+                names.append('客単価')
+                columns.append(sales / guests)
+            if sales is not None and profit is not None:
+                names.append('粗利率')
+                columns.append(profit / sales * 100)
+            if sales is not None:
+                # 営業日数: 店舗×日付の組をコード化して重複を除いた件数
+                day_codes, days = pd.factorize(pd.DatetimeIndex(prepare_datetime_index(df)).normalize())
+                dated = day_codes >= 0
+                visited = np.unique(store_codes[dated].astype(np.int64) * len(days) + day_codes[dated])
+                active_days = np.bincount(visited // max(len(days), 1), minlength=n_stores)
+                names.append('日販')
+                columns.append(sales / active_days)
+
+        matrix = np.column_stack(columns) if columns else np.empty((n_stores, 0))
+        # 算出できない値（客数0等）は特徴量の平均で補完
+        column_means = np.nanmean(np.where(np.isfinite(matrix), matrix, np.nan), axis=0) if columns else []
+        matrix = np.where(np.isfinite(matrix), matrix, np.nan_to_num(column_means))
+        return names, [str(label) for label in store_labels], matrix
+
+
+class SalesSimulationAnalyzer:
+    """Monte Carlo simulation of period sales from per-store daily distributions."""
+
+    def __init__(self, df: pd.DataFrame, cache_key: Optional[tuple] = None):
+        self.df = df
+        # (session_id, dataset_version) - Noneの場合はキャッシュしない
+        self.cache_key = cache_key
+
+    def analyze(self, metric: str = 'Total_Sales', method: str = 'bootstrap', distribution_type: str = 'auto',
+                days: int = 30, trials: int = 10000, percentiles: Optional[List[float]] = None,
+                stores: Optional[List[str]] = None, start_date: Optional[str] = None,
+                end_date: Optional[str] = None, filters: Tuple[tuple, ...] = ()) -> Dict[str, Any]:
+        """
+        店舗別の日次分布から days 日間の合計を trials 回シミュレーション
+
+        Args:
+            metric: 対象メトリック
+            method: bootstrap（経験分布の復元抽出）または fitted（当てはめた確率分布）
+            distribution_type: fitted で使う分布（auto は AIC 最小）
+            days: 1試行あたりの日数
+            trials: 試行回数
+            percentiles: 返す分位点（%）
+            stores: 対象店舗（省略時は全店舗）
+
+        Returns:
+            dict: stores（店舗別の分位点バンド）, total（全店合計のバンド）
+                  bands は percentiles と同じ順序の値リスト
+        """
+        percentiles = percentiles or list(config.SIMULATION_PERCENTILES)
+        spec = build_filter_spec(start_date, end_date, stores, filters)
+
+        def build() -> Dict[str, Any]:
+            return self._simulate(metric, method, distribution_type, days, trials, percentiles, spec)
+
+        if self.cache_key is None:
+            return build()
+        key = (*self.cache_key, 'simulation', metric, method, distribution_type,
+               days, trials, tuple(percentiles), spec, config.ANALYSIS_RANDOM_SEED)
+        return analysis_cache.get_or_compute(key, build)
+
+    def _simulate(self, metric: str, method: str, distribution_type: str, days: int, trials: int,
+                  percentiles: List[float], spec: Tuple[tuple, ...]) -> Dict[str, Any]:
+        labels, pools = self._daily_pools(metric, spec)
+        seed = config.ANALYSIS_RANDOM_SEED
+        fits: List[Optional[Dict[str, Any]]] = [None] * len(pools)
+        if method == 'bootstrap':
+            totals = simulate_bootstrap(pools, days, trials, seed)
+        else:
+            names = config.VALID_DISTRIBUTIONS if distribution_type == 'auto' else [distribution_type]
+            for index, pool in enumerate(pools):
+                if pool.size < 8:
+                    raise ValueError(f"At least 8 days of data are required for store '{labels[index]}'")
+                succeeded = [fit for fit in fit_candidates(pool, names, max_workers=config.ANALYSIS_MAX_WORKERS)
+                             if 'error' not in fit]
+                if not succeeded:
+                    raise ValueError(f"Distribution fitting failed for store '{labels[index]}'")
+                fits[index] = min(succeeded, key=lambda fit: fit['aic'])
+            totals = simulate_parametric([frozen_distribution(fit) for fit in fits], days, trials, seed)
+
+        # 全店合計は同一試行の店舗別合計の和（店舗間は独立と仮定）
+        chain = totals.sum(axis=0, keepdims=True)
+        bands = percentile_bands(np.vstack([totals, chain]), percentiles)
+
+        def summarize(row: int, samples: np.ndarray) -> Dict[str, Any]:
+            return {
+                'mean': float(samples.mean()),
+                'std': float(samples.std()),
+                'bands': bands[row].tolist(),
+            }
+
+        store_results = []
+        for index, label in enumerate(labels):
+            entry = {'store': label, 'history_days': int(pools[index].size),
+                     'daily_mean': float(pools[index].mean()), **summarize(index, totals[index])}
+            if fits[index] is not None:
+                entry['distribution'] = fits[index]['distribution']
+                entry['parameters'] = fits[index]['parameters']
+            store_results.append(entry)
+        return {
+            'metric': metric,
+            'method': method,
+            'days': days,
+            'trials': trials,
+            'percentiles': percentiles,
+            'seed': seed,
+            'stores': store_results,
+            'total': summarize(len(labels), chain[0]),
+        }
+
+    def _daily_pools(self, metric: str, spec: Tuple[tuple, ...]):
+        """店舗別の日次合計（店舗×日のコードに対する bincount 1回）"""
+        df = apply_row_filters(self.df, self.cache_key, spec)
+        if metric not in df.columns:
+            raise ValueError(f"Metric column '{metric}' not found in dataset")
+        store_values = df[get_store_column(df)].astype(str).to_numpy()
+        dates = pd.DatetimeIndex(prepare_datetime_index(df)).normalize()
+        values = pd.to_numeric(df[metric], errors='coerce').to_numpy(dtype=float)
+        valid = dates.notna() & np.isfinite(values)
+        if not valid.any():
+            raise ValueError('No data available for simulation')
+
+        store_codes, labels = pd.factorize(store_values[valid], sort=True)
+        day_codes, days = pd.factorize(dates[valid])
+        cell_codes = store_codes.astype(np.int64) * len(days) + day_codes
+        n_cells = len(labels) * len(days)
+        daily = np.bincount(cell_codes, weights=values[valid], minlength=n_cells).reshape(len(labels), len(days))
+        observed = np.bincount(cell_codes, minlength=n_cells).reshape(len(labels), len(days)) > 0
+        pools = [daily[index][observed[index]] for index in range(len(labels))]
+        return [str(label) for label in labels], pools
+
+
+class QueryAnalyzer:
+    """Execute declarative group-by aggregation queries as one vectorized plan."""
+
+    _TIME_UNIT_TO_PERIOD = {
+        '日': 'D',
+        '週': 'W',
+        '月': 'M',
+        '年': 'Y',
+    }
+
+    def __init__(self, df: pd.DataFrame, cache_key: Optional[tuple] = None):
+        self.df = df
+        # (session_id, dataset_version) - Noneの場合はキャッシュしない
+        self.cache_key = cache_key
+
+    def execute(self, query: Dict[str, Any], page_size: int = PARETO_DEFAULT_PAGE_SIZE,
+                offset: int = 0) -> Dict[str, Any]:
+        """
+        validate_query で正規化したクエリを実行
+
+        全グループの結果を正規化クエリ単位でキャッシュし、ページングはキャッシュから切り出す。
+
+        Returns:
+            dict: group_by, metrics, aggregations, total_groups, rows（グループキー, rows, values[metric][集計]）
+        """
+        def build() -> Dict[str, Any]:
+            return self._run(query)
+
+        if self.cache_key is None:
+            result = build()
+        else:
+            key = (*self.cache_key, 'query', *(tuple(v) if isinstance(v, list) else v for v in query.values()))
+            result = analysis_cache.get_or_compute(key, build)
+
+        rows = result['rows'][offset:offset + page_size]
+        next_offset = offset + page_size if offset + page_size < len(result['rows']) else None
+        return {**{name: value for name, value in result.items() if name != 'rows'},
+                'offset': offset, 'page_size': page_size, 'next_offset': next_offset, 'rows': rows}
+
+    def _run(self, query: Dict[str, Any]) -> Dict[str, Any]:
+        extra = query['filters']
+        if query['categories']:
+            extra = (*extra, ('in', self._category_column(self.df), tuple(query['categories'])))
+        spec = build_filter_spec(query['start_date'], query['end_date'], query['stores'], extra)
+        df = apply_row_filters(self.df, self.cache_key, spec)
+        metrics = query['metrics']
+        missing = [metric for metric in metrics if metric not in df.columns]
+        if missing:
+            raise ValueError(f"Metric column '{missing[0]}' not found in dataset")
+
+        keep = np.ones(len(df), dtype=bool)
+
+        # 次元ごとのコード（期間の -1 は日付の欠測でグループ化対象外）
+        names, codes, labels = [], [], []
+        for dimension in query['dimensions']:
+            column = get_store_column(df) if dimension == 'store' else self._category_column(df)
+            dimension_codes, uniques = pd.factorize(df[column], sort=True)
+            dimension_labels = [str(label) for label in uniques]
+            # 店舗・カテゴリの欠測は 'nan' の文字列にせず、末尾の null グループとして返す
+            if (dimension_codes < 0).any():
+                dimension_codes = np.where(dimension_codes < 0, len(dimension_labels), dimension_codes)
+                dimension_labels.append(None)
+            names.append(dimension)
+            codes.append(dimension_codes)
+            labels.append(dimension_labels)
+        if query['time_unit']:
+            periods = prepare_datetime_index(df).dt.to_period(self._TIME_UNIT_TO_PERIOD[query['time_unit']])
+            period_codes, uniques = pd.factorize(periods, sort=True)
+            names.append('period')
+            codes.append(period_codes)
+            labels.append([ts.isoformat() for ts in uniques.end_time.normalize()])
+        for dimension_codes in codes:
+            keep &= dimension_codes >= 0
+        if not keep.any():
+            raise ValueError('No data available for the requested query')
+
+        values = df[metrics].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)[keep]
+        groups, decoded = combine_codes([c[keep] for c in codes], [len(l) for l in labels], int(keep.sum()))
+        n_groups = len(decoded)
+        aggregated = aggregate(groups, n_groups, values, query['aggregations'], query['quantiles'])
+        row_counts = np.bincount(groups, minlength=n_groups)
+
+        columns = [*query['aggregations'], *(quantile_name(q) for q in query['quantiles'])]
+        rows = []
+        for group in range(n_groups):
+            row: Dict[str, Any] = {name: labels[d][decoded[group, d]] for d, name in enumerate(names)}
+            row['rows'] = int(row_counts[group])
+            row['values'] = {
+                metric: {name: self._value(aggregated[name][group, m], name) for name in columns}
+                for m, metric in enumerate(metrics)
+            }
+            rows.append(row)
+        return {
+            'group_by': names,
+            'time_unit': query['time_unit'],
+            'metrics': metrics,
+            'aggregations': columns,
+            'total_groups': n_groups,
+            'rows': rows,
+        }
+
+    @staticmethod
+    def _category_column(df: pd.DataFrame) -> str:
+        column = next((col for col in CATEGORY_COLUMNS if col in df.columns), None)
+        if column is None:
+            raise ValueError('Category column not present in dataset')
+        return column
+
+    @staticmethod
+    def _value(value: float, name: str) -> Optional[float]:
+        if name == 'count':
+            return int(value)
+        return float(value) if np.isfinite(value) else None
+
+
+class ProbabilityDistributionAnalyzer:
+    """Fit candidate probability distributions and select the best model."""
+
+    def __init__(self, df: pd.DataFrame, cache_key: Optional[tuple] = None):
+        self.df = df
+        # (session_id, dataset_version, row_scope) - Noneの場合はキャッシュしない（analysis_scope_key）
+        self.cache_key = cache_key
+
+    def analyze(self, target_column: str, distribution_type: str = 'auto',
+                store: Optional[str] = None, start_date: Optional[str] = None,
+                end_date: Optional[str] = None, filters: Tuple[tuple, ...] = ()) -> Dict[str, Any]:
+        """
+        確率分布の当てはめ（AIC/BICによるモデル選択、KS検定）
+
+        Args:
+            target_column: 対象列
+            distribution_type: 'auto'（全候補を並列推定）または分布名
+            store: 店舗名フィルタ
+            start_date: 開始日（任意）
+            end_date: 終了日（任意）
+            filters: 追加条件（validate_filters の条件タプル）
+
+        Returns:
+            dict: 最適分布、パラメータ、適合度、モデル選択結果
+        """
+        def build() -> Dict[str, Any]:
+            return self._fit(target_column, distribution_type, store, start_date, end_date, filters)
+
+        if self.cache_key is None:
+            return build()
+        key = (*self.cache_key, start_date, end_date, 'probability', target_column, store,
+               distribution_type, config.PROBABILITY_MAX_SAMPLES, filters)
+        return analysis_cache.get_or_compute(key, build)
+
+    def _fit(self, target_column: str, distribution_type: str, store: Optional[str],
+             start_date: Optional[str], end_date: Optional[str], filters: Tuple[tuple, ...]) -> Dict[str, Any]:
+        spec = build_filter_spec(start_date, end_date, [store] if store else None, filters)
+        df = apply_row_filters(self.df, self.cache_key, spec)
+        if target_column not in df.columns:
+            raise ValueError(f"Target column '{target_column}' not found in dataset")
+
+        series = pd.to_numeric(df[target_column], errors='coerce').to_numpy(dtype=float)
+        values = series[np.isfinite(series)]
+        if values.size < 8:
+            raise ValueError('At least 8 valid numeric values are required for distribution fitting')
+
+        sample = subsample(values, config.PROBABILITY_MAX_SAMPLES, config.ANALYSIS_RANDOM_SEED)
+        names = config.VALID_DISTRIBUTIONS if distribution_type == 'auto' else [distribution_type]
+        fits = fit_candidates(sample, names, max_workers=config.ANALYSIS_MAX_WORKERS)
+
+        succeeded = sorted((fit for fit in fits if 'error' not in fit), key=lambda fit: fit['aic'])
+        if not succeeded:
+            reasons = '; '.join(f"{fit['distribution']}: {fit['error']}" for fit in fits)
+            raise ValueError(f'Distribution fitting failed ({reasons})')
+        best = succeeded[0]
+
+        return {
+            'status': 'success',
+            'distribution': best['distribution'],
+            'parameters': best['parameters'],
+            'goodness_of_fit': {
+                'ks_statistic': best['ks_statistic'],
+                'p_value': best['p_value'],
+                'interpretation': '良好なフィット（p > 0.05）' if best['p_value'] > 0.05
+                else '適合度は低い（p ≤ 0.05）',
+            },
+            'model_selection': {
+                'aic': best['aic'],
+                'bic': best['bic'],
+                'best_distribution': best['distribution'],
+                'alternatives': [
+                    {
+                        'distribution': fit['distribution'],
+                        'aic': fit['aic'],
+                        'bic': fit['bic'],
+                        'ks_statistic': fit['ks_statistic'],
+                        'p_value': fit['p_value'],
+                    }
+                    for fit in succeeded[1:]
+                ],
+                'failed': [{'distribution': fit['distribution'], 'error': fit['error']}
+                           for fit in fits if 'error' in fit],
+            },
+            'sample': {
+                'n': int(values.size),
+                'sample_size': int(sample.size),
+                'subsampled': bool(sample.size < values.size),
+            },
+            'insights': self._build_insights(best, values),
+        }
+
+    @staticmethod
+    def _build_insights(best: Dict[str, Any], values: np.ndarray) -> list:
+        label = DISTRIBUTION_LABELS.get(best['distribution'], best['distribution'])
+        insights = []
+        if best['p_value'] > 0.05:
+            insights.append(f'データは{label}によく適合しています')
+        else:
+            insights.append(f'{label}が最も当てはまりますが、適合度は十分ではありません')
+        mean_val = float(np.mean(values))
+        median_val = float(np.median(values))
+        if mean_val > median_val * 1.05:
+            insights.append('右側に長い尾があり、まれに高い値が発生します')
+        elif mean_val < median_val * 0.95:
+            insights.append('左側に長い尾があり、まれに低い値が発生します')
+        insights.append(f'平均値は約{mean_val:,.0f}、中央値は約{median_val:,.0f}です')
+        return insights
+
+
+class EDAAnalyzer:
+    """Dataset profiling for the EDA execution API."""
+
+    def __init__(self, df: pd.DataFrame, cache_key: Optional[tuple] = None):
+        self.df = df
+        # (session_id, dataset_version) - Noneの場合はキャッシュしない
+        self.cache_key = cache_key
+
+    def analyze(self, target_column: Optional[str] = None, store: Optional[str] = None,
+                start_date: Optional[str] = None, end_date: Optional[str] = None,
+                remove_outliers: bool = False, filters: Tuple[tuple, ...] = ()) -> Dict[str, Any]:
+        """
+        EDAプロファイル（列別統計量・相関行列・主要な発見）
+
+        Args:
+            target_column: 対象列（外れ値除去の基準列）
+            store: 店舗名フィルタ
+            start_date: 開始日（任意）
+            end_date: 終了日（任意）
+            remove_outliers: 対象列のIQR外れ値を除去するか
+            filters: 追加条件（validate_filters の条件タプル）
+
+        Returns:
+            dict: key_findings, stats_summary, profile, insights
+        """
+        def build() -> Dict[str, Any]:
+            return self._profile(target_column, store, start_date, end_date, remove_outliers, filters)
+
+        if self.cache_key is None:
+            return build()
+        key = (*self.cache_key, start_date, end_date, 'eda', target_column, store, remove_outliers, filters)
+        return analysis_cache.get_or_compute(key, build)
+
+    def _profile(self, target_column: Optional[str], store: Optional[str],
+                 start_date: Optional[str], end_date: Optional[str],
+                 remove_outliers: bool, filters: Tuple[tuple, ...]) -> Dict[str, Any]:
+        spec = build_filter_spec(start_date, end_date, [store] if store else None, filters)
+        df = apply_row_filters(self.df, self.cache_key, spec)
+        if target_column is not None and target_column not in df.columns:
+            raise ValueError(f"Target column '{target_column}' not found in dataset")
+        if remove_outliers:
+            if target_column is None:
+                raise ValueError('target_column is required when remove_outliers is true')
+            df = self._remove_outliers(df, target_column)
+        if df.empty:
+            raise ValueError('No data available for EDA')
+
+        profile = profile_dataframe(df, max_workers=config.ANALYSIS_MAX_WORKERS)
+        stats_summary = {
+            column: {
+                'mean': summary['mean'],
+                'std': summary['std'],
+                'min': summary['min'],
+                'max': summary['max'],
+                'median': summary['quantiles']['0.5'],
+                'q25': summary['quantiles']['0.25'],
+                'q75': summary['quantiles']['0.75'],
+                'missing': summary['null_count'] + summary['inf_count'],
+            }
+            for column, summary in profile['columns'].items()
+            if 'mean' in summary
+        }
+        key_findings = self._build_key_findings(profile)
+        return {
+            'status': 'success',
+            'insights': {
+                'source': 'template',
+                'model': None,
+                'content': self._build_insight_content(profile, target_column),
+                'warning': None,
+            },
+            'key_findings': key_findings,
+            'stats_summary': stats_summary,
+            'profile': profile,
+        }
+
+    @staticmethod
+    def _remove_outliers(df: pd.DataFrame, column: str) -> pd.DataFrame:
+        values = pd.to_numeric(df[column], errors='coerce')
+        q25, q75 = values.quantile([0.25, 0.75])
+        iqr = q75 - q25
+        return df[values.between(q25 - 1.5 * iqr, q75 + 1.5 * iqr)]
+
+    @staticmethod
+    def _build_key_findings(profile: Dict[str, Any]) -> list:
+        dataset = profile['dataset']
+        findings = [{
+            'type': 'dataset_size',
+            'message': f"総レコード数: {dataset['rows']:,}件、カラム数: {dataset['columns']}個",
+        }]
+        pairs = profile['high_correlations']
+        if pairs:
+            findings.append({
+                'type': 'high_correlation',
+                'severity': 'info',
+                'message': f'{len(pairs)}組の高相関ペアが検出されました',
+                'details': [f"{pair['columns'][0]} ↔ {pair['columns'][1]}: {pair['correlation']:.3f}"
+                            for pair in pairs],
+            })
+        missing = [column for column, summary in profile['columns'].items()
+                   if summary['null_count'] or summary.get('inf_count')]
+        if missing:
+            findings.append({
+                'type': 'missing_values',
+                'severity': 'warning',
+                'message': f'{len(missing)}列に欠損値があります',
+                'details': missing,
+            })
+        return findings
+
+    @staticmethod
+    def _build_insight_content(profile: Dict[str, Any], target_column: Optional[str]) -> str:
+        dataset = profile['dataset']
+        lines = [
+            '### 📊 主要な発見',
+            '',
+            f"1. **データセット規模**: 総レコード数 {dataset['rows']:,}件、"
+            f"数値列 {len(dataset['numeric_columns'])}個、カテゴリ列 {len(dataset['categorical_columns'])}個",
+        ]
+        if profile['high_correlations']:
+            top = profile['high_correlations'][0]
+            lines.append(f"{len(lines) - 1}. **相関分析**: {top['columns'][0]}と{top['columns'][1]}の間に"
+                         f"強い相関（r={top['correlation']:.2f}）が確認されました")
+        summary = profile['columns'].get(target_column or '')
+        if summary and summary.get('mean') is not None:
+            lines.append(f"{len(lines) - 1}. **{target_column}**: 平均 {summary['mean']:,.0f}、"
+                         f"中央値 {summary['quantiles']['0.5']:,.0f}")
+        return '\n'.join(lines)
+
+
+# Response helpers ------------------------------------------------------------
+
+class ProgressiveAnalyzer:
+    """
+    段階的応答の近似結果（セッションの店舗別層別標本からの推定値と信頼区間）
+
+    期間別合計・ビン度数・カテゴリ合計を progressive.StratifiedSample の層別推定で求める。
+    ビン境界・期間軸は取り込み時に記録した母集団の最小/最大を使うため、
+    期間条件がなければ厳密な結果と同じ軸になる。
+    """
+
+    def __init__(self, sample: progressive.StratifiedSample, store: Optional[str] = None,
+                 start_date: Optional[str] = None, end_date: Optional[str] = None,
+                 confidence: float = 0.95, filters: Tuple[tuple, ...] = ()):
+        self.sample = sample
+        self.store = store
+        self.start_date = normalize_filter_date(start_date)
+        self.end_date = normalize_filter_date(end_date)
+        self.confidence = confidence
+        # 追加条件（validate_filters の条件タプル）
+        self.filters = filters
+        # 対象の層（店舗指定時はその店舗のみ）
+        self.strata = sample.stratum_mask(store)
+
+    def timeseries(self, metric: str, time_unit: str = '月') -> Dict[str, Any]:
+        """期間別合計の推定（dates / values / ci_lower / ci_upper）"""
+        if self.sample.dates is None:
+            raise ValueError('Datetime column not found in dataset')
+        values = self._values(metric)
+        dates = self.sample.dates
+        rows = self._rows() & np.isfinite(values) & ~np.asarray(dates.isna())
+        bounds = self.sample.date_range(self.strata)
+        if bounds is not None:
+            first, last = bounds
+            if self.start_date:
+                first = max(first, pd.Timestamp(self.start_date))
+            if self.end_date:
+                last = min(last, pd.Timestamp(self.end_date) + pd.Timedelta(days=1) - pd.Timedelta(1, 'ns'))
+        if bounds is None or not rows.any() or first > last:
+            raise ValueError('No data points available after resampling')
+
+        freq = TimeSeriesAnalyzer._TIME_UNIT_TO_FREQ[time_unit]
+        periods = pd.period_range(first, last, freq=freq)
+        codes = np.zeros(len(values), dtype=np.int64)
+        codes[rows] = pd.PeriodIndex(dates[rows], freq=freq).asi8 - periods[0].ordinal
+        rows &= (codes >= 0) & (codes < len(periods))
+        codes[~rows] = 0
+        estimate, half_width = self.sample.totals(codes, len(periods), np.where(rows, values, 0.0),
+                                                  self.confidence)
+
+        # resample と同じく期間の末日をラベルにする
+        labels = periods.end_time.normalize()
+        return {
+            'dates': [ts.to_pydatetime().isoformat() for ts in labels],
+            'values': estimate.tolist(),
+            'ci_lower': (estimate - half_width).tolist(),
+            'ci_upper': (estimate + half_width).tolist(),
+            'sample': self._sample_summary(rows),
+        }
+
+    def histogram(self, metric: str, bins: int = 20) -> Dict[str, Any]:
+        """ビン度数・件数・平均の推定"""
+        values = self._values(metric)
+        rows = self._rows() & np.isfinite(values)
+        if not rows.any():
+            raise ValueError('Metric column contains no valid numeric data')
+        # 期間・追加条件がなければ母集団の最小/最大でビン境界を決める（条件つきは標本の範囲）
+        value_range = None if (self.start_date or self.end_date or self.filters) else \
+            self.sample.value_range(metric, self.strata)
+        if value_range is None:
+            value_range = (values[rows].min(), values[rows].max())
+        bin_edges = SortedValuesIndex(np.asarray(value_range, dtype=float)).bin_edges(bins)
+        bin_index = np.clip(np.searchsorted(bin_edges, np.where(rows, values, bin_edges[0]), side='right') - 1,
+                            0, bins - 1)
+
+        indicator = rows.astype(float)
+        frequencies, half_width = self.sample.totals(bin_index, bins, indicator, self.confidence)
+        (count,), (count_half_width,) = self.sample.totals(np.zeros(len(values), dtype=np.int64), 1,
+                                                           indicator, self.confidence)
+        mean, mean_half_width = self.sample.ratio(np.where(rows, values, 0.0), rows, self.confidence)
+        return {
+            'bin_edges': [float(edge) for edge in bin_edges],
+            'frequencies': frequencies.tolist(),
+            'ci_lower': np.maximum(frequencies - half_width, 0.0).tolist(),
+            'ci_upper': (frequencies + half_width).tolist(),
+            'statistics': {
+                'count': float(count),
+                'count_ci': [float(max(count - count_half_width, 0.0)), float(count + count_half_width)],
+                'mean': mean,
+                'mean_ci': [mean - mean_half_width, mean + mean_half_width],
+            },
+            'sample': self._sample_summary(rows),
+        }
+
+    def pareto(self, metric: str, category_column: Optional[str], top_n: int = 20) -> Dict[str, Any]:
+        """カテゴリ合計の推定による上位カテゴリ・累積比率・ABC件数（標本に現れたカテゴリのみ）"""
+        if category_column is None or category_column not in self.sample.frame.columns:
+            raise ValueError(f"Category column '{category_column}' not found in dataset")
+        values = self._values(metric)
+        codes, uniques = pd.factorize(self.sample.frame[category_column], sort=True)
+        rows = self._rows() & (codes >= 0)
+        if not rows.any():
+            raise ValueError('フィルタ条件に一致するデータがありません')
+
+        contributions = np.where(rows, values, 0.0)
+        estimate, half_width = self.sample.totals(np.where(rows, codes, 0), len(uniques), contributions,
+                                                  self.confidence)
+        (total,), (total_half_width,) = self.sample.totals(np.zeros(len(values), dtype=np.int64), 1,
+                                                           contributions, self.confidence)
+        labels = uniques.tolist()
+        engine = ParetoEngine(labels, estimate)
+        top = engine.top(top_n)
+        position = {label: index for index, label in enumerate(labels)}
+        top_half_width = half_width[[position[label] for label in top['categories']]]
+        top_values = np.asarray(top['values'], dtype=float)
+        return {
+            'categories': top['categories'],
+            'values': top['values'],
+            'ci_lower': (top_values - top_half_width).tolist(),
+            'ci_upper': (top_values + top_half_width).tolist(),
+            'ratios': [round(r, 2) for r in top['ratios']],
+            'cumulative': [round(c, 2) for c in top['cumulative']],
+            'class_counts': engine.class_counts(),
+            'statistics': {
+                'total': float(total),
+                'total_ci': [float(total - total_half_width), float(total + total_half_width)],
+                'observed_categories': engine.size,
+            },
+            'sample': self._sample_summary(rows),
+        }
+
+    def _rows(self) -> np.ndarray:
+        """店舗・期間・追加条件に一致する標本行（条件外の行も標本から除かず寄与 0 として推定する）"""
+        rows = self.strata[self.sample.strata]
+        if self.filters:
+            rows = rows & DatasetFilter(self.sample.frame).mask(self.filters)
+        if (self.start_date or self.end_date) and self.sample.dates is not None:
+            dates = self.sample.dates.to_numpy(dtype='datetime64[ns]')
+            if self.start_date:
+                rows = rows & (dates >= np.datetime64(self.start_date, 'ns'))
+            if self.end_date:
+                rows = rows & (dates < np.datetime64(self.end_date, 'ns') + np.timedelta64(1, 'D'))
+        return rows
+
+    def _values(self, metric: str) -> np.ndarray:
+        if metric not in self.sample.frame.columns:
+            raise ValueError(f"Metric column '{metric}' not found in dataset")
+        return pd.to_numeric(self.sample.frame[metric], errors='coerce').to_numpy(dtype=float)
+
+    def _sample_summary(self, rows: np.ndarray) -> Dict[str, Any]:
+        return {
+            'rows': int(rows.sum()),
+            'sample_rows': self.sample.rows,
+            'population_rows': self.sample.population_rows,
+            'strata': int(self.strata.sum()),
+            'confidence_level': self.confidence,
+        }
+
+
+class SessionUnionAnalyzer:
+    """
+    複数セッションの和集合に対する時系列・ヒストグラム・パレート分析
+
+    行データは連結せず、セッションごとの集計（期間別合計・ソート済み値と統計量・カテゴリ別合計）を
+    analysis_cache から取り出して結合する。キャッシュにないセッションだけをその場で読み込んで集計する。
+    ヒストグラムとパレートは単一セッションの分析と同じキャッシュキーを使うため、集計を共有する。
+    """
+
+    def __init__(self, session_ids: List[str], start_date: Optional[str] = None, end_date: Optional[str] = None):
+        self.session_ids = session_ids
+        self.start_date = start_date
+        self.end_date = end_date
+
+    def timeseries(self, metric: str, time_unit: str = '月', store: Optional[str] = None,
+                   rolling: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        """期間別合計の和（間の期間は 0）と、セッション別の値（期間外は null）"""
+        parts = [self._session_resampled(session_id, metric, time_unit, store) for session_id in self.session_ids]
+        present = [part for part in parts if not part.empty]
+        if not present:
+            raise ValueError('No data points available after resampling')
+        periods = pd.date_range(min(part.index.min() for part in present), max(part.index.max() for part in present),
+                                freq=TimeSeriesAnalyzer._TIME_UNIT_TO_FREQ[time_unit])
+        aligned = [part.reindex(periods) for part in parts]
+        union = pd.concat(aligned, axis=1).sum(axis=1)
+
+        result = TimeSeriesAnalyzer.summarize(union, rolling)
+        result['sessions'] = [
+            {'session_id': session_id, 'values': TimeSeriesAnalyzer._nullable(part.to_numpy(dtype=float))}
+            for session_id, part in zip(self.session_ids, aligned)
+        ]
+        return result
+
+    def histogram(self, metric: str, bins: int = 20, store: Optional[str] = None) -> Dict[str, Any]:
+        """共通のビン境界での度数の和と、セッション別の集計済み統計量から結合した統計量"""
+        parts = [self._session_values(session_id, metric, store) for session_id in self.session_ids]
+        indexes = [index for index, _ in parts]
+        low, high = min(index.min for index in indexes), max(index.max for index in indexes)
+        bin_edges = SortedValuesIndex(np.array([low, high])).bin_edges(bins)
+        counts = [index.count(bin_edges) for index in indexes]
+
+        moments = session_union.merge_moments([
+            session_union.moments_from_statistics(index.size, statistics['mean'], statistics['std'],
+                                                  statistics['skewness'], statistics['kurtosis'])
+            for index, statistics in parts
+        ])
+        mean, std, skewness, kurtosis = session_union.describe_moments(moments)
+        arrays = [index.values for index in indexes]
+        statistics = {
+            'count': int(moments[0]),
+            'mean': mean,
+            'median': session_union.quantile(arrays, 0.5),
+            'std': std,
+            'min': low,
+            'max': high,
+            'skewness': skewness,
+            'kurtosis': kurtosis,
+            'percentiles': {str(p): session_union.quantile(arrays, p / 100) for p in HistogramAnalyzer._PERCENTILES},
+        }
+        return {
+            'bin_edges': [float(edge) for edge in bin_edges],
+            'frequencies': [int(c) for c in np.sum(counts, axis=0)],
+            'statistics': statistics,
+            'sessions': [
+                {'session_id': session_id, 'count': index.size, 'frequencies': [int(c) for c in session_counts]}
+                for session_id, index, session_counts in zip(self.session_ids, indexes, counts)
+            ],
+        }
+
+    def pareto(self, metric: str, category_column: str, store: Optional[str] = None, top_n: int = 20,
+               page_size: int = PARETO_DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+        """カテゴリ別合計の和によるパレート分析と、上位カテゴリのセッション別合計"""
+        engines = [self._session_engine(session_id, metric, category_column, store)
+                   for session_id in self.session_ids]
+        totals = [pd.Series(engine.totals, index=pd.Index(engine.labels, dtype=object)) for engine in engines]
+        # カテゴリ列を連結して集計した場合と同じラベル順（昇順）
+        union = pd.concat(totals).groupby(level=0, sort=True).sum()
+        engine = ParetoEngine(union.index.tolist(), union.to_numpy(dtype=float))
+        if engine.size == 0:
+            raise ValueError('No valid data for Pareto analysis')
+
+        result = ParetoAnalyzer.summarize(engine, metric, top_n, page_size)
+        categories = result['chart']['data'][0]['x']
+        result['sessions'] = [
+            {'session_id': session_id, 'total': float(session_engine.total),
+             'values': part.reindex(categories).fillna(0.0).astype(float).tolist()}
+            for session_id, session_engine, part in zip(self.session_ids, engines, totals)
+        ]
+        return result
+
+    def _session_resampled(self, session_id: str, metric: str, time_unit: str,
+                           store: Optional[str]) -> pd.Series:
+        """セッションの期間別合計（TimeSeriesAnalyzer のキャッシュキー形式でキャッシュ）"""
+        start_date, end_date = self.start_date, self.end_date
+
+        def compute() -> pd.Series:
+            with get_analysis_source(session_id, start_date, end_date, [store] if store else None) as (df, backend):
+                if backend is None:
+                    df = apply_row_filters(df, (session_id,), build_filter_spec(start_date, end_date))
+                return TimeSeriesAnalyzer(df, backend=backend).resample(metric, time_unit, store)
+
+        key = (session_id, get_dataset_version(session_id), start_date, end_date, 'resampled', metric, time_unit, store)
+        return analysis_cache.get_or_compute(key, compute)
+
+    def _session_values(self, session_id: str, metric: str,
+                        store: Optional[str]) -> Tuple[SortedValuesIndex, Dict[str, Any]]:
+        """セッションのソート済み値と統計量（HistogramAnalyzer と同じキャッシュキー、追加条件なし）"""
+        cache_key = (session_id, get_dataset_version(session_id), self.start_date, self.end_date, ())
+
+        def build_index() -> SortedValuesIndex:
+            df = get_dataframe_for_analysis(session_id, [store] if store else None, self.start_date, self.end_date)
+            df = apply_row_filters(df, (session_id,), build_filter_spec(self.start_date, self.end_date))
+            return HistogramAnalyzer(df)._build_sorted_index(metric, store)
+
+        index = analysis_cache.get_or_compute((*cache_key, 'sorted_values', metric, store), build_index)
+        statistics = analysis_cache.get_or_compute((*cache_key, 'statistics', metric, store),
+                                                   lambda: HistogramAnalyzer._build_statistics(index))
+        return index, statistics
+
+    def _session_engine(self, session_id: str, metric: str, category_column: str,
+                        store: Optional[str]) -> ParetoEngine:
+        """セッションのカテゴリ別集計済みエンジン（ParetoAnalyzer.engine と同じキャッシュキー、期間・追加条件なし）"""
+        stores = [store] if store else None
+        cache_key = analysis_scope_key(session_id, stores=stores)
+
+        def build() -> ParetoEngine:
+            with get_analysis_source(session_id, stores=stores) as (df, backend):
+                return ParetoAnalyzer(df, cache_key=cache_key, backend=backend)._build_engine(
+                    metric, category_column, store)
+
+        return analysis_cache.get_or_compute((*cache_key, None, None, 'pareto', metric, category_column, store, ()),
+                                             build)
+
+
+def build_success_response(data: Dict[str, Any]) -> Any:
+    return jsonify({'success': True, 'data': data})
+
+
+def build_error_response(message: str, status_code: int = 400, code: Optional[str] = None) -> Any:
+    response_body = {
+        'success': False,
+        'error': sanitize_error_message(message),
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+    }
+    if code:
+        response_body['code'] = code
+    return jsonify(response_body), status_code
+
+
+# API endpoints ---------------------------------------------------------------
+
+
+@app.route('/api/v2/upload/validate', methods=['POST'])
+def validate_upload():
+    """ファイルアップロードの検証"""
+    try:
+        if 'file' not in request.files:
+            return jsonify({'error': 'ファイルがありません'}), 400
+
+        file = request.files['file']
+
+        if not file or file.filename == '':
+            return jsonify({'error': 'ファイルが選択されていません'}), 400
+
+        # ファイル名のサニタイズ
+        filename = secure_filename(file.filename)
+
+        # 拡張子チェック
+        if not allowed_file(filename):
+            return jsonify({'error': f'許可されていないファイル形式です。許可: {", ".join(ALLOWED_EXTENSIONS)}'}), 400
+
+        # ファイルサイズチェック
+        file.seek(0, os.SEEK_END)
+        file_size = file.tell()
+        file.seek(0)
+
+        if file_size > MAX_FILE_SIZE:
+            return jsonify({
+                'error': f'ファイルサイズが大きすぎます (最大: {MAX_FILE_SIZE/1024/1024:.0f}MB)',
+                'file_size': f'{file_size/1024/1024:.1f}MB'
+            }), 400
+
+        # ファイル内容の検証
+        try:
+            if filename.endswith('.csv'):
+                df = pd.read_csv(file, encoding='utf-8-sig')
+            else:
+                df = pd.read_excel(file)
+
+            # 必須カラムチェック
+            required_columns = ['shop', 'Date']
+            missing = [col for col in required_columns if col not in df.columns]
+
+            if missing:
+                return jsonify({'error': f'必須カラムが不足: {missing}'}), 400
+
+            # データ検証結果
+            validation_result = {
+                'valid': True,
+                'rows': len(df),
+                'columns': list(df.columns),
+                'numeric_columns': list(df.select_dtypes(include=[np.number]).columns),
+                'date_columns': [],
+                'shops': [],
+                'date_range': {}
+            }
+
+            # 店舗情報の抽出
+            if 'shop' in df.columns:
+                validation_result['shops'] = df['shop'].unique().tolist()
+
+            # 日付情報の抽出
+            if 'Date' in df.columns:
+                try:
+                    df['Date'] = pd.to_datetime(df['Date'])
+                    validation_result['date_columns'].append('Date')
+                    validation_result['date_range'] = {
+                        'min': df['Date'].min().strftime('%Y-%m-%d'),
+                        'max': df['Date'].max().strftime('%Y-%m-%d')
+                    }
+                except Exception:  # pylint: disable=broad-except
+                    pass
+
+            # 主要なメトリックカラムをあらかじめ数値型に変換
+            # これにより、V2 APIでの 'sum()' TypeError を防ぐ
+            metrics_to_convert = [
+                'Total_Sales', 'gross_profit', 'Operating_profit',
+                'Number_of_guests', 'Price_per_customer',
+                'Mens_JACKETS&OUTER2', 'Mens_KNIT', 'Mens_PANTS',
+                "WOMEN'S_JACKETS2", "WOMEN'S_TOPS", "WOMEN'S_ONEPIECE",
+                "WOMEN'S_bottoms", "WOMEN'S_SCARF & STOLES"
+            ]
+            for col in metrics_to_convert:
+                if col in df.columns:
+                    df[col] = pd.to_numeric(df[col], errors='coerce')
+
+            # セッションにデータを保存
+            session_id = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            data_storage[session_id] = df
+            dataset_versions[session_id] = uuid.uuid4().hex
+            analysis_cache.invalidate_session(session_id)
+            filter_cache.invalidate_session(session_id)
+
+            # 段階的応答の近似値用に店舗別の層別標本を保持
+            sample = None
+            try:
+                sample = build_session_sample(df)
+                stratified_samples.set((session_id,), (dataset_versions[session_id], sample))
+            except Exception as sample_error:  # pylint: disable=broad-except
+                logger.warning(f"Stratified sample warning: {sample_error}")
+
+            # 店舗×月のパーティションでディスクにも保存（再起動後の読み込み・条件の読み飛ばし用）
+            if config.PARTITION_SESSION_DATASETS:
+                try:
+                    persist_session_dataset(session_id, df)
+                except Exception as persist_error:  # pylint: disable=broad-except
+                    logger.warning(f"Partitioned dataset write warning: {persist_error}")
+
+            # 数値列・コード・日時を mmap 可能な .npy 列として保存
+            if config.COLUMN_STORE_ENABLED:
+                try:
+                    persist_session_columns(session_id, df)
+                except Exception as persist_error:  # pylint: disable=broad-except
+                    logger.warning(f"Column store write warning: {persist_error}")
+
+            # 層別標本もデータの隣に保存（再起動後はデータ全体を読まずに近似値を返す）
+            if sample is not None:
+                try:
+                    persist_session_sample(session_id, sample)
+                except Exception as persist_error:  # pylint: disable=broad-except
+                    logger.warning(f"Stratified sample write warning: {persist_error}")
+
+            # フロントエンド(api.ts UploadResponse)が要求する形式でレスポンスを構築
+            response_payload = {
+                'session_id': session_id,
+                'filename': filename,
+                'columns': validation_result['columns'],
+                'row_count': validation_result['rows'],
                 'available_shops': validation_result.get('shops', []),
                 'date_range': {
                     'start': validation_result.get('date_range', {}).get('min', ''),
@@ -890,20 +3580,161 @@ def health_check() -> Any:
         }), 503
 
 
+def run_session_union_analysis(analysis_type: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    複数セッション（"session_ids": [...]）の和集合に対する分析
+
+    metric（パレートは category_column も）は各セッションに共通の列を明示指定する。
+    店舗を指定した場合は全セッションにその店舗の行が必要。
+    """
+    if payload.get('progressive'):
+        raise ValueError('progressive mode does not support session_ids')
+    if payload.get('filters') is not None:
+        raise ValueError('session_ids does not support filters')
+    session_ids = validate_session_ids(payload.get('session_ids'))
+    metric = payload.get('metric')
+    if not metric:
+        raise ValueError('metric is required when session_ids is given')
+    store = validate_store(payload.get('store'))
+
+    if analysis_type == 'timeseries':
+        analyzer = SessionUnionAnalyzer(session_ids, payload.get('start_date'), payload.get('end_date'))
+        result = analyzer.timeseries(metric, validate_time_unit(payload.get('time_unit')), store,
+                                     validate_rolling_options(payload.get('rolling')))
+    elif analysis_type == 'histogram':
+        if payload.get('group_by') is not None:
+            raise ValueError('session_ids does not support group_by')
+        analyzer = SessionUnionAnalyzer(session_ids, payload.get('start_date'), payload.get('end_date'))
+        result = analyzer.histogram(metric, validate_bins(payload.get('bins')), store)
+    else:
+        category_column = payload.get('category_column')
+        if not category_column:
+            raise ValueError('category_column is required when session_ids is given')
+        top_n = payload.get('top_n', 20)
+        if not isinstance(top_n, int) or not (5 <= top_n <= 100):
+            top_n = 20
+        # V1 パレートは期間条件を使わない
+        result = SessionUnionAnalyzer(session_ids).pareto(metric, category_column, store, top_n,
+                                                          validate_page_size(payload.get('page_size')))
+    return {'session_ids': session_ids, **result}
+
+
+def start_progressive_analysis(analysis_type: str, payload: Dict[str, Any],
+                               exact: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    段階的応答（"progressive": true）: 層別標本からの近似結果を即時に返し、厳密な結果をバックグラウンドで算出
+
+    セッション・店舗・指標の検証エラーはこの時点で送出する。
+    厳密な結果（通常モードのレスポンスと同じ内容）は GET /api/v1/analysis/results/<result_id> で参照する。
+    """
+    session_id = validate_session_id(payload.get('session_id'))
+    store = validate_store(payload.get('store'))
+    filters = validate_filters(payload.get('filters'))
+    sample = get_stratified_sample(session_id)
+    metric, category_column = resolve_pareto_columns(sample.frame, payload)
+    confidence = config.PROGRESSIVE_CONFIDENCE_LEVEL
+
+    if analysis_type == 'timeseries':
+        analyzer = ProgressiveAnalyzer(sample, store, payload.get('start_date'), payload.get('end_date'),
+                                       confidence, filters)
+        approximate = analyzer.timeseries(metric, validate_time_unit(payload.get('time_unit')))
+    elif analysis_type == 'histogram':
+        if payload.get('group_by') is not None:
+            raise ValueError('progressive mode does not support group_by')
+        analyzer = ProgressiveAnalyzer(sample, store, payload.get('start_date'), payload.get('end_date'),
+                                       confidence, filters)
+        approximate = analyzer.histogram(metric, validate_bins(payload.get('bins')))
+    else:
+        top_n = payload.get('top_n', 20)
+        if not isinstance(top_n, int) or not (5 <= top_n <= 100):
+            top_n = 20
+        # V1 パレートは期間条件を使わない
+        approximate = ProgressiveAnalyzer(sample, store, confidence=confidence, filters=filters).pareto(
+            metric, category_column, top_n)
+
+    result_id = uuid.uuid4().hex
+    progressive_results.set((result_id,), (analysis_type, progressive_executor.submit(exact, payload)))
+    return {
+        'mode': 'progressive',
+        'status': 'pending',
+        'analysis_type': analysis_type,
+        'result_id': result_id,
+        'result_url': f'/api/v1/analysis/results/{result_id}',
+        'approximate': approximate,
+    }
+
+
+@app.route('/api/v1/analysis/results/<result_id>', methods=['GET'])
+@require_api_key
+@limiter.limit("120 per minute")
+def get_progressive_result(result_id: str) -> Any:
+    """
+    段階的応答の厳密な結果の参照API
+
+    計算中は 202（status: pending）、完了後は 200（status: done, result: 通常モードと同じ結果）。
+    厳密な計算が失敗した場合は通常モードと同じエラーレスポンスを返す。
+    """
+    entry = progressive_results.get((result_id,))
+    if entry is None:
+        return build_error_response('Result not found', status_code=404, code='NOT_FOUND')
+    analysis_type, future = entry
+    response_data = {'result_id': result_id, 'analysis_type': analysis_type}
+    if not future.done():
+        return build_success_response({**response_data, 'status': 'pending'}), 202
+
+    exc = future.exception()
+    if isinstance(exc, FileNotFoundError):
+        return build_error_response(str(exc), status_code=404, code='SESSION_NOT_FOUND')
+    if isinstance(exc, ValueError):
+        return build_error_response(str(exc), status_code=400, code='VALIDATION_ERROR')
+    if exc is not None:
+        logger.error('Unexpected progressive %s error: %s', analysis_type, exc, exc_info=exc)
+        return build_error_response('Internal server error', status_code=500, code='INTERNAL_ERROR')
+    return build_success_response({**response_data, 'status': 'done', 'result': future.result()})
+
+
 @app.route('/api/v1/analysis/timeseries', methods=['POST'])
 @require_api_key
 @limiter.limit("30 per minute")
 def analyze_timeseries() -> Any:
-    """Time series analysis endpoint."""
-    start_time = time.time()  # 追加: 実行時間計測開始
+    """
+    Time series analysis endpoint.
 
+    "session_ids": [...] で複数セッションの和集合を分析、"progressive": true で近似結果を先に返す。
+    """
     try:
         payload = request.get_json(force=True)
-        session_id = validate_session_id(payload.get('session_id'))
+        if payload.get('session_ids') is not None:
+            return jsonify(run_session_union_analysis('timeseries', payload))
+        if payload.get('progressive'):
+            return jsonify(start_progressive_analysis('timeseries', payload, run_timeseries_analysis))
+        # Return results directly without wrapper (CHANGED)
+        return jsonify(run_timeseries_analysis(payload))
+    except FileNotFoundError as exc:
+        logger.warning('Time series analysis failed: %s', exc)
+        return build_error_response(str(exc), status_code=404, code='SESSION_NOT_FOUND')
+    except ValueError as exc:
+        logger.warning('Time series validation error: %s', exc)
+        return build_error_response(str(exc), status_code=400, code='VALIDATION_ERROR')
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.error('Unexpected time series error: %s', exc, exc_info=True)
+        return build_error_response('Internal server error', status_code=500, code='INTERNAL_ERROR')
 
-        # 先にデータフレームを取得
-        df = get_dataframe_for_analysis(session_id)
 
+def run_timeseries_analysis(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Time series analysis for a request payload (also run in the background in progressive mode)."""
+    session_id = validate_session_id(payload.get('session_id'))
+
+    # Date filters (NEW)
+    start_date = payload.get('start_date')
+    end_date = payload.get('end_date')
+
+    store = validate_store(payload.get('store'))
+    filters = validate_filters(payload.get('filters'))
+
+    # 先にデータフレームを取得（集計バックエンド有効時はスキーマのみ。店舗・期間はパーティションへ伝える）
+    stores = [store] if store else None
+    with get_analysis_source(session_id, start_date, end_date, stores, filters) as (df, backend):
         # データセットに存在する数値カラムを取得
         numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns.tolist()
         logger.info(f'[Timeseries] Available numeric columns: {numeric_cols}')
@@ -918,30 +3749,413 @@ def analyze_timeseries() -> Any:
             logger.info(f'[Timeseries] Using requested metric: {metric}')
 
         time_unit = validate_time_unit(payload.get('time_unit'))
-        store = validate_store(payload.get('store'))
-
-        # Date filters (NEW)
-        start_date = payload.get('start_date')
-        end_date = payload.get('end_date')
+        rolling = validate_rolling_options(payload.get('rolling'))
 
         # Apply date filters (NEW)
-        df = filter_dataframe_by_date(df, start_date, end_date)
+        if backend is None:
+            df = apply_row_filters(df, (session_id,), build_filter_spec(start_date, end_date, extra=filters))
 
         # セッション保存（追加）
         db.save_session(session_id, store=store)
+        analyzer = TimeSeriesAnalyzer(df, backend=backend)
+        analysis_result = analyzer.analyze(metric=metric, time_unit=time_unit, store=store, rolling=rolling)
+        return analysis_result
+
+
+def resolve_panel_series(payload: Dict[str, Any]):
+    """Validate the metrics list and optional stores list of multi-series requests."""
+    metrics = payload.get('metrics')
+    if not isinstance(metrics, list) or not metrics or not all(isinstance(m, str) for m in metrics):
+        raise ValueError('metrics must be a non-empty list of column names')
+    return list(dict.fromkeys(metrics)), validate_store_list(payload.get('stores'))
+
+
+@app.route('/api/v1/analysis/timeseries/panel', methods=['POST'])
+@require_api_key
+@limiter.limit("30 per minute")
+def analyze_timeseries_panel() -> Any:
+    """
+    複数メトリック×店舗の時系列・移動統計量API
+
+    Request Body:
+    {
+        "session_id": "session_20251027_120922",
+        "metrics": ["Total_Sales", "gross_profit"],
+        "time_unit": "週",
+        "stores": ["恵比寿", "横浜元町"],          // 省略時は全店舗
+        "rolling": {"window": 4, "ewma_span": 8, "growth_lag": 1},
+        "start_date": "2024-01-01",
+        "end_date": "2024-12-31"
+    }
+    """
+    try:
+        payload = request.get_json(force=True)
+        session_id = validate_session_id(payload.get('session_id'))
+        metrics, stores = resolve_panel_series(payload)
+        time_unit = validate_time_unit(payload.get('time_unit'))
+        rolling = validate_rolling_options(payload.get('rolling', True))
+
+        df = get_dataframe_for_analysis(session_id)
+        df = apply_row_filters(df, (session_id,), build_filter_spec(payload.get('start_date'), payload.get('end_date')))
         analyzer = TimeSeriesAnalyzer(df)
-        analysis_result = analyzer.analyze(metric=metric, time_unit=time_unit, store=store)
+        result = analyzer.analyze_panel(metrics=metrics, time_unit=time_unit, stores=stores, rolling=rolling)
+        return jsonify(result)
+    except FileNotFoundError as exc:
+        logger.warning('Time series panel analysis failed: %s', exc)
+        return build_error_response(str(exc), status_code=404, code='SESSION_NOT_FOUND')
+    except ValueError as exc:
+        logger.warning('Time series panel validation error: %s', exc)
+        return build_error_response(str(exc), status_code=400, code='VALIDATION_ERROR')
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.error('Unexpected time series panel error: %s', exc, exc_info=True)
+        return build_error_response('Internal server error', status_code=500, code='INTERNAL_ERROR')
+
+
+@app.route('/api/v1/analysis/timeseries/forecast', methods=['POST'])
+@require_api_key
+@limiter.limit("30 per minute")
+def analyze_timeseries_forecast() -> Any:
+    """
+    複数メトリック×店舗の一括予測API（加法型 Holt-Winters）
+
+    Request Body:
+    {
+        "session_id": "session_20251027_120922",
+        "metrics": ["Total_Sales", "Number_of_guests"],
+        "time_unit": "月",
+        "stores": ["恵比寿"],                       // 省略時は全店舗
+        "horizon": 6,
+        "start_date": "2023-01-01",
+        "end_date": "2024-12-31",
+        "filters": {"ranges": {"客数": {"min": 10}}, "categories": {"カテゴリ": ["食品"]}}   // 任意の追加条件
+    }
+    """
+    try:
+        payload = request.get_json(force=True)
+        session_id = validate_session_id(payload.get('session_id'))
+        metrics, stores = resolve_panel_series(payload)
+        time_unit = validate_time_unit(payload.get('time_unit'))
+        horizon = validate_horizon(payload.get('horizon'))
+        start_date = payload.get('start_date')
+        end_date = payload.get('end_date')
+        filters = validate_filters(payload.get('filters'))
+
+        df = get_dataframe_for_analysis(session_id)
+        df = apply_row_filters(df, (session_id,), build_filter_spec(start_date, end_date, extra=filters))
+        analyzer = TimeSeriesAnalyzer(
+            df, cache_key=(session_id, get_dataset_version(session_id), start_date, end_date, filters))
+        result = analyzer.forecast_panel(metrics=metrics, time_unit=time_unit, stores=stores, horizon=horizon)
+        return jsonify(result)
+    except FileNotFoundError as exc:
+        logger.warning('Forecast failed: %s', exc)
+        return build_error_response(str(exc), status_code=404, code='SESSION_NOT_FOUND')
+    except ValueError as exc:
+        logger.warning('Forecast validation error: %s', exc)
+        return build_error_response(str(exc), status_code=400, code='VALIDATION_ERROR')
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.error('Unexpected forecast error: %s', exc, exc_info=True)
+        return build_error_response('Internal server error', status_code=500, code='INTERNAL_ERROR')
+
+
+@app.route('/api/v1/analysis/anomalies', methods=['POST'])
+@require_api_key
+@limiter.limit("30 per minute")
+def analyze_anomalies() -> Any:
+    """
+    店舗×日×メトリックの異常日スキャンAPI（判定されたセルのみをカーソルでページング）
+
+    Request Body:
+    {
+        "session_id": "session_20251027_120922",
+        "metrics": ["Total_Sales", "Number_of_guests"],  // 省略時は全数値列
+        "stores": ["恵比寿"],                              // 省略時は全店舗
+        "methods": ["seasonal"],                         // robust_z / iqr / seasonal
+        "threshold": 3.5,
+        "cursor": "100",                                  // 前ページの next_cursor
+        "limit": 100,
+        "filters": {"ranges": {"客数": {"min": 10}}}          // 任意の追加条件
+    }
+    """
+    try:
+        payload = request.get_json(force=True)
+        session_id = validate_session_id(payload.get('session_id'))
+        methods = validate_anomaly_methods(payload.get('methods'))
+        threshold = validate_threshold(payload.get('threshold'))
+        cursor = validate_cursor(payload.get('cursor'))
+        limit = validate_page_size(payload.get('limit', 100))
+        start_date = payload.get('start_date')
+        end_date = payload.get('end_date')
+        filters = validate_filters(payload.get('filters'))
+
+        df = get_dataframe_for_analysis(session_id)
+        if payload.get('metrics') is None:
+            payload = {**payload, 'metrics': [col for col in df.select_dtypes(include=[np.number]).columns
+                                              if col not in DATE_PART_COLUMNS]}
+        metrics, stores = resolve_panel_series(payload)
+        df = apply_row_filters(df, (session_id,), build_filter_spec(start_date, end_date, extra=filters))
+        analyzer = TimeSeriesAnalyzer(
+            df, cache_key=(session_id, get_dataset_version(session_id), start_date, end_date, filters))
+        result = analyzer.scan_anomalies(metrics=metrics, stores=stores, methods=methods,
+                                         threshold=threshold, cursor=cursor, limit=limit)
+        return jsonify(result)
+    except FileNotFoundError as exc:
+        logger.warning('Anomaly scan failed: %s', exc)
+        return build_error_response(str(exc), status_code=404, code='SESSION_NOT_FOUND')
+    except ValueError as exc:
+        logger.warning('Anomaly scan validation error: %s', exc)
+        return build_error_response(str(exc), status_code=400, code='VALIDATION_ERROR')
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.error('Unexpected anomaly scan error: %s', exc, exc_info=True)
+        return build_error_response('Internal server error', status_code=500, code='INTERNAL_ERROR')
+
+
+@app.route('/api/v1/analysis/comparison', methods=['POST'])
+@require_api_key
+@limiter.limit("30 per minute")
+def analyze_comparison() -> Any:
+    """
+    期間比較API（前年同期 / 前月 / 前年同曜日 / 店舗間）
+
+    Request Body:
+    {
+        "session_id": "session_20251027_120922",
+        "metrics": ["Total_Sales", "Number_of_guests"],
+        "mode": "yoy" | "mom" | "same_weekday_yoy" | "store",
+        "time_unit": "月",
+        "stores": ["恵比寿", "横浜元町"],          // 省略時は全店舗
+        "base_store": "恵比寿",                    // mode=store のみ
+        "start_date": "2024-04-01",
+        "end_date": "2024-04-30"
+    }
+    """
+    try:
+        payload = request.get_json(force=True)
+        session_id = validate_session_id(payload.get('session_id'))
+        metrics, stores = resolve_panel_series(payload)
+        mode = validate_comparison_mode(payload.get('mode'))
+        time_unit = validate_time_unit(payload.get('time_unit'))
+        base_store = validate_store(payload.get('base_store'))
+
+        df = get_dataframe_for_analysis(session_id)
+        # 比較元の期間を参照するため、期間フィルタは集計後に適用する
+        analyzer = TimeSeriesAnalyzer(df, cache_key=(session_id, get_dataset_version(session_id), None, None))
+        result = analyzer.compare_periods(
+            metrics=metrics,
+            mode=mode,
+            time_unit=time_unit,
+            stores=stores,
+            base_store=base_store,
+            start_date=payload.get('start_date'),
+            end_date=payload.get('end_date')
+        )
+        return jsonify(result)
+    except FileNotFoundError as exc:
+        logger.warning('Comparison analysis failed: %s', exc)
+        return build_error_response(str(exc), status_code=404, code='SESSION_NOT_FOUND')
+    except ValueError as exc:
+        logger.warning('Comparison validation error: %s', exc)
+        return build_error_response(str(exc), status_code=400, code='VALIDATION_ERROR')
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.error('Unexpected comparison error: %s', exc, exc_info=True)
+        return build_error_response('Internal server error', status_code=500, code='INTERNAL_ERROR')
+
+
+@app.route('/api/v1/analysis/heatmap', methods=['POST'])
+@require_api_key
+@limiter.limit("30 per minute")
+def analyze_heatmap() -> Any:
+    """
+    店舗×月 / 店舗×曜日ヒートマップAPI（密な行列＋軸ラベル）
+
+    Request Body:
+    {
+        "session_id": "session_20251027_120922",
+        "metric": "Total_Sales",
+        "axis": "month" | "weekday",
+        "aggregation": "sum" | "mean" | "count",
+        "stores": ["恵比寿", "横浜元町"],          // 省略時は全店舗
+        "start_date": "2024-01-01",
+        "end_date": "2024-12-31",
+        "filters": {"ranges": {"客数": {"min": 10}}, "categories": {"カテゴリ": ["食品"]}}   // 任意の追加条件
+    }
+    """
+    try:
+        payload = request.get_json(force=True)
+        session_id = validate_session_id(payload.get('session_id'))
+        metric = payload.get('metric') or 'Total_Sales'
+        axis = validate_heatmap_axis(payload.get('axis'))
+        aggregation = validate_aggregation(payload.get('aggregation'))
+        stores = validate_store_list(payload.get('stores'))
+        filters = validate_filters(payload.get('filters'))
+
+        df = get_dataframe_for_analysis(session_id)
+        analyzer = HeatmapAnalyzer(df, cache_key=(session_id, get_dataset_version(session_id)))
+        result = analyzer.analyze(
+            metric=metric,
+            axis=axis,
+            aggregation=aggregation,
+            stores=stores,
+            start_date=payload.get('start_date'),
+            end_date=payload.get('end_date'),
+            filters=filters
+        )
+        return jsonify(result)
+    except FileNotFoundError as exc:
+        logger.warning('Heatmap analysis failed: %s', exc)
+        return build_error_response(str(exc), status_code=404, code='SESSION_NOT_FOUND')
+    except ValueError as exc:
+        logger.warning('Heatmap validation error: %s', exc)
+        return build_error_response(str(exc), status_code=400, code='VALIDATION_ERROR')
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.error('Unexpected heatmap error: %s', exc, exc_info=True)
+        return build_error_response('Internal server error', status_code=500, code='INTERNAL_ERROR')
+
+
+@app.route('/api/v1/analysis/scatter', methods=['POST'])
+@require_api_key
+@limiter.limit("30 per minute")
+def analyze_scatter() -> Any:
+    """
+    メトリック間の散布図API（大規模データは2次元ビンの密度で返す）
+
+    Request Body:
+    {
+        "session_id": "session_20251027_120922",
+        "x_metric": "Number_of_guests",
+        "y_metric": "Price_per_customer",
+        "mode": "auto" | "points" | "rect" | "hex",
+        "bins": 40,
+        "store": "恵比寿",
+        "start_date": "2024-01-01",
+        "end_date": "2024-12-31",
+        "filters": {"ranges": {"客数": {"min": 10}}, "categories": {"カテゴリ": ["食品"]}}   // 任意の追加条件
+    }
+    """
+    try:
+        payload = request.get_json(force=True)
+        session_id = validate_session_id(payload.get('session_id'))
+        x_metric = payload.get('x_metric')
+        y_metric = payload.get('y_metric')
+        if not x_metric or not y_metric:
+            raise ValueError('x_metric and y_metric are required')
+        mode = validate_scatter_mode(payload.get('mode'))
+        bins = validate_bins(payload.get('bins', 40))
+        store = validate_store(payload.get('store'))
+        filters = validate_filters(payload.get('filters'))
+
+        df = get_dataframe_for_analysis(session_id)
+        analyzer = ScatterAnalyzer(df, cache_key=(session_id, get_dataset_version(session_id)))
+        result = analyzer.analyze(
+            x_metric=x_metric,
+            y_metric=y_metric,
+            mode=mode,
+            bins=bins,
+            store=store,
+            start_date=payload.get('start_date'),
+            end_date=payload.get('end_date'),
+            filters=filters
+        )
+        return jsonify(result)
+    except FileNotFoundError as exc:
+        logger.warning('Scatter analysis failed: %s', exc)
+        return build_error_response(str(exc), status_code=404, code='SESSION_NOT_FOUND')
+    except ValueError as exc:
+        logger.warning('Scatter validation error: %s', exc)
+        return build_error_response(str(exc), status_code=400, code='VALIDATION_ERROR')
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.error('Unexpected scatter error: %s', exc, exc_info=True)
+        return build_error_response('Internal server error', status_code=500, code='INTERNAL_ERROR')
+
+
+@app.route('/api/v1/analysis/clustering', methods=['POST'])
+@require_api_key
+@limiter.limit("30 per minute")
+def analyze_store_clustering() -> Any:
+    """
+    店舗クラスタリングAPI（k-means++ / 商品カテゴリ構成比・KPIプロファイル）
+
+    Request Body:
+    {
+        "session_id": "session_20251027_120922",
+        "k": 4,
+        "features": ["メンズ ニット 構成比", "客単価", "粗利率"],   // 省略時は全特徴量
+        "start_date": "2024-01-01",
+        "end_date": "2024-12-31",
+        "filters": {"ranges": {"客数": {"min": 10}}, "categories": {"カテゴリ": ["食品"]}}   // 任意の追加条件
+    }
+    """
+    try:
+        payload = request.get_json(force=True)
+        session_id = validate_session_id(payload.get('session_id'))
+        k = validate_cluster_count(payload.get('k'))
+        features = payload.get('features')
+        filters = validate_filters(payload.get('filters'))
+        if features is not None and (not isinstance(features, list) or
+                                     not all(isinstance(name, str) for name in features)):
+            raise ValueError('features must be a list of feature names')
+
+        df = get_dataframe_for_analysis(session_id)
+        analyzer = StoreClusterAnalyzer(df, cache_key=(session_id, get_dataset_version(session_id)))
+        result = analyzer.analyze(
+            k=k,
+            features=list(dict.fromkeys(features)) if features else None,
+            start_date=payload.get('start_date'),
+            end_date=payload.get('end_date'),
+            filters=filters
+        )
+        return jsonify(result)
+    except FileNotFoundError as exc:
+        logger.warning('Store clustering failed: %s', exc)
+        return build_error_response(str(exc), status_code=404, code='SESSION_NOT_FOUND')
+    except ValueError as exc:
+        logger.warning('Store clustering validation error: %s', exc)
+        return build_error_response(str(exc), status_code=400, code='VALIDATION_ERROR')
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.error('Unexpected store clustering error: %s', exc, exc_info=True)
+        return build_error_response('Internal server error', status_code=500, code='INTERNAL_ERROR')
+
+
+@app.route('/api/v1/analysis/query', methods=['POST'])
+@require_api_key
+@limiter.limit("30 per minute")
+def analyze_query() -> Any:
+    """
+    宣言的な集計クエリAPI（店舗/カテゴリ/期間でグループ化し、複数メトリックを複数の集計で返す）
+
+    Request Body:
+    {
+        "session_id": "session_20251027_120922",
+        "group_by": ["store", "category", "月"],      // 期間は 日/週/月/年 のいずれか1つ
+        "metrics": ["売上金額", "客数"],
+        "aggregations": ["sum", "mean", "count", "min", "max", "median"],
+        "quantiles": [0.1, 0.9],
+        "stores": ["恵比寿"],                          // 省略時は全店舗
+        "categories": ["食品"],                        // 省略時は全カテゴリ
+        "start_date": "2024-01-01",
+        "end_date": "2024-12-31",
+        "page_size": 50,
+        "offset": 0,
+        "filters": {"ranges": {"客数": {"min": 10}}, "categories": {"カテゴリ": ["食品"]}}   // 任意の追加条件
+    }
+    """
+    try:
+        payload = request.get_json(force=True)
+        session_id = validate_session_id(payload.get('session_id'))
+        query = validate_query(payload)
+        page_size = validate_page_size(payload.get('page_size'))
+        offset = validate_offset(payload.get('offset'))
 
-        # Return results directly without wrapper (CHANGED)
-        return jsonify(analysis_result)
+        df = get_dataframe_for_analysis(session_id)
+        analyzer = QueryAnalyzer(df, cache_key=(session_id, get_dataset_version(session_id)))
+        return jsonify(analyzer.execute(query, page_size=page_size, offset=offset))
     except FileNotFoundError as exc:
-        logger.warning('Time series analysis failed: %s', exc)
+        logger.warning('Query failed: %s', exc)
         return build_error_response(str(exc), status_code=404, code='SESSION_NOT_FOUND')
     except ValueError as exc:
-        logger.warning('Time series validation error: %s', exc)
+        logger.warning('Query validation error: %s', exc)
         return build_error_response(str(exc), status_code=400, code='VALIDATION_ERROR')
     except Exception as exc:  # pylint: disable=broad-except
-        logger.error('Unexpected time series error: %s', exc, exc_info=True)
+        logger.error('Unexpected query error: %s', exc, exc_info=True)
         return build_error_response('Internal server error', status_code=500, code='INTERNAL_ERROR')
 
 
@@ -949,138 +4163,258 @@ def analyze_timeseries() -> Any:
 @require_api_key
 @limiter.limit("30 per minute")
 def analyze_histogram() -> Any:
-    """Histogram analysis endpoint."""
-    start_time = time.time()
+    """
+    Histogram analysis endpoint.
 
+    "session_ids": [...] で複数セッションの和集合を分析、"progressive": true で近似結果を先に返す。
+    """
     try:
         payload = request.get_json(force=True)
-        session_id = validate_session_id(payload.get('session_id'))
+        if payload.get('session_ids') is not None:
+            return jsonify(run_session_union_analysis('histogram', payload))
+        if payload.get('progressive'):
+            return jsonify(start_progressive_analysis('histogram', payload, run_histogram_analysis))
+        # Return results directly without wrapper (CHANGED)
+        return jsonify(run_histogram_analysis(payload))
+    except FileNotFoundError as exc:
+        logger.warning('Histogram analysis failed: %s', exc)
+        return build_error_response(str(exc), status_code=404, code='SESSION_NOT_FOUND')
+    except ValueError as exc:
+        logger.warning('Histogram validation error: %s', exc)
+        return build_error_response(str(exc), status_code=400, code='VALIDATION_ERROR')
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.error('Unexpected histogram error: %s', exc, exc_info=True)
+        return build_error_response('Internal server error', status_code=500, code='INTERNAL_ERROR')
 
-        # 先にデータフレームを取得
-        df = get_dataframe_for_analysis(session_id)
+
+def run_histogram_analysis(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Histogram analysis for a request payload (also run in the background in progressive mode)."""
+    session_id = validate_session_id(payload.get('session_id'))
+
+    # Date filters (NEW)
+    start_date = payload.get('start_date')
+    end_date = payload.get('end_date')
+
+    store = validate_store(payload.get('store'))
+
+    bins = validate_bins(payload.get('bins'))
+    normality_method = validate_normality_method(payload.get('normality_method'))
+    filters = validate_filters(payload.get('filters'))
+    cache_key = (session_id, get_dataset_version(session_id), start_date, end_date, filters)
+
+    def load_filtered() -> pd.DataFrame:
+        frame = get_dataframe_for_analysis(session_id, [store] if store else None, start_date, end_date)
+        return apply_row_filters(frame, (session_id,), build_filter_spec(start_date, end_date, extra=filters))
+
+    # 集計バックエンドは店舗別重ね合わせモード・追加条件なしの場合に使用（店舗・期間はパーティションへ伝える）
+    backend = None
+    if payload.get('group_by') is None and not filters:
+        backend = get_analysis_backend(session_id, start_date, end_date, [store] if store else None)
+
+    try:
+        requested_metric = payload.get('metric')
+        if backend is None and payload.get('group_by') is None and requested_metric and \
+                analysis_cache.get((*cache_key, 'sorted_values', requested_metric, store)) is not None:
+            # ビン数だけの変更: キャッシュ済みのソート済みインデックスから再計算し、フレームの読み込み・コピーを行わない
+            db.save_session(session_id, store=store)
+            analyzer = HistogramAnalyzer(None, cache_key=cache_key, loader=load_filtered)
+            return analyzer.analyze(metric=requested_metric, bins=bins, store=store, normality_method=normality_method)
+
+        if backend is not None:
+            df = backend.schema
+        elif payload.get('group_by') is not None:
+            df = get_dataframe_for_analysis(session_id, start_date=start_date, end_date=end_date)
+        else:
+            df = get_dataframe_for_analysis(session_id, [store] if store else None, start_date, end_date)
 
         # データセットに存在する数値カラムを取得
         numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns.tolist()
 
         # metricが指定されていない、または存在しない場合、最初の数値カラムを使用
-        requested_metric = payload.get('metric')
         if not requested_metric or requested_metric not in df.columns:
             metric = numeric_cols[0] if numeric_cols else 'value'
         else:
             metric = requested_metric
 
-        bins = validate_bins(payload.get('bins'))
-        store = validate_store(payload.get('store'))
-
-        # Date filters (NEW)
-        start_date = payload.get('start_date')
-        end_date = payload.get('end_date')
-
         # Apply date filters (NEW)
-        df = filter_dataframe_by_date(df, start_date, end_date)
+        if backend is None:
+            df = apply_row_filters(df, (session_id,), build_filter_spec(start_date, end_date, extra=filters))
 
         # セッション保存
         db.save_session(session_id, store=store)
-        analyzer = HistogramAnalyzer(df)
-        analysis_result = analyzer.analyze(metric=metric, bins=bins, store=store)
+        analyzer = HistogramAnalyzer(df, cache_key=cache_key, backend=backend)
 
-        # Return results directly without wrapper (CHANGED)
-        return jsonify(analysis_result)
-    except FileNotFoundError as exc:
-        logger.warning('Histogram analysis failed: %s', exc)
-        return build_error_response(str(exc), status_code=404, code='SESSION_NOT_FOUND')
-    except ValueError as exc:
-        logger.warning('Histogram validation error: %s', exc)
-        return build_error_response(str(exc), status_code=400, code='VALIDATION_ERROR')
-    except Exception as exc:  # pylint: disable=broad-except
-        logger.error('Unexpected histogram error: %s', exc, exc_info=True)
-        return build_error_response('Internal server error', status_code=500, code='INTERNAL_ERROR')
+        # 店舗別重ね合わせモード（共通ビン境界）
+        if payload.get('group_by') == 'store':
+            stores = validate_store_list(payload.get('stores'))
+            return analyzer.analyze_grouped(metric=metric, bins=bins, stores=stores)
+        if payload.get('group_by') is not None:
+            raise ValueError("Invalid group_by. Must be one of: store")
+
+        analysis_result = analyzer.analyze(
+            metric=metric,
+            bins=bins,
+            store=store,
+            normality_method=normality_method
+        )
+        return analysis_result
+    finally:
+        if backend is not None:
+            backend.close()
+
+
+def resolve_pareto_columns(df: pd.DataFrame, payload: Dict[str, Any]):
+    """Resolve metric / category column for v1 Pareto requests (with fallbacks)."""
+    # データセットに存在する数値カラムを取得
+    numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns.tolist()
+
+    # metricが指定されていない、または存在しない場合、最初の数値カラムを使用
+    requested_metric = payload.get('metric')
+    if not requested_metric or requested_metric not in df.columns:
+        metric = numeric_cols[0] if numeric_cols else 'value'
+    else:
+        metric = requested_metric
+
+    # category_columnが指定されていない、または存在しない場合、非数値カラムから選択
+    requested_category = payload.get('category_column')
+    if not requested_category or requested_category not in df.columns:
+        non_numeric_cols = df.select_dtypes(exclude=['int64', 'float64']).columns.tolist()
+        category_column = non_numeric_cols[0] if non_numeric_cols else None
+    else:
+        category_column = requested_category
+    return metric, category_column
 
 
 @app.route('/api/v1/analysis/pareto', methods=['POST'])
 @require_api_key
 @limiter.limit("30 per minute")
 def analyze_pareto() -> Any:
-    """Pareto analysis endpoint (80/20 rule, ABC classification)."""
-    start_time = time.time()
+    """
+    Pareto analysis endpoint (80/20 rule, ABC classification).
 
+    "session_ids": [...] で複数セッションの和集合を分析、"progressive": true で近似結果を先に返す。
+    """
     try:
         payload = request.get_json(force=True)
-        session_id = validate_session_id(payload.get('session_id'))
+        if payload.get('session_ids') is not None:
+            return build_success_response(run_session_union_analysis('pareto', payload))
+        if payload.get('progressive'):
+            return build_success_response(start_progressive_analysis('pareto', payload, run_pareto_analysis))
+        return build_success_response(run_pareto_analysis(payload))
+    except FileNotFoundError as exc:
+        logger.warning('Pareto analysis failed: %s', exc)
+        return build_error_response(str(exc), status_code=404, code='SESSION_NOT_FOUND')
+    except ValueError as exc:
+        logger.warning('Pareto validation error: %s', exc)
+        return build_error_response(str(exc), status_code=400, code='VALIDATION_ERROR')
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.error('Unexpected Pareto error: %s', exc, exc_info=True)
+        return build_error_response('Internal server error', status_code=500, code='INTERNAL_ERROR')
 
-        # 先にデータフレームを取得
-        df = get_dataframe_for_analysis(session_id)
 
-        # データセットに存在する数値カラムを取得
-        numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns.tolist()
+def run_pareto_analysis(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Pareto analysis for a request payload, saved to the history DB (also run in the background in progressive mode)."""
+    start_time = time.time()
 
-        # metricが指定されていない、または存在しない場合、最初の数値カラムを使用
-        requested_metric = payload.get('metric')
-        if not requested_metric or requested_metric not in df.columns:
-            metric = numeric_cols[0] if numeric_cols else 'value'
-        else:
-            metric = requested_metric
+    session_id = validate_session_id(payload.get('session_id'))
 
-        # category_columnが指定されていない、または存在しない場合、非数値カラムから選択
-        requested_category = payload.get('category_column')
-        if not requested_category or requested_category not in df.columns:
-            non_numeric_cols = df.select_dtypes(exclude=['int64', 'float64']).columns.tolist()
-            category_column = non_numeric_cols[0] if non_numeric_cols else None
-        else:
-            category_column = requested_category
+    store = validate_store(payload.get('store'))
+    filters = validate_filters(payload.get('filters'))
+
+    # 先にデータフレームを取得（集計バックエンド有効時はスキーマのみ。店舗はパーティションへ伝える）
+    stores = [store] if store else None
+    with get_analysis_source(session_id, stores=stores, filters=filters) as (df, backend):
+        metric, category_column = resolve_pareto_columns(df, payload)
 
-        store = validate_store(payload.get('store'))
         top_n = payload.get('top_n', 20)
 
         if not isinstance(top_n, int) or not (5 <= top_n <= 100):
             top_n = 20
 
+        page_size = validate_page_size(payload.get('page_size'))
+
         # セッション保存
         db.save_session(session_id, store=store)
-        analyzer = ParetoAnalyzer(df)
+        analyzer = ParetoAnalyzer(df, cache_key=analysis_scope_key(session_id, stores=stores), backend=backend)
         analysis_result = analyzer.analyze(
             metric=metric,
             category_column=category_column,
             store=store,
-            top_n=top_n
+            top_n=top_n,
+            page_size=page_size,
+            filters=filters
         )
 
-        # 実行時間計測
-        execution_time = time.time() - start_time
-
-        # データベース保存
-        analysis_id = db.save_analysis_result(
-            session_id=session_id,
-            analysis_type='pareto',
-            store=store,
-            target_column=metric,
-            parameters={
-                'metric': metric,
-                'category_column': category_column,
-                'store': store,
-                'top_n': top_n
-            },
-            results=analysis_result,
-            execution_time=execution_time
-        )
+    # 実行時間計測
+    execution_time = time.time() - start_time
+
+    # データベース保存
+    analysis_id = db.save_analysis_result(
+        session_id=session_id,
+        analysis_type='pareto',
+        store=store,
+        target_column=metric,
+        parameters={
+            'metric': metric,
+            'category_column': category_column,
+            'store': store,
+            'top_n': top_n,
+            'page_size': page_size,
+            # 追加条件は指定時のみ記録
+            **({'filters': payload['filters']} if filters else {})
+        },
+        results=analysis_result,
+        execution_time=execution_time
+    )
+
+    # レスポンス
+    response_data = {
+        'analysis_id': analysis_id,
+        'session_id': session_id,
+        'execution_time': round(execution_time, 3),
+        **analysis_result
+    }
+    return response_data
 
-        # レスポンス
-        response_data = {
-            'analysis_id': analysis_id,
-            'session_id': session_id,
-            'execution_time': round(execution_time, 3),
-            **analysis_result
-        }
 
-        return build_success_response(response_data)
+@app.route('/api/v1/analysis/pareto/members', methods=['POST'])
+@require_api_key
+@limiter.limit("120 per minute")
+def analyze_pareto_members() -> Any:
+    """ABC分類メンバーのページ参照（パレート分析のキャッシュ済み集計を利用）"""
+    try:
+        payload = request.get_json(force=True)
+        session_id = validate_session_id(payload.get('session_id'))
+        store = validate_store(payload.get('store'))
+        filters = validate_filters(payload.get('filters'))
+        # V1 と同じ読み込み範囲（店舗はパーティションへ伝える）でキャッシュ済みの集計を共有する
+        stores = [store] if store else None
+        with get_analysis_source(session_id, stores=stores, filters=filters) as (df, backend):
+            metric, category_column = resolve_pareto_columns(df, payload)
+
+            abc_class = payload.get('abc_class', 'A')
+            offset = validate_offset(payload.get('offset'))
+            limit = validate_page_size(payload.get('limit'))
+
+            analyzer = ParetoAnalyzer(df, cache_key=analysis_scope_key(session_id, stores=stores), backend=backend)
+            page = analyzer.members(
+                metric=metric,
+                category_column=category_column,
+                store=store,
+                abc_class=abc_class,
+                offset=offset,
+                limit=limit,
+                filters=filters
+            )
+        return build_success_response(page)
     except FileNotFoundError as exc:
-        logger.warning('Pareto analysis failed: %s', exc)
+        logger.warning('Pareto members failed: %s', exc)
         return build_error_response(str(exc), status_code=404, code='SESSION_NOT_FOUND')
     except ValueError as exc:
-        logger.warning('Pareto validation error: %s', exc)
+        logger.warning('Pareto members validation error: %s', exc)
         return build_error_response(str(exc), status_code=400, code='VALIDATION_ERROR')
     except Exception as exc:  # pylint: disable=broad-except
-        logger.error('Unexpected Pareto error: %s', exc, exc_info=True)
+        logger.error('Unexpected Pareto members error: %s', exc, exc_info=True)
         return build_error_response('Internal server error', status_code=500, code='INTERNAL_ERROR')
 
 
@@ -1100,7 +4434,8 @@ def analyze_pareto_v2() -> Any:
         "metric": "Total_Sales",
         "shop": "恵比寿" (optional),
         "start_date": "2019-04-30" (optional),
-        "end_date": "2024-12-31" (optional)
+        "end_date": "2024-12-31" (optional),
+        "filters": {"ranges": {"Number_of_guests": {"min": 10}}} (optional: 追加条件)
     }
     """
     try:
@@ -1108,153 +4443,289 @@ def analyze_pareto_v2() -> Any:
         session_id = validate_session_id(payload.get('session_id'))
         category_type = payload.get('category_type', 'product_category')
         metric = payload.get('metric', 'Total_Sales')
-        shop_filter = payload.get('shop')
+        shop_filter = validate_store(payload.get('shop'))
         start_date = payload.get('start_date')
         end_date = payload.get('end_date')
+        filters = validate_filters(payload.get('filters'))
 
         logger.info(f'[Pareto V2] Request: session={session_id}, category_type={category_type}, metric={metric}')
 
-        # Get dataframe
+        # Get dataframe（集計バックエンド有効時はスキーマのみ、期間はバックエンド側で適用。店舗・期間はパーティションへ伝える）
+        stores = [shop_filter] if shop_filter else None
+        with get_analysis_source(session_id, start_date, end_date, stores, filters) as (df, backend):
+            # V1 と共通のエンジン・キャッシュで集計（フィルタは未キャッシュ時のみ適用）
+            analyzer = ParetoAnalyzer(df, cache_key=analysis_scope_key(session_id, start_date, end_date, stores),
+                                      backend=backend)
+            result = analyzer.analyze_v2(
+                metric=metric,
+                category_type=category_type,
+                store=shop_filter,
+                start_date=start_date,
+                end_date=end_date,
+                filters=filters
+            )
+
+        logger.info(f'[Pareto V2] Success: {len(result["categories"])} categories processed')
+        return jsonify(result)
+
+    except FileNotFoundError as exc:
+        logger.warning('Pareto V2 failed: %s', exc)
+        return build_error_response(str(exc), status_code=404, code='SESSION_NOT_FOUND')
+    except ValueError as exc:
+        logger.warning('Pareto V2 validation error: %s', exc)
+        return build_error_response(str(exc), status_code=400, code='VALIDATION_ERROR')
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.error('Unexpected Pareto V2 error: %s', exc, exc_info=True)
+        return build_error_response('Internal server error', status_code=500, code='INTERNAL_ERROR')
+
+
+@app.route('/api/v2/analysis/pareto/migration', methods=['POST'])
+def analyze_pareto_migration() -> Any:
+    """
+    ABCクラス遷移分析API（期間別パレート分析）
+
+    Request Body:
+    {
+        "session_id": "session_20251027_120922",
+        "category_type": "product_category" | "shop",
+        "metric": "Total_Sales",
+        "time_unit": "月" (optional: 日/週/月/年),
+        "shop": "恵比寿" (optional),
+        "start_date": "2019-04-30" (optional),
+        "end_date": "2024-12-31" (optional)
+    }
+    """
+    try:
+        payload = request.get_json(force=True)
+        session_id = validate_session_id(payload.get('session_id'))
+        category_type = payload.get('category_type', 'product_category')
+        metric = payload.get('metric', 'Total_Sales')
+        time_unit = validate_time_unit(payload.get('time_unit'))
+        shop_filter = validate_store(payload.get('shop'))
+
         df = get_dataframe_for_analysis(session_id)
+        analyzer = ParetoAnalyzer(df, cache_key=analysis_scope_key(session_id))
+        result = analyzer.analyze_migration(
+            metric=metric,
+            category_type=category_type,
+            time_unit=time_unit,
+            store=shop_filter,
+            start_date=payload.get('start_date'),
+            end_date=payload.get('end_date')
+        )
 
-        # Apply filters
-        if shop_filter and 'shop' in df.columns:
-            df = df[df['shop'] == shop_filter]
-
-        if 'Date' in df.columns:
-            df['Date'] = pd.to_datetime(df['Date'])
-            if start_date:
-                # タイムゾーン情報を削除して tz-naive な datetime として比較
-                start_ts = pd.to_datetime(start_date)
-                if start_ts.tzinfo is not None:
-                    start_ts = start_ts.tz_localize(None)
-                df = df[df['Date'] >= start_ts]
-            if end_date:
-                # タイムゾーン情報を削除して tz-naive な datetime として比較
-                end_ts = pd.to_datetime(end_date)
-                if end_ts.tzinfo is not None:
-                    end_ts = end_ts.tz_localize(None)
-                df = df[df['Date'] <= end_ts]
-
-        if len(df) == 0:
-            return build_error_response('フィルタ条件に一致するデータがありません', status_code=400)
-
-        # ============================================================
-        # 商品カテゴリベースのパレート分析
-        # ============================================================
-        if category_type == 'product_category':
-            category_columns = [
-                'Mens_JACKETS&OUTER2',
-                'Mens_KNIT',
-                'Mens_PANTS',
-                "WOMEN'S_JACKETS2",
-                "WOMEN'S_TOPS",
-                "WOMEN'S_ONEPIECE",
-                "WOMEN'S_bottoms",
-                "WOMEN'S_SCARF & STOLES"
-            ]
+        logger.info(f'[Pareto Migration] Success: {len(result["periods"])} periods, '
+                    f'{len(result["categories"])} categories')
+        return jsonify(result)
 
-            category_labels = {
-                'Mens_JACKETS&OUTER2': 'メンズ ジャケット・アウター',
-                'Mens_KNIT': 'メンズ ニット',
-                'Mens_PANTS': 'メンズ パンツ',
-                "WOMEN'S_JACKETS2": 'レディース ジャケット',
-                "WOMEN'S_TOPS": 'レディース トップス',
-                "WOMEN'S_ONEPIECE": 'レディース ワンピース',
-                "WOMEN'S_bottoms": 'レディース ボトムス',
-                "WOMEN'S_SCARF & STOLES": 'レディース スカーフ・ストール'
-            }
+    except FileNotFoundError as exc:
+        logger.warning('Pareto migration failed: %s', exc)
+        return build_error_response(str(exc), status_code=404, code='SESSION_NOT_FOUND')
+    except ValueError as exc:
+        logger.warning('Pareto migration validation error: %s', exc)
+        return build_error_response(str(exc), status_code=400, code='VALIDATION_ERROR')
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.error('Unexpected Pareto migration error: %s', exc, exc_info=True)
+        return build_error_response('Internal server error', status_code=500, code='INTERNAL_ERROR')
 
-            # Calculate totals for each category
-            category_sales = {}
-            for col in category_columns:
-                if col in df.columns:
-                    # validate_uploadで変換済みだが、二重チェックとして
-                    # 文字列カラムをsum()すると500エラーになるため、数値に変換
-                    try:
-                        total = pd.to_numeric(df[col], errors='coerce').sum()
-                    except Exception:
-                        total = 0.0
-                    if pd.notna(total) and total > 0:
-                        category_sales[category_labels.get(col, col)] = total
-
-            if len(category_sales) == 0:
-                return build_error_response('商品カテゴリデータが見つかりません', status_code=400)
-
-            # Sort descending
-            sorted_data = sorted(category_sales.items(), key=lambda x: x[1], reverse=True)
-            categories = [item[0] for item in sorted_data]
-            values = [item[1] for item in sorted_data]
-
-        # ============================================================
-        # 店舗ベースのパレート分析
-        # ============================================================
-        elif category_type == 'shop':
-            if 'shop' not in df.columns:
-                return build_error_response('shop列が見つかりません', status_code=400)
-
-            shop_sales = df.groupby('shop')[metric].sum().sort_values(ascending=False)
-            categories = shop_sales.index.tolist()
-            values = shop_sales.values.tolist()
 
-        else:
-            return build_error_response(f'未対応のcategory_type: {category_type}', status_code=400)
+@app.route('/api/v2/analysis/pareto/drilldown', methods=['POST'])
+def analyze_pareto_drilldown() -> Any:
+    """
+    2階層パレート分析API（商品カテゴリ → 店舗）
 
-        # ============================================================
-        # Calculate cumulative percentage and ABC classification
-        # ============================================================
-        total = sum(values)
+    Request Body:
+    {
+        "session_id": "session_20251027_120922",
+        "category": "メンズ ニット" (optional: 指定時はそのカテゴリの店舗別内訳のみ),
+        "start_date": "2019-04-30" (optional),
+        "end_date": "2024-12-31" (optional)
+    }
+    """
+    try:
+        payload = request.get_json(force=True)
+        session_id = validate_session_id(payload.get('session_id'))
 
-        # エッジケース対応: フィルタリング後に合計が0になる場合のゼロ除算を防ぐ
-        if total == 0:
-            return build_error_response(
-                'フィルタ条件に一致するデータの合計が0です。フィルタ条件を変更してください。',
-                status_code=400
-            )
+        df = get_dataframe_for_analysis(session_id)
+        analyzer = ParetoAnalyzer(df, cache_key=analysis_scope_key(session_id))
+        result = analyzer.analyze_drilldown(
+            category=payload.get('category'),
+            start_date=payload.get('start_date'),
+            end_date=payload.get('end_date')
+        )
+        return jsonify(result)
 
-        cumulative_sum = np.cumsum(values)
-        cumulative_percentage = (cumulative_sum / total * 100).tolist()
-
-        # ABC classification
-        abc_classification = {}
-        for i, category in enumerate(categories):
-            cumulative = cumulative_percentage[i]
-            if cumulative <= 80:
-                abc_classification[category] = 'A'
-            elif cumulative <= 95:
-                abc_classification[category] = 'B'
-            else:
-                abc_classification[category] = 'C'
+    except FileNotFoundError as exc:
+        logger.warning('Pareto drilldown failed: %s', exc)
+        return build_error_response(str(exc), status_code=404, code='SESSION_NOT_FOUND')
+    except ValueError as exc:
+        logger.warning('Pareto drilldown validation error: %s', exc)
+        return build_error_response(str(exc), status_code=400, code='VALIDATION_ERROR')
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.error('Unexpected Pareto drilldown error: %s', exc, exc_info=True)
+        return build_error_response('Internal server error', status_code=500, code='INTERNAL_ERROR')
 
-        # Statistics
-        a_count = sum(1 for v in abc_classification.values() if v == 'A')
-        b_count = sum(1 for v in abc_classification.values() if v == 'B')
-        c_count = sum(1 for v in abc_classification.values() if v == 'C')
 
-        result = {
-            'categories': categories,
-            'values': values,
-            'cumulative_percentage': cumulative_percentage,
-            'abc_classification': abc_classification,
-            'statistics': {
-                'total': float(total),
-                'a_items': a_count,
-                'b_items': b_count,
-                'c_items': c_count
-            }
-        }
+# ============================================================
+# Probability Distribution Analysis V2
+# ============================================================
+
+@app.route('/api/v2/analysis/probability', methods=['POST'])
+@require_api_key
+@limiter.limit("30 per minute")
+def analyze_probability() -> Any:
+    """
+    確率分布分析API（gamma / lognormal / weibull / exponential / normal / beta）
+
+    Request Body:
+    {
+        "session_id": "session_20251027_120922",
+        "target_column": "Total_Sales",
+        "distribution_type": "auto" | "gamma" | ...,
+        "filters": {"shop": "恵比寿", "start_date": "2024-01-01", "end_date": "2024-12-31",
+                    "ranges": {"客数": {"min": 10}}}   // stores / ranges / categories は任意の追加条件
+    }
+    """
+    try:
+        payload = request.get_json(force=True)
+        session_id = validate_session_id(payload.get('session_id'))
+        target_column = payload.get('target_column') or 'Total_Sales'
+        distribution_type = validate_distribution_type(payload.get('distribution_type'))
+        options, filters = split_filter_options(payload.get('filters'), ('shop', 'start_date', 'end_date'))
+        store = validate_store(options.get('shop'))
 
-        logger.info(f'[Pareto V2] Success: {len(categories)} categories processed')
+        df = get_dataframe_for_analysis(session_id)
+        analyzer = ProbabilityDistributionAnalyzer(df, cache_key=analysis_scope_key(session_id))
+        result = analyzer.analyze(
+            target_column=target_column,
+            distribution_type=distribution_type,
+            store=store,
+            start_date=options.get('start_date'),
+            end_date=options.get('end_date'),
+            filters=filters
+        )
         return jsonify(result)
 
     except FileNotFoundError as exc:
-        logger.warning('Pareto V2 failed: %s', exc)
+        logger.warning('Probability analysis failed: %s', exc)
         return build_error_response(str(exc), status_code=404, code='SESSION_NOT_FOUND')
     except ValueError as exc:
-        logger.warning('Pareto V2 validation error: %s', exc)
+        logger.warning('Probability validation error: %s', exc)
         return build_error_response(str(exc), status_code=400, code='VALIDATION_ERROR')
     except Exception as exc:  # pylint: disable=broad-except
-        logger.error('Unexpected Pareto V2 error: %s', exc, exc_info=True)
+        logger.error('Unexpected probability analysis error: %s', exc, exc_info=True)
+        return build_error_response('Internal server error', status_code=500, code='INTERNAL_ERROR')
+
+
+# ============================================================
+# EDA Execution
+# ============================================================
+
+@app.route('/api/v1/analysis/eda/execute', methods=['POST'])
+@require_api_key
+@limiter.limit("30 per minute")
+def execute_eda() -> Any:
+    """
+    EDA実行API（列別統計量・相関行列・主要な発見）
+
+    Request Body:
+    {
+        "session_id": "session_20251027_120922",
+        "target_column": "Total_Sales",
+        "filters": {"shop": "恵比寿", "start_date": "2024-01-01", "end_date": "2024-12-31",
+                    "remove_outliers": false,
+                    "categories": {"カテゴリ": ["食品"]}}   // stores / ranges / categories は任意の追加条件
+    }
+    """
+    started = time.perf_counter()
+    try:
+        payload = request.get_json(force=True)
+        session_id = validate_session_id(payload.get('session_id'))
+        target_column = payload.get('target_column')
+        options, filters = split_filter_options(payload.get('filters'),
+                                                ('shop', 'start_date', 'end_date', 'remove_outliers'))
+        store = validate_store(options.get('shop'))
+
+        df = get_dataframe_for_analysis(session_id)
+        analyzer = EDAAnalyzer(df, cache_key=(session_id, get_dataset_version(session_id)))
+        result = analyzer.analyze(
+            target_column=target_column,
+            store=store,
+            start_date=options.get('start_date'),
+            end_date=options.get('end_date'),
+            remove_outliers=bool(options.get('remove_outliers', False)),
+            filters=filters
+        )
+        return jsonify({
+            **result,
+            'session_id': session_id,
+            'execution_time': round(time.perf_counter() - started, 3),
+        })
+
+    except FileNotFoundError as exc:
+        logger.warning('EDA execution failed: %s', exc)
+        return build_error_response(str(exc), status_code=404, code='SESSION_NOT_FOUND')
+    except ValueError as exc:
+        logger.warning('EDA validation error: %s', exc)
+        return build_error_response(str(exc), status_code=400, code='VALIDATION_ERROR')
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.error('Unexpected EDA execution error: %s', exc, exc_info=True)
+        return build_error_response('Internal server error', status_code=500, code='INTERNAL_ERROR')
+
+
+# ============================================================
+# Monte Carlo Sales Simulation V2
+# ============================================================
+
+@app.route('/api/v2/analysis/simulation', methods=['POST'])
+@require_api_key
+@limiter.limit("30 per minute")
+def analyze_simulation() -> Any:
+    """
+    売上シミュレーションAPI（店舗別日次分布からの期間合計の分位点バンド）
+
+    Request Body:
+    {
+        "session_id": "session_20251027_120922",
+        "metric": "Total_Sales",
+        "method": "bootstrap" | "fitted",
+        "distribution_type": "auto" | "gamma" | ...,   // fitted のみ
+        "days": 30,
+        "trials": 10000,
+        "percentiles": [5, 25, 50, 75, 95],
+        "stores": ["恵比寿"],                            // 省略時は全店舗
+        "start_date": "2024-01-01",
+        "end_date": "2024-12-31",
+        "filters": {"ranges": {"客数": {"min": 10}}, "categories": {"カテゴリ": ["食品"]}}   // 任意の追加条件
+    }
+    """
+    try:
+        payload = request.get_json(force=True)
+        session_id = validate_session_id(payload.get('session_id'))
+        metric = payload.get('metric') or 'Total_Sales'
+        options = validate_simulation_options(payload)
+        stores = validate_store_list(payload.get('stores'))
+        filters = validate_filters(payload.get('filters'))
+
+        df = get_dataframe_for_analysis(session_id)
+        analyzer = SalesSimulationAnalyzer(df, cache_key=(session_id, get_dataset_version(session_id)))
+        result = analyzer.analyze(
+            metric=metric,
+            stores=stores,
+            start_date=payload.get('start_date'),
+            end_date=payload.get('end_date'),
+            filters=filters,
+            **options
+        )
+        return jsonify(result)
+    except FileNotFoundError as exc:
+        logger.warning('Simulation failed: %s', exc)
+        return build_error_response(str(exc), status_code=404, code='SESSION_NOT_FOUND')
+    except ValueError as exc:
+        logger.warning('Simulation validation error: %s', exc)
+        return build_error_response(str(exc), status_code=400, code='VALIDATION_ERROR')
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.error('Unexpected simulation error: %s', exc, exc_info=True)
         return build_error_response('Internal server error', status_code=500, code='INTERNAL_ERROR')
 
 
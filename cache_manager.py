@@ -0,0 +1,65 @@
+"""Q-Storm Platform - In-memory analysis cache (session scoped LRU)"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+class AnalysisCache:
+    """スレッドセーフなLRUキャッシュ
+
+    キーの先頭要素は必ず session_id とし、アップロード時に
+    invalidate_session() でセッション単位の破棄ができるようにする。
+    """
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self._entries: 'OrderedDict[Tuple[Hashable, ...], Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[Hashable, ...]) -> Optional[Any]:
+        """キャッシュ取得（存在しない場合はNone）"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def set(self, key: Tuple[Hashable, ...], value: Any) -> None:
+        """キャッシュ保存（上限超過時は最も古いエントリを破棄）"""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: Tuple[Hashable, ...], compute: Callable[[], Any]) -> Any:
+        """キャッシュ済みならその値を、未計算なら compute() の結果を保存して返す"""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        value = compute()
+        self.set(key, value)
+        return value
+
+    def invalidate_session(self, session_id: str) -> int:
+        """指定セッションのエントリを全て破棄し、破棄件数を返す"""
+        with self._lock:
+            stale = [key for key in self._entries if key and key[0] == session_id]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def clear(self) -> None:
+        """全エントリ破棄"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
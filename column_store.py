@@ -0,0 +1,298 @@
+"""Q-Storm Platform - Memory-mapped NumPy column store per session
+
+セッションの各列を生の .npy 配列として uploads/<session_id>/columns/ に書き出し、
+np.load(mmap_mode='r') で開く。数値列はそのままの dtype、文字列等の列は
+整数コード＋ラベル（店舗列もこの形式）、行ごとの日時は datetime64[ns] の1配列にする。
+
+読み込みはページキャッシュ経由のゼロコピーで、同じファイルを開く全スレッド・全プロセスが
+物理メモリを共有する。ColumnStoreBackend は DuckDBBackend / ParquetStreamBackend と
+同じ集計インタフェースを持ち、DataFrame の生成・コピーなしで分析クラスに配列を渡す。
+"""
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+COLUMNS_DIR = 'columns'
+MANIFEST_NAME = 'manifest.json'
+DATES_FILE = '__dates__.npy'
+
+# 時間単位 → pandas の resample 頻度
+_TIME_UNIT_TO_FREQ = {'日': 'D', '週': 'W', '月': 'M', '年': 'Y'}
+
+
+def exists(directory: Path) -> bool:
+    return (Path(directory) / MANIFEST_NAME).exists()
+
+
+def write_column_store(df: pd.DataFrame, directory: Path, dates: Optional[pd.Series] = None) -> Dict[str, Any]:
+    """
+    DataFrame を列ごとの .npy に書き出す
+
+    Args:
+        dates: 行ごとの日時（prepare_datetime_index の結果。None の場合は日時配列なし）
+
+    Returns:
+        書き出したマニフェスト
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    columns = []
+    for position, name in enumerate(df.columns):
+        series = df[name]
+        entry = {'name': name, 'dtype': str(series.dtype), 'file': f'{position:04d}.npy'}
+        if pd.api.types.is_bool_dtype(series) or not (pd.api.types.is_numeric_dtype(series) or
+                                                       pd.api.types.is_datetime64_any_dtype(series)):
+            codes, uniques = pd.factorize(series, sort=_sortable(series))
+            entry.update({'kind': 'codes', 'labels': _json_labels(uniques)})
+            np.save(directory / entry['file'], codes.astype(np.int32))
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            entry['kind'] = 'datetime'
+            np.save(directory / entry['file'], _naive_datetimes(series))
+        else:
+            entry['kind'] = 'numeric'
+            # 拡張型（Int64 等）は欠測を NaN にした float で保存（mmap できるのは固定長 dtype のみ）
+            values = series.to_numpy() if isinstance(series.dtype, np.dtype) else \
+                series.to_numpy(dtype=float, na_value=np.nan)
+            np.save(directory / entry['file'], values)
+        columns.append(entry)
+    if dates is not None:
+        np.save(directory / DATES_FILE, _naive_datetimes(dates))
+
+    manifest = {'rows': len(df), 'has_dates': dates is not None, 'columns': columns}
+    (directory / MANIFEST_NAME).write_text(json.dumps(manifest, ensure_ascii=False), encoding='utf-8')
+    return manifest
+
+
+class ColumnStore:
+    """書き出し済みの列を mmap で開く（配列は初回アクセス時に開いて保持）"""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        manifest = json.loads((self.directory / MANIFEST_NAME).read_text(encoding='utf-8'))
+        self.rows: int = manifest['rows']
+        self.has_dates: bool = manifest['has_dates']
+        self.entries: Dict[str, Dict[str, Any]] = {entry['name']: entry for entry in manifest['columns']}
+        # 列名と型だけを持つ0行の DataFrame（列の自動検出を pandas 経路と共通化する）
+        self.schema = pd.DataFrame({name: pd.Series(dtype=_schema_dtype(entry['dtype']))
+                                    for name, entry in self.entries.items()})
+        self._arrays: Dict[str, np.ndarray] = {}
+
+    def array(self, name: str) -> np.ndarray:
+        """列の生配列（数値列は元の dtype、コード列は int32 コード）"""
+        if name not in self._arrays:
+            self._arrays[name] = np.load(self.directory / self.entries[name]['file'], mmap_mode='r')
+        return self._arrays[name]
+
+    def dates(self) -> np.ndarray:
+        if not self.has_dates:
+            raise ValueError('Datetime column not found in dataset')
+        if DATES_FILE not in self._arrays:
+            self._arrays[DATES_FILE] = np.load(self.directory / DATES_FILE, mmap_mode='r')
+        return self._arrays[DATES_FILE]
+
+    def numeric(self, name: str) -> np.ndarray:
+        """
+        数値としての値（数値列は元の dtype の mmap 配列をそのまま返す）
+
+        コード列はラベルを数値変換した float（変換できない値・欠測は NaN）。
+        """
+        entry = self.entries[name]
+        if entry['kind'] == 'numeric':
+            return self.array(name)
+        if entry['kind'] == 'datetime':
+            raise ValueError(f"Column '{name}' is not numeric")
+        values = np.append(pd.to_numeric(pd.Series(entry['labels'], dtype=object), errors='coerce')
+                           .to_numpy(dtype=float), np.nan)
+        # コード -1（欠測）は末尾の NaN を指す
+        return values[self.array(name)]
+
+    def codes(self, name: str) -> Tuple[np.ndarray, List[Any]]:
+        """行ごとのコードとラベル（数値列は値をその場でコード化）"""
+        entry = self.entries[name]
+        if entry['kind'] == 'codes':
+            return self.array(name), entry['labels']
+        codes, uniques = pd.factorize(np.asarray(self.array(name)), sort=True)
+        return codes, uniques.tolist()
+
+
+class ColumnStoreBackend:
+    """
+    mmap 列ストアに対する集計（DuckDBBackend と同じインタフェース）
+
+    start_date / end_date（'YYYY-MM-DD'）を指定すると、以降の全集計にその期間条件が付く。
+    """
+
+    def __init__(self, store: ColumnStore, start_date: Optional[str] = None, end_date: Optional[str] = None):
+        self.store = store
+        self.schema: pd.DataFrame = store.schema
+        self.columns: List[str] = list(store.entries)
+        self._date_range = (start_date, end_date)
+
+    def close(self) -> None:
+        """DuckDBBackend と同じインタフェース（mmap はセッション単位で共有するため閉じない）"""
+
+    def resample_sum(self, metric: str, time_unit: str, store_column: Optional[str] = None,
+                     store: Optional[str] = None) -> pd.Series:
+        """Series.resample(freq).sum() と同じ期間軸（期間末ラベル、欠測期間は0）の期間合計"""
+        self._require_columns([metric])
+        mask = self._mask(store_column, store)
+        values = _select(self.store.numeric(metric), mask)
+        dates = _select(self.store.dates(), mask)
+        valid = ~np.isnat(dates)
+        if values.dtype.kind == 'f':
+            valid &= ~np.isnan(values)
+        if not valid.any():
+            raise ValueError('Metric column contains no valid numeric data')
+        series = pd.Series(values[valid].astype(float, copy=False), index=pd.DatetimeIndex(dates[valid])).sort_index()
+        return series.resample(_TIME_UNIT_TO_FREQ[time_unit]).sum()
+
+    def value_summary(self, metric: str, store_column: Optional[str] = None,
+                      store: Optional[str] = None,
+                      quantiles: Sequence[float] = (0.05, 0.25, 0.5, 0.75, 0.95)) -> Dict[str, Any]:
+        """
+        有限値の件数・範囲・平均・標本標準偏差・分位点（線形補間）・歪度/尖度（scipy の既定と同じ母集団モーメント）
+        """
+        values = np.sort(self._finite_values(metric, store_column, store))
+        count = values.size
+        if not count:
+            raise ValueError('Metric column contains no valid numeric data')
+        mean = values.mean()
+        deviation = values - mean
+        m2 = float(np.mean(deviation ** 2))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            skewness = float(np.float64(np.mean(deviation ** 3)) / np.float64(m2) ** 1.5)
+            kurtosis = float(np.float64(np.mean(deviation ** 4)) / np.float64(m2) ** 2 - 3.0)
+        points = {}
+        for q in quantiles:
+            position = q * (count - 1)
+            lower = int(np.floor(position))
+            upper = min(lower + 1, count - 1)
+            weight = position - lower
+            points[q] = float(values[lower] * (1 - weight) + values[upper] * weight)
+        return {
+            'count': int(count),
+            'min': float(values[0]),
+            'max': float(values[-1]),
+            'mean': float(mean),
+            'std': float(np.std(values, ddof=1)) if count > 1 else 0.0,
+            'quantiles': points,
+            'skewness': skewness,
+            'kurtosis': kurtosis,
+        }
+
+    def histogram_counts(self, metric: str, bin_edges: np.ndarray, store_column: Optional[str] = None,
+                         store: Optional[str] = None) -> np.ndarray:
+        """任意のビン境界に対する度数（np.histogram と同じ半開区間、最終ビンのみ閉区間）"""
+        return np.histogram(self._finite_values(metric, store_column, store),
+                            bins=np.asarray(bin_edges, dtype=float))[0]
+
+    def sample_values(self, metric: str, max_samples: int, seed: int, store_column: Optional[str] = None,
+                      store: Optional[str] = None) -> Tuple[np.ndarray, int]:
+        """
+        正規性検定用の値（pandas 経路と同じく、昇順の値からシード固定の非復元抽出）
+
+        Returns:
+            (値, 有限値の総件数)
+        """
+        values = np.sort(self._finite_values(metric, store_column, store))
+        if values.size <= max_samples:
+            return values, int(values.size)
+        sample = np.random.default_rng(seed).choice(values, size=max_samples, replace=False)
+        return sample, int(values.size)
+
+    def column_totals(self, columns: Sequence[str], store_column: Optional[str] = None,
+                      store: Optional[str] = None) -> np.ndarray:
+        """各列の合計（NaN/inf は0）。存在しない列は呼び出し側で除外しておく"""
+        mask = self._mask(store_column, store)
+        return np.array([float(_finite(_select(self.store.numeric(column), mask)).sum()) for column in columns])
+
+    def group_totals(self, key_column: str, metric: str, store_column: Optional[str] = None,
+                     store: Optional[str] = None) -> Tuple[List[Any], np.ndarray]:
+        """キー列ごとの metric 合計（キーの昇順。ParetoEngine.from_codes と同じ並び）"""
+        self._require_columns([key_column, metric])
+        mask = self._mask(store_column, store)
+        codes, labels = self.store.codes(key_column)
+        codes = _select(codes, mask)
+        values = _select(self.store.numeric(metric), mask)
+        valid = codes >= 0
+        # bincount は重みを float64 で読むため、整数列は変換せずに渡す
+        weights = (np.where(np.isfinite(values), values, 0.0) if values.dtype.kind == 'f' else values)[valid]
+        totals = np.bincount(codes[valid], weights=weights, minlength=len(labels))
+        present = np.bincount(codes[valid], minlength=len(labels)) > 0
+        return [label for label, keep in zip(labels, present) if keep], totals[present]
+
+    def row_count(self, store_column: Optional[str] = None, store: Optional[str] = None) -> int:
+        mask = self._mask(store_column, store)
+        return self.store.rows if mask is None else int(mask.sum())
+
+    def _finite_values(self, metric: str, store_column: Optional[str], store: Optional[str]) -> np.ndarray:
+        self._require_columns([metric])
+        return _finite(_select(self.store.numeric(metric), self._mask(store_column, store)))
+
+    def _mask(self, store_column: Optional[str], store: Optional[str]) -> Optional[np.ndarray]:
+        """期間・店舗条件の行マスク（条件がない場合は None = 全行、配列は選択せずそのまま使う）"""
+        start_date, end_date = self._date_range
+        if not (start_date or end_date or store is not None):
+            return None
+        mask = np.ones(self.store.rows, dtype=bool)
+        if start_date or end_date:
+            dates = self.store.dates()
+            if start_date:
+                mask &= dates >= np.datetime64(start_date, 'ns')
+            if end_date:
+                mask &= dates < np.datetime64(end_date, 'ns') + np.timedelta64(1, 'D')
+        if store is not None:
+            codes, labels = self.store.codes(store_column)
+            wanted = [code for code, label in enumerate(labels) if str(label) == store]
+            mask &= np.isin(codes, wanted)
+        return mask
+
+    def _require_columns(self, columns: Sequence[str]) -> None:
+        for column in columns:
+            if column not in self.store.entries:
+                raise ValueError(f"Metric column '{column}' not found in dataset")
+
+
+def _select(values: np.ndarray, mask: Optional[np.ndarray]) -> np.ndarray:
+    """マスクがない場合は mmap 配列をコピーせずそのまま返す"""
+    return values if mask is None else values[mask]
+
+
+def _finite(values: np.ndarray) -> np.ndarray:
+    """有限値のみ（整数列は NaN/inf を持たないためそのまま）"""
+    return values[np.isfinite(values)] if values.dtype.kind == 'f' else values
+
+
+def _sortable(series: pd.Series) -> bool:
+    try:
+        pd.Index(series.dropna().unique()).sort_values()
+    except TypeError:
+        return False
+    return True
+
+
+def _json_labels(uniques: Any) -> List[Any]:
+    labels = pd.Index(uniques).tolist()
+    try:
+        json.dumps(labels)
+    except (TypeError, ValueError):
+        labels = [str(label) for label in labels]
+    return labels
+
+
+def _naive_datetimes(values: Any) -> np.ndarray:
+    index = pd.DatetimeIndex(values)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.to_numpy(dtype='datetime64[ns]')
+
+
+def _schema_dtype(dtype: str) -> Any:
+    try:
+        return np.dtype(dtype)
+    except TypeError:
+        # category / 拡張型は object として扱う（列の自動検出は数値型かどうかのみを見る）
+        return object
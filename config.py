@@ -26,6 +26,95 @@ VALID_METRICS = [
 # Supported time aggregation units
 VALID_TIME_UNITS = ['日', '週', '月', '年']
 
+# Analysis cache (session scoped LRU, see SYSTEM_ARCHITECTURE_SPECIFICATION 3.2.2)
+ANALYSIS_CACHE_SIZE = int(os.environ.get('ANALYSIS_CACHE_SIZE', 128))
+# Row filter column arrays / masks (session scoped LRU, separate so masks never evict results)
+FILTER_CACHE_SIZE = int(os.environ.get('FILTER_CACHE_SIZE', 256))
+
+# Analysis backend for session datasets: 'pandas' (default), 'duckdb' (optional dependency),
+# 'stream' or 'columns'. duckdb runs time series / histogram / Pareto aggregations out-of-core and
+# multithreaded; stream iterates Parquet row groups and combines partial aggregates (peak memory ~ one
+# row group); columns reads the session's memory-mapped .npy column store without building a DataFrame.
+ANALYSIS_BACKEND = os.environ.get('ANALYSIS_BACKEND', 'pandas')
+DUCKDB_THREADS = int(os.environ.get('DUCKDB_THREADS', os.cpu_count() or 1))
+# 例: '1GB'（空文字は DuckDB の既定）
+DUCKDB_MEMORY_LIMIT = os.environ.get('DUCKDB_MEMORY_LIMIT', '')
+
+# Write uploaded session datasets to disk partitioned by store / month (Parquet + manifest)
+PARTITION_SESSION_DATASETS = os.environ.get('PARTITION_SESSION_DATASETS', 'true').lower() == 'true'
+PARTITION_ROW_GROUP_SIZE = int(os.environ.get('PARTITION_ROW_GROUP_SIZE', 65536))
+# Write uploaded session datasets as memory-mappable .npy columns (uploads/<session_id>/columns/)
+COLUMN_STORE_ENABLED = os.environ.get('COLUMN_STORE_ENABLED', 'true').lower() == 'true'
+
+# Progressive mode ("progressive": true): answer first from a per-store stratified sample kept at ingest
+# (at most PROGRESSIVE_SAMPLE_PER_STORE rows per store), then compute the exact result in background workers
+PROGRESSIVE_SAMPLE_PER_STORE = int(os.environ.get('PROGRESSIVE_SAMPLE_PER_STORE', 2000))
+PROGRESSIVE_CONFIDENCE_LEVEL = float(os.environ.get('PROGRESSIVE_CONFIDENCE_LEVEL', 0.95))
+PROGRESSIVE_WORKERS = int(os.environ.get('PROGRESSIVE_WORKERS', 2))
+# Stratified samples kept in memory (LRU over sessions; evicted samples are reopened from uploads/<id>/sample/)
+PROGRESSIVE_SAMPLE_CACHE_SIZE = int(os.environ.get('PROGRESSIVE_SAMPLE_CACHE_SIZE', 32))
+# Exact results kept for fetching by result id (oldest evicted first)
+PROGRESSIVE_RESULT_LIMIT = int(os.environ.get('PROGRESSIVE_RESULT_LIMIT', 256))
+
+# Multi-session analysis ("session_ids": [...]): upper bound on the sessions combined in one request
+MAX_UNION_SESSIONS = int(os.environ.get('MAX_UNION_SESSIONS', 24))
+
+# Seed for deterministic subsampling / simulation
+ANALYSIS_RANDOM_SEED = 42
+
+# Worker processes for CPU-bound fits (1 = sequential)
+ANALYSIS_MAX_WORKERS = int(os.environ.get('ANALYSIS_MAX_WORKERS', min(4, os.cpu_count() or 1)))
+
+# Normality test configuration (histogram statistics)
+VALID_NORMALITY_METHODS = ['shapiro', 'anderson', 'dagostino']
+NORMALITY_MAX_SAMPLES = int(os.environ.get('NORMALITY_MAX_SAMPLES', 5000))
+NORMALITY_RANDOM_SEED = ANALYSIS_RANDOM_SEED
+
+# Probability distribution fitting (/api/v2/analysis/probability)
+VALID_DISTRIBUTIONS = ['normal', 'lognormal', 'gamma', 'weibull', 'exponential', 'beta']
+PROBABILITY_MAX_SAMPLES = int(os.environ.get('PROBABILITY_MAX_SAMPLES', 10000))
+
+# Rolling statistics for time series (window / EWMA span in periods)
+TIMESERIES_ROLLING_WINDOW = 3
+TIMESERIES_MAX_WINDOW = 365
+
+# Batch forecasting (/api/v1/analysis/timeseries/forecast), horizon in periods
+FORECAST_DEFAULT_HORIZON = 12
+FORECAST_MAX_HORIZON = 365
+
+# Period comparison (/api/v1/analysis/comparison)
+VALID_COMPARISON_MODES = ['yoy', 'mom', 'same_weekday_yoy', 'store']
+
+# Store x period heatmap (/api/v1/analysis/heatmap)
+VALID_HEATMAP_AXES = ['month', 'weekday']
+VALID_AGGREGATIONS = ['sum', 'mean', 'count']
+
+# Density-binned scatter (/api/v1/analysis/scatter)
+VALID_SCATTER_MODES = ['auto', 'points', 'rect', 'hex']
+SCATTER_MAX_POINTS = int(os.environ.get('SCATTER_MAX_POINTS', 5000))
+
+# Store clustering (/api/v1/analysis/clustering)
+CLUSTER_MAX_K = 20
+CLUSTER_N_INIT = 5
+
+# Monte Carlo sales simulation (/api/v2/analysis/simulation)
+VALID_SIMULATION_METHODS = ['bootstrap', 'fitted']
+SIMULATION_DEFAULT_TRIALS = 10000
+SIMULATION_MAX_TRIALS = 100000
+SIMULATION_MAX_DAYS = 366
+SIMULATION_PERCENTILES = [5, 25, 50, 75, 95]
+
+# Declarative group-by query (/api/v1/analysis/query); time units come from VALID_TIME_UNITS
+VALID_QUERY_DIMENSIONS = ['store', 'category']
+VALID_QUERY_AGGREGATIONS = ['count', 'sum', 'mean', 'min', 'max', 'median']
+QUERY_MAX_METRICS = 20
+
+# Anomaly scan (/api/v1/analysis/anomalies)
+VALID_ANOMALY_METHODS = ['robust_z', 'iqr', 'seasonal']
+# 曜日パターンのある日次売上では季節残差のみが既定（robust_z/iqr は週末を過検出しやすい）
+ANOMALY_DEFAULT_METHODS = ['seasonal']
+ANOMALY_Z_THRESHOLD = 3.5
+
 
 def validate_env_config():
     """
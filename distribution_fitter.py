@@ -0,0 +1,157 @@
+"""Q-Storm Platform - Probability distribution fitting (process pool workers)
+
+ワーカープロセスから import されるため、Flask アプリや DB に依存しない。
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from scipy import stats
+
+logger = logging.getLogger(__name__)
+
+# 分布名 → scipy.stats の分布
+DISTRIBUTIONS = {
+    'normal': stats.norm,
+    'lognormal': stats.lognorm,
+    'gamma': stats.gamma,
+    'weibull': stats.weibull_min,
+    'exponential': stats.expon,
+    'beta': stats.beta,
+}
+
+# 正の値のみを台とする分布（loc=0 に固定して推定）
+POSITIVE_SUPPORT = {'lognormal', 'gamma', 'weibull', 'exponential'}
+
+DISTRIBUTION_LABELS = {
+    'normal': '正規分布',
+    'lognormal': '対数正規分布',
+    'gamma': 'ガンマ分布',
+    'weibull': 'ワイブル分布',
+    'exponential': '指数分布',
+    'beta': 'ベータ分布',
+}
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+
+
+def subsample(values: np.ndarray, max_samples: int, seed: int) -> np.ndarray:
+    """max_samples を超える場合はシード固定の非復元抽出で縮小"""
+    if values.size <= max_samples:
+        return values
+    rng = np.random.default_rng(seed)
+    return rng.choice(values, size=max_samples, replace=False)
+
+
+def fit_distribution(name: str, values: np.ndarray) -> Dict[str, Any]:
+    """
+    単一分布の最尤推定と適合度指標（AIC/BIC/KS検定）
+
+    Returns:
+        dict: distribution, parameters, log_likelihood, aic, bic, ks_statistic, p_value
+              （推定不能な場合は error のみ）
+    """
+    dist = DISTRIBUTIONS[name]
+    n = values.size
+    try:
+        if name in POSITIVE_SUPPORT:
+            if np.min(values) <= 0:
+                return {'distribution': name, 'error': '正の値のみ対応の分布です'}
+            params = dist.fit(values, floc=0)
+            free_params = len(params) - 1
+        elif name == 'beta':
+            # 台 [lo, hi] を観測範囲よりわずかに広げて固定し、形状パラメータのみ推定
+            spread = np.ptp(values)
+            if spread == 0:
+                return {'distribution': name, 'error': '値がすべて同一です'}
+            lo = np.min(values) - spread * 1e-3
+            hi = np.max(values) + spread * 1e-3
+            params = dist.fit(values, floc=lo, fscale=hi - lo)
+            free_params = len(params)
+        else:
+            params = dist.fit(values)
+            free_params = len(params)
+
+        log_likelihood = float(np.sum(dist.logpdf(values, *params)))
+        if not np.isfinite(log_likelihood):
+            return {'distribution': name, 'error': '尤度が計算できません'}
+        ks_statistic, p_value = stats.kstest(values, dist.cdf, args=params)
+    except Exception as exc:  # pylint: disable=broad-except
+        return {'distribution': name, 'error': str(exc)}
+
+    return {
+        'distribution': name,
+        'parameters': _named_parameters(dist, params),
+        'log_likelihood': log_likelihood,
+        'aic': float(2 * free_params - 2 * log_likelihood),
+        'bic': float(free_params * np.log(n) - 2 * log_likelihood),
+        'ks_statistic': float(ks_statistic),
+        'p_value': float(p_value),
+    }
+
+
+def frozen_distribution(fit: Dict[str, Any]) -> Any:
+    """fit_distribution の結果から scipy.stats の frozen 分布を復元"""
+    dist = DISTRIBUTIONS[fit['distribution']]
+    parameters = fit['parameters']
+    return dist(*[parameters[name] for name in _shape_names(dist)],
+                loc=parameters['location'], scale=parameters['scale'])
+
+
+def _shape_names(dist: Any) -> List[str]:
+    shape_names = [name.strip() for name in dist.shapes.split(',')] if dist.shapes else []
+    return ['shape'] if len(shape_names) == 1 else shape_names
+
+
+def _named_parameters(dist: Any, params: Sequence[float]) -> Dict[str, float]:
+    named = {shape: float(value) for shape, value in zip(_shape_names(dist), params)}
+    named['location'] = float(params[-2])
+    named['scale'] = float(params[-1])
+    return named
+
+
+def get_process_pool(max_workers: int) -> Executor:
+    """
+    共有プロセスプール（初回呼び出し時に生成）
+
+    Flask のワーカースレッド・ロックを抱えたプロセスを fork しないよう forkserver（非対応環境は spawn）で起動する。
+    """
+    global _executor  # pylint: disable=global-statement
+    with _executor_lock:
+        if _executor is None:
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _executor = ProcessPoolExecutor(max_workers=max_workers,
+                                            mp_context=multiprocessing.get_context(method))
+        return _executor
+
+
+def reset_process_pool() -> None:
+    global _executor  # pylint: disable=global-statement
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def fit_candidates(values: np.ndarray, names: Sequence[str], max_workers: int = 1) -> List[Dict[str, Any]]:
+    """
+    候補分布を並列に推定（プロセスプールで GIL を回避）
+
+    プロセスプールが利用できない環境では逐次実行にフォールバックする。
+    """
+    if max_workers <= 1 or len(names) <= 1:
+        return [fit_distribution(name, values) for name in names]
+
+    try:
+        executor = get_process_pool(max_workers)
+        futures = [executor.submit(fit_distribution, name, values) for name in names]
+        return [future.result() for future in futures]
+    except (BrokenProcessPool, OSError, RuntimeError) as exc:
+        logger.warning('Process pool unavailable (%s). Fitting distributions sequentially.', exc)
+        reset_process_pool()
+        return [fit_distribution(name, values) for name in names]
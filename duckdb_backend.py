@@ -0,0 +1,268 @@
+"""Q-Storm Platform - Optional DuckDB backend for Parquet session datasets
+
+セッションの Parquet ファイルを DuckDB のビューとして登録し、時系列の期間集計・
+ヒストグラムのビン度数・パレートのカテゴリ合計を SQL で実行する。
+DuckDB はファイルを列単位・行グループ単位で読み、マルチスレッドかつメモリ上限を
+超える分はディスクへ退避して処理するため、DataFrame 全体をメモリに載せない。
+
+duckdb は任意依存。未インストールの場合は available() が False を返し、
+呼び出し側は従来の pandas 実装を使う。集計結果は pandas 実装と一致させる。
+"""
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import duckdb  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    duckdb = None  # type: ignore
+
+# prepare_datetime_index と同じ優先順位の日付列
+DATE_COLUMNS = ['営業日付', 'Date', 'date']
+
+# 時間単位 → DuckDB date_trunc の単位 / pandas の期間・resample 頻度
+_TIME_UNITS = {
+    '日': ('day', 'D', 'D'),
+    '週': ('week', 'W-SUN', 'W'),
+    '月': ('month', 'M', 'M'),
+    '年': ('year', 'Y', 'Y'),
+}
+
+
+def available() -> bool:
+    return duckdb is not None
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _quote_literal(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _finite(expression: str) -> str:
+    """NaN/inf/NULL を 0 とする数値式（pareto_engine.numeric_matrix と同じ扱い）"""
+    return f'COALESCE(CASE WHEN isfinite({expression}) THEN {expression} END, 0)'
+
+
+class DuckDBBackend:
+    """
+    Parquet ファイル群に対する集計クエリ
+
+    start_date / end_date（'YYYY-MM-DD'）を指定すると、以降の全クエリにその期間条件が付く
+    （pandas 経路でエンドポイントが日付フィルタ後の DataFrame を渡すのと同じ位置づけ）。
+    """
+
+    def __init__(self, paths: Sequence[Path], threads: Optional[int] = None,
+                 memory_limit: Optional[str] = None, start_date: Optional[str] = None,
+                 end_date: Optional[str] = None):
+        if duckdb is None:
+            raise RuntimeError('duckdb is not installed')
+        self.connection = duckdb.connect(database=':memory:')
+        if threads:
+            self.connection.execute(f'SET threads TO {int(threads)}')
+        if memory_limit:
+            self.connection.execute(f'SET memory_limit = {_quote_literal(memory_limit)}')
+        files = ', '.join(_quote_literal(str(path)) for path in paths)
+        self.connection.execute(f'CREATE VIEW dataset AS SELECT * FROM read_parquet([{files}])')
+        # 列名と型だけを持つ0行の DataFrame（列の自動検出を pandas 経路と共通化する）
+        self.schema: pd.DataFrame = self.connection.execute('SELECT * FROM dataset LIMIT 0').df()
+        self.columns: List[str] = list(self.schema.columns)
+        self._date_expression = self._resolve_date_expression()
+        self._date_range = (start_date, end_date)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    # ------------------------------------------------------------------
+    # 時系列
+    # ------------------------------------------------------------------
+
+    def resample_sum(self, metric: str, time_unit: str, store_column: Optional[str] = None,
+                     store: Optional[str] = None) -> pd.Series:
+        """
+        Series.resample(freq).sum() と同じ期間軸（期間末ラベル、欠測期間は0）の期間合計
+        """
+        self._require_columns([metric])
+        trunc_unit, period_freq, resample_freq = _TIME_UNITS[time_unit]
+        where, params = self._where(store_column, store)
+        value = f'TRY_CAST({quote_identifier(metric)} AS DOUBLE)'
+        rows = self.connection.execute(
+            f'''
+            SELECT date_trunc('{trunc_unit}', d) AS period, SUM(v) AS total
+            FROM (SELECT {self._date_sql()} AS d, {value} AS v FROM dataset WHERE {where})
+            WHERE d IS NOT NULL AND v IS NOT NULL AND NOT isnan(v)
+            GROUP BY period ORDER BY period
+            ''', params).fetchall()
+        if not rows:
+            raise ValueError('Metric column contains no valid numeric data')
+
+        starts = pd.DatetimeIndex([row[0] for row in rows])
+        labels = pd.PeriodIndex(starts, freq=period_freq).end_time.normalize()
+        totals = pd.Series([float(row[1]) for row in rows], index=labels)
+        full_index = pd.date_range(labels[0], labels[-1], freq=resample_freq)
+        return totals.reindex(full_index, fill_value=0.0)
+
+    # ------------------------------------------------------------------
+    # ヒストグラム
+    # ------------------------------------------------------------------
+
+    def value_summary(self, metric: str, store_column: Optional[str] = None,
+                      store: Optional[str] = None,
+                      quantiles: Sequence[float] = (0.05, 0.25, 0.5, 0.75, 0.95)) -> Dict[str, Any]:
+        """
+        有限値の件数・範囲・平均・標本標準偏差・分位点（線形補間）・歪度/尖度（scipy の既定と同じ母集団モーメント）
+        """
+        source, params = self._finite_values(metric, store_column, store)
+        count, minimum, maximum, mean, std, points = self.connection.execute(
+            f'''
+            SELECT COUNT(*), MIN(x), MAX(x), AVG(x), STDDEV_SAMP(x),
+                   quantile_cont(x, [{', '.join(repr(float(q)) for q in quantiles)}])
+            FROM ({source})
+            ''', params).fetchone()
+        if not count:
+            raise ValueError('Metric column contains no valid numeric data')
+
+        m2, m3, m4 = self.connection.execute(
+            f'SELECT AVG(POWER(x - ?, 2)), AVG(POWER(x - ?, 3)), AVG(POWER(x - ?, 4)) FROM ({source})',
+            [mean, mean, mean, *params]).fetchone()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            skewness = float(np.float64(m3) / np.float64(m2) ** 1.5)
+            kurtosis = float(np.float64(m4) / np.float64(m2) ** 2 - 3.0)
+        return {
+            'count': int(count),
+            'min': float(minimum),
+            'max': float(maximum),
+            'mean': float(mean),
+            'std': float(std) if count > 1 else 0.0,
+            'quantiles': dict(zip(quantiles, (float(p) for p in points))),
+            'skewness': skewness,
+            'kurtosis': kurtosis,
+        }
+
+    def histogram_counts(self, metric: str, bin_edges: np.ndarray, store_column: Optional[str] = None,
+                         store: Optional[str] = None) -> np.ndarray:
+        """
+        任意のビン境界に対する度数（np.histogram と同じ半開区間、最終ビンのみ閉区間）
+
+        ビン番号を等幅の割り算で求め、np.histogram と同じく境界値との比較で1つずれを補正する。
+        """
+        bins = len(bin_edges) - 1
+        first, last = float(bin_edges[0]), float(bin_edges[-1])
+        source, params = self._finite_values(metric, store_column, store)
+        rows = self.connection.execute(
+            f'''
+            WITH raw AS (
+                SELECT x, LEAST(GREATEST(CAST(FLOOR((x - ?) * ?) AS BIGINT), 0), {bins - 1}) AS i,
+                       CAST(? AS DOUBLE[]) AS edges
+                FROM ({source}) WHERE x >= ? AND x <= ?
+            )
+            SELECT i - CAST(x < edges[i + 1] AS BIGINT)
+                     + CAST(x >= edges[i + 2] AND i < {bins - 1} AS BIGINT) AS bin, COUNT(*)
+            FROM raw GROUP BY bin
+            ''', [first, bins / (last - first), [float(edge) for edge in bin_edges], *params, first, last]).fetchall()
+        counts = np.zeros(bins, dtype=np.int64)
+        for index, count in rows:
+            counts[int(index)] = int(count)
+        return counts
+
+    def sample_values(self, metric: str, max_samples: int, seed: int, store_column: Optional[str] = None,
+                      store: Optional[str] = None) -> Tuple[np.ndarray, int]:
+        """
+        正規性検定用の値（件数が max_samples 以下なら全件、超える場合はシード固定のリザーバ抽出）
+
+        Returns:
+            (値, 有限値の総件数)
+        """
+        source, params = self._finite_values(metric, store_column, store)
+        total = self.connection.execute(f'SELECT COUNT(*) FROM ({source})', params).fetchone()[0]
+        sample = '' if total <= max_samples else \
+            f' USING SAMPLE reservoir({int(max_samples)} ROWS) REPEATABLE ({int(seed)})'
+        values = self.connection.execute(f'SELECT x FROM ({source}){sample}', params).fetchnumpy()['x']
+        return np.asarray(values, dtype=float), int(total)
+
+    # ------------------------------------------------------------------
+    # パレート
+    # ------------------------------------------------------------------
+
+    def column_totals(self, columns: Sequence[str], store_column: Optional[str] = None,
+                      store: Optional[str] = None) -> np.ndarray:
+        """各列の合計（NaN/inf は0）。存在しない列は呼び出し側で除外しておく"""
+        if not columns:
+            return np.zeros(0)
+        where, params = self._where(store_column, store)
+        sums = ', '.join(f'SUM({_finite(f"TRY_CAST({quote_identifier(col)} AS DOUBLE)")})' for col in columns)
+        row = self.connection.execute(f'SELECT {sums} FROM dataset WHERE {where}', params).fetchone()
+        return np.array([float(value or 0.0) for value in row])
+
+    def group_totals(self, key_column: str, metric: str, store_column: Optional[str] = None,
+                     store: Optional[str] = None) -> Tuple[List[Any], np.ndarray]:
+        """キー列ごとの metric 合計（キーの昇順。ParetoEngine.from_codes と同じ並び）"""
+        self._require_columns([key_column, metric])
+        where, params = self._where(store_column, store)
+        key = quote_identifier(key_column)
+        value = _finite(f'TRY_CAST({quote_identifier(metric)} AS DOUBLE)')
+        rows = self.connection.execute(
+            f'SELECT {key} AS k, SUM({value}) FROM dataset WHERE {where} AND {key} IS NOT NULL '
+            f'GROUP BY k ORDER BY k', params).fetchall()
+        return [row[0] for row in rows], np.array([float(row[1]) for row in rows])
+
+    def row_count(self, store_column: Optional[str] = None, store: Optional[str] = None) -> int:
+        where, params = self._where(store_column, store)
+        return int(self.connection.execute(f'SELECT COUNT(*) FROM dataset WHERE {where}', params).fetchone()[0])
+
+    # ------------------------------------------------------------------
+    # 内部ヘルパ
+    # ------------------------------------------------------------------
+
+    def _finite_values(self, metric: str, store_column: Optional[str], store: Optional[str]):
+        self._require_columns([metric])
+        where, params = self._where(store_column, store)
+        value = f'TRY_CAST({quote_identifier(metric)} AS DOUBLE)'
+        return f'SELECT {value} AS x FROM dataset WHERE {where} AND isfinite({value})', params
+
+    def _where(self, store_column: Optional[str], store: Optional[str]) -> Tuple[str, List[Any]]:
+        clauses, params = ['TRUE'], []
+        start_date, end_date = self._date_range
+        if start_date or end_date:
+            if self._date_expression is None:
+                raise ValueError('Datetime column not found in dataset')
+            if start_date:
+                clauses.append(f'{self._date_expression} >= CAST(? AS TIMESTAMP)')
+                params.append(start_date)
+            if end_date:
+                clauses.append(f"{self._date_expression} < CAST(? AS TIMESTAMP) + INTERVAL 1 DAY")
+                params.append(end_date)
+        if store is not None:
+            clauses.append(f'CAST({quote_identifier(store_column)} AS VARCHAR) = ?')
+            params.append(store)
+        return ' AND '.join(clauses), params
+
+    def _date_sql(self) -> str:
+        if self._date_expression is None:
+            raise ValueError('Datetime column not found in dataset')
+        return self._date_expression
+
+    def _resolve_date_expression(self) -> Optional[str]:
+        for column in DATE_COLUMNS:
+            if column in self.columns:
+                expression = f'TRY_CAST({quote_identifier(column)} AS TIMESTAMP)'
+                if pd.api.types.is_datetime64_dtype(self.schema[column]):
+                    # timestamp 型の列はそのまま比較し、行グループの min/max 統計による読み飛ばしを効かせる
+                    expression = quote_identifier(column)
+                parsed = self.connection.execute(
+                    f'SELECT COUNT({expression}) FROM dataset').fetchone()[0]
+                if parsed:
+                    return expression
+        if {'年', '月', '日'}.issubset(self.columns):
+            parts = ', '.join(f'CAST({quote_identifier(col)} AS INTEGER)' for col in ('年', '月', '日'))
+            return f'CAST(make_date({parts}) AS TIMESTAMP)'
+        return None
+
+    def _require_columns(self, columns: Sequence[str]) -> None:
+        for column in columns:
+            if column not in self.columns:
+                raise ValueError(f"Metric column '{column}' not found in dataset")
@@ -0,0 +1,191 @@
+"""Q-Storm Platform - Single-pass EDA profiling engine"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# 数値列の分位点
+QUANTILES = (0.0, 0.05, 0.25, 0.5, 0.75, 0.95, 1.0)
+
+# 高相関ペアとみなす相関係数の閾値（|r|）
+HIGH_CORRELATION_THRESHOLD = 0.7
+
+# 並列処理する数値列ブロックの最小列数
+_MIN_BLOCK_COLUMNS = 4
+
+
+def _finite_or_none(value: float) -> Optional[float]:
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def _profile_numeric_block(matrix: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    数値列ブロック (行×列) の列別統計量を列方向のベクトル演算で一括算出
+
+    NaN/inf は欠損として除外。列ごとの1回のソートから
+    分位点・最小/最大・ユニーク数を位置参照で求める。
+    """
+    is_nan = np.isnan(matrix)
+    is_inf = np.isinf(matrix)
+    finite = ~(is_nan | is_inf)
+    count = finite.sum(axis=0)
+    safe_count = np.where(count > 0, count, 1)
+
+    zeroed = np.where(finite, matrix, 0.0)
+    mean = zeroed.sum(axis=0) / safe_count
+    deviation = np.where(finite, matrix - mean, 0.0)
+    m2 = (deviation ** 2).sum(axis=0)
+    m3 = (deviation ** 3).sum(axis=0)
+    m4 = (deviation ** 4).sum(axis=0)
+    variance = m2 / np.where(count > 1, count - 1, 1)
+    population_m2 = m2 / safe_count
+    with np.errstate(divide='ignore', invalid='ignore'):
+        skewness = (m3 / safe_count) / population_m2 ** 1.5
+        kurtosis = (m4 / safe_count) / population_m2 ** 2 - 3.0
+
+    # 非有限値は +inf としてソート末尾に寄せる
+    ordered = np.sort(np.where(finite, matrix, np.inf), axis=0)
+    columns = np.arange(matrix.shape[1])
+    quantiles = np.full((len(QUANTILES), matrix.shape[1]), np.nan)
+    for row, q in enumerate(QUANTILES):
+        position = q * (count - 1)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, count - 1)
+        weight = position - lower
+        valid = count > 0
+        lo = ordered[np.clip(lower, 0, None), columns]
+        hi = ordered[np.clip(upper, 0, None), columns]
+        quantiles[row] = np.where(valid, lo * (1 - weight) + hi * weight, np.nan)
+
+    # ユニーク数: ソート済み列の隣接差分（有限値の範囲のみ）
+    changes = np.diff(ordered, axis=0) != 0
+    within = np.arange(1, matrix.shape[0])[:, None] < count[None, :]
+    unique = np.where(count > 0, 1 + (changes & within).sum(axis=0), 0)
+
+    return {
+        'count': count,
+        'null_count': is_nan.sum(axis=0),
+        'inf_count': is_inf.sum(axis=0),
+        'mean': np.where(count > 0, mean, np.nan),
+        'std': np.where(count > 1, np.sqrt(variance), np.nan),
+        'skewness': skewness,
+        'kurtosis': kurtosis,
+        'quantiles': quantiles,
+        'unique': unique,
+    }
+
+
+def pairwise_correlation(matrix: np.ndarray) -> np.ndarray:
+    """
+    欠損を除いたペアごとの Pearson 相関（pandas.DataFrame.corr と同等）
+
+    有効値マスクとの行列積で全ペアの件数・和・二乗和・積和を一度に求める。
+    """
+    finite = np.isfinite(matrix)
+    mask = finite.astype(float)
+    values = np.where(finite, matrix, 0.0)
+    pair_count = mask.T @ mask
+    sum_x = values.T @ mask
+    sum_xx = (values ** 2).T @ mask
+    sum_xy = values.T @ values
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = pair_count * sum_xy - sum_x * sum_x.T
+        variance = pair_count * sum_xx - sum_x ** 2
+        correlation = covariance / np.sqrt(variance * variance.T)
+    correlation[pair_count < 2] = np.nan
+    return np.clip(correlation, -1.0, 1.0)
+
+
+def _profile_categorical(series: pd.Series, top_k: int) -> Dict[str, Any]:
+    codes, uniques = pd.factorize(series)
+    valid = codes >= 0
+    counts = np.bincount(codes[valid], minlength=len(uniques))
+    top = np.argsort(-counts, kind='stable')[:top_k]
+    return {
+        'dtype': str(series.dtype),
+        'count': int(valid.sum()),
+        'null_count': int((~valid).sum()),
+        'unique': int(len(uniques)),
+        'top_values': [{'value': str(uniques[i]), 'count': int(counts[i])} for i in top],
+    }
+
+
+def profile_dataframe(df: pd.DataFrame, max_workers: int = 1, top_k: int = 5) -> Dict[str, Any]:
+    """
+    データセットのプロファイル（列別統計量・相関行列）
+
+    数値列は行列化して列ブロック単位で並列にベクトル演算し、
+    非数値列はカテゴリ列として件数・ユニーク数・頻出値を求める。
+
+    Returns:
+        dict: dataset, columns (列名→統計量), correlation, high_correlations
+    """
+    numeric_columns = df.select_dtypes(include=[np.number]).columns.tolist()
+    other_columns = [col for col in df.columns if col not in numeric_columns]
+    matrix = df[numeric_columns].to_numpy(dtype=float, na_value=np.nan) if numeric_columns \
+        else np.empty((len(df), 0))
+
+    blocks: List[np.ndarray] = []
+    if numeric_columns:
+        n_blocks = max(1, min(max_workers, len(numeric_columns) // _MIN_BLOCK_COLUMNS))
+        blocks = np.array_split(np.arange(len(numeric_columns)), n_blocks)
+
+    # ソート等の NumPy 演算は GIL を解放するため、列ブロックはスレッドで並列化
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        numeric_futures = [executor.submit(_profile_numeric_block, matrix[:, block]) for block in blocks]
+        categorical_futures = {col: executor.submit(_profile_categorical, df[col], top_k)
+                               for col in other_columns}
+        correlation = pairwise_correlation(matrix) if numeric_columns else np.empty((0, 0))
+        numeric_results = [future.result() for future in numeric_futures]
+        categorical_results = {col: future.result() for col, future in categorical_futures.items()}
+
+    columns: Dict[str, Dict[str, Any]] = {}
+    for block, result in zip(blocks, numeric_results):
+        for offset, index in enumerate(block):
+            column = numeric_columns[index]
+            quantiles = result['quantiles'][:, offset]
+            columns[column] = {
+                'dtype': str(df[column].dtype),
+                'count': int(result['count'][offset]),
+                'null_count': int(result['null_count'][offset]),
+                'inf_count': int(result['inf_count'][offset]),
+                'unique': int(result['unique'][offset]),
+                'mean': _finite_or_none(result['mean'][offset]),
+                'std': _finite_or_none(result['std'][offset]),
+                'skewness': _finite_or_none(result['skewness'][offset]),
+                'kurtosis': _finite_or_none(result['kurtosis'][offset]),
+                'min': _finite_or_none(quantiles[0]),
+                'max': _finite_or_none(quantiles[-1]),
+                'quantiles': {f'{q:g}': _finite_or_none(v) for q, v in zip(QUANTILES, quantiles)},
+            }
+    columns.update(categorical_results)
+
+    high_correlations = []
+    if numeric_columns:
+        upper = np.triu_indices(len(numeric_columns), k=1)
+        strength = np.abs(correlation[upper])
+        strong = np.flatnonzero(np.nan_to_num(strength) > HIGH_CORRELATION_THRESHOLD)
+        for index in strong[np.argsort(-strength[strong], kind='stable')]:
+            i, j = upper[0][index], upper[1][index]
+            high_correlations.append({
+                'columns': [numeric_columns[i], numeric_columns[j]],
+                'correlation': float(correlation[i, j]),
+            })
+
+    return {
+        'dataset': {
+            'rows': int(len(df)),
+            'columns': int(len(df.columns)),
+            'numeric_columns': numeric_columns,
+            'categorical_columns': other_columns,
+            'memory_bytes': int(df.memory_usage(deep=False).sum()),
+        },
+        'columns': {col: columns[col] for col in df.columns},
+        'correlation': {
+            'columns': numeric_columns,
+            'matrix': [[_finite_or_none(v) for v in row] for row in correlation],
+        },
+        'high_correlations': high_correlations,
+    }
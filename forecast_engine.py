@@ -0,0 +1,196 @@
+"""Q-Storm Platform - Batch Holt-Winters forecasting (process pool workers)
+
+期間×系列の行列（行=期間、列=メトリック×店舗）の全列に加法型 Holt-Winters を当てはめる。
+平滑化係数はグリッド全体×全系列を1本の状態配列で同時に漸化し、系列ごとに SSE 最小の組を選ぶ。
+NaN の期間（開店前など行のない期間）は未観測として当てはめの誤差に含めない。
+ワーカープロセスから import されるため、Flask アプリや DB に依存しない。
+"""
+import itertools
+import logging
+import warnings
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from distribution_fitter import get_process_pool, reset_process_pool
+
+logger = logging.getLogger(__name__)
+
+# 平滑化係数の探索グリッド（alpha: 水準, beta: 傾き, gamma: 季節）
+ALPHA_GRID = (0.1, 0.3, 0.5, 0.8)
+BETA_GRID = (0.0, 0.05, 0.2)
+GAMMA_GRID = (0.05, 0.2, 0.5)
+
+# これを超えるセル数（期間×系列×グリッド）の当てはめは列を分割してプロセスプールで実行
+PARALLEL_MIN_CELLS = 5_000_000
+
+# 予測区間（約95%）の係数
+INTERVAL_Z = 1.96
+
+
+def _parameter_grid(seasonal: bool) -> np.ndarray:
+    gammas = GAMMA_GRID if seasonal else (0.0,)
+    return np.array(list(itertools.product(ALPHA_GRID, BETA_GRID, gammas)))
+
+
+def _initial_state(matrix: np.ndarray, season_length: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    最初の1〜2季節から水準・傾き・季節成分の初期値を求める（未観測の期間は除き、求められない傾き・季節成分は 0）
+    """
+    periods = matrix.shape[0]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        if season_length > 1:
+            first = np.nanmean(matrix[:season_length], axis=0)
+            if periods >= 2 * season_length:
+                second = np.nanmean(matrix[season_length:2 * season_length], axis=0)
+                trend = np.nan_to_num((second - first) / season_length)
+            else:
+                trend = np.zeros(matrix.shape[1])
+            season = np.nan_to_num(matrix[:season_length] - first)
+            return first, trend, season
+    trend = np.nan_to_num(matrix[1] - matrix[0]) if periods > 1 else np.zeros(matrix.shape[1])
+    return matrix[0].copy(), trend, np.zeros((1, matrix.shape[1]))
+
+
+def fit_holt_winters(matrix: np.ndarray, season_length: int) -> Dict[str, np.ndarray]:
+    """
+    全系列に加法型 Holt-Winters を当てはめ、系列ごとに最良の平滑化係数を選択
+
+    季節長の2倍に満たない系列長では季節成分なし（Holt の線形トレンド）で当てはめる。
+    観測の始まりが異なる系列（途中で開店した店舗など）は、開始期間ごとにその期間から当てはめる。
+
+    Returns:
+        dict: alpha, beta, gamma, level, trend (系列数), season (季節長×系列数),
+              rmse (系列数), season_length
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    periods, n_series = matrix.shape
+    if periods < 2:
+        raise ValueError('At least 2 periods are required for forecasting')
+    seasonal = season_length > 1 and periods >= 2 * season_length
+    season_length = season_length if seasonal else 1
+
+    observed = np.isfinite(matrix)
+    starts = np.where(observed.any(axis=0), observed.argmax(axis=0), periods)
+    if not starts.any():
+        return _fit_aligned(matrix, season_length)
+
+    # 観測が2期間に満たない系列は水準（最後の観測、なければ NaN）のみ
+    fit = {
+        'alpha': np.zeros(n_series), 'beta': np.zeros(n_series), 'gamma': np.zeros(n_series),
+        'level': np.full(n_series, np.nan), 'trend': np.zeros(n_series),
+        'season': np.zeros((season_length, n_series)), 'rmse': np.zeros(n_series),
+        'season_length': np.array(season_length),
+    }
+    for start in np.unique(starts):
+        columns = np.flatnonzero(starts == start)
+        if periods - start < 2:
+            if start < periods:
+                fit['level'][columns] = matrix[start, columns]
+            continue
+        part = _fit_aligned(matrix[start:, columns], season_length)
+        for key in ('alpha', 'beta', 'gamma', 'level', 'trend', 'rmse'):
+            fit[key][columns] = part[key]
+        # 期間が短く季節成分なしで当てはめた系列の季節成分は 0 のまま
+        if int(part['season_length']) == season_length:
+            fit['season'][:, columns] = part['season']
+    return fit
+
+
+def _fit_aligned(matrix: np.ndarray, season_length: int) -> Dict[str, np.ndarray]:
+    """先頭の期間に全系列の観測がある行列の当てはめ（途中の未観測期間は状態を予測値のまま進める）"""
+    periods, n_series = matrix.shape
+    seasonal = season_length > 1 and periods >= 2 * season_length
+    season_length = season_length if seasonal else 1
+
+    grid = _parameter_grid(seasonal)
+    alpha, beta, gamma = (grid[:, i][:, None] for i in range(3))
+    level0, trend0, season0 = _initial_state(matrix, season_length)
+
+    # 状態はすべて (グリッド, 系列) の形状で保持し、時点方向のみループする
+    level = np.broadcast_to(level0, (len(grid), n_series)).copy()
+    trend = np.broadcast_to(trend0, (len(grid), n_series)).copy()
+    season = np.broadcast_to(season0[:, None, :], (season_length, len(grid), n_series)).copy()
+    sse = np.zeros((len(grid), n_series))
+    fitted_steps = np.zeros(n_series)
+    start = season_length if seasonal else 1
+    for t in range(start, periods):
+        observed = matrix[t]
+        slot = t % season_length
+        seasonal_term = season[slot]
+        present = np.isfinite(observed)
+        error = np.where(present, observed - (level + trend + seasonal_term), 0.0)
+        sse += error ** 2
+        fitted_steps += present
+        new_level = np.where(present, alpha * (observed - seasonal_term) + (1 - alpha) * (level + trend),
+                             level + trend)
+        trend = np.where(present, beta * (new_level - level) + (1 - beta) * trend, trend)
+        season[slot] = np.where(present, gamma * (observed - new_level) + (1 - gamma) * seasonal_term, seasonal_term)
+        level = new_level
+
+    best = np.argmin(sse, axis=0)
+    columns = np.arange(n_series)
+    # 次の時点から始まるよう季節成分を並べ替える
+    order = (np.arange(season_length) + periods) % season_length
+    return {
+        'alpha': grid[best, 0],
+        'beta': grid[best, 1],
+        'gamma': grid[best, 2],
+        'level': level[best, columns],
+        'trend': trend[best, columns],
+        'season': season[:, best, columns][order],
+        'rmse': np.sqrt(sse[best, columns] / np.maximum(fitted_steps, 1)),
+        'season_length': np.array(season_length),
+    }
+
+
+def fit_panel(matrix: np.ndarray, season_length: int, max_workers: int = 1) -> Dict[str, np.ndarray]:
+    """
+    行列全体を当てはめ（大規模な場合は列ブロックをプロセスプールで並列実行）
+
+    プロセスプールが利用できない環境では単一プロセスにフォールバックする。
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    cells = matrix.size * len(_parameter_grid(season_length > 1))
+    if max_workers <= 1 or cells < PARALLEL_MIN_CELLS or matrix.shape[1] < 2:
+        return fit_holt_winters(matrix, season_length)
+
+    blocks = np.array_split(np.arange(matrix.shape[1]), min(max_workers, matrix.shape[1]))
+    try:
+        executor = get_process_pool(max_workers)
+        futures = [executor.submit(fit_holt_winters, matrix[:, block], season_length) for block in blocks]
+        parts = [future.result() for future in futures]
+    except (BrokenProcessPool, OSError, RuntimeError) as exc:
+        logger.warning('Process pool unavailable (%s). Fitting forecasts in-process.', exc)
+        reset_process_pool()
+        return fit_holt_winters(matrix, season_length)
+
+    merged = {key: np.concatenate([part[key] for part in parts], axis=-1)
+              for key in parts[0] if key != 'season_length'}
+    merged['season_length'] = parts[0]['season_length']
+    return merged
+
+
+def forecast(fit: Dict[str, np.ndarray], horizon: int,
+             interval_z: Optional[float] = INTERVAL_Z) -> Dict[str, np.ndarray]:
+    """
+    当てはめ結果から horizon 期先までの点予測と予測区間を算出
+
+    予測区間は残差RMSEを√k で広げる簡易近似。
+
+    Returns:
+        dict: forecast, lower, upper（いずれも horizon×系列数）
+    """
+    steps = np.arange(1, horizon + 1)[:, None]
+    season_length = int(fit['season_length'])
+    seasonal = fit['season'][(steps[:, 0] - 1) % season_length]
+    mean = fit['level'] + steps * fit['trend'] + seasonal
+    width = (interval_z or 0.0) * fit['rmse'] * np.sqrt(steps)
+    return {'forecast': mean, 'lower': mean - width, 'upper': mean + width}
+
+
+def parameters_for(fit: Dict[str, np.ndarray], index: int) -> Dict[str, float]:
+    """index 列目の系列の平滑化係数と残差RMSE"""
+    return {name: float(fit[name][index]) for name in ('alpha', 'beta', 'gamma', 'rmse')}
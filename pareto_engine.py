@@ -0,0 +1,330 @@
+"""Q-Storm Platform - Vectorized Pareto (ABC) engine"""
+import threading
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# ABC分類の累積比率境界 (%): A ≤ 80 < B ≤ 95 < C
+ABC_THRESHOLDS = (80.0, 95.0)
+ABC_CLASSES = ('A', 'B', 'C')
+
+# 分類メンバー一覧のページサイズ
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+# 降順の先頭部分を確定させる際の初期件数
+_INITIAL_HEAD_SIZE = 256
+
+
+def _object_array(values: Sequence[Any]) -> np.ndarray:
+    """ラベル列を1次元の object 配列に変換（タプル等も1要素として保持）"""
+    values = list(values)
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def numeric_matrix(df: pd.DataFrame, columns: Sequence[str]) -> np.ndarray:
+    """指定列を float 行列に変換（NaN/inf は 0）"""
+    frame = df[list(columns)]
+    try:
+        matrix = frame.to_numpy(dtype=float, na_value=np.nan)
+    except (TypeError, ValueError):
+        # 文字列混在列は数値変換してから行列化
+        matrix = frame.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    return np.where(np.isfinite(matrix), matrix, 0.0)
+
+
+class ParetoEngine:
+    """
+    カテゴリ合計からパレート順位・累積比率・ABC分類を求めるエンジン
+
+    SKU単位のような高カーディナリティでも全件ソートを避けるため、
+    降順の先頭部分だけを np.partition による部分選択で確定させる。
+    B/C境界（累積95%）を超えるまで先頭部分を拡張すれば ABC の境界が
+    決まるため、件数の大半を占める C クラスの末尾はページ参照時まで
+    ソートしない。
+
+    analysis_cache 経由でリクエストスレッド間に共有されるため、先頭部分の拡張はロック下で行い、
+    (先頭インデックス, 累積比率, ABC境界) を1つのタプルとして置き換える（縮小はしない）。
+    """
+
+    def __init__(self, labels: Sequence[Any], totals: np.ndarray):
+        totals = np.asarray(totals, dtype=float)
+        labels = _object_array(labels)
+        valid = np.isfinite(totals)
+        self.labels = labels[valid]
+        self.totals = totals[valid]
+        self.size = int(self.totals.size)
+        self.total = float(self.totals.sum())
+        self._lock = threading.Lock()
+        self._ranked: Optional[Tuple[np.ndarray, np.ndarray, Tuple[int, int]]] = None
+
+    @classmethod
+    def from_codes(cls, keys: pd.Series, values: pd.Series) -> 'ParetoEngine':
+        """カテゴリ列をコード化し、np.bincount で1回の走査で合計"""
+        codes, uniques = pd.factorize(keys, sort=True)
+        weights = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+        valid = codes >= 0
+        weights = np.where(np.isfinite(weights), weights, 0.0)[valid]
+        totals = np.bincount(codes[valid], weights=weights, minlength=len(uniques))
+        return cls(uniques.tolist(), totals)
+
+    @classmethod
+    def from_columns(cls, df: pd.DataFrame, columns: Sequence[str],
+                     labels: Optional[Dict[str, str]] = None,
+                     positive_only: bool = False) -> 'ParetoEngine':
+        """
+        カテゴリ列（商品カテゴリ別売上等）を行列として1回の縮約で列合計
+
+        Args:
+            df: 対象データ
+            columns: カテゴリ列（存在しない列は無視）
+            labels: 列名→表示ラベル
+            positive_only: 合計が正のカテゴリのみ対象とする
+        """
+        columns = [col for col in columns if col in df.columns]
+        matrix = numeric_matrix(df, columns)
+        totals = matrix.sum(axis=0) if matrix.size else np.zeros(len(columns))
+        return cls.from_totals(columns, totals, labels, positive_only)
+
+    @classmethod
+    def from_totals(cls, columns: Sequence[str], totals: np.ndarray,
+                    labels: Optional[Dict[str, str]] = None,
+                    positive_only: bool = False) -> 'ParetoEngine':
+        """集計済みの列合計から生成（SQL バックエンド等で合計を求めた場合）"""
+        totals = np.asarray(totals, dtype=float)
+        names = [labels.get(col, col) if labels else col for col in columns]
+        if positive_only:
+            keep = totals > 0
+            names = [name for name, flag in zip(names, keep) if flag]
+            totals = totals[keep]
+        return cls(names, totals)
+
+    # ------------------------------------------------------------------
+    # 降順先頭部分（部分選択）
+    # ------------------------------------------------------------------
+
+    def _ensure_head(self, count: int = 0) -> Tuple[np.ndarray, np.ndarray, Tuple[int, int]]:
+        """
+        降順の先頭 count 件、かつ累積比率が ABC_THRESHOLDS[-1] を超えるまでを確定
+
+        Returns:
+            (先頭インデックス, 累積比率 (%), (A終端, B終端))。呼び出し側はこのタプルのみを参照する
+        """
+        count = min(count, self.size)
+        ranked = self._ranked
+        if ranked is not None and ranked[0].size >= count:
+            return ranked
+        with self._lock:
+            ranked = self._ranked
+            if ranked is not None and ranked[0].size >= count:
+                return ranked
+            self._ranked = self._extend_head(count, ranked[0].size if ranked is not None else 0)
+            return self._ranked
+
+    def _extend_head(self, count: int, current: int) -> Tuple[np.ndarray, np.ndarray, Tuple[int, int]]:
+        """現在の先頭 current 件より長い先頭部分を部分選択で求める"""
+        k = max(count, current * 2, _INITIAL_HEAD_SIZE)
+        while True:
+            # 先頭部分が全体の半分を超える場合は全件ソートの方が安い
+            k = self.size if k > self.size // 2 else k
+            if k == self.size:
+                head = np.argsort(-self.totals, kind='stable')
+            else:
+                # k番目の値で部分選択し、同値は元の順序で採用（全件の安定ソートと同一結果）
+                kth = -np.partition(-self.totals, k - 1)[k - 1]
+                greater = np.flatnonzero(self.totals > kth)
+                equal = np.flatnonzero(self.totals == kth)[:k - greater.size]
+                candidates = np.concatenate([greater, equal])
+                head = candidates[np.lexsort((candidates, -self.totals[candidates]))]
+            cumulative = self._cumulative_percentage(self.totals[head])
+            if k == self.size or cumulative[-1] > ABC_THRESHOLDS[-1]:
+                break
+            # 残りの各要素は k 番目の値以下のため、不足分から必要件数の下限を見積もる
+            shortfall = (ABC_THRESHOLDS[-1] - cumulative[-1]) / 100 * self.total
+            kth_value = self.totals[head[-1]]
+            needed = int(np.ceil(shortfall / kth_value)) if kth_value > 0 else self.size
+            k = max(k * 2, k + needed)
+
+        # 負値を含む場合でも単調になるよう累積最大値で境界を探索
+        monotone = np.maximum.accumulate(cumulative) if cumulative.size else cumulative
+        a_end, b_end = np.searchsorted(monotone, ABC_THRESHOLDS, side='right')
+        return head, cumulative, (int(a_end), int(b_end))
+
+    def _cumulative_percentage(self, sorted_totals: np.ndarray) -> np.ndarray:
+        if self.total == 0:
+            return np.zeros(sorted_totals.size)
+        return np.cumsum(sorted_totals) / self.total * 100
+
+    @property
+    def boundaries(self) -> Tuple[int, int]:
+        """降順位置での (A終端, B終端)"""
+        return self._ensure_head()[2]
+
+    # ------------------------------------------------------------------
+    # 結果参照
+    # ------------------------------------------------------------------
+
+    def top(self, n: int) -> Dict[str, list]:
+        """上位 n 件の label / value / ratio / cumulative (%)"""
+        head, cumulative, _ = self._ensure_head(n)
+        index = head[:n]
+        values = self.totals[index]
+        ratios = values / self.total * 100 if self.total else np.zeros(values.size)
+        return {
+            'categories': self.labels[index].tolist(),
+            'values': values.tolist(),
+            'ratios': ratios.tolist(),
+            'cumulative': cumulative[:n].tolist(),
+        }
+
+    def ranking(self) -> Dict[str, list]:
+        """全件の降順ランキングと各カテゴリの ABC クラス（全件返却用）"""
+        head, cumulative, (a_end, b_end) = self._ensure_head(self.size)
+        classes = np.repeat(np.array(ABC_CLASSES, dtype=object),
+                            [a_end, b_end - a_end, self.size - b_end])
+        return {
+            'categories': self.labels[head].tolist(),
+            'values': self.totals[head].tolist(),
+            'cumulative_percentage': cumulative.tolist(),
+            'classes': classes.tolist(),
+        }
+
+    def class_counts(self) -> Dict[str, int]:
+        a_end, b_end = self.boundaries
+        return {'A': a_end, 'B': b_end - a_end, 'C': self.size - b_end}
+
+    def members(self, abc_class: str, offset: int = 0, limit: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+        """ABCクラスのメンバーを降順でページ参照"""
+        if abc_class not in ABC_CLASSES:
+            raise ValueError(f"Invalid abc_class. Must be one of: {', '.join(ABC_CLASSES)}")
+        offset = max(int(offset), 0)
+        limit = min(max(int(limit), 1), MAX_PAGE_SIZE)
+
+        a_end, b_end = self.boundaries
+        start, end = {'A': (0, a_end), 'B': (a_end, b_end), 'C': (b_end, self.size)}[abc_class]
+        page_start = min(start + offset, end)
+        page_end = min(page_start + limit, end)
+        index = self._ensure_head(page_end)[0][page_start:page_end]
+
+        return {
+            'abc_class': abc_class,
+            'count': end - start,
+            'offset': offset,
+            'limit': limit,
+            'items': self.labels[index].tolist(),
+            'values': self.totals[index].tolist(),
+            'has_more': page_end < end,
+        }
+
+    def classification(self, page_size: int = DEFAULT_PAGE_SIZE) -> Dict[str, Dict[str, Any]]:
+        """クラス別件数・構成比と先頭ページのメンバー"""
+        head, _, (a_end, b_end) = self._ensure_head()
+        spans = {'A': (0, a_end), 'B': (a_end, b_end), 'C': (b_end, self.size)}
+        result = {}
+        for abc_class in ABC_CLASSES:
+            start, end = spans[abc_class]
+            page = self.members(abc_class, 0, page_size)
+            if abc_class == 'C':
+                # C の末尾は未ソートのため、全体合計から A/B 分を差し引く
+                value = self.total - float(self.totals[head[:start]].sum())
+            else:
+                value = float(self.totals[head[start:end]].sum())
+            result[abc_class] = {
+                'count': page['count'],
+                'percentage': round(page['count'] / self.size * 100, 2) if self.size else 0.0,
+                'value_percentage': round(value / self.total * 100, 2) if self.total else 0.0,
+                'items': page['items'],
+                'has_more': page['has_more'],
+            }
+        return result
+
+
+# ----------------------------------------------------------------------
+# グループ別 ABC 分類（期間別クラス遷移・階層ドリルダウン）
+# ----------------------------------------------------------------------
+
+# グループ別分類の状態: A/B/C と該当グループに実績なし
+MIGRATION_STATES = ('A', 'B', 'C', '-')
+_INACTIVE = len(MIGRATION_STATES) - 1
+
+
+def sum_rows_by_code(row_codes: np.ndarray, n_groups: int, matrix: np.ndarray) -> np.ndarray:
+    """
+    行×カテゴリ行列を行のグループコード（期間・店舗等）で1回の縮約により合計
+
+    Returns:
+        (グループ数, カテゴリ数) の合計行列
+    """
+    matrix = np.where(np.isfinite(matrix), matrix, 0.0)
+    order = np.argsort(row_codes, kind='stable')
+    sizes = np.bincount(row_codes, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    totals = np.zeros((n_groups, matrix.shape[1]))
+    present = sizes > 0
+    if present.any():
+        totals[present] = np.add.reduceat(matrix[order], starts[present], axis=0)
+    return totals
+
+
+def sum_by_code_pair(group_codes: np.ndarray, n_groups: int,
+                     category_codes: np.ndarray, n_categories: int,
+                     values: np.ndarray) -> np.ndarray:
+    """グループコード×カテゴリコードの合計を np.bincount 1回で集計"""
+    values = np.where(np.isfinite(values), values, 0.0)
+    flat = group_codes.astype(np.int64) * n_categories + category_codes
+    totals = np.bincount(flat, weights=values, minlength=n_groups * n_categories)
+    return totals.reshape(n_groups, n_categories)
+
+
+def rank_rows(totals: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    行ごとの降順順位と累積比率 (%) を一括で算出（正でない値は 0 として末尾）
+
+    Returns:
+        (降順の列インデックス, 降順の値, 累積比率) いずれも totals と同形
+    """
+    work = np.where(totals > 0, totals, 0.0)
+    order = np.argsort(-work, axis=1, kind='stable')
+    sorted_totals = np.take_along_axis(work, order, axis=1)
+    row_totals = sorted_totals.sum(axis=1, keepdims=True)
+    cumulative = np.cumsum(sorted_totals, axis=1) / np.where(row_totals > 0, row_totals, 1) * 100
+    return order, sorted_totals, cumulative
+
+
+def classify_rows(totals: np.ndarray) -> np.ndarray:
+    """
+    行ごとの ABC 分類を一括で算出
+
+    Args:
+        totals: (グループ数, カテゴリ数) の合計行列。各行を独立に分類する
+
+    Returns:
+        MIGRATION_STATES のインデックス行列（合計が正でないカテゴリは '-'）
+    """
+    active = totals > 0
+    order, _, cumulative = rank_rows(totals)
+    sorted_classes = (cumulative > ABC_THRESHOLDS[0]).astype(np.int64) + (cumulative > ABC_THRESHOLDS[1])
+    classes = np.empty_like(sorted_classes)
+    np.put_along_axis(classes, order, sorted_classes, axis=1)
+    classes[~active] = _INACTIVE
+    return classes
+
+
+def transition_counts(classes: np.ndarray) -> np.ndarray:
+    """
+    隣接期間の状態遷移件数
+
+    Returns:
+        (期間数-1, 状態数, 状態数) の遷移件数（[t, from, to]）
+    """
+    n_states = len(MIGRATION_STATES)
+    steps = classes.shape[0] - 1
+    if steps <= 0:
+        return np.zeros((0, n_states, n_states), dtype=np.int64)
+    step_index = np.arange(steps)[:, None]
+    flat = (step_index * n_states + classes[:-1]) * n_states + classes[1:]
+    counts = np.bincount(flat.ravel(), minlength=steps * n_states * n_states)
+    return counts.reshape(steps, n_states, n_states)
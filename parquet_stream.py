@@ -0,0 +1,346 @@
+"""Q-Storm Platform - Out-of-core streaming aggregation over Parquet row groups
+
+セッションの Parquet ファイルを行グループ単位で読み、時系列の期間合計・固定境界の
+ヒストグラム度数・カテゴリ合計・モーメントを部分集計の合成で求める。
+各パスで保持するのは「必要な列だけを読んだ1行グループ」と集計途中の小さな配列のみで、
+ピークメモリはデータセット全体ではなく行グループの大きさで決まる。
+
+分位点（中央値・パーセンタイル）は値域をビンで絞り込む複数パスの選択で厳密値を求める。
+DuckDBBackend（duckdb_backend.py）と同じインタフェースで、集計結果は pandas 実装と一致させる。
+"""
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from pareto_engine import numeric_matrix
+from partitioned_store import row_groups_in_range
+
+# prepare_datetime_index と同じ優先順位の日付列
+DATE_COLUMNS = ['営業日付', 'Date', 'date']
+_YMD_COLUMNS = ['年', '月', '日']
+
+# 時間単位 → pandas の resample 頻度
+_TIME_UNIT_TO_FREQ = {'日': 'D', '週': 'W', '月': 'M', '年': 'Y'}
+
+# 分位点の絞り込み: 1パスあたりのビン数と、候補値を直接集めて選択に切り替える件数
+SELECT_BINS = 1024
+SELECT_COLLECT_LIMIT = 65536
+
+
+class ParquetStreamBackend:
+    """
+    Parquet ファイル群を行グループ単位で走査する集計バックエンド
+
+    start_date / end_date（'YYYY-MM-DD'）を指定すると、以降の全集計にその期間条件が付く。
+    """
+
+    def __init__(self, paths: Sequence[Path], start_date: Optional[str] = None,
+                 end_date: Optional[str] = None):
+        self.paths = [Path(path) for path in paths]
+        # 列名と型だけを持つ0行の DataFrame（列の自動検出を pandas 経路と共通化する）
+        self.schema: pd.DataFrame = pq.read_schema(self.paths[0]).empty_table().to_pandas()
+        self.columns: List[str] = list(self.schema.columns)
+        self._date_range = (start_date, end_date)
+        self._date_columns = self._resolve_date_columns()
+
+    def close(self) -> None:
+        """DuckDBBackend と同じインタフェース（保持するリソースはない）"""
+
+    # ------------------------------------------------------------------
+    # 時系列
+    # ------------------------------------------------------------------
+
+    def resample_sum(self, metric: str, time_unit: str, store_column: Optional[str] = None,
+                     store: Optional[str] = None) -> pd.Series:
+        """
+        Series.resample(freq).sum() と同じ期間軸（期間末ラベル、欠測期間は0）の期間合計
+
+        行グループごとの resample 結果を期間ラベルで足し合わせる。
+        """
+        self._require_columns([metric])
+        if self._date_columns is None:
+            raise ValueError('Datetime column not found in dataset')
+        freq = _TIME_UNIT_TO_FREQ[time_unit]
+        totals: Optional[pd.Series] = None
+        for chunk, dates in self._chunks([metric], store_column, store, with_dates=True):
+            values = pd.to_numeric(chunk[metric], errors='coerce').to_numpy(dtype=float)
+            valid = ~np.isnan(values) & ~np.isnat(dates)
+            if not valid.any():
+                continue
+            partial = pd.Series(values[valid], index=pd.DatetimeIndex(dates[valid])).resample(freq).sum()
+            totals = partial if totals is None else totals.add(partial, fill_value=0.0)
+        if totals is None:
+            raise ValueError('Metric column contains no valid numeric data')
+
+        totals = totals.sort_index()
+        full_index = pd.date_range(totals.index[0], totals.index[-1], freq=freq)
+        return totals.reindex(full_index, fill_value=0.0)
+
+    # ------------------------------------------------------------------
+    # ヒストグラム
+    # ------------------------------------------------------------------
+
+    def value_summary(self, metric: str, store_column: Optional[str] = None,
+                      store: Optional[str] = None,
+                      quantiles: Sequence[float] = (0.05, 0.25, 0.5, 0.75, 0.95)) -> Dict[str, Any]:
+        """
+        有限値の件数・範囲・平均・標本標準偏差・分位点（線形補間）・歪度/尖度（scipy の既定と同じ母集団モーメント）
+
+        1パス目で件数・合計・最小・最大、2パス目で平均まわりの2〜4次モーメント、
+        以降のパスで分位点に必要な順序統計量を求める。
+        """
+        count, total, minimum, maximum = 0, 0.0, np.inf, -np.inf
+        for values in self._finite_chunks(metric, store_column, store):
+            count += values.size
+            total += float(values.sum())
+            minimum = min(minimum, float(values.min()))
+            maximum = max(maximum, float(values.max()))
+        if not count:
+            raise ValueError('Metric column contains no valid numeric data')
+
+        mean = total / count
+        m2 = m3 = m4 = 0.0
+        for values in self._finite_chunks(metric, store_column, store):
+            deviation = values - mean
+            squared = deviation * deviation
+            m2 += float(squared.sum())
+            m3 += float((squared * deviation).sum())
+            m4 += float((squared * squared).sum())
+
+        positions = {q: q * (count - 1) for q in quantiles}
+        ranks = sorted({int(np.floor(p)) for p in positions.values()}
+                       | {min(int(np.floor(p)) + 1, count - 1) for p in positions.values()})
+        ordered = self._order_statistics(metric, ranks, count, minimum, maximum, store_column, store)
+        points = {}
+        for q, position in positions.items():
+            lower = int(np.floor(position))
+            weight = position - lower
+            points[q] = ordered[lower] * (1 - weight) + ordered[min(lower + 1, count - 1)] * weight
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            skewness = float(np.float64(m3 / count) / np.float64(m2 / count) ** 1.5)
+            kurtosis = float(np.float64(m4 / count) / np.float64(m2 / count) ** 2 - 3.0)
+        return {
+            'count': count,
+            'min': minimum,
+            'max': maximum,
+            'mean': mean,
+            'std': float(np.sqrt(m2 / (count - 1))) if count > 1 else 0.0,
+            'quantiles': {q: float(value) for q, value in points.items()},
+            'skewness': skewness,
+            'kurtosis': kurtosis,
+        }
+
+    def histogram_counts(self, metric: str, bin_edges: np.ndarray, store_column: Optional[str] = None,
+                         store: Optional[str] = None) -> np.ndarray:
+        """任意のビン境界に対する度数（np.histogram と同じ半開区間、最終ビンのみ閉区間）"""
+        bin_edges = np.asarray(bin_edges, dtype=float)
+        counts = np.zeros(len(bin_edges) - 1, dtype=np.int64)
+        for values in self._finite_chunks(metric, store_column, store):
+            counts += np.histogram(values, bins=bin_edges)[0]
+        return counts
+
+    def sample_values(self, metric: str, max_samples: int, seed: int, store_column: Optional[str] = None,
+                      store: Optional[str] = None) -> Tuple[np.ndarray, int]:
+        """
+        正規性検定用の値（件数が max_samples 以下なら全件、超える場合はシード固定のリザーバ抽出）
+
+        各値に一様乱数のキーを振り、キーの小さい max_samples 件だけを保持し続ける。
+
+        Returns:
+            (値, 有限値の総件数)
+        """
+        rng = np.random.default_rng(seed)
+        kept_values = np.empty(0)
+        kept_keys = np.empty(0)
+        total = 0
+        for values in self._finite_chunks(metric, store_column, store):
+            total += values.size
+            kept_values = np.concatenate([kept_values, values])
+            kept_keys = np.concatenate([kept_keys, rng.random(values.size)])
+            if kept_values.size > max_samples:
+                keep = np.argpartition(kept_keys, max_samples - 1)[:max_samples]
+                kept_values, kept_keys = kept_values[keep], kept_keys[keep]
+        return kept_values, total
+
+    # ------------------------------------------------------------------
+    # パレート
+    # ------------------------------------------------------------------
+
+    def column_totals(self, columns: Sequence[str], store_column: Optional[str] = None,
+                      store: Optional[str] = None) -> np.ndarray:
+        """各列の合計（NaN/inf は0）。存在しない列は呼び出し側で除外しておく"""
+        totals = np.zeros(len(columns))
+        if not columns:
+            return totals
+        for chunk, _ in self._chunks(columns, store_column, store):
+            totals += numeric_matrix(chunk, columns).sum(axis=0)
+        return totals
+
+    def group_totals(self, key_column: str, metric: str, store_column: Optional[str] = None,
+                     store: Optional[str] = None) -> Tuple[List[Any], np.ndarray]:
+        """キー列ごとの metric 合計（キーの昇順。ParetoEngine.from_codes と同じ並び）"""
+        self._require_columns([key_column, metric])
+        totals: Optional[pd.Series] = None
+        for chunk, _ in self._chunks([key_column, metric], store_column, store):
+            values = numeric_matrix(chunk, [metric])[:, 0]
+            partial = pd.Series(values).groupby(chunk[key_column].to_numpy(), sort=False).sum()
+            totals = partial if totals is None else totals.add(partial, fill_value=0.0)
+        if totals is None:
+            return [], np.zeros(0)
+        totals = totals.sort_index()
+        return list(totals.index), totals.to_numpy(dtype=float)
+
+    def row_count(self, store_column: Optional[str] = None, store: Optional[str] = None) -> int:
+        return sum(len(chunk) for chunk, _ in self._chunks([], store_column, store))
+
+    # ------------------------------------------------------------------
+    # 内部ヘルパ
+    # ------------------------------------------------------------------
+
+    def _row_groups(self, prune: bool = True) -> Iterator[Tuple[pq.ParquetFile, int]]:
+        """
+        走査する行グループ
+
+        日付列が datetime 型で保存されている場合は、行グループの min/max 統計で期間外の行グループを読み飛ばす。
+        """
+        start_date, end_date = self._date_range if prune else (None, None)
+        date_column = self._date_columns[0] if prune and self._date_columns and \
+            len(self._date_columns) == 1 else None
+        for path in self.paths:
+            parquet_file = pq.ParquetFile(path)
+            for index in row_groups_in_range(parquet_file, date_column, start_date, end_date):
+                yield parquet_file, index
+
+    def _chunks(self, columns: Sequence[str], store_column: Optional[str], store: Optional[str],
+                with_dates: bool = False) -> Iterator[Tuple[pd.DataFrame, Optional[np.ndarray]]]:
+        """
+        期間・店舗条件を適用した行グループを1つずつ返す
+
+        読む列は集計対象＋条件に必要な列だけ。with_dates=True の場合は行ごとの日時（datetime64[ns]）も返す。
+        """
+        start_date, end_date = self._date_range
+        needs_dates = with_dates or bool(start_date or end_date)
+        if needs_dates and self._date_columns is None:
+            raise ValueError('Datetime column not found in dataset')
+        read_columns = list(dict.fromkeys([*columns,
+                                           *(self._date_columns if needs_dates else []),
+                                           *([store_column] if store is not None else [])]))
+        for parquet_file, index in self._row_groups():
+            chunk = parquet_file.read_row_group(index, columns=read_columns).to_pandas()
+            mask = np.ones(len(chunk), dtype=bool)
+            dates = self._chunk_dates(chunk) if needs_dates else None
+            if start_date:
+                mask &= dates >= np.datetime64(start_date, 'ns')
+            if end_date:
+                mask &= dates < np.datetime64(end_date, 'ns') + np.timedelta64(1, 'D')
+            if store is not None:
+                mask &= (chunk[store_column].astype(str) == store).to_numpy()
+            if not mask.all():
+                chunk = chunk[mask]
+                dates = dates[mask] if dates is not None else None
+            if len(chunk):
+                yield chunk, dates
+
+    def _finite_chunks(self, metric: str, store_column: Optional[str], store: Optional[str]) -> Iterator[np.ndarray]:
+        self._require_columns([metric])
+        for chunk, _ in self._chunks([metric], store_column, store):
+            values = pd.to_numeric(chunk[metric], errors='coerce').to_numpy(dtype=float)
+            values = values[np.isfinite(values)]
+            if values.size:
+                yield values
+
+    def _order_statistics(self, metric: str, ranks: Sequence[int], count: int, minimum: float, maximum: float,
+                          store_column: Optional[str], store: Optional[str]) -> Dict[int, float]:
+        """
+        昇順で ranks 番目（0始まり）の値を、値域の絞り込みを繰り返す複数パスで求める
+
+        各ランクについて「その値を含む区間・区間より小さい値の件数・区間内の件数と最小/最大」を保持し、
+        1パスごとに区間を SELECT_BINS 等分した度数から該当ビンへ狭める。区間内の件数が
+        SELECT_COLLECT_LIMIT 以下になったら次のパスで区間内の値を集めて直接選ぶ。
+        """
+        # rank → [下限, 上限, 上限を含むか, 区間より小さい件数, 区間内件数, 区間内最小, 区間内最大]
+        states = {rank: [minimum, maximum, True, 0, count, minimum, maximum] for rank in ranks}
+        result: Dict[int, float] = {}
+        while len(result) < len(states):
+            for rank, state in states.items():
+                if rank not in result and state[5] == state[6]:
+                    result[rank] = state[5]
+            pending = [rank for rank in states if rank not in result]
+            if not pending:
+                break
+            collect = [rank for rank in pending if states[rank][4] <= SELECT_COLLECT_LIMIT]
+            refine = [rank for rank in pending if rank not in collect]
+            edges = {rank: np.linspace(states[rank][5], states[rank][6], SELECT_BINS + 1) for rank in refine}
+            collected: Dict[int, List[np.ndarray]] = {rank: [] for rank in collect}
+            bin_counts = {rank: np.zeros(SELECT_BINS, dtype=np.int64) for rank in refine}
+            bin_low = {rank: np.full(SELECT_BINS, np.inf) for rank in refine}
+            bin_high = {rank: np.full(SELECT_BINS, -np.inf) for rank in refine}
+
+            for values in self._finite_chunks(metric, store_column, store):
+                values = np.sort(values)
+                for rank in pending:
+                    lower, upper, closed = states[rank][:3]
+                    inside = values[np.searchsorted(values, lower, side='left'):
+                                    np.searchsorted(values, upper, side='right' if closed else 'left')]
+                    if rank in collected:
+                        collected[rank].append(inside.copy())
+                        continue
+                    # ビン [e_i, e_i+1)、最終ビンのみ閉区間（SortedValuesIndex.count と同じ）
+                    positions = np.searchsorted(inside, edges[rank], side='left')
+                    positions[-1] = inside.size
+                    counts = np.diff(positions)
+                    filled = counts > 0
+                    bin_counts[rank] += counts
+                    bin_low[rank][filled] = np.minimum(bin_low[rank][filled], inside[positions[:-1][filled]])
+                    bin_high[rank][filled] = np.maximum(bin_high[rank][filled], inside[positions[1:][filled] - 1])
+
+            for rank in collect:
+                values = np.concatenate(collected[rank])
+                result[rank] = float(np.partition(values, rank - states[rank][3])[rank - states[rank][3]])
+            for rank in refine:
+                below = states[rank][3]
+                cumulative = np.cumsum(bin_counts[rank])
+                chosen = int(np.searchsorted(cumulative, rank - below, side='right'))
+                last = chosen == SELECT_BINS - 1
+                states[rank] = [edges[rank][chosen], edges[rank][chosen + 1], last,
+                                below + int(cumulative[chosen] - bin_counts[rank][chosen]),
+                                int(bin_counts[rank][chosen]), float(bin_low[rank][chosen]),
+                                float(bin_high[rank][chosen])]
+        return result
+
+    def _chunk_dates(self, chunk: pd.DataFrame) -> np.ndarray:
+        """prepare_datetime_index と同じ日時（行グループ単位）"""
+        if self._date_columns == _YMD_COLUMNS:
+            try:
+                dates = pd.to_datetime(chunk[_YMD_COLUMNS].astype(int)
+                                       .rename(columns={'年': 'year', '月': 'month', '日': 'day'}))
+            except Exception as exc:
+                raise ValueError('Failed to construct datetime from year/month/day columns') from exc
+        else:
+            dates = pd.to_datetime(chunk[self._date_columns[0]], errors='coerce')
+        index = pd.DatetimeIndex(dates)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        return index.to_numpy(dtype='datetime64[ns]')
+
+    def _resolve_date_columns(self) -> Optional[List[str]]:
+        """日付として解釈できる値を持つ最初の日付列（列ごと・行グループごとに読んで判定）"""
+        for column in DATE_COLUMNS:
+            if column not in self.columns:
+                continue
+            for parquet_file, index in self._row_groups(prune=False):
+                values = parquet_file.read_row_group(index, columns=[column]).to_pandas()[column]
+                if pd.to_datetime(values, errors='coerce').notna().any():
+                    return [column]
+        if set(_YMD_COLUMNS).issubset(self.columns):
+            return list(_YMD_COLUMNS)
+        return None
+
+    def _require_columns(self, columns: Sequence[str]) -> None:
+        for column in columns:
+            if column not in self.columns:
+                raise ValueError(f"Metric column '{column}' not found in dataset")
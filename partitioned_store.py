@@ -0,0 +1,214 @@
+"""Q-Storm Platform - Store / month partitioned Parquet layout for session datasets
+
+セッションのデータセットを「店舗 × 月」ごとの Parquet ファイルに分けて保存し、
+マニフェスト（_manifest.json）に各ファイルの店舗・月・行数・日付範囲を記録する。
+日付列は datetime 型で書き出し、行グループごとの min/max 統計を Parquet に持たせる。
+
+読み込み時は店舗・期間の条件をマニフェストでファイル単位に、行グループ統計で
+行グループ単位に絞り込み、該当しないファイル・行グループは開かない。
+
+    <session>/partitioned/_manifest.json
+    <session>/partitioned/store=<店舗>/month=YYYY-MM/part-0.parquet
+"""
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DATASET_DIR = 'partitioned'
+MANIFEST_NAME = '_manifest.json'
+# 店舗列・日付が欠測の行を入れるパーティション名
+NULL_PARTITION = '__null__'
+
+
+def write_partitioned(df: pd.DataFrame, directory: Path, store_column: Optional[str],
+                      dates: Optional[pd.Series], date_column: Optional[str],
+                      row_group_size: int = 65536) -> Dict[str, Any]:
+    """
+    DataFrame を店舗×月のパーティションに分けて書き出す
+
+    Args:
+        store_column: 店舗列（None の場合は月のみで分割）
+        dates: 行ごとの日時（prepare_datetime_index の結果。None の場合は店舗のみで分割）
+        date_column: dates の元になった日付列。datetime 型に揃えて書き出し、行グループ統計の対象にする
+            （年/月/日 列から組み立てた場合は None）
+
+    Returns:
+        書き出したマニフェスト
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    frame = df.reset_index(drop=True)
+    date_values = None
+    if dates is not None:
+        date_values = pd.DatetimeIndex(dates)
+        if date_values.tz is not None:
+            date_values = date_values.tz_localize(None)
+        if date_column is not None:
+            frame[date_column] = date_values
+    # 全パーティションで同じスキーマになるよう、表全体を一度 Arrow に変換してから分割する
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+
+    n_rows = len(frame)
+    store_keys = np.full(n_rows, NULL_PARTITION, dtype=object)
+    if store_column is not None:
+        store_keys = frame[store_column].map(lambda value: NULL_PARTITION if pd.isna(value) else str(value))
+    month_keys = np.full(n_rows, NULL_PARTITION, dtype=object)
+    if date_values is not None:
+        month_keys = np.where(date_values.isna(), NULL_PARTITION, date_values.strftime('%Y-%m'))
+
+    codes, uniques = pd.factorize(pd.MultiIndex.from_arrays([store_keys, month_keys]), sort=True)
+    # パーティション内は元の行順を保つ
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+
+    partitions = []
+    for index, (store_key, month_key) in enumerate(uniques):
+        rows = order[bounds[index]:bounds[index + 1]]
+        relative = Path(f'store={quote(store_key, safe="")}') / f'month={month_key}' / 'part-0.parquet'
+        (directory / relative).parent.mkdir(parents=True, exist_ok=True)
+        pq.write_table(table.take(pa.array(rows)), directory / relative,
+                       row_group_size=row_group_size, write_statistics=True)
+        partition = {
+            'store': None if store_key == NULL_PARTITION else store_key,
+            'month': None if month_key == NULL_PARTITION else month_key,
+            'path': relative.as_posix(),
+            'rows': int(rows.size),
+            'date_min': None,
+            'date_max': None,
+        }
+        if date_values is not None and month_key != NULL_PARTITION:
+            partition['date_min'] = date_values[rows].min().isoformat()
+            partition['date_max'] = date_values[rows].max().isoformat()
+        partitions.append(partition)
+
+    manifest = {
+        'store_column': store_column,
+        'date_column': date_column,
+        'partitioned_by_date': dates is not None,
+        'rows': n_rows,
+        'columns': list(frame.columns),
+        'partitions': partitions,
+    }
+    (directory / MANIFEST_NAME).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding='utf-8')
+    return manifest
+
+
+def read_manifest(directory: Path) -> Dict[str, Any]:
+    return json.loads((Path(directory) / MANIFEST_NAME).read_text(encoding='utf-8'))
+
+
+def select_files(directory: Path, stores: Optional[Sequence[str]] = None,
+                 start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Path]:
+    """店舗・期間の条件に掛かるパーティションファイル（マニフェストのみで判定）"""
+    directory = Path(directory)
+    manifest = read_manifest(directory)
+    wanted = {str(store) for store in stores} if stores else None
+    start, end = _date_bounds(start_date, end_date)
+    selected = []
+    for partition in manifest['partitions']:
+        if wanted is not None and manifest['store_column'] is not None and partition['store'] not in wanted:
+            continue
+        if (start is not None or end is not None) and manifest['partitioned_by_date']:
+            if partition['date_min'] is None:
+                continue
+            if end is not None and pd.Timestamp(partition['date_min']) >= end:
+                continue
+            if start is not None and pd.Timestamp(partition['date_max']) < start:
+                continue
+        selected.append(directory / partition['path'])
+    return selected
+
+
+def all_files(directory: Path) -> List[Path]:
+    directory = Path(directory)
+    return [directory / partition['path'] for partition in read_manifest(directory)['partitions']]
+
+
+def row_groups_in_range(parquet_file: pq.ParquetFile, column: Optional[str],
+                        start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[int]:
+    """
+    期間 [start_date, end_date] と重なり得る行グループ番号
+
+    column の min/max 統計（timestamp 型）で判定し、統計がない行グループは残す。
+    """
+    metadata = parquet_file.metadata
+    groups = list(range(metadata.num_row_groups))
+    start, end = _date_bounds(start_date, end_date)
+    if column is None or (start is None and end is None):
+        return groups
+    position = next((i for i in range(metadata.num_columns)
+                     if metadata.row_group(0).column(i).path_in_schema == column), None) \
+        if metadata.num_row_groups else None
+    if position is None:
+        return groups
+
+    kept = []
+    for group in groups:
+        statistics = metadata.row_group(group).column(position).statistics
+        if statistics is None or not statistics.has_min_max or not isinstance(statistics.min, datetime):
+            kept.append(group)
+            continue
+        if end is not None and pd.Timestamp(statistics.min) >= end:
+            continue
+        if start is not None and pd.Timestamp(statistics.max) < start:
+            continue
+        kept.append(group)
+    return kept
+
+
+def read_partitioned(directory: Path, stores: Optional[Sequence[str]] = None,
+                     start_date: Optional[str] = None, end_date: Optional[str] = None,
+                     columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    条件に掛かるファイル・行グループだけを読み、条件に一致する行を返す
+
+    日付列を持たない（年/月/日 から日付を組み立てる）データセットでは期間は月単位の絞り込みまでで、
+    行単位の期間条件は呼び出し側の行フィルタで適用する。
+    条件を指定した場合は DataFrame.attrs['row_scope'] に (店舗, 開始日, 終了日) を記録する
+    （データセット全体とは行位置が異なることを行フィルタのキャッシュに伝えるため）。
+    """
+    directory = Path(directory)
+    manifest = read_manifest(directory)
+    date_column = manifest['date_column']
+    tables = []
+    for path in select_files(directory, stores, start_date, end_date):
+        parquet_file = pq.ParquetFile(path)
+        groups = row_groups_in_range(parquet_file, date_column, start_date, end_date)
+        if groups:
+            tables.append(parquet_file.read_row_groups(groups, columns=columns))
+    if not tables:
+        schema = pq.read_schema(directory / manifest['partitions'][0]['path'])
+        frame = schema.empty_table().to_pandas()
+        frame = frame[list(columns)] if columns is not None else frame
+    else:
+        frame = pa.concat_tables(tables).to_pandas()
+
+    mask = np.ones(len(frame), dtype=bool)
+    if stores and manifest['store_column'] in frame.columns:
+        mask &= frame[manifest['store_column']].astype(str).isin([str(store) for store in stores]).to_numpy()
+    start, end = _date_bounds(start_date, end_date)
+    if date_column is not None and date_column in frame.columns:
+        dates = pd.DatetimeIndex(frame[date_column])
+        if start is not None:
+            mask &= np.asarray(dates >= start)
+        if end is not None:
+            mask &= np.asarray(dates < end)
+    if not mask.all():
+        frame = frame[mask].reset_index(drop=True)
+    if stores or start_date or end_date:
+        frame.attrs['row_scope'] = (tuple(sorted(str(store) for store in stores or ())), start_date, end_date)
+    return frame
+
+
+def _date_bounds(start_date: Optional[str], end_date: Optional[str]):
+    """'YYYY-MM-DD' の期間を半開区間 [start, end + 1日) の Timestamp に変換"""
+    start = pd.Timestamp(start_date) if start_date else None
+    end = pd.Timestamp(end_date) + pd.Timedelta(days=1) if end_date else None
+    return start, end
@@ -0,0 +1,252 @@
+"""Q-Storm Platform - Stratified samples for progressive (approximate -> exact) answers
+
+取り込み時に店舗を層とする層別無作為標本（層ごとに最大 per_store 行）を保持し、
+期間別合計・ビン度数・カテゴリ合計を層別推定量と信頼区間で即時に返す。
+厳密な結果は呼び出し側がバックグラウンドで算出する。
+
+層 h の母集団行数 N_h・標本行数 n_h、標本行 i の寄与 z_i について
+
+    合計の推定    T = Σ_h N_h * mean_h(z)
+    分散の推定    V = Σ_h N_h² (1 - n_h / N_h) s_h²(z) / n_h
+
+期間・店舗などの条件は標本から行を除かず z=0 として扱う（部分母集団の推定。n_h は層全体の標本数のまま）。
+n_h = N_h の層（小さい店舗）は全行を保持するため誤差を持たない。
+
+標本は取り込み時に uploads/<session_id>/sample/ へ書き出し（標本行は Parquet、層・範囲の配列は .npz、
+元データのバージョンとラベルは manifest.json）、再起動後は全データを読まずにそこから開く。
+"""
+import json
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+SAMPLE_DIR = 'sample'
+MANIFEST_NAME = 'manifest.json'
+_FRAME_FILE = 'frame.parquet'
+_ARRAYS_FILE = 'arrays.npz'
+
+
+class StratifiedSample:
+    """
+    店舗別の層別標本
+
+    Attributes:
+        frame: 標本行（元の列をそのまま保持、元の行順）
+        strata: 標本行ごとの層コード
+        labels: 層ラベル（店舗名の文字列。店舗列がない場合は [None]）
+        population: 層ごとの母集団行数 N_h
+        sizes: 層ごとの標本行数 n_h
+        dates: 標本行ごとの日時（日時を解決できない場合は None）
+    """
+
+    def __init__(self, frame: pd.DataFrame, strata: np.ndarray, labels: Sequence[Optional[str]],
+                 population: np.ndarray, sizes: np.ndarray, dates: Optional[pd.DatetimeIndex],
+                 extremes: Dict[str, Tuple[np.ndarray, np.ndarray]],
+                 date_bounds: Optional[Tuple[np.ndarray, np.ndarray]]):
+        self.frame = frame
+        self.strata = strata
+        self.labels = list(labels)
+        self.population = population
+        self.sizes = sizes
+        self.dates = dates
+        # 数値列ごとの層別 (最小値, 最大値)、日時の層別 (最小, 最大)（ビン境界・期間軸を母集団と揃える）
+        self._extremes = extremes
+        self._date_bounds = date_bounds
+
+    @property
+    def rows(self) -> int:
+        return int(self.sizes.sum())
+
+    @property
+    def population_rows(self) -> int:
+        return int(self.population.sum())
+
+    def stratum_mask(self, store: Optional[str] = None) -> np.ndarray:
+        """対象の層（店舗指定時はその店舗のみ）。該当店舗がない場合は ValueError"""
+        if store is None:
+            return np.ones(len(self.labels), dtype=bool)
+        mask = np.array([label == str(store) for label in self.labels], dtype=bool)
+        if not mask.any():
+            raise ValueError('No records found for specified store')
+        return mask
+
+    def value_range(self, column: str, strata: np.ndarray) -> Optional[Tuple[float, float]]:
+        """対象層の母集団での列の (最小値, 最大値)。値がない場合は None"""
+        if column not in self._extremes:
+            return None
+        minimums, maximums = self._extremes[column]
+        minimums, maximums = minimums[strata], maximums[strata]
+        if not np.isfinite(minimums).any():
+            return None
+        return float(np.nanmin(minimums)), float(np.nanmax(maximums))
+
+    def date_range(self, strata: np.ndarray) -> Optional[Tuple[pd.Timestamp, pd.Timestamp]]:
+        """対象層の母集団での日時の (最小, 最大)"""
+        if self._date_bounds is None:
+            return None
+        minimums, maximums = self._date_bounds[0][strata], self._date_bounds[1][strata]
+        present = ~np.isnat(minimums)
+        if not present.any():
+            return None
+        return pd.Timestamp(minimums[present].min()), pd.Timestamp(maximums[present].max())
+
+    def totals(self, groups: np.ndarray, n_groups: int, values: np.ndarray,
+               confidence: float = 0.95) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        グループ別合計の層別推定と信頼区間の半幅
+
+        Args:
+            groups: 標本行ごとのグループコード（0..n_groups-1）
+            values: 標本行ごとの寄与 z_i（条件外・欠測の行は 0）
+
+        Returns:
+            (推定値, 半幅) いずれも長さ n_groups
+        """
+        n_strata = len(self.labels)
+        values = np.where(np.isfinite(values), values, 0.0)
+        cells = self.strata * n_groups + groups
+        first = np.bincount(cells, weights=values, minlength=n_strata * n_groups).reshape(n_strata, n_groups)
+        second = np.bincount(cells, weights=values * values,
+                             minlength=n_strata * n_groups).reshape(n_strata, n_groups)
+
+        n = self.sizes[:, None].astype(float)
+        big_n = self.population[:, None].astype(float)
+        means = np.divide(first, n, out=np.zeros_like(first), where=n > 0)
+        # 不偏分散（標本1行の層は分散を推定できないため 0）
+        variances = np.divide(second - n * means ** 2, n - 1, out=np.zeros_like(first), where=n > 1)
+        variances = np.maximum(variances, 0.0)
+        fpc = np.divide(big_n - n, big_n, out=np.zeros_like(big_n), where=big_n > 0)
+
+        estimate = (big_n * means).sum(axis=0)
+        variance = np.divide(big_n ** 2 * fpc * variances, n, out=np.zeros_like(first), where=n > 0).sum(axis=0)
+        return estimate, critical_value(confidence) * np.sqrt(variance)
+
+    def ratio(self, values: np.ndarray, domain: np.ndarray,
+              confidence: float = 0.95) -> Tuple[float, float]:
+        """
+        部分母集団の平均 R = T(y) / T(1) の推定と信頼区間の半幅（線形化法）
+
+        Args:
+            values: 標本行ごとの値
+            domain: 対象行（values が有限の行に限る）
+        """
+        zeros = np.zeros(len(self.strata), dtype=np.int64)
+        y = np.where(domain, values, 0.0)
+        (total,), _ = self.totals(zeros, 1, y, confidence)
+        (count,), _ = self.totals(zeros, 1, domain.astype(float), confidence)
+        if count <= 0:
+            return float('nan'), float('nan')
+        mean = total / count
+        residuals = np.where(domain, values - mean, 0.0) / count
+        _, (half_width,) = self.totals(zeros, 1, residuals, confidence)
+        return float(mean), float(half_width)
+
+
+def critical_value(confidence: float) -> float:
+    """両側信頼区間の正規分布の臨界値（0.95 → 1.96）"""
+    return float(stats.norm.ppf(0.5 + confidence / 2))
+
+
+def build_stratified_sample(df: pd.DataFrame, store_column: Optional[str], per_store: int,
+                            dates: Optional[pd.Series] = None, seed: int = 0) -> StratifiedSample:
+    """
+    店舗ごとに最大 per_store 行を非復元で無作為抽出した層別標本を作る
+
+    Args:
+        store_column: 層にする店舗列（None の場合は全体を1層とした単純無作為標本）
+        dates: 行ごとの日時（prepare_datetime_index の結果）
+    """
+    n_rows = len(df)
+    if store_column is not None:
+        # 行フィルタの店舗条件と同じく文字列で比較する（欠測は 'nan' の層）
+        strata, uniques = pd.factorize(df[store_column].astype(str), sort=True)
+        labels = [str(label) for label in uniques]
+    else:
+        strata, labels = np.zeros(n_rows, dtype=np.int64), [None]
+    strata = strata.astype(np.int64)
+    n_strata = len(labels)
+    population = np.bincount(strata, minlength=n_strata)
+
+    # 層内で乱数キーの小さい順に per_store 行を採用
+    keys = np.random.default_rng(seed).random(n_rows)
+    order = np.lexsort((keys, strata))
+    offsets = np.concatenate(([0], np.cumsum(population)[:-1]))
+    rank = np.arange(n_rows) - offsets[strata[order]]
+    taken = np.sort(order[rank < per_store])
+    sizes = np.minimum(population, per_store)
+
+    numeric = df.select_dtypes(include=[np.number])
+    extremes = {}
+    if not numeric.empty:
+        grouped = numeric.replace([np.inf, -np.inf], np.nan).groupby(strata)
+        minimums = grouped.min().reindex(range(n_strata))
+        maximums = grouped.max().reindex(range(n_strata))
+        extremes = {column: (minimums[column].to_numpy(dtype=float), maximums[column].to_numpy(dtype=float))
+                    for column in numeric.columns}
+
+    sample_dates, date_bounds = None, None
+    if dates is not None:
+        index = pd.DatetimeIndex(dates)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        series = pd.Series(index, dtype='datetime64[ns]').groupby(strata)
+        date_bounds = (series.min().reindex(range(n_strata)).to_numpy(dtype='datetime64[ns]'),
+                       series.max().reindex(range(n_strata)).to_numpy(dtype='datetime64[ns]'))
+        sample_dates = index[taken]
+
+    frame = df.iloc[taken].reset_index(drop=True)
+    return StratifiedSample(frame, strata[taken], labels, population, sizes, sample_dates,
+                            extremes, date_bounds)
+
+
+def exists(directory: Path) -> bool:
+    return (Path(directory) / MANIFEST_NAME).exists()
+
+
+def write_stratified_sample(sample: StratifiedSample, directory: Path, data_version: str) -> None:
+    """
+    標本をディレクトリに書き出す（マニフェストは最後に書くため、途中で失敗した標本は読まれない）
+
+    Args:
+        data_version: 標本を作った元データの識別子（読み込み時に現在のデータと照合する）
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / MANIFEST_NAME).unlink(missing_ok=True)
+    sample.frame.to_parquet(directory / _FRAME_FILE, index=False)
+
+    columns = list(sample._extremes)
+    arrays = {'strata': sample.strata, 'population': sample.population, 'sizes': sample.sizes}
+    for position, column in enumerate(columns):
+        arrays[f'min_{position}'], arrays[f'max_{position}'] = sample._extremes[column]
+    if sample.dates is not None:
+        arrays['dates'] = sample.dates.to_numpy(dtype='datetime64[ns]')
+    if sample._date_bounds is not None:
+        arrays['date_min'], arrays['date_max'] = sample._date_bounds
+    np.savez(directory / _ARRAYS_FILE, **arrays)
+
+    manifest = {'data_version': data_version, 'labels': sample.labels, 'extreme_columns': columns}
+    (directory / MANIFEST_NAME).write_text(json.dumps(manifest, ensure_ascii=False), encoding='utf-8')
+
+
+def read_stratified_sample(directory: Path) -> Tuple[str, StratifiedSample]:
+    """
+    write_stratified_sample で書き出した標本を開く
+
+    Returns:
+        (元データの識別子, 標本)
+    """
+    directory = Path(directory)
+    manifest = json.loads((directory / MANIFEST_NAME).read_text(encoding='utf-8'))
+    frame = pd.read_parquet(directory / _FRAME_FILE)
+    with np.load(directory / _ARRAYS_FILE) as arrays:
+        extremes = {column: (arrays[f'min_{position}'], arrays[f'max_{position}'])
+                    for position, column in enumerate(manifest['extreme_columns'])}
+        dates = pd.DatetimeIndex(arrays['dates']) if 'dates' in arrays else None
+        date_bounds = (arrays['date_min'], arrays['date_max']) if 'date_min' in arrays else None
+        sample = StratifiedSample(frame, arrays['strata'], manifest['labels'], arrays['population'],
+                                  arrays['sizes'], dates, extremes, date_bounds)
+    return manifest['data_version'], sample
@@ -0,0 +1,104 @@
+"""Q-Storm Platform - Vectorized group-by aggregation for declarative queries
+
+クエリは「次元ごとのコード配列」と「行×メトリック行列」に落としてから実行する。
+グループ化は混合基数で1本のキーにまとめた np.unique 1回、count/sum/mean は
+np.bincount 1回（全メトリック同時）、min/max/分位点はグループ内ソート1回で求める。
+"""
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+BASIC_AGGREGATIONS = ('count', 'sum', 'mean', 'min', 'max', 'median')
+
+
+def combine_codes(codes: Sequence[np.ndarray], sizes: Sequence[int], n_rows: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    次元ごとのコードを混合基数で1本のキーにまとめ、出現したグループだけに詰める
+
+    Returns:
+        (行ごとのグループ番号, グループ×次元のコード行列)
+        次元が0個の場合は全行が1グループ
+    """
+    flat = np.zeros(n_rows, dtype=np.int64)
+    for dimension_codes, size in zip(codes, sizes):
+        flat = flat * size + dimension_codes
+    keys, groups = np.unique(flat, return_inverse=True)
+
+    decoded = np.empty((len(keys), len(sizes)), dtype=np.int64)
+    remainder = keys.copy()
+    for dimension in reversed(range(len(sizes))):
+        decoded[:, dimension] = remainder % sizes[dimension]
+        remainder //= sizes[dimension]
+    return groups.reshape(-1), decoded
+
+
+def quantile_name(q: float) -> str:
+    return f'q{q:g}'
+
+
+def aggregate(groups: np.ndarray, n_groups: int, values: np.ndarray,
+              aggregations: Sequence[str], quantiles: Sequence[float] = ()) -> Dict[str, np.ndarray]:
+    """
+    グループ×メトリックの集計値
+
+    Args:
+        groups: 行ごとのグループ番号（0 .. n_groups-1）
+        values: (行数, メトリック数)。NaN は欠測として集計から除外
+        aggregations: BASIC_AGGREGATIONS の部分集合
+        quantiles: 追加で求める分位点（0〜1、np.quantile と同じ線形補間）
+
+    Returns:
+        集計名 → (n_groups, メトリック数) の配列（値のないグループは NaN、count は 0）
+    """
+    n_metrics = values.shape[1]
+    valid = np.isfinite(values)
+    # (グループ, メトリック) を1本のコードにして全メトリックを bincount 1回で集計
+    cells = (groups.astype(np.int64)[:, None] * n_metrics + np.arange(n_metrics)).ravel()
+    size = n_groups * n_metrics
+    counts = np.bincount(cells, weights=valid.ravel(), minlength=size).reshape(n_groups, n_metrics)
+
+    result: Dict[str, np.ndarray] = {}
+    if 'count' in aggregations:
+        result['count'] = counts
+    if 'sum' in aggregations or 'mean' in aggregations:
+        sums = np.bincount(cells, weights=np.where(valid, values, 0.0).ravel(),
+                           minlength=size).reshape(n_groups, n_metrics)
+        if 'sum' in aggregations:
+            result['sum'] = sums
+        if 'mean' in aggregations:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                result['mean'] = np.where(counts > 0, sums / counts, np.nan)
+
+    ordered = [q for name, q in (('min', 0.0), ('median', 0.5), ('max', 1.0)) if name in aggregations]
+    ordered.extend(quantiles)
+    if ordered:
+        computed = _sorted_quantiles(groups, n_groups, values, counts, ordered)
+        for name, q in (('min', 0.0), ('median', 0.5), ('max', 1.0)):
+            if name in aggregations:
+                result[name] = computed[q]
+        for q in quantiles:
+            result[quantile_name(q)] = computed[q]
+    return result
+
+
+def _sorted_quantiles(groups: np.ndarray, n_groups: int, values: np.ndarray, counts: np.ndarray,
+                      quantiles: Sequence[float]) -> Dict[float, np.ndarray]:
+    """グループ内で値を昇順に並べ（NaN は末尾）、位置の線形補間で分位点を取り出す"""
+    starts = np.concatenate(([0], np.cumsum(np.bincount(groups, minlength=n_groups))[:-1]))
+    filled = counts > 0
+    result = {q: np.full(counts.shape, np.nan) for q in quantiles}
+    for metric in range(values.shape[1]):
+        column = values[:, metric]
+        column = np.where(np.isfinite(column), column, np.nan)
+        ordered = column[np.lexsort((column, groups))]
+        n_valid = counts[:, metric]
+        for q in quantiles:
+            position = np.maximum(n_valid - 1, 0) * q
+            lower = np.floor(position).astype(np.int64)
+            upper = np.ceil(position).astype(np.int64)
+            fraction = position - lower
+            low_values = ordered[np.minimum(starts + lower, len(ordered) - 1)]
+            high_values = ordered[np.minimum(starts + upper, len(ordered) - 1)]
+            result[q][:, metric] = np.where(filled[:, metric],
+                                            low_values + (high_values - low_values) * fraction, np.nan)
+    return result
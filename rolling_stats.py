@@ -0,0 +1,119 @@
+"""Q-Storm Platform - Vectorized rolling-window statistics
+
+期間×系列の行列（行=期間、列=メトリック×店舗）に対し、
+移動平均・移動標準偏差・移動最小/最大・EWMA・前期比を列方向に一括計算する。
+"""
+from typing import Dict, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# EWMA の減衰係数 d^-k がオーバーフローしないチャンク長の上限指数
+_EWMA_MAX_EXPONENT = 300.0
+
+
+def _window_sums(matrix: np.ndarray, window: int) -> np.ndarray:
+    cumulative = np.cumsum(matrix, axis=0)
+    cumulative = np.vstack([np.zeros((1, matrix.shape[1])), cumulative])
+    return cumulative[window:] - cumulative[:-window]
+
+
+def _pad_head(values: np.ndarray, window: int) -> np.ndarray:
+    """先頭 window-1 期間（窓が満たない区間）を NaN で埋める"""
+    head = np.full((window - 1, values.shape[1]), np.nan)
+    return np.vstack([head, values])
+
+
+def rolling_mean_std(matrix: np.ndarray, window: int):
+    """累積和による移動平均・移動標準偏差（不偏）"""
+    # 桁落ちを抑えるため列平均で中心化してから二乗和を取る
+    offset = matrix.mean(axis=0) if matrix.size else np.zeros(matrix.shape[1])
+    centered = matrix - offset
+    sums = _window_sums(centered, window)
+    squares = _window_sums(centered ** 2, window)
+    mean = sums / window + offset
+    if window > 1:
+        variance = np.maximum(squares - sums ** 2 / window, 0.0) / (window - 1)
+    else:
+        variance = np.full_like(sums, np.nan)
+    return _pad_head(mean, window), _pad_head(np.sqrt(variance), window)
+
+
+def rolling_min_max(matrix: np.ndarray, window: int):
+    """ストライドビュー（コピーなし）による移動最小/最大"""
+    windows = sliding_window_view(matrix, window, axis=0)
+    return _pad_head(windows.min(axis=-1), window), _pad_head(windows.max(axis=-1), window)
+
+
+def ewma(matrix: np.ndarray, span: int) -> np.ndarray:
+    """
+    指数加重移動平均（pandas の ewm(span, adjust=True).mean() と同等）
+
+    y_t = Σ d^(t-i) x_i / Σ d^(t-i) を、チャンクごとに d^-i で重み付けした
+    累積和として計算し、チャンク間は分子・分母を繰り越す。
+    """
+    alpha = 2.0 / (span + 1.0)
+    decay = 1.0 - alpha
+    periods, n_series = matrix.shape
+    result = np.empty_like(matrix, dtype=float)
+    if periods == 0 or decay <= 0:
+        return matrix.astype(float)
+
+    chunk = max(1, int(_EWMA_MAX_EXPONENT / -np.log(decay)))
+    numerator = np.zeros(n_series)
+    denominator = 0.0
+    for start in range(0, periods, chunk):
+        block = matrix[start:start + chunk]
+        steps = np.arange(block.shape[0])
+        growth = decay ** -steps
+        shrink = decay ** steps
+        block_num = (decay * numerator + np.cumsum(block * growth[:, None], axis=0)) * shrink[:, None]
+        block_den = (decay * denominator + np.cumsum(growth)) * shrink
+        result[start:start + chunk] = block_num / block_den[:, None]
+        numerator = block_num[-1]
+        denominator = block_den[-1]
+    return result
+
+
+def period_growth(matrix: np.ndarray, lag: int) -> np.ndarray:
+    """lag 期前に対する増減率（%）。基準値が0の期間は NaN"""
+    growth = np.full_like(matrix, np.nan, dtype=float)
+    if lag < matrix.shape[0]:
+        base = matrix[:-lag]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            growth[lag:] = np.where(base != 0, (matrix[lag:] - base) / np.abs(base) * 100, np.nan)
+    return growth
+
+
+def rolling_statistics(matrix: np.ndarray, window: int, span: Optional[int] = None,
+                       growth_lag: int = 1) -> Dict[str, np.ndarray]:
+    """
+    行列の全列について移動統計量を一括計算
+
+    Args:
+        matrix: 期間×系列の2次元配列（欠損なし）
+        window: 移動窓の期間数
+        span: EWMA のスパン（省略時は window）
+        growth_lag: 前期比の比較期間数
+
+    Returns:
+        dict: rolling_mean, rolling_std, rolling_min, rolling_max, ewma, growth_rate
+              （いずれも matrix と同じ形状、窓が満たない期間は NaN）
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    if matrix.ndim == 1:
+        matrix = matrix[:, None]
+    if window > matrix.shape[0]:
+        nan = np.full_like(matrix, np.nan)
+        mean = std = minimum = maximum = nan
+    else:
+        mean, std = rolling_mean_std(matrix, window)
+        minimum, maximum = rolling_min_max(matrix, window)
+    return {
+        'rolling_mean': mean,
+        'rolling_std': std,
+        'rolling_min': minimum,
+        'rolling_max': maximum,
+        'ewma': ewma(matrix, span or window),
+        'growth_rate': period_growth(matrix, growth_lag),
+    }
@@ -0,0 +1,92 @@
+"""Q-Storm Platform - Merging per-session aggregates for multi-session (union) analysis
+
+複数セッションの和集合に対する統計量を、行データを連結せずにセッションごとの集計済みの値から求める。
+
+- 件数・平均・中心モーメント（分散・歪度・尖度）: Pébay の結合式で逐次結合
+- 分位点: ソート済み配列の組から順序統計量を二分探索で選択（連結して np.quantile した結果と同一）
+"""
+from typing import Sequence, Tuple
+
+import numpy as np
+
+# (件数, 平均, M2, M3, M4)  Mk = Σ (x - 平均)^k
+Moments = Tuple[int, float, float, float, float]
+
+
+def moments_from_statistics(count: int, mean: float, std: float, skewness: float, kurtosis: float) -> Moments:
+    """
+    集計済みの統計量（std は不偏、skewness / kurtosis は scipy.stats 既定の標本歪度・超過尖度）から中心モーメントの和へ
+    """
+    if count == 0:
+        return 0, 0.0, 0.0, 0.0, 0.0
+    m2 = std ** 2 * (count - 1) / count if count > 1 else 0.0
+    if m2 <= 0:
+        # 定数・1件のセッションの歪度・尖度は NaN のため、高次モーメントは 0（全値が平均に一致）
+        return count, mean, 0.0, 0.0, 0.0
+    return (count, mean, m2 * count, skewness * m2 ** 1.5 * count, (kurtosis + 3) * m2 ** 2 * count)
+
+
+def merge_moments(parts: Sequence[Moments]) -> Moments:
+    """中心モーメントの和を結合（Pébay, 2008）"""
+    n, mean, m2, m3, m4 = 0, 0.0, 0.0, 0.0, 0.0
+    for n_b, mean_b, m2_b, m3_b, m4_b in parts:
+        if n_b == 0:
+            continue
+        n_a = n
+        n = n_a + n_b
+        delta = mean_b - mean
+        m4 = (m4 + m4_b
+              + delta ** 4 * n_a * n_b * (n_a ** 2 - n_a * n_b + n_b ** 2) / n ** 3
+              + 6 * delta ** 2 * (n_a ** 2 * m2_b + n_b ** 2 * m2) / n ** 2
+              + 4 * delta * (n_a * m3_b - n_b * m3) / n)
+        m3 = (m3 + m3_b
+              + delta ** 3 * n_a * n_b * (n_a - n_b) / n ** 2
+              + 3 * delta * (n_a * m2_b - n_b * m2) / n)
+        m2 = m2 + m2_b + delta ** 2 * n_a * n_b / n
+        mean = mean + delta * n_b / n
+    return n, mean, m2, m3, m4
+
+
+def describe_moments(moments: Moments) -> Tuple[float, float, float, float]:
+    """(平均, 不偏標準偏差, 標本歪度, 超過尖度)。分散 0 の場合の歪度・尖度は 0"""
+    n, mean, m2, m3, m4 = moments
+    std = float(np.sqrt(m2 / (n - 1))) if n > 1 else 0.0
+    if m2 <= 0:
+        return float(mean), std, 0.0, 0.0
+    variance = m2 / n
+    return float(mean), std, float(m3 / n / variance ** 1.5), float(m4 / n / variance ** 2 - 3)
+
+
+def order_statistic(arrays: Sequence[np.ndarray], k: int) -> float:
+    """
+    昇順ソート済み配列の組の和集合で k 番目（0始まり）の値
+
+    値 v 以下の件数 rank(v) = Σ searchsorted(a, v, 'right') は v について単調なので、
+    k 番目の値を含む配列ではその値が rank(a[j]) > k を満たす最小の要素になる。
+    """
+    def rank(value: float, side: str) -> int:
+        return sum(int(np.searchsorted(values, value, side=side)) for values in arrays)
+
+    for values in arrays:
+        lo, hi = 0, values.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if rank(values[mid], 'right') > k:
+                hi = mid
+            else:
+                lo = mid + 1
+        if lo < values.size and rank(values[lo], 'left') <= k:
+            return float(values[lo])
+    raise IndexError('order statistic out of range')
+
+
+def quantile(arrays: Sequence[np.ndarray], q: float) -> float:
+    """ソート済み配列の組の和集合の分位点（線形補間、np.quantile の既定と同一）"""
+    size = sum(values.size for values in arrays)
+    position = q * (size - 1)
+    lower = int(np.floor(position))
+    upper = min(lower + 1, size - 1)
+    weight = position - lower
+    lower_value = order_statistic(arrays, lower)
+    upper_value = order_statistic(arrays, upper) if upper != lower else lower_value
+    return float(lower_value * (1 - weight) + upper_value * weight)
@@ -0,0 +1,79 @@
+"""Q-Storm Platform - Vectorized k-means for store clustering"""
+from typing import Dict, Tuple
+
+import numpy as np
+
+
+def standardize(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """列ごとの z スコア化（分散0の列は0）。戻り値: (標準化行列, 平均, 標準偏差)"""
+    mean = matrix.mean(axis=0)
+    std = matrix.std(axis=0)
+    scale = np.where(std > 0, std, 1.0)
+    return (matrix - mean) / scale * (std > 0), mean, std
+
+
+def _squared_distances(points: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """点×中心の二乗ユークリッド距離（‖x‖² - 2x·c + ‖c‖²）"""
+    distances = (np.einsum('ij,ij->i', points, points)[:, None]
+                 - 2.0 * points @ centers.T
+                 + np.einsum('ij,ij->i', centers, centers)[None, :])
+    return np.maximum(distances, 0.0)
+
+
+def _kmeans_plus_plus(points: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """k-means++ による初期中心（既存中心からの距離²に比例して抽出）"""
+    centers = np.empty((k, points.shape[1]))
+    centers[0] = points[rng.integers(points.shape[0])]
+    closest = _squared_distances(points, centers[:1])[:, 0]
+    for index in range(1, k):
+        total = closest.sum()
+        if total > 0:
+            choice = rng.choice(points.shape[0], p=closest / total)
+        else:
+            choice = rng.integers(points.shape[0])
+        centers[index] = points[choice]
+        closest = np.minimum(closest, _squared_distances(points, centers[index:index + 1])[:, 0])
+    return centers
+
+
+def _lloyd(points: np.ndarray, centers: np.ndarray, max_iter: int, tol: float):
+    for iteration in range(1, max_iter + 1):
+        distances = _squared_distances(points, centers)
+        labels = distances.argmin(axis=1)
+        counts = np.bincount(labels, minlength=len(centers))
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, points)
+        new_centers = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centers)
+        # 空クラスタは現在の中心から最も遠い点で置き換える
+        for empty in np.flatnonzero(counts == 0):
+            farthest = distances[np.arange(len(points)), labels].argmax()
+            new_centers[empty] = points[farthest]
+            distances[farthest] = 0.0
+        shift = np.sum((new_centers - centers) ** 2)
+        centers = new_centers
+        if shift <= tol:
+            break
+    distances = _squared_distances(points, centers)
+    labels = distances.argmin(axis=1)
+    inertia = float(distances[np.arange(len(points)), labels].sum())
+    return labels, centers, inertia, iteration
+
+
+def kmeans(points: np.ndarray, k: int, n_init: int = 5, max_iter: int = 100,
+           tol: float = 1e-8, seed: int = 0) -> Dict[str, np.ndarray]:
+    """
+    k-means++ 初期化の k-means（n_init 回試行し、慣性最小の結果を採用）
+
+    Returns:
+        dict: labels, centers, inertia, iterations
+    """
+    points = np.asarray(points, dtype=float)
+    if not 1 <= k <= points.shape[0]:
+        raise ValueError(f'k must be between 1 and the number of samples ({points.shape[0]})')
+    rng = np.random.default_rng(seed)
+    best = None
+    for _ in range(n_init):
+        labels, centers, inertia, iterations = _lloyd(points, _kmeans_plus_plus(points, k, rng), max_iter, tol)
+        if best is None or inertia < best['inertia']:
+            best = {'labels': labels, 'centers': centers, 'inertia': inertia, 'iterations': iterations}
+    return best
@@ -0,0 +1,126 @@
+"""Anomaly scan tests."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import werkzeug
+
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '3.1.3'
+
+# Ensure project root is importable
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from anomaly_detector import detect_anomalies, flagged_cells  # noqa: E402
+from app_improved import analysis_cache, app, data_storage  # noqa: E402
+
+
+def _build_daily_dataframe(days: int = 180) -> pd.DataFrame:
+    rng = np.random.default_rng(12)
+    dates = pd.date_range('2024-01-01', periods=days, freq='D')
+    frames = []
+    for shop in ['恵比寿', '横浜元町', '銀座']:
+        weekend = np.where(dates.dayofweek >= 5, 1.5, 1.0)
+        frames.append(pd.DataFrame({
+            'shop': shop,
+            'Date': dates,
+            'Total_Sales': 300000 * weekend + rng.normal(0, 10000, days),
+            'Number_of_guests': 100 * weekend + rng.normal(0, 5, days),
+        }))
+    df = pd.concat(frames, ignore_index=True)
+    df.loc[(df['shop'] == '銀座') & (df['Date'] == '2024-03-05'), 'Total_Sales'] = 0.0
+    df.loc[(df['shop'] == '恵比寿') & (df['Date'] == '2024-04-10'), 'Number_of_guests'] = 900.0
+    return df
+
+
+def test_detect_anomalies_flags_injected_cells():
+    rng = np.random.default_rng(13)
+    weekdays = np.arange(140) % 7
+    matrix = 100 + 50 * (weekdays[:, None] >= 5) + rng.normal(0, 2, (140, 5))
+    matrix[30, 2] = 400.0
+    matrix[70, 4] = 0.0
+
+    result = detect_anomalies(matrix, weekdays)
+    rows, columns, method_mask = flagged_cells(result)
+    flagged = set(zip(rows.tolist(), columns.tolist()))
+    assert {(30, 2), (70, 4)} <= flagged
+    assert (rows[0], columns[0]) == (30, 2)
+    assert method_mask[0].all()
+    # 週末の高い売上は曜日季節残差では異常にならない
+    assert not result['flags']['seasonal'][5].any()
+
+
+def test_anomaly_endpoint_pages_flagged_cells():
+    session_id = 'session_test_anomalies'
+    data_storage[session_id] = _build_daily_dataframe()
+    analysis_cache.invalidate_session(session_id)
+
+    try:
+        client = app.test_client()
+        response = client.post('/api/v1/analysis/anomalies',
+                               json={'session_id': session_id, 'limit': 1})
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body['total_cells'] == 180 * 2 * 4
+        assert body['methods'] == ['seasonal']
+        assert 4 <= body['flagged_count'] <= 20
+        first = body['anomalies'][0]
+        assert (first['date'], first['metric'], first['store']) == ('2024-04-10', 'Number_of_guests', '恵比寿')
+        assert body['next_cursor'] == '1'
+
+        collected = list(body['anomalies'])
+        hits_before = analysis_cache.hits
+        cursor = body['next_cursor']
+        while cursor is not None:
+            page = client.post('/api/v1/analysis/anomalies', json={
+                'session_id': session_id, 'limit': 1, 'cursor': cursor}).get_json()
+            collected.extend(page['anomalies'])
+            cursor = page['next_cursor']
+        assert len(collected) == body['flagged_count']
+        assert analysis_cache.hits == hits_before + body['flagged_count'] - 1
+        assert any((a['date'], a['metric'], a['store']) == ('2024-03-05', 'Total_Sales', '銀座')
+                   for a in collected)
+
+        response = client.post('/api/v1/analysis/anomalies', json={
+            'session_id': session_id, 'methods': ['robust_z', 'iqr'], 'metrics': ['Total_Sales']})
+        assert response.status_code == 200
+        assert response.get_json()['anomalies'][0]['methods'] == ['robust_z', 'iqr']
+
+        response = client.post('/api/v1/analysis/anomalies',
+                               json={'session_id': session_id, 'methods': ['zscore']})
+        assert response.status_code == 400
+        response = client.post('/api/v1/analysis/anomalies',
+                               json={'session_id': session_id, 'cursor': 'abc'})
+        assert response.status_code == 400
+    finally:
+        data_storage.pop(session_id, None)
+        analysis_cache.invalidate_session(session_id)
+
+
+def test_store_opening_partway_is_not_flagged():
+    # 2店舗目が 2024-03-01 に開店: 開店前の日は未観測（0 ではない）として判定しない
+    rng = np.random.default_rng(14)
+    dates = pd.date_range('2024-01-01', '2024-06-30', freq='D')
+    frames = []
+    for shop, opened in (('恵比寿', '2024-01-01'), ('銀座', '2024-03-01')):
+        days = dates[dates >= opened]
+        weekend = np.where(days.dayofweek >= 5, 1.4, 1.0)
+        frames.append(pd.DataFrame({'shop': shop, 'Date': days,
+                                    'Total_Sales': 200000 * weekend + rng.normal(0, 5000, len(days))}))
+    df = pd.concat(frames, ignore_index=True)
+    df.loc[(df['shop'] == '銀座') & (df['Date'] == '2024-05-15'), 'Total_Sales'] = 600000.0
+
+    session_id = 'session_test_anomalies_opening'
+    data_storage[session_id] = df
+    analysis_cache.invalidate_session(session_id)
+    try:
+        client = app.test_client()
+        body = client.post('/api/v1/analysis/anomalies', json={'session_id': session_id, 'limit': 500}).get_json()
+        # 合計系列も開店前の期間は判定対象外（182日 + 店舗ごとの観測日）
+        assert body['total_cells'] == 122 + 182 + 122
+        assert all(a['date'] >= '2024-03-01' for a in body['anomalies'])
+        assert ('2024-05-15', '銀座') in {(a['date'], a['store']) for a in body['anomalies']}
+    finally:
+        data_storage.pop(session_id, None)
+        analysis_cache.invalidate_session(session_id)
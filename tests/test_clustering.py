@@ -0,0 +1,91 @@
+"""Store clustering tests."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import werkzeug
+
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '3.1.3'
+
+# Ensure project root is importable
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_improved import StoreClusterAnalyzer, analysis_cache, app, data_storage  # noqa: E402
+from lang_agent.chain import DEFAULT_CATEGORY_COLUMNS as LANGCHAIN_DEFAULT_CATEGORIES  # noqa: E402
+from store_clustering import kmeans  # noqa: E402
+
+
+def _build_store_dataframe(stores_per_group: int = 100, days: int = 30) -> pd.DataFrame:
+    """メンズ中心・レディース中心の2グループの店舗"""
+    rng = np.random.default_rng(18)
+    frames = []
+    for group in range(2):
+        for index in range(stores_per_group):
+            sales = rng.normal(300000, 20000, days)
+            frame = pd.DataFrame({
+                'shop': f'store_{group}_{index:03d}',
+                'Date': pd.date_range('2024-01-01', periods=days, freq='D'),
+                'Total_Sales': sales,
+                'gross_profit': sales * (0.35 if group == 0 else 0.5),
+                'Number_of_guests': rng.integers(80, 120, days).astype(float),
+            })
+            for column in LANGCHAIN_DEFAULT_CATEGORIES:
+                mens = column.startswith('Mens_')
+                weight = 3.0 if mens == (group == 0) else 1.0
+                frame[column] = sales * weight * rng.uniform(0.9, 1.1, days) / 10
+            frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_kmeans_recovers_separated_groups():
+    rng = np.random.default_rng(19)
+    centers = np.array([[0.0, 0.0], [10.0, 0.0], [0.0, 10.0]])
+    points = np.vstack([center + rng.normal(0, 0.5, (50, 2)) for center in centers])
+
+    result = kmeans(points, 3, seed=1)
+    labels = result['labels']
+    for group in range(3):
+        assert len(set(labels[group * 50:(group + 1) * 50])) == 1
+    assert len(set(labels)) == 3
+
+
+def test_store_clustering_separates_category_mix():
+    df = _build_store_dataframe()
+    result = StoreClusterAnalyzer(df).analyze(k=2)
+
+    assert '客単価' in result['features'] and '粗利率' in result['features'] and '日販' in result['features']
+    labels = dict(zip(result['stores'], result['assignments']))
+    groups = {group: {labels[s] for s in result['stores'] if s.startswith(f'store_{group}_')} for group in range(2)}
+    assert len(groups[0]) == 1 and len(groups[1]) == 1 and groups[0] != groups[1]
+    margin = {c['cluster']: c['centroid']['粗利率'] for c in result['clusters']}
+    assert sorted(margin.values()) == pytest.approx([35.0, 50.0])
+
+
+def test_clustering_endpoint_caches_and_validates():
+    session_id = 'session_test_clustering'
+    data_storage[session_id] = _build_store_dataframe(stores_per_group=10, days=10)
+    analysis_cache.invalidate_session(session_id)
+
+    try:
+        client = app.test_client()
+        payload = {'session_id': session_id, 'k': 2, 'features': ['粗利率', '客単価']}
+        response = client.post('/api/v1/analysis/clustering', json=payload)
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body['features'] == ['粗利率', '客単価']
+        assert sum(cluster['size'] for cluster in body['clusters']) == 20
+
+        hits_before = analysis_cache.hits
+        assert client.post('/api/v1/analysis/clustering', json=payload).get_json() == body
+        assert analysis_cache.hits == hits_before + 1
+
+        response = client.post('/api/v1/analysis/clustering', json={**payload, 'features': ['unknown']})
+        assert response.status_code == 400
+        response = client.post('/api/v1/analysis/clustering', json={**payload, 'k': 1})
+        assert response.status_code == 400
+    finally:
+        data_storage.pop(session_id, None)
+        analysis_cache.invalidate_session(session_id)
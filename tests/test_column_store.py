@@ -0,0 +1,104 @@
+"""Memory-mapped session column store tests."""
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import werkzeug
+
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '3.1.3'
+
+# Ensure project root is importable
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import column_store  # noqa: E402
+import config  # noqa: E402
+from app_improved import (  # noqa: E402
+    analysis_cache, app, column_stores, data_storage, filter_cache, get_session_upload_dir, open_column_store,
+    persist_session_columns)
+from tests.generate_test_data import generate_sample_store_data  # noqa: E402
+
+SESSION_ID = 'session_test_column_store'
+
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    csv_path = tmp_path / 'test_data.csv'
+    generate_sample_store_data(output_path=str(csv_path))
+    df = pd.read_csv(csv_path)
+    df['カテゴリ'] = np.where(df['月'] % 3 == 0, '衣料', '雑貨')
+    data_storage[SESSION_ID] = df
+    persist_session_columns(SESSION_ID, df)
+    monkeypatch.setattr(config, 'ANALYSIS_BACKEND', 'pandas')
+    try:
+        yield df, monkeypatch
+    finally:
+        data_storage.pop(SESSION_ID, None)
+        column_stores.pop(SESSION_ID, None)
+        analysis_cache.invalidate_session(SESSION_ID)
+        filter_cache.invalidate_session(SESSION_ID)
+        shutil.rmtree(get_session_upload_dir(SESSION_ID), ignore_errors=True)
+
+
+def test_columns_are_memory_mapped(session):
+    df, _ = session
+    store = open_column_store(SESSION_ID)
+    assert open_column_store(SESSION_ID) is store
+    assert store.rows == len(df)
+    assert isinstance(store.array('売上金額'), np.memmap)
+    np.testing.assert_array_equal(store.array('売上金額'), df['売上金額'].to_numpy())
+    # 数値列は元の dtype のまま mmap 配列をコピーせずに返す
+    assert store.numeric('売上金額') is store.array('売上金額')
+    assert store.numeric('売上金額').dtype == df['売上金額'].dtype
+
+    codes, labels = store.codes('店舗名')
+    assert isinstance(codes, np.memmap)
+    assert [labels[code] for code in codes[:3]] == df['店舗名'].iloc[:3].tolist()
+    assert np.asarray(store.dates())[0] == np.datetime64('2023-01-01')
+    assert list(store.schema.columns) == list(df.columns)
+    assert (store.schema.dtypes == df.dtypes).all()
+
+    directory = get_session_upload_dir(SESSION_ID) / column_store.COLUMNS_DIR
+    assert column_store.exists(directory)
+
+
+def test_columns_backend_matches_pandas(session):
+    _, monkeypatch = session
+    requests = [
+        ('/api/v1/analysis/timeseries', {'metric': '売上金額', 'time_unit': '週', 'store': '恵比寿',
+                                         'start_date': '2023-02-10', 'end_date': '2023-09-30'}),
+        ('/api/v1/analysis/histogram', {'metric': '客単価', 'bins': 15, 'start_date': '2023-03-01'}),
+        ('/api/v1/analysis/pareto', {'metric': '粗利額', 'category_column': 'カテゴリ', 'store': '横浜元町'}),
+        ('/api/v2/analysis/pareto', {'category_type': 'product_category', 'metric': 'Total_Sales',
+                                     'shop': '恵比寿', 'start_date': '2023-04-01', 'end_date': '2023-06-30'}),
+    ]
+    with app.test_client() as client:
+        for path, payload in requests:
+            results = []
+            for backend in ('pandas', 'columns'):
+                monkeypatch.setattr(config, 'ANALYSIS_BACKEND', backend)
+                analysis_cache.invalidate_session(SESSION_ID)
+                response = client.post(path, json={'session_id': SESSION_ID, **payload})
+                assert response.status_code == 200, response.get_json()
+                body = response.get_json()
+                results.append(body.get('data', body))
+            pandas_result, columns_result = results
+            if path.endswith('timeseries'):
+                assert columns_result['dates'] == pandas_result['dates']
+                np.testing.assert_allclose(columns_result['values'], pandas_result['values'])
+            elif path.endswith('histogram'):
+                assert columns_result['frequencies'] == pandas_result['frequencies']
+                for key in ('mean', 'median', 'std', 'min', 'max', 'skewness', 'kurtosis'):
+                    assert columns_result['statistics'][key] == pytest.approx(pandas_result['statistics'][key])
+                assert columns_result['statistics']['percentiles'] == \
+                    pytest.approx(pandas_result['statistics']['percentiles'])
+                assert columns_result['statistics']['normality'] == \
+                    pytest.approx(pandas_result['statistics']['normality'])
+            else:
+                for key in ('execution_time', 'analysis_id'):
+                    pandas_result.pop(key, None)
+                    columns_result.pop(key, None)
+                assert columns_result == pandas_result
@@ -0,0 +1,88 @@
+"""Period comparison tests."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import werkzeug
+
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '3.1.3'
+
+# Ensure project root is importable
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_improved import analysis_cache, app, data_storage  # noqa: E402
+
+
+def _build_daily_dataframe() -> pd.DataFrame:
+    rng = np.random.default_rng(14)
+    dates = pd.date_range('2023-01-01', '2024-06-30', freq='D')
+    frames = []
+    for shop, scale in [('恵比寿', 1.0), ('横浜元町', 0.5)]:
+        frames.append(pd.DataFrame({
+            'shop': shop,
+            'Date': dates,
+            'Total_Sales': scale * rng.integers(100000, 200000, len(dates)).astype(float),
+            'Number_of_guests': rng.integers(50, 150, len(dates)).astype(float),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def _post(client, payload):
+    response = client.post('/api/v1/analysis/comparison', json=payload)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_comparison_modes_match_direct_aggregation():
+    session_id = 'session_test_comparison'
+    df = _build_daily_dataframe()
+    data_storage[session_id] = df
+    analysis_cache.invalidate_session(session_id)
+
+    try:
+        client = app.test_client()
+        metrics = ['Total_Sales', 'Number_of_guests']
+
+        body = _post(client, {'session_id': session_id, 'metrics': metrics, 'mode': 'yoy',
+                              'start_date': '2024-04-01', 'end_date': '2024-04-30'})
+        assert body['periods'] == ['2024-04-30T00:00:00']
+        assert body['base_periods'] == ['2023-04-30T00:00:00']
+        ebisu = next(s for s in body['series'] if s['metric'] == 'Total_Sales' and s['store'] == '恵比寿')
+        shop = df[df['shop'] == '恵比寿']
+        current = shop[(shop['Date'] >= '2024-04-01') & (shop['Date'] <= '2024-04-30')]['Total_Sales'].sum()
+        base = shop[(shop['Date'] >= '2023-04-01') & (shop['Date'] <= '2023-04-30')]['Total_Sales'].sum()
+        assert ebisu['current'] == [pytest.approx(current)]
+        assert ebisu['base'] == [pytest.approx(base)]
+        assert ebisu['growth_rate'] == [pytest.approx((current - base) / base * 100)]
+        assert len(body['series']) == 2 * 3
+
+        body = _post(client, {'session_id': session_id, 'metrics': ['Total_Sales'],
+                              'mode': 'same_weekday_yoy', 'start_date': '2024-03-01', 'end_date': '2024-03-07'})
+        weekdays = [pd.Timestamp(p).dayofweek for p in body['periods']]
+        assert weekdays == [pd.Timestamp(p).dayofweek for p in body['base_periods']]
+        total = body['series'][0]
+        assert total['store'] is None and total['total']['comparable_periods'] == 7
+
+        body = _post(client, {'session_id': session_id, 'metrics': ['Total_Sales'], 'mode': 'mom',
+                              'start_date': '2023-01-01', 'end_date': '2023-02-28'})
+        assert body['base_periods'] == [None, '2023-01-31T00:00:00']
+        assert body['series'][0]['delta'][0] is None
+        assert body['series'][0]['total']['comparable_periods'] == 1
+
+        body = _post(client, {'session_id': session_id, 'metrics': ['Total_Sales'], 'mode': 'store',
+                              'base_store': '恵比寿', 'start_date': '2024-01-01', 'end_date': '2024-06-30'})
+        assert [s['store'] for s in body['series']] == ['横浜元町']
+        assert body['series'][0]['total']['growth_rate'] == pytest.approx(-50, abs=5)
+
+        response = client.post('/api/v1/analysis/comparison',
+                               json={'session_id': session_id, 'metrics': metrics, 'mode': 'store'})
+        assert response.status_code == 400
+        response = client.post('/api/v1/analysis/comparison',
+                               json={'session_id': session_id, 'metrics': metrics, 'mode': 'wow'})
+        assert response.status_code == 400
+    finally:
+        data_storage.pop(session_id, None)
+        analysis_cache.invalidate_session(session_id)
@@ -0,0 +1,90 @@
+"""DuckDB analysis backend tests (results must match the pandas path)."""
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import werkzeug
+
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '3.1.3'
+
+# Ensure project root is importable
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+pytest.importorskip('duckdb')
+
+import config  # noqa: E402
+from app_improved import analysis_cache, app, get_session_upload_dir  # noqa: E402
+from tests.generate_test_data import generate_sample_store_data  # noqa: E402
+
+SESSION_ID = 'session_test_duckdb_backend'
+
+
+@pytest.fixture
+def parquet_session(tmp_path, monkeypatch):
+    csv_path = tmp_path / 'test_data.csv'
+    generate_sample_store_data(output_path=str(csv_path))
+    session_dir = get_session_upload_dir(SESSION_ID)
+    session_dir.mkdir(parents=True, exist_ok=True)
+    pd.read_csv(csv_path).to_parquet(session_dir / 'cleaned_data.parquet', index=False)
+    monkeypatch.setattr(config, 'ANALYSIS_BACKEND', 'pandas')
+    try:
+        yield monkeypatch
+    finally:
+        analysis_cache.invalidate_session(SESSION_ID)
+        shutil.rmtree(session_dir, ignore_errors=True)
+
+
+def _post_both(monkeypatch, path, payload):
+    """同じリクエストを pandas / duckdb 両バックエンドで実行"""
+    results = []
+    with app.test_client() as client:
+        for backend in ('pandas', 'duckdb'):
+            monkeypatch.setattr(config, 'ANALYSIS_BACKEND', backend)
+            analysis_cache.invalidate_session(SESSION_ID)
+            response = client.post(path, json={'session_id': SESSION_ID, **payload})
+            assert response.status_code == 200, response.get_json()
+            body = response.get_json()
+            results.append(body.get('data', body))
+    return results
+
+
+def test_timeseries_and_histogram_match_pandas(parquet_session):
+    pandas_result, duckdb_result = _post_both(parquet_session, '/api/v1/analysis/timeseries', {
+        'metric': '売上金額', 'time_unit': '週', 'store': '恵比寿',
+        'start_date': '2023-02-10', 'end_date': '2023-09-30'})
+    assert duckdb_result['dates'] == pandas_result['dates']
+    np.testing.assert_allclose(duckdb_result['values'], pandas_result['values'])
+
+    pandas_result, duckdb_result = _post_both(parquet_session, '/api/v1/analysis/histogram', {
+        'metric': '客単価', 'bins': 15, 'start_date': '2023-03-01'})
+    assert duckdb_result['frequencies'] == pandas_result['frequencies']
+    np.testing.assert_allclose(duckdb_result['bin_edges'], pandas_result['bin_edges'])
+    for key in ('mean', 'median', 'std', 'min', 'max', 'skewness', 'kurtosis'):
+        assert duckdb_result['statistics'][key] == pytest.approx(pandas_result['statistics'][key], rel=1e-9)
+    for key, value in pandas_result['statistics']['percentiles'].items():
+        assert duckdb_result['statistics']['percentiles'][key] == pytest.approx(value, rel=1e-9)
+
+
+def test_pareto_matches_pandas(parquet_session):
+    for payload in ({'metric': '売上金額', 'category_column': '店舗名'},
+                    {'metric': '粗利額', 'category_column': '店舗名', 'store': '横浜元町'}):
+        pandas_result, duckdb_result = _post_both(parquet_session, '/api/v1/analysis/pareto', payload)
+        assert duckdb_result['abc_classification'] == pandas_result['abc_classification']
+        assert duckdb_result['statistics'] == pandas_result['statistics']
+        assert duckdb_result['chart'] == pandas_result['chart']
+
+    # 商品カテゴリ列の合計（期間・店舗条件つき）
+    pandas_result, duckdb_result = _post_both(parquet_session, '/api/v2/analysis/pareto', {
+        'category_type': 'product_category', 'metric': 'Total_Sales', 'shop': '恵比寿',
+        'start_date': '2023-04-01', 'end_date': '2023-06-30'})
+    assert duckdb_result == pandas_result
+
+    with app.test_client() as client:
+        parquet_session.setattr(config, 'ANALYSIS_BACKEND', 'duckdb')
+        response = client.post('/api/v1/analysis/timeseries',
+                               json={'session_id': SESSION_ID, 'metric': '売上金額', 'store': '存在しない店舗'})
+        assert response.status_code == 400
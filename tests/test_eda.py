@@ -0,0 +1,103 @@
+"""EDA profiling tests."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import werkzeug
+
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '3.1.3'
+
+# Ensure project root is importable
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_improved import analysis_cache, app, data_storage, dataset_versions  # noqa: E402
+from eda_profiler import pairwise_correlation, profile_dataframe  # noqa: E402
+
+
+def _build_fixture_dataframe(rows: int = 500) -> pd.DataFrame:
+    rng = np.random.default_rng(8)
+    sales = rng.normal(300000, 50000, rows)
+    df = pd.DataFrame({
+        'shop': rng.choice(['恵比寿', '横浜元町', '銀座'], rows),
+        'Date': pd.date_range('2023-01-01', periods=rows, freq='D'),
+        'Total_Sales': sales,
+        'gross_profit': sales * 0.4 + rng.normal(0, 5000, rows),
+        'Number_of_guests': rng.integers(50, 300, rows).astype(float),
+        'Mens_KNIT': rng.choice([0.0, 1000.0, 2500.0], rows),
+    })
+    df.loc[::25, 'Number_of_guests'] = np.nan
+    df.loc[3, 'Mens_KNIT'] = np.inf
+    return df
+
+
+def test_profile_matches_pandas_reference():
+    df = _build_fixture_dataframe()
+    profile = profile_dataframe(df, max_workers=2)
+    numeric = df.select_dtypes(include=[np.number]).replace([np.inf, -np.inf], np.nan)
+
+    for column in numeric.columns:
+        series = numeric[column].dropna()
+        summary = profile['columns'][column]
+        assert summary['count'] == series.size
+        assert summary['mean'] == pytest.approx(series.mean())
+        assert summary['std'] == pytest.approx(series.std())
+        assert summary['skewness'] == pytest.approx(series.skew(), rel=0.02, abs=1e-3)
+        assert summary['quantiles']['0.25'] == pytest.approx(series.quantile(0.25))
+        assert summary['max'] == pytest.approx(series.max())
+        assert summary['unique'] == series.nunique()
+
+    assert profile['columns']['Number_of_guests']['null_count'] == 20
+    assert profile['columns']['Mens_KNIT']['inf_count'] == 1
+    assert profile['columns']['shop']['unique'] == 3
+
+    expected = numeric.corr().to_numpy()
+    assert np.array(profile['correlation']['matrix'], dtype=float) == pytest.approx(expected, nan_ok=True)
+    assert profile['high_correlations'][0]['columns'] == ['Total_Sales', 'gross_profit']
+
+
+def test_pairwise_correlation_handles_constant_and_sparse_columns():
+    matrix = np.array([[1.0, 5.0, np.nan], [2.0, 5.0, 1.0], [3.0, 5.0, np.nan]])
+    correlation = pairwise_correlation(matrix)
+    assert correlation[0, 0] == pytest.approx(1.0)
+    assert np.isnan(correlation[0, 1])
+    assert np.isnan(correlation[0, 2])
+
+
+def test_eda_endpoint_caches_per_dataset_version():
+    session_id = 'session_test_eda'
+    data_storage[session_id] = _build_fixture_dataframe()
+    analysis_cache.invalidate_session(session_id)
+
+    try:
+        client = app.test_client()
+        payload = {'session_id': session_id, 'target_column': 'Total_Sales',
+                   'filters': {'shop': '恵比寿', 'remove_outliers': True}}
+        response = client.post('/api/v1/analysis/eda/execute', json=payload)
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body['session_id'] == session_id
+        assert body['insights']['source'] == 'template'
+        assert body['key_findings'][0]['type'] == 'dataset_size'
+        assert set(body['stats_summary']['Total_Sales']) == {
+            'mean', 'std', 'min', 'max', 'median', 'q25', 'q75', 'missing'}
+
+        hits_before = analysis_cache.hits
+        again = client.post('/api/v1/analysis/eda/execute', json=payload).get_json()
+        assert analysis_cache.hits == hits_before + 1
+        assert again['stats_summary'] == body['stats_summary']
+
+        dataset_versions[session_id] = 'replaced'
+        misses_before = analysis_cache.misses
+        client.post('/api/v1/analysis/eda/execute', json=payload)
+        assert analysis_cache.misses == misses_before + 1
+
+        response = client.post('/api/v1/analysis/eda/execute',
+                               json={'session_id': session_id, 'target_column': 'unknown'})
+        assert response.status_code == 400
+    finally:
+        data_storage.pop(session_id, None)
+        dataset_versions.pop(session_id, None)
+        analysis_cache.invalidate_session(session_id)
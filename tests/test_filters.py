@@ -0,0 +1,156 @@
+"""Row filter engine tests."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import werkzeug
+
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '3.1.3'
+
+# Ensure project root is importable
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_improved import (  # noqa: E402
+    DatasetFilter, analysis_cache, app, build_filter_spec, data_storage, filter_cache, validate_filters)
+
+
+def _build_dataframe() -> pd.DataFrame:
+    rng = np.random.default_rng(41)
+    dates = pd.date_range('2024-01-01', '2024-03-31', freq='D')
+    frames = []
+    for shop in ['恵比寿', '横浜元町', '銀座']:
+        for category in ['衣料', '食品']:
+            frames.append(pd.DataFrame({
+                'shop': shop,
+                'カテゴリ': category,
+                'Date': dates,
+                'Total_Sales': rng.integers(10000, 50000, len(dates)).astype(float),
+                'Number_of_guests': rng.integers(10, 100, len(dates)).astype(float),
+            }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_compiled_masks_match_pandas_and_spec_is_normalized():
+    df = _build_dataframe()
+    spec = validate_filters({
+        'stores': ['銀座', '恵比寿'],
+        'start_date': '2024-02-01',
+        'end_date': '2024-02-29T10:00:00',
+        'ranges': {'Number_of_guests': {'min': 20, 'max': 80}},
+        'categories': {'カテゴリ': ['食品']},
+    })
+    reordered = validate_filters({
+        'categories': {'カテゴリ': ['食品', '食品']},
+        'ranges': {'Number_of_guests': {'max': 80, 'min': 20}},
+        'end_date': '2024-02-29', 'start_date': '2024-02-01', 'stores': ['恵比寿', '銀座'],
+    })
+    assert spec == reordered
+
+    expected = df[df['shop'].isin(['銀座', '恵比寿']) & (df['Date'] >= '2024-02-01') & (df['Date'] <= '2024-02-29')
+                  & df['Number_of_guests'].between(20, 80) & (df['カテゴリ'] == '食品')]
+    filtered = DatasetFilter(df).apply(spec)
+    pd.testing.assert_frame_equal(filtered, expected)
+    assert DatasetFilter(df).apply(build_filter_spec(stores=['存在しない店舗'])).empty
+
+    for invalid in [{'unknown': 1}, {'ranges': {'Number_of_guests': {'min': 5, 'max': 1}}},
+                    {'ranges': {'Number_of_guests': {'low': 5}}}, {'categories': {'カテゴリ': []}},
+                    {'start_date': 'not-a-date'}]:
+        with pytest.raises(ValueError):
+            validate_filters(invalid)
+
+
+def test_filter_masks_are_shared_across_analyzers_and_requests():
+    session_id = 'session_test_filters'
+    df = _build_dataframe()
+    data_storage[session_id] = df
+    analysis_cache.invalidate_session(session_id)
+    filter_cache.invalidate_session(session_id)
+
+    try:
+        client = app.test_client()
+        filters = {'ranges': {'Number_of_guests': {'min': 50}}, 'categories': {'カテゴリ': ['衣料']}}
+        response = client.post('/api/v1/analysis/heatmap', json={
+            'session_id': session_id, 'metric': 'Total_Sales', 'stores': ['恵比寿'], 'filters': filters})
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        subset = df[(df['shop'] == '恵比寿') & (df['Number_of_guests'] >= 50) & (df['カテゴリ'] == '衣料')]
+        january = subset[subset['Date'].dt.month == 1]['Total_Sales'].sum()
+        assert body['stores'] == ['恵比寿']
+        assert body['values'][0][0] == pytest.approx(january)
+
+        # 同じ条件のマスクは別の分析（散布図）でも再計算せずに再利用される
+        misses_before = filter_cache.misses
+        response = client.post('/api/v1/analysis/scatter', json={
+            'session_id': session_id, 'x_metric': 'Total_Sales', 'y_metric': 'Number_of_guests',
+            'mode': 'points', 'filters': filters})
+        assert response.status_code == 200, response.get_json()
+        assert response.get_json()['n'] == int(((df['Number_of_guests'] >= 50) & (df['カテゴリ'] == '衣料')).sum())
+        assert filter_cache.misses == misses_before
+
+        response = client.post('/api/v1/analysis/heatmap', json={
+            'session_id': session_id, 'metric': 'Total_Sales', 'filters': {'ranges': {'missing': {'min': 1}}}})
+        assert response.status_code == 400
+        response = client.post('/api/v1/analysis/heatmap', json={
+            'session_id': session_id, 'metric': 'Total_Sales', 'filters': ['not', 'an', 'object']})
+        assert response.status_code == 400
+    finally:
+        data_storage.pop(session_id, None)
+        analysis_cache.invalidate_session(session_id)
+        filter_cache.invalidate_session(session_id)
+
+
+def test_filters_apply_to_every_analysis_endpoint():
+    # 追加条件つきの結果は、条件に一致する行だけを持つセッションの結果と一致する
+    session_id, subset_id = 'session_test_filters_all', 'session_test_filters_subset'
+    df = _build_dataframe()
+    filters = {'ranges': {'Number_of_guests': {'min': 30}}, 'categories': {'カテゴリ': ['衣料']}}
+    data_storage[session_id] = df
+    data_storage[subset_id] = df[(df['Number_of_guests'] >= 30) & (df['カテゴリ'] == '衣料')].reset_index(drop=True)
+
+    def strip(body):
+        body = body.get('data', body)
+        return {key: value for key, value in body.items()
+                if key not in ('session_id', 'analysis_id', 'execution_time')}
+
+    try:
+        client = app.test_client()
+        requests = [
+            ('/api/v1/analysis/timeseries', {'metric': 'Total_Sales', 'time_unit': '週', 'filters': filters}),
+            ('/api/v1/analysis/histogram', {'metric': 'Total_Sales', 'bins': 10, 'filters': filters}),
+            ('/api/v1/analysis/pareto', {'metric': 'Total_Sales', 'category_column': 'shop', 'filters': filters}),
+            ('/api/v1/analysis/timeseries/forecast', {'metrics': ['Total_Sales'], 'time_unit': '週',
+                                                      'horizon': 2, 'filters': filters}),
+            ('/api/v1/analysis/anomalies', {'metrics': ['Total_Sales'], 'methods': ['robust_z'],
+                                            'filters': filters}),
+            ('/api/v2/analysis/probability', {'target_column': 'Total_Sales', 'distribution_type': 'normal',
+                                              'filters': {'shop': '銀座', **filters}}),
+            ('/api/v1/analysis/eda/execute', {'target_column': 'Total_Sales', 'filters': {'shop': '銀座', **filters}}),
+        ]
+        for path, payload in requests:
+            response = client.post(path, json={'session_id': session_id, **payload})
+            assert response.status_code == 200, (path, response.get_json())
+            options = payload['filters'].get('shop')
+            expected = client.post(path, json={'session_id': subset_id, **payload,
+                                               'filters': {'shop': options} if options else None})
+            assert expected.status_code == 200, (path, expected.get_json())
+            assert strip(response.get_json()) == strip(expected.get_json()), path
+
+        unfiltered = client.post('/api/v1/analysis/timeseries', json={
+            'session_id': session_id, 'metric': 'Total_Sales', 'time_unit': '週'}).get_json()
+        filtered = client.post('/api/v1/analysis/timeseries', json={
+            'session_id': session_id, 'metric': 'Total_Sales', 'time_unit': '週', 'filters': filters}).get_json()
+        assert sum(filtered['values']) < sum(unfiltered['values'])
+
+        for path, payload in [('/api/v2/analysis/probability', {'filters': {'unknown': 1}}),
+                              ('/api/v1/analysis/timeseries', {'session_ids': [session_id, subset_id],
+                                                               'filters': filters})]:
+            response = client.post(path, json={'session_id': session_id, 'metric': 'Total_Sales', **payload})
+            assert response.status_code == 400
+    finally:
+        for sid in (session_id, subset_id):
+            data_storage.pop(sid, None)
+            analysis_cache.invalidate_session(sid)
+            filter_cache.invalidate_session(sid)
@@ -0,0 +1,76 @@
+"""Store x period heatmap tests."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import werkzeug
+
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '3.1.3'
+
+# Ensure project root is importable
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_improved import HeatmapAnalyzer, analysis_cache, app, data_storage  # noqa: E402
+
+
+def _build_fixture_dataframe(rows: int = 3000) -> pd.DataFrame:
+    rng = np.random.default_rng(15)
+    df = pd.DataFrame({
+        'shop': rng.choice(['恵比寿', '横浜元町', '銀座', '新宿'], rows),
+        'Date': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 540, rows), unit='D'),
+        'Total_Sales': rng.integers(100000, 500000, rows).astype(float),
+    })
+    # 銀座は2023年5月のデータなし（空セル）
+    return df[~((df['shop'] == '銀座') & (df['Date'].dt.strftime('%Y-%m') == '2023-05'))]
+
+
+def test_heatmap_matches_pivot_table():
+    df = _build_fixture_dataframe()
+    result = HeatmapAnalyzer(df).analyze('Total_Sales', axis='month', aggregation='mean')
+    expected = df.pivot_table(index='shop', columns=df['Date'].dt.strftime('%Y-%m'),
+                              values='Total_Sales', aggfunc='mean')
+
+    assert result['stores'] == expected.index.tolist()
+    assert result['periods'] == expected.columns.tolist()
+    matrix = np.array(result['values'], dtype=float)
+    assert matrix == pytest.approx(expected.to_numpy(), nan_ok=True)
+    assert result['values'][result['stores'].index('銀座')][result['periods'].index('2023-05')] is None
+    assert result['statistics']['empty_cells'] == 1
+
+    weekday = HeatmapAnalyzer(df).analyze('Total_Sales', axis='weekday', aggregation='count',
+                                          stores=['恵比寿'])
+    assert weekday['stores'] == ['恵比寿']
+    assert weekday['values'][0] == df[df['shop'] == '恵比寿']['Date'].dt.dayofweek.value_counts() \
+        .sort_index().astype(float).tolist()
+
+
+def test_heatmap_endpoint_caches_result():
+    session_id = 'session_test_heatmap'
+    data_storage[session_id] = _build_fixture_dataframe()
+    analysis_cache.invalidate_session(session_id)
+
+    try:
+        client = app.test_client()
+        payload = {'session_id': session_id, 'metric': 'Total_Sales', 'start_date': '2024-01-01'}
+        response = client.post('/api/v1/analysis/heatmap', json=payload)
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body['periods'][0] == '2024-01'
+        assert len(body['values']) == len(body['stores']) == 4
+
+        hits_before = analysis_cache.hits
+        assert client.post('/api/v1/analysis/heatmap', json=payload).get_json() == body
+        assert analysis_cache.hits == hits_before + 1
+
+        response = client.post('/api/v1/analysis/heatmap', json={**payload, 'axis': 'hour'})
+        assert response.status_code == 400
+        # 文字列以外の店舗は 500 ではなく入力エラー
+        for stores in ([1, None], [['恵比寿']]):
+            response = client.post('/api/v1/analysis/heatmap', json={**payload, 'stores': stores})
+            assert response.status_code == 400
+    finally:
+        data_storage.pop(session_id, None)
+        analysis_cache.invalidate_session(session_id)
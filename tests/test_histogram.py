@@ -0,0 +1,156 @@
+"""Histogram analysis tests (normality stage, caching)."""
+import sys
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pytest
+import werkzeug
+
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '3.1.3'
+
+# Ensure project root is importable
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_improved import (  # noqa: E402
+    HistogramAnalyzer,
+    SortedValuesIndex,
+    analysis_cache,
+    app,
+    data_storage,
+)
+
+
+def _build_fixture_dataframe(rows: int = 12000) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            'shop': np.where(np.arange(rows) % 2 == 0, '恵比寿', '横浜元町'),
+            'Date': pd.date_range('2020-01-01', periods=rows, freq='h'),
+            '売上金額': rng.normal(500000, 50000, rows),
+        }
+    )
+
+
+@pytest.mark.parametrize('bins', [2, 7, 20, 200])
+def test_sorted_index_matches_numpy_histogram(bins):
+    values = np.random.default_rng(2).lognormal(10, 1, 5000).round(0)
+    index = SortedValuesIndex(values)
+
+    counts, edges = index.histogram(bins)
+    expected_counts, expected_edges = np.histogram(values, bins=bins)
+
+    np.testing.assert_array_equal(counts, expected_counts)
+    np.testing.assert_allclose(edges, expected_edges)
+    for q in (0.0, 0.05, 0.5, 0.95, 1.0):
+        assert index.quantile(q) == pytest.approx(np.quantile(values, q))
+
+
+def test_sorted_index_constant_values():
+    counts, edges = SortedValuesIndex(np.full(10, 5.0)).histogram(4)
+    expected_counts, expected_edges = np.histogram(np.full(10, 5.0), bins=4)
+    np.testing.assert_array_equal(counts, expected_counts)
+    np.testing.assert_allclose(edges, expected_edges)
+
+
+@pytest.mark.parametrize('method', ['shapiro', 'anderson', 'dagostino'])
+def test_normality_subsamples_large_input(method):
+    values = np.random.default_rng(1).normal(0, 1, 20000)
+
+    first = HistogramAnalyzer._test_normality(values, method, max_samples=5000, seed=7)
+    second = HistogramAnalyzer._test_normality(values, method, max_samples=5000, seed=7)
+
+    assert first == second
+    assert first['method'] == method
+    assert first['n'] == 20000
+    assert first['sample_size'] == 5000
+    assert first['subsampled'] is True
+    assert first['is_normal'] is True
+
+
+def test_normality_small_and_constant_input():
+    assert HistogramAnalyzer._test_normality(np.array([1.0, 2.0]), 'shapiro')['p_value'] == 1.0
+    constant = HistogramAnalyzer._test_normality(np.full(50, 3.0), 'dagostino')
+    assert constant['is_normal'] is False
+    assert constant['sample_size'] == 50
+
+
+def test_histogram_endpoint_reports_and_caches_normality():
+    session_id = 'session_test_histogram'
+    data_storage[session_id] = _build_fixture_dataframe()
+    analysis_cache.invalidate_session(session_id)
+
+    try:
+        client = app.test_client()
+        payload = {'session_id': session_id, 'metric': '売上金額', 'normality_method': 'anderson'}
+        response = client.post('/api/v1/analysis/histogram', json=payload)
+        assert response.status_code == 200
+        statistics = response.get_json()['statistics']
+        assert statistics['normality']['method'] == 'anderson'
+        assert statistics['normality']['sample_size'] == 5000
+        assert 'shapiro_pvalue' not in statistics
+
+        hits_before = analysis_cache.hits
+        # ビン数だけの変更はキャッシュ済みインデックスから算出し、フレームを読み込まない
+        with mock.patch('app_improved.get_dataframe_for_analysis', side_effect=AssertionError('frame loaded')):
+            response = client.post('/api/v1/analysis/histogram', json={**payload, 'bins': 50})
+        assert response.status_code == 200
+        assert analysis_cache.hits > hits_before
+        body = response.get_json()
+        assert len(body['frequencies']) == 50
+        assert sum(body['frequencies']) == 12000
+        assert set(body['statistics']['percentiles']) == {'5', '25', '75', '95'}
+
+        response = client.post('/api/v1/analysis/histogram', json={'session_id': session_id})
+        statistics = response.get_json()['statistics']
+        assert statistics['normality']['method'] == 'shapiro'
+        assert 'shapiro_statistic' in statistics and 'shapiro_pvalue' in statistics
+
+        response = client.post('/api/v1/analysis/histogram',
+                               json={'session_id': session_id, 'normality_method': 'ks'})
+        assert response.status_code == 400
+    finally:
+        data_storage.pop(session_id, None)
+        analysis_cache.invalidate_session(session_id)
+
+
+def test_grouped_histogram_shares_edges_across_stores():
+    df = _build_fixture_dataframe(rows=2000)
+    df.loc[df['shop'] == '横浜元町', '売上金額'] *= 0.8
+    result = HistogramAnalyzer(df).analyze_grouped(metric='売上金額', bins=15)
+
+    assert result['stores'] == ['恵比寿', '横浜元町']
+    edges = np.array(result['bin_edges'])
+    for store, frequencies, stats in zip(result['stores'], result['frequencies'], result['statistics']):
+        store_values = df.loc[df['shop'] == store, '売上金額'].to_numpy()
+        expected, _ = np.histogram(store_values, bins=edges)
+        assert frequencies == expected.tolist()
+        assert stats['count'] == store_values.size
+        assert stats['mean'] == pytest.approx(store_values.mean())
+        assert stats['std'] == pytest.approx(store_values.std(ddof=1))
+        assert stats['median'] == pytest.approx(np.median(store_values))
+
+
+def test_histogram_endpoint_grouped_mode():
+    session_id = 'session_test_histogram_grouped'
+    data_storage[session_id] = _build_fixture_dataframe(rows=500)
+
+    try:
+        client = app.test_client()
+        response = client.post('/api/v1/analysis/histogram', json={
+            'session_id': session_id,
+            'metric': '売上金額',
+            'bins': 10,
+            'group_by': 'store',
+            'stores': ['横浜元町'],
+        })
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body['mode'] == 'grouped'
+        assert body['stores'] == ['横浜元町']
+        assert len(body['frequencies']) == 1 and sum(body['frequencies'][0]) == 250
+    finally:
+        data_storage.pop(session_id, None)
+        analysis_cache.invalidate_session(session_id)
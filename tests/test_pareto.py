@@ -0,0 +1,284 @@
+"""Pareto (ABC) analysis tests."""
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import werkzeug
+
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '3.1.3'
+
+# Ensure project root is importable
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_improved import analysis_cache, app, data_storage  # noqa: E402
+from lang_agent.chain import CATEGORY_LABELS  # noqa: E402
+from lang_agent.chain import DEFAULT_CATEGORY_COLUMNS as LANGCHAIN_DEFAULT_CATEGORIES  # noqa: E402
+from pareto_engine import ParetoEngine  # noqa: E402
+
+
+def _reference_classes(totals: pd.Series) -> dict:
+    ordered = totals.sort_values(ascending=False, kind='stable')
+    cumulative = ordered.cumsum() / ordered.sum() * 100
+    return {
+        'A': cumulative[cumulative <= 80].index.tolist(),
+        'B': cumulative[(cumulative > 80) & (cumulative <= 95)].index.tolist(),
+        'C': cumulative[cumulative > 95].index.tolist(),
+    }
+
+
+def _build_sku_dataframe(rows: int = 60000, skus: int = 20000) -> pd.DataFrame:
+    rng = np.random.default_rng(3)
+    sku_ids = rng.zipf(1.3, rows) % skus
+    return pd.DataFrame({
+        'shop': np.where(np.arange(rows) % 3 == 0, '恵比寿', '横浜元町'),
+        'sku': [f'SKU{i:05d}' for i in sku_ids],
+        '売上金額': rng.integers(1000, 5000, rows).astype(float),
+    })
+
+
+def test_engine_matches_full_sort_reference():
+    df = _build_sku_dataframe()
+    reference_totals = df.groupby('sku')['売上金額'].sum()
+    reference = _reference_classes(reference_totals)
+
+    engine = ParetoEngine.from_codes(df['sku'], df['売上金額'])
+
+    assert engine.size == reference_totals.size
+    assert engine.class_counts() == {k: len(v) for k, v in reference.items()}
+    top = engine.top(20)
+    assert top['values'] == reference_totals.sort_values(ascending=False).head(20).tolist()
+
+    for abc_class, expected in reference.items():
+        collected = []
+        offset = 0
+        while True:
+            page = engine.members(abc_class, offset, 1000)
+            collected.extend(page['items'])
+            offset += 1000
+            if not page['has_more']:
+                break
+        assert sorted(collected) == sorted(expected)
+
+
+def test_engine_empty_and_small_inputs():
+    engine = ParetoEngine(['x', 'y', 'z'], np.array([70.0, 20.0, 10.0]))
+    assert engine.class_counts() == {'A': 1, 'B': 1, 'C': 1}
+    classification = engine.classification(page_size=5)
+    assert classification['A']['items'] == ['x']
+    assert classification['C']['value_percentage'] == pytest.approx(10.0)
+
+    empty = ParetoEngine([], np.array([]))
+    assert empty.class_counts() == {'A': 0, 'B': 0, 'C': 0}
+    with pytest.raises(ValueError):
+        engine.members('D')
+
+
+def test_engine_shared_across_threads():
+    # キャッシュ済みのエンジンは複数スレッドから同時に参照される（先頭部分の拡張が縮小・不整合にならない）
+    totals = np.random.default_rng(4).pareto(1.2, 50000)
+    for _ in range(5):
+        engine = ParetoEngine(np.arange(totals.size), totals)
+
+        def read(index: int) -> int:
+            if index % 2:
+                return len(engine.top(5 + index)['categories'])
+            ranking = engine.ranking()
+            assert len(ranking['categories']) == len(ranking['cumulative_percentage']) == len(ranking['classes'])
+            return len(ranking['classes'])
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            sizes = list(executor.map(read, range(32)))
+        assert sizes[::2] == [engine.size] * 16
+        assert engine.top(5)['categories'] == engine.ranking()['categories'][:5]
+
+
+def test_pareto_v1_endpoint_paginates_members():
+    session_id = 'session_test_pareto_v1'
+    data_storage[session_id] = _build_sku_dataframe(rows=20000, skus=5000)
+    analysis_cache.invalidate_session(session_id)
+
+    try:
+        client = app.test_client()
+        payload = {'session_id': session_id, 'metric': '売上金額', 'category_column': 'sku'}
+        response = client.post('/api/v1/analysis/pareto', json={**payload, 'page_size': 10})
+        assert response.status_code == 200
+        body = response.get_json()['data']
+        abc = body['abc_classification']
+        counts = body['statistics']['abc_counts']
+        assert sum(counts.values()) == body['statistics']['category_count']
+        assert all(len(abc[c]['items']) <= 10 for c in 'ABC')
+        assert abc['C']['count'] == counts['C'] and abc['C']['has_more'] is True
+        assert len(body['chart']['data'][0]['x']) == 20
+
+        response = client.post('/api/v1/analysis/pareto/members',
+                               json={**payload, 'abc_class': 'C', 'offset': 10, 'limit': 25})
+        assert response.status_code == 200
+        page = response.get_json()['data']
+        assert page['count'] == counts['C']
+        assert len(page['items']) == 25
+        assert page['values'] == sorted(page['values'], reverse=True)
+    finally:
+        data_storage.pop(session_id, None)
+        analysis_cache.invalidate_session(session_id)
+
+
+def _build_category_dataframe() -> pd.DataFrame:
+    rng = np.random.default_rng(4)
+    rows = 400
+    df = pd.DataFrame({
+        'shop': rng.choice(['恵比寿', '横浜元町', '銀座', '新宿'], rows),
+        'Date': pd.date_range('2023-01-01', periods=rows, freq='D'),
+        'Total_Sales': rng.integers(100000, 500000, rows).astype(float),
+    })
+    weights = [0.3, 0.2, 0.15, 0.1, 0.1, 0.08, 0.05, 0.02]
+    for column, weight in zip(LANGCHAIN_DEFAULT_CATEGORIES, weights):
+        df[column] = (df['Total_Sales'] * weight).round(0)
+    df["WOMEN'S_ONEPIECE"] = 0.0
+    return df
+
+
+def test_pareto_v2_product_category_matches_column_sums():
+    session_id = 'session_test_pareto_v2'
+    df = _build_category_dataframe()
+    data_storage[session_id] = df
+    analysis_cache.invalidate_session(session_id)
+
+    try:
+        client = app.test_client()
+        response = client.post('/api/v2/analysis/pareto', json={
+            'session_id': session_id,
+            'category_type': 'product_category',
+            'start_date': '2023-03-01',
+            'end_date': '2023-06-30',
+        })
+        assert response.status_code == 200
+        body = response.get_json()
+
+        window = df[(df['Date'] >= '2023-03-01') & (df['Date'] <= '2023-06-30')]
+        expected = {CATEGORY_LABELS[c]: window[c].sum() for c in LANGCHAIN_DEFAULT_CATEGORIES
+                    if window[c].sum() > 0}
+        assert dict(zip(body['categories'], body['values'])) == pytest.approx(expected)
+        assert body['values'] == sorted(body['values'], reverse=True)
+        assert CATEGORY_LABELS["WOMEN'S_ONEPIECE"] not in body['categories']
+        cumulative = np.cumsum(body['values']) / sum(body['values']) * 100
+        assert body['cumulative_percentage'] == pytest.approx(cumulative.tolist())
+        expected_classes = ['A' if c <= 80 else 'B' if c <= 95 else 'C' for c in cumulative]
+        assert [body['abc_classification'][c] for c in body['categories']] == expected_classes
+        assert body['statistics']['a_items'] == expected_classes.count('A')
+    finally:
+        data_storage.pop(session_id, None)
+        analysis_cache.invalidate_session(session_id)
+
+
+def test_pareto_v1_and_v2_share_cached_shop_aggregate():
+    session_id = 'session_test_pareto_shared'
+    data_storage[session_id] = _build_category_dataframe()
+    analysis_cache.invalidate_session(session_id)
+
+    try:
+        client = app.test_client()
+        response = client.post('/api/v2/analysis/pareto', json={
+            'session_id': session_id, 'category_type': 'shop', 'metric': 'Total_Sales'})
+        assert response.status_code == 200
+        v2 = response.get_json()
+
+        hits_before = analysis_cache.hits
+        response = client.post('/api/v1/analysis/pareto', json={
+            'session_id': session_id, 'metric': 'Total_Sales', 'category_column': 'shop', 'top_n': 5})
+        assert response.status_code == 200
+        assert analysis_cache.hits == hits_before + 1
+        v1 = response.get_json()['data']
+        assert v1['chart']['data'][0]['x'] == v2['categories']
+        assert v1['statistics']['total'] == pytest.approx(v2['statistics']['total'])
+
+        response = client.post('/api/v2/analysis/pareto', json={
+            'session_id': session_id, 'category_type': 'region'})
+        assert response.status_code == 400
+    finally:
+        data_storage.pop(session_id, None)
+        analysis_cache.invalidate_session(session_id)
+
+
+def test_pareto_migration_matches_per_period_v2_calls():
+    session_id = 'session_test_pareto_migration'
+    df = _build_category_dataframe()
+    # 4月以降は店舗の売上構成を変えて遷移を発生させる
+    df.loc[(df['Date'] >= '2023-04-01') & (df['shop'] == '新宿'), 'Total_Sales'] *= 5
+    data_storage[session_id] = df
+    analysis_cache.invalidate_session(session_id)
+
+    try:
+        client = app.test_client()
+        response = client.post('/api/v2/analysis/pareto/migration', json={
+            'session_id': session_id, 'category_type': 'shop', 'metric': 'Total_Sales',
+            'time_unit': '月', 'end_date': '2023-06-30'})
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body['periods'] == ['2023-01', '2023-02', '2023-03', '2023-04', '2023-05', '2023-06']
+
+        for index, period in enumerate(body['periods']):
+            start = pd.Period(period, 'M').start_time.strftime('%Y-%m-%d')
+            end = pd.Period(period, 'M').end_time.strftime('%Y-%m-%d')
+            monthly = client.post('/api/v2/analysis/pareto', json={
+                'session_id': session_id, 'category_type': 'shop', 'metric': 'Total_Sales',
+                'start_date': start, 'end_date': end}).get_json()
+            for category, classes in zip(body['categories'], body['classes']):
+                assert classes[index] == monthly['abc_classification'][category]
+
+        transitions = np.array(body['transition_matrix'])
+        assert transitions.shape == (4, 4)
+        assert transitions.sum() == len(body['categories']) * (len(body['periods']) - 1)
+        assert len(body['period_transitions']) == len(body['periods']) - 1
+
+        response = client.post('/api/v2/analysis/pareto/migration', json={
+            'session_id': session_id, 'category_type': 'product_category', 'time_unit': '年'})
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body['periods'] == ['2023', '2024']
+        assert all(classes[0] == '-' for category, classes in zip(body['categories'], body['classes'])
+                   if category == CATEGORY_LABELS["WOMEN'S_ONEPIECE"])
+    finally:
+        data_storage.pop(session_id, None)
+        analysis_cache.invalidate_session(session_id)
+
+
+def test_pareto_drilldown_serves_categories_from_cache():
+    session_id = 'session_test_pareto_drilldown'
+    df = _build_category_dataframe()
+    data_storage[session_id] = df
+    analysis_cache.invalidate_session(session_id)
+
+    try:
+        client = app.test_client()
+        response = client.post('/api/v2/analysis/pareto/drilldown', json={'session_id': session_id})
+        assert response.status_code == 200
+        body = response.get_json()
+
+        v2 = client.post('/api/v2/analysis/pareto', json={
+            'session_id': session_id, 'category_type': 'product_category'}).get_json()
+        assert body['categories'] == v2['categories']
+        assert body['values'] == pytest.approx(v2['values'])
+
+        knit = CATEGORY_LABELS['Mens_KNIT']
+        expected = df.groupby('shop')['Mens_KNIT'].sum().sort_values(ascending=False)
+        hits_before = analysis_cache.hits
+        response = client.post('/api/v2/analysis/pareto/drilldown',
+                               json={'session_id': session_id, 'category': knit})
+        assert response.status_code == 200
+        assert analysis_cache.hits == hits_before + 1
+        detail = response.get_json()
+        assert detail['stores'] == expected.index.tolist()
+        assert detail['values'] == pytest.approx(expected.tolist())
+        assert detail['total'] == pytest.approx(df['Mens_KNIT'].sum())
+        assert detail['abc_classification'][detail['stores'][0]] == 'A'
+
+        response = client.post('/api/v2/analysis/pareto/drilldown',
+                               json={'session_id': session_id, 'category': 'unknown'})
+        assert response.status_code == 400
+    finally:
+        data_storage.pop(session_id, None)
+        analysis_cache.invalidate_session(session_id)
@@ -0,0 +1,119 @@
+"""Parquet row-group streaming backend tests (results must match the pandas path)."""
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import werkzeug
+from scipy.stats import kurtosis, skew
+
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '3.1.3'
+
+# Ensure project root is importable
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import config  # noqa: E402
+import parquet_stream  # noqa: E402
+from app_improved import analysis_cache, app, get_session_upload_dir  # noqa: E402
+from tests.generate_test_data import generate_sample_store_data  # noqa: E402
+
+SESSION_ID = 'session_test_parquet_stream'
+
+
+@pytest.fixture
+def parquet_session(tmp_path, monkeypatch):
+    csv_path = tmp_path / 'test_data.csv'
+    generate_sample_store_data(output_path=str(csv_path))
+    session_dir = get_session_upload_dir(SESSION_ID)
+    session_dir.mkdir(parents=True, exist_ok=True)
+    # 小さな行グループで複数チャンクの合成を検証する
+    pd.read_csv(csv_path).to_parquet(session_dir / 'cleaned_data.parquet', index=False, row_group_size=64)
+    monkeypatch.setattr(config, 'ANALYSIS_BACKEND', 'pandas')
+    try:
+        yield monkeypatch
+    finally:
+        analysis_cache.invalidate_session(SESSION_ID)
+        shutil.rmtree(session_dir, ignore_errors=True)
+
+
+def _post_both(monkeypatch, path, payload):
+    """同じリクエストを pandas / stream 両バックエンドで実行"""
+    results = []
+    with app.test_client() as client:
+        for backend in ('pandas', 'stream'):
+            monkeypatch.setattr(config, 'ANALYSIS_BACKEND', backend)
+            analysis_cache.invalidate_session(SESSION_ID)
+            response = client.post(path, json={'session_id': SESSION_ID, **payload})
+            assert response.status_code == 200, response.get_json()
+            body = response.get_json()
+            results.append(body.get('data', body))
+    return results
+
+
+def test_endpoints_match_pandas(parquet_session):
+    # リクエストごとに開いたバックエンドはすべて閉じられる
+    opened, closed = [], []
+    init, close = parquet_stream.ParquetStreamBackend.__init__, parquet_stream.ParquetStreamBackend.close
+
+    def tracked_init(self, *args, **kwargs):
+        opened.append(self)
+        init(self, *args, **kwargs)
+
+    def tracked_close(self):
+        closed.append(self)
+        close(self)
+
+    parquet_session.setattr(parquet_stream.ParquetStreamBackend, '__init__', tracked_init)
+    parquet_session.setattr(parquet_stream.ParquetStreamBackend, 'close', tracked_close)
+
+    pandas_result, stream_result = _post_both(parquet_session, '/api/v1/analysis/timeseries', {
+        'metric': '売上金額', 'time_unit': '週', 'store': '恵比寿',
+        'start_date': '2023-02-10', 'end_date': '2023-09-30'})
+    assert stream_result['dates'] == pandas_result['dates']
+    np.testing.assert_allclose(stream_result['values'], pandas_result['values'])
+
+    pandas_result, stream_result = _post_both(parquet_session, '/api/v1/analysis/histogram', {
+        'metric': '客単価', 'bins': 15, 'start_date': '2023-03-01'})
+    assert stream_result['frequencies'] == pandas_result['frequencies']
+    np.testing.assert_allclose(stream_result['bin_edges'], pandas_result['bin_edges'])
+    for key in ('mean', 'median', 'std', 'min', 'max', 'skewness', 'kurtosis'):
+        assert stream_result['statistics'][key] == pytest.approx(pandas_result['statistics'][key], rel=1e-9)
+    assert stream_result['statistics']['percentiles'] == pytest.approx(pandas_result['statistics']['percentiles'])
+
+    pandas_result, stream_result = _post_both(parquet_session, '/api/v1/analysis/pareto',
+                                              {'metric': '粗利額', 'category_column': '店舗名', 'store': '横浜元町'})
+    assert stream_result['chart'] == pandas_result['chart']
+
+    pandas_result, stream_result = _post_both(parquet_session, '/api/v2/analysis/pareto', {
+        'category_type': 'product_category', 'metric': 'Total_Sales', 'shop': '恵比寿',
+        'start_date': '2023-04-01', 'end_date': '2023-06-30'})
+    assert stream_result == pandas_result
+    assert opened and closed == opened
+
+
+def test_exact_quantiles_with_multipass_selection(tmp_path, monkeypatch):
+    # 候補値を集める閾値を下げて、区間の絞り込みパスを複数回通す
+    monkeypatch.setattr(parquet_stream, 'SELECT_BINS', 8)
+    monkeypatch.setattr(parquet_stream, 'SELECT_COLLECT_LIMIT', 16)
+    rng = np.random.default_rng(7)
+    values = np.concatenate([rng.lognormal(8, 1.5, 5000), np.full(400, 1234.5), [np.nan, np.inf]])
+    rng.shuffle(values)
+    path = tmp_path / 'values.parquet'
+    pd.DataFrame({'x': values}).to_parquet(path, index=False, row_group_size=300)
+
+    backend = parquet_stream.ParquetStreamBackend([path])
+    quantiles = (0.0, 0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 1.0)
+    summary = backend.value_summary('x', quantiles=quantiles)
+    finite = values[np.isfinite(values)]
+    assert summary['count'] == finite.size
+    for q in quantiles:
+        assert summary['quantiles'][q] == pytest.approx(np.quantile(finite, q), rel=1e-12)
+    assert summary['std'] == pytest.approx(finite.std(ddof=1), rel=1e-12)
+    assert summary['skewness'] == pytest.approx(skew(finite), rel=1e-9)
+    assert summary['kurtosis'] == pytest.approx(kurtosis(finite), rel=1e-9)
+
+    sample, total = backend.sample_values('x', 100, seed=3)
+    assert total == finite.size and sample.size == 100 and np.isin(sample, finite).all()
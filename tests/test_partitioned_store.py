@@ -0,0 +1,114 @@
+"""Store / month partitioned session dataset tests."""
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+import werkzeug
+
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '3.1.3'
+
+# Ensure project root is importable
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import config  # noqa: E402
+import duckdb_backend  # noqa: E402
+import partitioned_store  # noqa: E402
+from app_improved import (  # noqa: E402
+    analysis_cache, app, data_storage, filter_cache, get_session_upload_dir, load_session_dataframe,
+    persist_session_dataset)
+from tests.generate_test_data import generate_sample_store_data  # noqa: E402
+
+DISK_SESSION = 'session_test_partitioned_disk'
+MEMORY_SESSION = 'session_test_partitioned_memory'
+
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch):
+    csv_path = tmp_path / 'test_data.csv'
+    generate_sample_store_data(output_path=str(csv_path))
+    df = pd.read_csv(csv_path)
+    monkeypatch.setattr(config, 'PARTITION_ROW_GROUP_SIZE', 7)
+    monkeypatch.setattr(config, 'ANALYSIS_BACKEND', 'pandas')
+    persist_session_dataset(DISK_SESSION, df)
+    data_storage[MEMORY_SESSION] = df
+    try:
+        yield df, monkeypatch
+    finally:
+        data_storage.pop(MEMORY_SESSION, None)
+        for session_id in (DISK_SESSION, MEMORY_SESSION):
+            analysis_cache.invalidate_session(session_id)
+            filter_cache.invalidate_session(session_id)
+        shutil.rmtree(get_session_upload_dir(DISK_SESSION), ignore_errors=True)
+
+
+def test_layout_and_pushdown_reads_only_matching_files(sessions):
+    df, monkeypatch = sessions
+    directory = get_session_upload_dir(DISK_SESSION) / partitioned_store.DATASET_DIR
+    manifest = partitioned_store.read_manifest(directory)
+    assert manifest['store_column'] == '店舗名' and manifest['date_column'] == '営業日付'
+    assert len(manifest['partitions']) == 2 * 12
+    assert sum(partition['rows'] for partition in manifest['partitions']) == len(df)
+
+    # 1店舗・1四半期は3ファイル、その中でも期間に掛かる行グループだけを読む
+    files = partitioned_store.select_files(directory, ['恵比寿'], '2023-04-01', '2023-06-30')
+    assert len(files) == 3
+    groups = partitioned_store.row_groups_in_range(pq.ParquetFile(files[0]), '営業日付', '2023-04-10', '2023-04-20')
+    assert 0 < len(groups) < pq.ParquetFile(files[0]).num_row_groups
+
+    read_groups = []
+    original = pq.ParquetFile.read_row_groups
+
+    def spy(self, row_groups, *args, **kwargs):
+        read_groups.extend(row_groups)
+        return original(self, row_groups, *args, **kwargs)
+
+    monkeypatch.setattr(pq.ParquetFile, 'read_row_groups', spy)
+    loaded = load_session_dataframe(DISK_SESSION, ['恵比寿'], '2023-04-10', '2023-05-20')
+    dates = pd.to_datetime(df['営業日付'])
+    expected = df[(df['店舗名'] == '恵比寿') & (dates >= '2023-04-10') & (dates < '2023-05-21')]
+    total_groups = sum(pq.ParquetFile(path).num_row_groups for path in partitioned_store.all_files(directory))
+    assert 0 < len(read_groups) <= 8 < total_groups
+    assert len(loaded) == len(expected)
+    np.testing.assert_array_equal(loaded['売上金額'].to_numpy(), expected['売上金額'].to_numpy())
+
+    with pytest.raises(ValueError, match='No records found'):
+        load_session_dataframe(DISK_SESSION, ['存在しない店舗'])
+
+
+@pytest.mark.parametrize('backend', [
+    'pandas', 'stream',
+    pytest.param('duckdb', marks=pytest.mark.skipif(not duckdb_backend.available(), reason='duckdb not installed')),
+])
+def test_partitioned_session_matches_in_memory(sessions, backend):
+    _, monkeypatch = sessions
+    requests = [
+        ('/api/v1/analysis/timeseries', {'metric': '売上金額', 'time_unit': '月', 'store': '横浜元町',
+                                         'start_date': '2023-04-01', 'end_date': '2023-06-30'}),
+        ('/api/v1/analysis/histogram', {'metric': '客単価', 'bins': 12, 'store': '恵比寿',
+                                        'start_date': '2023-02-15', 'end_date': '2023-08-31'}),
+        ('/api/v2/analysis/pareto', {'category_type': 'product_category', 'metric': 'Total_Sales',
+                                     'shop': '恵比寿', 'start_date': '2023-04-01', 'end_date': '2023-06-30'}),
+    ]
+    with app.test_client() as client:
+        for path, payload in requests:
+            results = []
+            for session_id in (MEMORY_SESSION, DISK_SESSION):
+                monkeypatch.setattr(config, 'ANALYSIS_BACKEND', backend)
+                response = client.post(path, json={'session_id': session_id, **payload})
+                assert response.status_code == 200, response.get_json()
+                results.append(response.get_json())
+            memory_result, disk_result = results
+            if path.endswith('histogram'):
+                assert disk_result['frequencies'] == memory_result['frequencies']
+                assert disk_result['statistics']['mean'] == pytest.approx(memory_result['statistics']['mean'])
+                assert disk_result['statistics']['median'] == pytest.approx(memory_result['statistics']['median'])
+            elif path.endswith('timeseries'):
+                assert disk_result['dates'] == memory_result['dates']
+                np.testing.assert_allclose(disk_result['values'], memory_result['values'])
+            else:
+                assert disk_result == memory_result
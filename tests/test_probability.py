@@ -0,0 +1,88 @@
+"""Probability distribution analysis tests."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import werkzeug
+
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '3.1.3'
+
+# Ensure project root is importable
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_improved import analysis_cache, app, data_storage  # noqa: E402
+from distribution_fitter import fit_candidates, fit_distribution  # noqa: E402
+
+
+def _build_fixture_dataframe(rows: int = 12000) -> pd.DataFrame:
+    rng = np.random.default_rng(5)
+    return pd.DataFrame({
+        'shop': np.where(np.arange(rows) % 2 == 0, '恵比寿', '横浜元町'),
+        'Date': pd.date_range('2020-01-01', periods=rows, freq='h'),
+        'Total_Sales': rng.gamma(shape=2.5, scale=400000, size=rows),
+    })
+
+
+def test_fit_distribution_recovers_gamma_parameters():
+    values = np.random.default_rng(6).gamma(shape=2.5, scale=400000, size=5000)
+    fit = fit_distribution('gamma', values)
+
+    assert fit['parameters']['shape'] == pytest.approx(2.5, rel=0.1)
+    assert fit['parameters']['scale'] == pytest.approx(400000, rel=0.1)
+    assert fit['parameters']['location'] == 0.0
+    assert fit['p_value'] > 0.05
+
+    assert 'error' in fit_distribution('lognormal', np.array([-1.0, 2.0, 3.0]))
+
+
+def test_fit_candidates_parallel_matches_sequential():
+    values = np.random.default_rng(7).lognormal(12, 0.5, 2000)
+    names = ['normal', 'lognormal', 'gamma']
+
+    sequential = fit_candidates(values, names, max_workers=1)
+    parallel = fit_candidates(values, names, max_workers=2)
+
+    assert [fit['distribution'] for fit in parallel] == names
+    for left, right in zip(sequential, parallel):
+        assert left['aic'] == pytest.approx(right['aic'])
+
+
+def test_probability_endpoint_selects_model_and_caches():
+    session_id = 'session_test_probability'
+    data_storage[session_id] = _build_fixture_dataframe()
+    analysis_cache.invalidate_session(session_id)
+
+    try:
+        client = app.test_client()
+        payload = {'session_id': session_id, 'target_column': 'Total_Sales',
+                   'filters': {'shop': '恵比寿'}}
+        response = client.post('/api/v2/analysis/probability', json=payload)
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body['distribution'] == 'gamma'
+        assert body['model_selection']['best_distribution'] == 'gamma'
+        alternatives = body['model_selection']['alternatives']
+        assert len(alternatives) + len(body['model_selection']['failed']) == 5
+        assert all(alt['aic'] >= body['model_selection']['aic'] for alt in alternatives)
+        assert body['sample'] == {'n': 6000, 'sample_size': 6000, 'subsampled': False}
+
+        hits_before = analysis_cache.hits
+        assert client.post('/api/v2/analysis/probability', json=payload).get_json() == body
+        assert analysis_cache.hits == hits_before + 1
+
+        response = client.post('/api/v2/analysis/probability',
+                               json={'session_id': session_id, 'distribution_type': 'weibull'})
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body['distribution'] == 'weibull'
+        assert body['sample'] == {'n': 12000, 'sample_size': 10000, 'subsampled': True}
+
+        response = client.post('/api/v2/analysis/probability',
+                               json={'session_id': session_id, 'distribution_type': 'cauchy'})
+        assert response.status_code == 400
+    finally:
+        data_storage.pop(session_id, None)
+        analysis_cache.invalidate_session(session_id)
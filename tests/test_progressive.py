@@ -0,0 +1,138 @@
+"""Progressive mode tests (approximate answer from the stratified sample, exact result by result id)."""
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import werkzeug
+
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '3.1.3'
+
+# Ensure project root is importable
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import app_improved  # noqa: E402
+import config  # noqa: E402
+import progressive  # noqa: E402
+from app_improved import (  # noqa: E402
+    analysis_cache, app, data_storage, get_session_upload_dir, get_stratified_sample, progressive_results,
+    stratified_samples
+)
+from tests.generate_test_data import generate_sample_store_data  # noqa: E402
+
+SESSION_ID = 'session_test_progressive'
+
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    csv_path = tmp_path / 'test_data.csv'
+    generate_sample_store_data(output_path=str(csv_path))
+    data_storage[SESSION_ID] = pd.read_csv(csv_path)
+    try:
+        yield monkeypatch
+    finally:
+        data_storage.pop(SESSION_ID, None)
+        stratified_samples.invalidate_session(SESSION_ID)
+        analysis_cache.invalidate_session(SESSION_ID)
+
+
+def _progressive(client, path, payload):
+    """近似結果と、完了を待った厳密な結果（結果参照APIの data.result）"""
+    response = client.post(path, json={'session_id': SESSION_ID, 'progressive': True, **payload})
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    body = body.get('data', body)
+    assert body['status'] == 'pending'
+
+    progressive_results.get((body['result_id'],))[1].result(timeout=30)
+    fetched = client.get(body['result_url'])
+    assert fetched.status_code == 200, fetched.get_json()
+    assert fetched.get_json()['data']['status'] == 'done'
+    return body['approximate'], fetched.get_json()['data']['result']
+
+
+def test_sampled_answers_bracket_exact_results(session):
+    session.setattr(config, 'PROGRESSIVE_SAMPLE_PER_STORE', 60)
+    with app.test_client() as client:
+        approximate, exact = _progressive(client, '/api/v1/analysis/timeseries',
+                                          {'metric': '売上金額', 'time_unit': '月'})
+        assert approximate['sample']['sample_rows'] == 120
+        assert approximate['sample']['population_rows'] == 730
+        # 期間軸は母集団の日付範囲から作るため厳密な結果と一致する
+        assert approximate['dates'] == exact['dates']
+        lower, upper = np.array(approximate['ci_lower']), np.array(approximate['ci_upper'])
+        assert np.all(lower < upper)
+        covered = (np.array(exact['values']) >= lower) & (np.array(exact['values']) <= upper)
+        assert covered.mean() >= 0.75
+
+        approximate, exact = _progressive(client, '/api/v1/analysis/histogram', {'metric': '客単価', 'bins': 10})
+        np.testing.assert_allclose(approximate['bin_edges'], exact['bin_edges'])
+        assert approximate['statistics']['count'] == pytest.approx(730)
+        low, high = approximate['statistics']['mean_ci']
+        assert low <= exact['statistics']['mean'] <= high
+
+        approximate, exact = _progressive(client, '/api/v1/analysis/pareto',
+                                          {'metric': '売上金額', 'category_column': '店舗名'})
+        low, high = approximate['statistics']['total_ci']
+        assert low <= exact['statistics']['total'] <= high
+        assert approximate['categories'] == exact['chart']['data'][0]['x']
+
+
+def test_full_strata_are_exact_and_errors(session):
+    # 店舗の全行が標本に入る場合は信頼区間の幅 0 で厳密な結果と一致する
+    session.setattr(config, 'PROGRESSIVE_SAMPLE_PER_STORE', 1000)
+    with app.test_client() as client:
+        approximate, exact = _progressive(client, '/api/v1/analysis/timeseries', {
+            'metric': '売上金額', 'time_unit': '週', 'store': '恵比寿',
+            'start_date': '2023-02-10', 'end_date': '2023-09-30'})
+        assert approximate['dates'] == exact['dates']
+        np.testing.assert_allclose(approximate['values'], exact['values'])
+        np.testing.assert_allclose(approximate['ci_lower'], approximate['ci_upper'])
+
+        approximate, exact = _progressive(client, '/api/v1/analysis/histogram',
+                                          {'metric': '客単価', 'bins': 15, 'store': '横浜元町'})
+        np.testing.assert_allclose(approximate['frequencies'], exact['frequencies'])
+
+        response = client.post('/api/v1/analysis/timeseries', json={
+            'session_id': SESSION_ID, 'progressive': True, 'metric': '売上金額', 'store': '存在しない店舗'})
+        assert response.status_code == 400
+        assert client.get('/api/v1/analysis/results/unknown').status_code == 404
+
+
+def test_sample_is_saved_and_reopened_from_disk(monkeypatch):
+    # ディスク上のセッション（再起動後など）は保存済みの標本を開き、データ全体を読まない
+    session_id = 'session_test_progressive_disk'
+    session_dir = get_session_upload_dir(session_id)
+    session_dir.mkdir(parents=True, exist_ok=True)
+    csv_path = session_dir / 'data.csv'
+    generate_sample_store_data(output_path=str(csv_path))
+    try:
+        built = get_stratified_sample(session_id)
+        assert progressive.exists(session_dir / progressive.SAMPLE_DIR)
+
+        stratified_samples.invalidate_session(session_id)
+        with monkeypatch.context() as patch:
+            def fail(*args, **kwargs):
+                raise AssertionError('dataset must not be loaded')
+            patch.setattr(app_improved, 'get_dataframe_for_analysis', fail)
+            patch.setattr(progressive, 'build_stratified_sample', fail)
+            loaded = get_stratified_sample(session_id)
+        pd.testing.assert_frame_equal(loaded.frame, built.frame)
+        assert loaded.labels == built.labels
+        np.testing.assert_array_equal(loaded.strata, built.strata)
+        np.testing.assert_array_equal(loaded.population, built.population)
+        strata = loaded.stratum_mask()
+        assert loaded.value_range('客単価', strata) == built.value_range('客単価', strata)
+        assert loaded.date_range(strata) == built.date_range(strata)
+        assert get_stratified_sample(session_id) is loaded
+
+        # データファイルが変わった場合は標本を作り直す
+        stratified_samples.invalidate_session(session_id)
+        pd.read_csv(csv_path).head(100).to_csv(csv_path, index=False)
+        assert get_stratified_sample(session_id).population_rows == 100
+    finally:
+        stratified_samples.invalidate_session(session_id)
+        shutil.rmtree(session_dir, ignore_errors=True)
@@ -0,0 +1,114 @@
+"""Declarative group-by query tests."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import werkzeug
+
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '3.1.3'
+
+# Ensure project root is importable
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_improved import analysis_cache, app, data_storage  # noqa: E402
+from query_engine import aggregate, combine_codes  # noqa: E402
+
+
+def _build_long_dataframe() -> pd.DataFrame:
+    rng = np.random.default_rng(31)
+    dates = pd.date_range('2024-01-01', '2024-06-30', freq='D')
+    frames = []
+    for shop in ['恵比寿', '横浜元町']:
+        for category in ['衣料', '食品', '雑貨']:
+            frames.append(pd.DataFrame({
+                '店舗名': shop,
+                'カテゴリ': category,
+                '営業日付': dates,
+                '売上金額': rng.integers(10000, 50000, len(dates)).astype(float),
+                '客数': rng.integers(10, 100, len(dates)).astype(float),
+            }))
+    df = pd.concat(frames, ignore_index=True)
+    df.loc[5, '客数'] = np.nan
+    df.loc[7, 'カテゴリ'] = None
+    return df
+
+
+def test_aggregate_matches_pandas_groupby():
+    rng = np.random.default_rng(32)
+    keys = rng.integers(0, 4, 500)
+    values = rng.normal(size=(500, 2))
+    values[::17, 1] = np.nan
+    groups, decoded = combine_codes([keys], [4], 500)
+    result = aggregate(groups, len(decoded), values, ['count', 'sum', 'mean', 'min', 'max', 'median'], [0.1, 0.9])
+
+    frame = pd.DataFrame(values, columns=['a', 'b'])
+    grouped = frame.groupby(keys)
+    assert np.allclose(result['count'], grouped.count().to_numpy())
+    assert np.allclose(result['sum'], grouped.sum().to_numpy())
+    assert np.allclose(result['mean'], grouped.mean().to_numpy())
+    assert np.allclose(result['min'], grouped.min().to_numpy())
+    assert np.allclose(result['max'], grouped.max().to_numpy())
+    assert np.allclose(result['median'], grouped.median().to_numpy())
+    assert np.allclose(result['q0.1'], grouped.quantile(0.1).to_numpy())
+    assert np.allclose(result['q0.9'], grouped.quantile(0.9).to_numpy())
+
+
+def test_query_endpoint_groups_filters_and_caches():
+    session_id = 'session_test_query'
+    df = _build_long_dataframe()
+    data_storage[session_id] = df
+    analysis_cache.invalidate_session(session_id)
+
+    try:
+        client = app.test_client()
+        payload = {'session_id': session_id, 'group_by': ['月', 'store', 'category'],
+                   'metrics': ['売上金額', '客数'], 'aggregations': ['mean', 'sum'],
+                   'quantiles': [0.5], 'stores': ['恵比寿'], 'start_date': '2024-02-01',
+                   'end_date': '2024-03-31', 'page_size': 4}
+        response = client.post('/api/v1/analysis/query', json=payload)
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        assert body['group_by'] == ['store', 'category', 'period']
+        assert body['aggregations'] == ['sum', 'mean', 'q0.5']
+        assert body['total_groups'] == 3 * 2
+        assert body['next_offset'] == 4
+        first = body['rows'][0]
+        assert (first['store'], first['category'], first['period']) == ('恵比寿', '衣料', '2024-02-29T00:00:00')
+        subset = df[(df['店舗名'] == '恵比寿') & (df['カテゴリ'] == '衣料') &
+                    (df['営業日付'] >= '2024-02-01') & (df['営業日付'] <= '2024-02-29')]
+        assert first['rows'] == 29
+        assert first['values']['売上金額']['sum'] == pytest.approx(subset['売上金額'].sum())
+        assert first['values']['客数']['q0.5'] == pytest.approx(subset['客数'].median())
+
+        # 次元の順序や重複が違っても正規化後は同じクエリとしてキャッシュを共有する
+        hits_before = analysis_cache.hits
+        reordered = {**payload, 'group_by': ['category', 'store', '月'], 'metrics': ['売上金額', '客数', '客数'],
+                     'aggregations': ['sum', 'mean'], 'offset': 4}
+        page = client.post('/api/v1/analysis/query', json=reordered).get_json()
+        assert analysis_cache.hits == hits_before + 1
+        assert len(page['rows']) == 2 and page['next_offset'] is None
+
+        body = client.post('/api/v1/analysis/query', json={
+            'session_id': session_id, 'metrics': ['客数'], 'aggregations': ['count', 'max']}).get_json()
+        assert body['total_groups'] == 1
+        assert body['rows'][0]['values']['客数'] == {'count': len(df) - 1, 'max': df['客数'].max()}
+
+        # カテゴリの欠測は 'nan' ではなく null のグループ
+        body = client.post('/api/v1/analysis/query', json={
+            'session_id': session_id, 'group_by': ['category'], 'metrics': ['売上金額'],
+            'aggregations': ['count']}).get_json()
+        assert [row['category'] for row in body['rows']] == [*sorted(['衣料', '食品', '雑貨']), None]
+        assert body['rows'][-1]['rows'] == 1
+
+        for invalid in [{'metrics': ['Total_Sales']}, {'group_by': ['月', '年']},
+                        {'aggregations': ['mode']}, {'quantiles': [1.5]}, {'quantiles': [True]},
+                        {'start_date': 'not-a-date'}]:
+            response = client.post('/api/v1/analysis/query', json={
+                'session_id': session_id, 'metrics': ['売上金額'], **invalid})
+            assert response.status_code == 400
+    finally:
+        data_storage.pop(session_id, None)
+        analysis_cache.invalidate_session(session_id)
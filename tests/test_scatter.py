@@ -0,0 +1,79 @@
+"""Density-binned scatter tests."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import werkzeug
+
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '3.1.3'
+
+# Ensure project root is importable
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_improved import analysis_cache, app, data_storage  # noqa: E402
+from density_binning import hex_bins, rect_bins  # noqa: E402
+
+
+def _build_fixture_dataframe(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(16)
+    guests = rng.integers(50, 300, rows).astype(float)
+    return pd.DataFrame({
+        'shop': rng.choice(['恵比寿', '横浜元町'], rows),
+        'Date': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 365, rows), unit='D'),
+        'Number_of_guests': guests,
+        'Total_Sales': guests * 3000 + rng.normal(0, 20000, rows),
+    })
+
+
+def test_binning_conserves_points():
+    rng = np.random.default_rng(17)
+    x = rng.normal(0, 1, 50000)
+    y = 2 * x + rng.normal(0, 0.5, 50000)
+
+    hexes = hex_bins(x, y, gridsize=30)
+    assert sum(hexes['counts']) == x.size
+    assert len(hexes['counts']) < 2000
+
+    rect = rect_bins(x, y, 20, 10)
+    counts = np.array(rect['counts'])
+    assert counts.shape == (10, 20)
+    assert counts.sum() == x.size
+
+    flat = hex_bins(np.ones(10), np.arange(10.0), gridsize=5)
+    assert sum(flat['counts']) == 10
+
+
+def test_scatter_endpoint_switches_to_bins_above_threshold():
+    small_id = 'session_test_scatter_small'
+    large_id = 'session_test_scatter_large'
+    data_storage[small_id] = _build_fixture_dataframe(1000)
+    data_storage[large_id] = _build_fixture_dataframe(60000)
+
+    try:
+        client = app.test_client()
+        payload = {'x_metric': 'Number_of_guests', 'y_metric': 'Total_Sales'}
+        body = client.post('/api/v1/analysis/scatter', json={**payload, 'session_id': small_id}).get_json()
+        assert body['mode'] == 'points'
+        assert len(body['points']['x']) == 1000
+        assert body['statistics']['pearson_r'] > 0.9
+        assert body['statistics']['regression']['slope'] == pytest.approx(3000, rel=0.05)
+
+        body = client.post('/api/v1/analysis/scatter', json={**payload, 'session_id': large_id}).get_json()
+        assert body['mode'] == 'hex'
+        assert body['n'] == 60000
+        assert sum(body['hex']['counts']) == 60000
+        assert 'points' not in body
+
+        response = client.post('/api/v1/analysis/scatter',
+                               json={**payload, 'session_id': large_id, 'mode': 'points'})
+        assert response.status_code == 400
+        response = client.post('/api/v1/analysis/scatter',
+                               json={**payload, 'session_id': large_id, 'mode': 'rect', 'bins': 25})
+        assert np.array(response.get_json()['rect']['counts']).shape == (25, 25)
+    finally:
+        for session_id in (small_id, large_id):
+            data_storage.pop(session_id, None)
+            analysis_cache.invalidate_session(session_id)
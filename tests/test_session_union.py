@@ -0,0 +1,146 @@
+"""Multi-session (union) analysis tests (results must match a session holding the concatenated data)."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import werkzeug
+from scipy import stats
+
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '3.1.3'
+
+# Ensure project root is importable
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import session_union  # noqa: E402
+from app_improved import analysis_cache, app, data_storage  # noqa: E402
+from tests.generate_test_data import generate_sample_store_data  # noqa: E402
+
+SESSION_IDS = ['session_test_union_first', 'session_test_union_second']
+CONCATENATED_ID = 'session_test_union_all'
+
+
+@pytest.fixture
+def sessions(tmp_path):
+    csv_path = tmp_path / 'test_data.csv'
+    generate_sample_store_data(output_path=str(csv_path))
+    df = pd.read_csv(csv_path)
+    dates = pd.to_datetime(df['営業日付'])
+    # 期間の離れた2回のアップロード（間の期間にデータなし）
+    parts = [df[dates < '2023-05-15'].reset_index(drop=True), df[dates >= '2023-07-01'].reset_index(drop=True)]
+    for session_id, part in zip(SESSION_IDS, parts):
+        data_storage[session_id] = part
+    data_storage[CONCATENATED_ID] = pd.concat(parts, ignore_index=True)
+    try:
+        yield
+    finally:
+        for session_id in (*SESSION_IDS, CONCATENATED_ID):
+            data_storage.pop(session_id, None)
+            analysis_cache.invalidate_session(session_id)
+
+
+def _post_union_and_concatenated(client, path, payload):
+    results = []
+    for ids in ({'session_ids': SESSION_IDS}, {'session_id': CONCATENATED_ID}):
+        response = client.post(path, json={**ids, **payload})
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        results.append(body.get('data', body))
+    return results
+
+
+def test_union_matches_concatenated_session(sessions):
+    with app.test_client() as client:
+        union, concatenated = _post_union_and_concatenated(client, '/api/v1/analysis/timeseries', {
+            'metric': '売上金額', 'time_unit': '週', 'store': '恵比寿'})
+        assert union['dates'] == concatenated['dates']
+        np.testing.assert_allclose(union['values'], concatenated['values'])
+        assert [entry['session_id'] for entry in union['sessions']] == SESSION_IDS
+        # セッション別の値は各セッションの期間外が null
+        assert union['sessions'][0]['values'][-1] is None and union['sessions'][1]['values'][0] is None
+
+        union, concatenated = _post_union_and_concatenated(client, '/api/v1/analysis/histogram', {
+            'metric': '客単価', 'bins': 12, 'start_date': '2023-02-01'})
+        assert union['frequencies'] == concatenated['frequencies']
+        np.testing.assert_allclose(union['bin_edges'], concatenated['bin_edges'])
+        for key in ('mean', 'median', 'std', 'min', 'max', 'skewness', 'kurtosis'):
+            assert union['statistics'][key] == pytest.approx(concatenated['statistics'][key], rel=1e-9)
+        assert union['statistics']['percentiles'] == concatenated['statistics']['percentiles']
+
+        union, concatenated = _post_union_and_concatenated(client, '/api/v1/analysis/pareto', {
+            'metric': '売上金額', 'category_column': '店舗名'})
+        assert union['abc_classification'] == concatenated['abc_classification']
+        assert union['chart'] == concatenated['chart']
+        assert sum(entry['total'] for entry in union['sessions']) == pytest.approx(union['statistics']['total'])
+
+        # 2回目はセッションごとの集計済みの値の参照のみ
+        misses = analysis_cache.misses
+        response = client.post('/api/v1/analysis/pareto', json={
+            'session_ids': SESSION_IDS, 'metric': '売上金額', 'category_column': '店舗名'})
+        assert response.status_code == 200
+        assert analysis_cache.misses == misses
+
+
+def test_merged_statistics_and_validation(sessions):
+    rng = np.random.default_rng(0)
+    arrays = [np.sort(rng.normal(loc, scale, size)) for loc, scale, size in ((0, 1, 50), (3, 2, 7), (-1, 0.5, 200))]
+    values = np.concatenate(arrays)
+    for q in (0.0, 0.05, 0.5, 0.77, 1.0):
+        assert session_union.quantile(arrays, q) == pytest.approx(np.quantile(values, q), rel=1e-12)
+
+    parts = [session_union.moments_from_statistics(a.size, a.mean(), a.std(ddof=1), stats.skew(a), stats.kurtosis(a))
+             for a in arrays]
+    mean, std, skewness, kurtosis = session_union.describe_moments(session_union.merge_moments(parts))
+    assert mean == pytest.approx(values.mean())
+    assert std == pytest.approx(values.std(ddof=1))
+    assert skewness == pytest.approx(stats.skew(values))
+    assert kurtosis == pytest.approx(stats.kurtosis(values))
+
+    with app.test_client() as client:
+        for payload in ({'session_ids': SESSION_IDS},
+                        {'session_ids': SESSION_IDS, 'metric': '売上金額', 'progressive': True},
+                        {'session_ids': [], 'metric': '売上金額'}):
+            response = client.post('/api/v1/analysis/timeseries', json=payload)
+            assert response.status_code == 400
+        response = client.post('/api/v1/analysis/histogram', json={
+            'session_ids': [SESSION_IDS[0], 'session_test_union_missing'], 'metric': '客単価'})
+        assert response.status_code == 404
+
+
+def test_constant_and_single_row_sessions_merge_to_finite_moments(sessions):
+    # 定数・1件のセッションは歪度・尖度が NaN になるが、結合結果は連結した値と一致する
+    arrays = [np.full(5, 2.0), np.array([7.0]), np.array([1.0, 4.0, 2.5, 9.0])]
+    values = np.concatenate(arrays)
+    with pytest.warns(RuntimeWarning):
+        parts = [session_union.moments_from_statistics(a.size, a.mean(), a.std(ddof=1) if a.size > 1 else 0.0,
+                                                       stats.skew(a), stats.kurtosis(a)) for a in arrays]
+    mean, std, skewness, kurtosis = session_union.describe_moments(session_union.merge_moments(parts))
+    assert mean == pytest.approx(values.mean())
+    assert std == pytest.approx(values.std(ddof=1))
+    assert skewness == pytest.approx(stats.skew(values))
+    assert kurtosis == pytest.approx(stats.kurtosis(values))
+
+    data_storage[SESSION_IDS[0]] = data_storage[SESSION_IDS[0]].assign(客単価=1500)
+    analysis_cache.invalidate_session(SESSION_IDS[0])
+    with app.test_client() as client:
+        response = client.post('/api/v1/analysis/histogram', json={'session_ids': SESSION_IDS, 'metric': '客単価'})
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        statistics = body.get('data', body)['statistics']
+        assert np.isfinite([statistics['skewness'], statistics['kurtosis']]).all()
+
+        # 単一セッションの分析と集計済みの値を共有する
+        hits = analysis_cache.hits
+        response = client.post('/api/v1/analysis/histogram', json={'session_id': SESSION_IDS[1], 'metric': '客単価'})
+        assert response.status_code == 200
+        assert analysis_cache.hits > hits
+
+        client.post('/api/v1/analysis/pareto', json={
+            'session_ids': SESSION_IDS, 'metric': '売上金額', 'category_column': '店舗名'})
+        hits = analysis_cache.hits
+        response = client.post('/api/v1/analysis/pareto', json={
+            'session_id': SESSION_IDS[0], 'metric': '売上金額', 'category_column': '店舗名'})
+        assert response.status_code == 200
+        assert analysis_cache.hits > hits
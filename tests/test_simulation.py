@@ -0,0 +1,95 @@
+"""Monte Carlo sales simulation tests."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import werkzeug
+
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '3.1.3'
+
+# Ensure project root is importable
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app_improved import analysis_cache, app, data_storage  # noqa: E402
+from monte_carlo import percentile_bands, simulate_bootstrap, simulate_parametric  # noqa: E402
+from scipy import stats  # noqa: E402
+
+
+def _build_daily_dataframe(days: int = 120) -> pd.DataFrame:
+    rng = np.random.default_rng(21)
+    dates = pd.date_range('2024-01-01', periods=days, freq='D')
+    frames = []
+    for shop, mean in [('恵比寿', 300000.0), ('横浜元町', 150000.0)]:
+        frames.append(pd.DataFrame({
+            'shop': shop,
+            'Date': dates,
+            'Total_Sales': rng.gamma(50.0, mean / 50.0, days),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_simulators_match_analytic_moments_and_are_chunk_invariant():
+    pools = [np.array([1.0, 2.0, 3.0, 4.0]), np.array([10.0])]
+    totals = simulate_bootstrap(pools, days=30, trials=20000, seed=3)
+    assert totals.shape == (2, 20000)
+    assert totals[0].mean() == pytest.approx(75.0, rel=0.01)
+    assert totals[0].var() == pytest.approx(30 * 1.25, rel=0.05)
+    assert (totals[1] == 300.0).all()
+    # ブロック分割しても同じ乱数列・同じ結果になる
+    chunked = simulate_bootstrap(pools, days=30, trials=20000, seed=3, chunk_elements=1000)
+    assert np.allclose(totals[1], chunked[1])
+
+    gamma = stats.gamma(4.0, scale=2.0)
+    totals = simulate_parametric([gamma], days=10, trials=20000, seed=5)
+    assert totals[0].mean() == pytest.approx(80.0, rel=0.01)
+    bands = percentile_bands(totals, [5, 50, 95])
+    assert bands.shape == (1, 3)
+    assert bands[0, 1] == pytest.approx(stats.gamma(40.0, scale=2.0).median(), rel=0.02)
+
+
+def test_simulation_endpoint_bootstrap_and_fitted():
+    session_id = 'session_test_simulation'
+    df = _build_daily_dataframe()
+    data_storage[session_id] = df
+    analysis_cache.invalidate_session(session_id)
+
+    try:
+        client = app.test_client()
+        payload = {'session_id': session_id, 'days': 30, 'trials': 5000}
+        response = client.post('/api/v2/analysis/simulation', json=payload)
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        assert body['method'] == 'bootstrap'
+        assert [s['store'] for s in body['stores']] == ['恵比寿', '横浜元町']
+        ebisu = body['stores'][0]
+        expected = 30 * df[df['shop'] == '恵比寿']['Total_Sales'].mean()
+        assert ebisu['mean'] == pytest.approx(expected, rel=0.01)
+        assert body['percentiles'] == [5, 25, 50, 75, 95]
+        assert len(ebisu['bands']) == 5 and ebisu['bands'] == sorted(ebisu['bands'])
+        total_mean = sum(s['mean'] for s in body['stores'])
+        assert body['total']['mean'] == pytest.approx(total_mean)
+
+        hits_before = analysis_cache.hits
+        assert client.post('/api/v2/analysis/simulation', json=payload).get_json() == body
+        assert analysis_cache.hits == hits_before + 1
+
+        response = client.post('/api/v2/analysis/simulation', json={
+            **payload, 'method': 'fitted', 'distribution_type': 'gamma',
+            'stores': ['横浜元町'], 'percentiles': [50]})
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        store = body['stores'][0]
+        assert store['distribution'] == 'gamma'
+        assert store['mean'] == pytest.approx(30 * store['daily_mean'], rel=0.02)
+        assert len(store['bands']) == 1
+
+        for invalid in [{'method': 'mcmc'}, {'trials': 10}, {'days': 0}, {'percentiles': [120]},
+                        {'percentiles': [True, 50]}]:
+            response = client.post('/api/v2/analysis/simulation', json={**payload, **invalid})
+            assert response.status_code == 400
+    finally:
+        data_storage.pop(session_id, None)
+        analysis_cache.invalidate_session(session_id)
@@ -0,0 +1,144 @@
+"""Time series rolling statistics tests."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import werkzeug
+
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '3.1.3'
+
+# Ensure project root is importable
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import forecast_engine  # noqa: E402
+from app_improved import TimeSeriesAnalyzer, analysis_cache, app, data_storage  # noqa: E402
+from forecast_engine import fit_panel, forecast  # noqa: E402
+from rolling_stats import rolling_statistics  # noqa: E402
+
+
+def _build_fixture_dataframe(rows: int = 600) -> pd.DataFrame:
+    rng = np.random.default_rng(9)
+    return pd.DataFrame({
+        'shop': rng.choice(['恵比寿', '横浜元町', '銀座'], rows),
+        'Date': pd.date_range('2023-01-01', periods=rows, freq='D'),
+        'Total_Sales': rng.normal(300000, 50000, rows),
+        'gross_profit': rng.normal(120000, 20000, rows),
+    })
+
+
+def test_rolling_statistics_match_pandas():
+    matrix = np.random.default_rng(10).normal(100, 10, (2000, 4))
+    frame = pd.DataFrame(matrix)
+    result = rolling_statistics(matrix, window=7, span=20, growth_lag=2)
+
+    assert result['rolling_mean'] == pytest.approx(frame.rolling(7).mean().to_numpy(), nan_ok=True)
+    assert result['rolling_std'] == pytest.approx(frame.rolling(7).std().to_numpy(), nan_ok=True)
+    assert result['rolling_min'] == pytest.approx(frame.rolling(7).min().to_numpy(), nan_ok=True)
+    assert result['rolling_max'] == pytest.approx(frame.rolling(7).max().to_numpy(), nan_ok=True)
+    assert result['ewma'] == pytest.approx(frame.ewm(span=20).mean().to_numpy())
+    assert result['growth_rate'] == pytest.approx(frame.pct_change(2).to_numpy() * 100, nan_ok=True)
+
+    short = rolling_statistics(matrix[:3], window=5)
+    assert np.isnan(short['rolling_mean']).all()
+
+
+def test_panel_matches_single_series_analysis():
+    df = _build_fixture_dataframe()
+    analyzer = TimeSeriesAnalyzer(df)
+    rolling = {'window': 3, 'span': 6, 'growth_lag': 1}
+    panel = analyzer.analyze_panel(['Total_Sales', 'gross_profit'], time_unit='月', rolling=rolling)
+
+    assert len(panel['series']) == 2 * 4
+    for entry in panel['series']:
+        single = analyzer.analyze(metric=entry['metric'], time_unit='月', store=entry['store'],
+                                  rolling=rolling)
+        assert single['dates'] == panel['dates']
+        assert entry['values'] == pytest.approx(single['values'])
+        assert entry['ewma'] == pytest.approx(single['rolling']['ewma'])
+        assert entry['rolling_mean'][:2] == [None, None]
+
+
+def test_timeseries_panel_endpoint():
+    session_id = 'session_test_timeseries_panel'
+    data_storage[session_id] = _build_fixture_dataframe()
+
+    try:
+        client = app.test_client()
+        response = client.post('/api/v1/analysis/timeseries/panel', json={
+            'session_id': session_id, 'metrics': ['Total_Sales'], 'time_unit': '週',
+            'stores': ['恵比寿'], 'rolling': {'window': 4}})
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body['rolling'] == {'window': 4, 'span': 4, 'growth_lag': 1}
+        assert [entry['store'] for entry in body['series']] == [None, '恵比寿']
+        assert body['series'][0]['values'] == body['series'][1]['values']
+
+        response = client.post('/api/v1/analysis/timeseries/panel', json={
+            'session_id': session_id, 'metrics': ['Total_Sales'], 'rolling': {'window': 0}})
+        assert response.status_code == 400
+        response = client.post('/api/v1/analysis/timeseries/panel', json={
+            'session_id': session_id, 'metrics': ['unknown']})
+        assert response.status_code == 400
+    finally:
+        data_storage.pop(session_id, None)
+
+
+def test_holt_winters_tracks_trend_and_season(monkeypatch):
+    rng = np.random.default_rng(11)
+    periods = np.arange(120)
+    pattern = 1000 + 5 * periods + 200 * np.sin(2 * np.pi * periods / 12)
+    matrix = pattern[:, None] + rng.normal(0, 5, (120, 30))
+
+    fit = fit_panel(matrix, season_length=12)
+    future = np.arange(120, 132)
+    expected = 1000 + 5 * future + 200 * np.sin(2 * np.pi * future / 12)
+    predicted = forecast(fit, horizon=12)
+    assert predicted['forecast'] == pytest.approx(np.repeat(expected[:, None], 30, axis=1), rel=0.02)
+    assert (predicted['lower'] < predicted['forecast']).all()
+
+    monkeypatch.setattr(forecast_engine, 'PARALLEL_MIN_CELLS', 0)
+    parallel = fit_panel(matrix, season_length=12, max_workers=2)
+    assert parallel['level'] == pytest.approx(fit['level'])
+    assert parallel['season'] == pytest.approx(fit['season'])
+
+    short = fit_panel(matrix[:10], season_length=12)
+    assert int(short['season_length']) == 1
+
+    # 途中から観測が始まる系列（開店前は NaN）は最初の観測から当てはめる
+    opened = matrix.copy()
+    opened[:40, :3] = np.nan
+    predicted = forecast(fit_panel(opened, season_length=12), horizon=12)
+    assert predicted['forecast'][:, :3] == pytest.approx(np.repeat(expected[:, None], 3, axis=1), rel=0.05)
+
+
+def test_timeseries_forecast_endpoint_caches_fit():
+    session_id = 'session_test_timeseries_forecast'
+    data_storage[session_id] = _build_fixture_dataframe()
+    analysis_cache.invalidate_session(session_id)
+
+    try:
+        client = app.test_client()
+        payload = {'session_id': session_id, 'metrics': ['Total_Sales', 'gross_profit'],
+                   'time_unit': '日', 'horizon': 4}
+        response = client.post('/api/v1/analysis/timeseries/forecast', json=payload)
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body['season_length'] == 7
+        assert len(body['forecast_dates']) == 4
+        assert len(body['series']) == 2 * 4
+        assert all(len(entry['forecast']) == 4 for entry in body['series'])
+
+        hits_before = analysis_cache.hits
+        response = client.post('/api/v1/analysis/timeseries/forecast', json={**payload, 'horizon': 8})
+        assert analysis_cache.hits == hits_before + 1
+        longer = response.get_json()
+        assert longer['series'][0]['forecast'][:4] == pytest.approx(body['series'][0]['forecast'])
+
+        response = client.post('/api/v1/analysis/timeseries/forecast', json={**payload, 'horizon': 0})
+        assert response.status_code == 400
+    finally:
+        data_storage.pop(session_id, None)
+        analysis_cache.invalidate_session(session_id)